@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Time history inserts and full-text searches over a synthetic history.
+
+Usage: python benchmarks/bench_history_search.py [--entries N] [--searches N]
+
+Builds a throwaway history database in a temporary cache directory, so the
+real history is never touched.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+VERBS = ["find", "list", "delete", "compress", "count", "show", "rename", "copy", "sort"]
+OBJECTS = ["log files", "docker images", "git branches", "large files", "open ports", "csv rows"]
+QUALIFIERS = ["older than a week", "in this repo", "by size", "recursively", "over ssh", ""]
+COMMANDS = ["find . -name", "ls -la", "docker ps", "git branch", "du -sh", "ss -tlnp", "awk -F,"]
+
+
+def synthetic_task(rng: random.Random) -> tuple[str, str]:
+    task = f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(QUALIFIERS)}".strip()
+    command = f"{rng.choice(COMMANDS)} {rng.randrange(10**6)}"
+    return task, command
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=200_000)
+    parser.add_argument("--searches", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        os.environ["SHELLGENIUS_CACHE_DIR"] = cache_dir
+        from shellgenius.history import connect_history, search_history
+
+        rng = random.Random(0)
+        start = time.perf_counter()
+        with connect_history() as connection:
+            connection.executemany(
+                "INSERT INTO generations (created, task, model, os_name, command)"
+                " VALUES (?, ?, 'gpt-5.4-mini', 'Linux', ?)",
+                ((time.time(), *synthetic_task(rng)) for _ in range(args.entries)),
+            )
+        print(f"Inserted {args.entries} entries in {time.perf_counter() - start:.2f}s")
+
+        queries = [f"{rng.choice(VERBS)} {rng.choice(OBJECTS).split()[0][:4]}"]
+        queries += [rng.choice(VERBS + OBJECTS) for _ in range(args.searches - 1)]
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            search_history(query)
+            timings.append(time.perf_counter() - start)
+
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(
+            f"{len(queries)} searches: p50 {statistics.median(timings) * 1000:.1f} ms,"
+            f" p95 {p95 * 1000:.1f} ms, max {timings[-1] * 1000:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Compare time to first token and total latency across reasoning settings.
+
+Usage: python benchmarks/bench_reasoning_settings.py [--model MODEL] [--runs N]
+           [--max-output-tokens N] [--live [--record FILE] | --replay FILE]
+
+Without --live or --replay the stream is simulated: every reasoning token
+delays the first output token and every output token adds streaming time, at
+the rates below scaled by --time-scale. --live calls the API (needs a key)
+and --record saves each stream's chunk timings for later --replay runs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from shellgenius.gpt_integration import format_prompt
+from shellgenius.models import get_model_capabilities, resolve_request_options
+from shellgenius.openai_backend import OpenAIResponsesBackend
+
+TASK = "find files larger than 100 MB modified in the last week and sort them by size"
+
+# Rough token counts for the simulated stream.
+MOCK_REASONING_TOKENS = {"none": 0, "minimal": 10, "low": 150, "medium": 600, "high": 1800}
+MOCK_OUTPUT_TOKENS = {None: 120, "low": 60, "medium": 120, "high": 260}
+MOCK_BASE_SECONDS = 0.35
+MOCK_TOKENS_PER_SECOND = 120.0
+MOCK_TOKENS_PER_CHUNK = 4
+
+
+class MockStreamClient:
+    """Client whose ``responses.create`` streams after simulated delays."""
+
+    def __init__(self, time_scale: float) -> None:
+        self.time_scale = time_scale
+        self.responses = SimpleNamespace(create=self._create)
+
+    def _create(self, **kwargs):
+        effort = (kwargs.get("reasoning") or {}).get("effort", "none")
+        verbosity = (kwargs.get("text") or {}).get("verbosity")
+        reasoning_tokens = MOCK_REASONING_TOKENS.get(effort, 0)
+        output_tokens = MOCK_OUTPUT_TOKENS.get(verbosity, MOCK_OUTPUT_TOKENS[None])
+
+        limit = kwargs.get("max_output_tokens")
+        if limit is not None:
+            reasoning_tokens = min(reasoning_tokens, limit)
+            output_tokens = min(output_tokens, limit - reasoning_tokens)
+
+        return self._stream(reasoning_tokens, output_tokens)
+
+    def _stream(self, reasoning_tokens: int, output_tokens: int):
+        time.sleep(
+            (MOCK_BASE_SECONDS + reasoning_tokens / MOCK_TOKENS_PER_SECOND) * self.time_scale
+        )
+        chunk_delay = MOCK_TOKENS_PER_CHUNK / MOCK_TOKENS_PER_SECOND * self.time_scale
+        text = []
+        for _ in range(0, output_tokens, MOCK_TOKENS_PER_CHUNK):
+            text.append("tok ")
+            yield SimpleNamespace(type="response.output_text.delta", delta="tok ")
+            time.sleep(chunk_delay)
+        yield SimpleNamespace(
+            type="response.completed",
+            response=SimpleNamespace(output_text="".join(text)),
+        )
+
+
+class ReplayStreamClient:
+    """Client that replays chunk timings saved by ``--record``."""
+
+    def __init__(self, recordings: dict[str, list[list]]) -> None:
+        self.recordings = recordings
+        self.responses = SimpleNamespace(create=self._create)
+
+    def _create(self, **kwargs):
+        key = setting_key(
+            (kwargs.get("reasoning") or {}).get("effort"),
+            (kwargs.get("text") or {}).get("verbosity"),
+        )
+        if key not in self.recordings:
+            raise SystemExit(f"No recording for {key}; record it with --live --record.")
+        return self._stream(self.recordings[key])
+
+    @staticmethod
+    def _stream(chunks: list[list]):
+        start = time.perf_counter()
+        text = []
+        for offset, delta in chunks:
+            time.sleep(max(0.0, offset - (time.perf_counter() - start)))
+            text.append(delta)
+            yield SimpleNamespace(type="response.output_text.delta", delta=delta)
+        yield SimpleNamespace(
+            type="response.completed",
+            response=SimpleNamespace(output_text="".join(text)),
+        )
+
+
+def setting_key(effort: str | None, verbosity: str | None) -> str:
+    return f"{effort or '-'}/{verbosity or '-'}"
+
+
+def run_once(backend, model: str, options) -> tuple[float | None, float, list[list]]:
+    chunks: list[list] = []
+    start = time.perf_counter()
+
+    def on_chunk(delta: str) -> None:
+        chunks.append([time.perf_counter() - start, delta])
+
+    backend.create_text_response(
+        prompt=format_prompt(TASK, "Linux"),
+        model=model,
+        n=1,
+        temperature=None,
+        stop=None,
+        stream=True,
+        chunk_callback=on_chunk,
+        reasoning_effort=options.reasoning_effort,
+        verbosity=options.verbosity,
+        max_output_tokens=options.max_output_tokens,
+    )
+    total = time.perf_counter() - start
+    first_token = chunks[0][0] if chunks else None
+    return first_token, total, chunks
+
+
+def settings_for(model: str, max_output_tokens: int | None):
+    capabilities = get_model_capabilities(model)
+    efforts = capabilities.reasoning_efforts or (None,)
+    verbosities = ("low", "medium", "high") if capabilities.verbosity else (None,)
+    for effort in efforts:
+        for verbosity in verbosities:
+            yield resolve_request_options(
+                model,
+                reasoning_effort=effort,
+                verbosity=verbosity,
+                max_output_tokens=max_output_tokens,
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="gpt-5.4-mini")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--max-output-tokens", type=int)
+    parser.add_argument("--time-scale", type=float, default=0.1)
+    parser.add_argument("--live", action="store_true")
+    parser.add_argument("--record", type=Path)
+    parser.add_argument("--replay", type=Path)
+    args = parser.parse_args()
+
+    scale = 1.0
+    if args.live:
+        from shellgenius.openai_backend import create_openai_backend
+
+        backend = create_openai_backend()
+        source = "live API"
+    elif args.replay:
+        recordings = json.loads(args.replay.read_text(encoding="utf-8"))
+        backend = OpenAIResponsesBackend(client=ReplayStreamClient(recordings))
+        source = f"replay of {args.replay}"
+    else:
+        backend = OpenAIResponsesBackend(client=MockStreamClient(args.time_scale))
+        scale = args.time_scale
+        source = f"mock stream, times rescaled from x{args.time_scale}"
+
+    print(f"{args.model}, {args.runs} run(s) per setting, {source}")
+    print(f"{'effort/verbosity':<20} {'TTFT p50':>10} {'total p50':>10} {'total max':>10}")
+
+    recordings: dict[str, list[list]] = {}
+    for options in settings_for(args.model, args.max_output_tokens):
+        key = setting_key(options.reasoning_effort, options.verbosity)
+        first_tokens, totals = [], []
+        for _ in range(args.runs):
+            first_token, total, chunks = run_once(backend, args.model, options)
+            if first_token is not None:
+                first_tokens.append(first_token / scale)
+            totals.append(total / scale)
+            recordings[key] = chunks
+
+        ttft = f"{statistics.median(first_tokens):9.2f}s" if first_tokens else f"{'-':>10}"
+        print(f"{key:<20} {ttft} {statistics.median(totals):9.2f}s {max(totals):9.2f}s")
+
+    if args.record:
+        args.record.write_text(json.dumps(recordings), encoding="utf-8")
+        print(f"Recorded chunk timings to {args.record}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Time response cache lookups against the number of cached answers.
+
+Usage: python benchmarks/bench_response_cache.py [--sizes 1000,100000,1000000] [--lookups N]
+
+Builds each cache in a temporary cache directory, so the real one is never
+touched. Lookups are timed through ``lookup_response``, as a request makes
+them, for cached and uncached tasks. For comparison, the same number of
+answers is also timed in the JSON file earlier versions used, up to 100k.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+ANSWER = "```bash\nfind . -name '*.log' -mtime +7 -delete\n```\n\nExplanation:\n* Deletes old logs."
+
+# The JSON format is rewritten whole on every store; beyond this it is too
+# slow to be worth timing.
+MAX_JSON_ENTRIES = 100_000
+
+
+def percentiles(timings: list[float]) -> str:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    return f"p50 {statistics.median(timings) * 1e6:7.1f} us, p95 {p95 * 1e6:7.1f} us"
+
+
+def time_lookups(lookup, keys: list[str]) -> list[float]:
+    timings = []
+    for key in keys:
+        start = time.perf_counter()
+        lookup(key)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench(size: int, lookups: int) -> None:
+    from shellgenius import response_cache
+    from shellgenius.response_cache import lookup_response, response_cache_key
+    from shellgenius.segment_store import SegmentStore
+
+    rng = random.Random(size)
+    keys = [response_cache_key(f"task {number}", "Linux") for number in range(size)]
+    payload = json.dumps({"text": ANSWER, "model": "gpt-5.4-mini", "explain": True}).encode()
+
+    start = time.perf_counter()
+    with SegmentStore(response_cache.get_response_cache_path()).writer() as writer:
+        for key in keys:
+            writer.put(bytes.fromhex(key), time.time(), payload)
+    build_seconds = time.perf_counter() - start
+    store = SegmentStore(response_cache.get_response_cache_path())
+    print(
+        f"{size:>9} answers: built in {build_seconds:.1f}s,"
+        f" {store.size_bytes() / 2**20:.1f} MiB on disk"
+    )
+
+    hits = [rng.choice(keys) for _ in range(lookups)]
+    misses = [response_cache_key(f"other task {number}", "Linux") for number in range(lookups)]
+    assert lookup_response(hits[0]).text == ANSWER
+    print(f"  segment hit   {percentiles(time_lookups(lookup_response, hits))}")
+    print(f"  segment miss  {percentiles(time_lookups(lookup_response, misses))}")
+
+    if size > MAX_JSON_ENTRIES:
+        return
+    json_path = Path(os.environ["SHELLGENIUS_CACHE_DIR"]) / "legacy.json"
+    entry = {"text": ANSWER, "model": "gpt-5.4-mini", "explain": True, "created": time.time()}
+    json_path.write_text(json.dumps({"version": 1, "entries": dict.fromkeys(keys, entry)}))
+
+    def json_lookup(key: str):
+        return json.loads(json_path.read_text())["entries"].get(key)
+
+    json_timings = time_lookups(json_lookup, hits[: max(lookups // 100, 10)])
+    print(f"  JSON hit      {percentiles(json_timings)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    for size in (int(value) for value in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            os.environ["SHELLGENIUS_CACHE_DIR"] = cache_dir
+            bench(size, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""Measure similar-task precision, recall, and lookup latency on a synthetic corpus.
+
+Usage: python benchmarks/bench_similarity.py [--tasks N] [--queries N] [--thresholds T ...]
+
+Indexes generated tasks into a throwaway cache directory, then looks up
+reworded copies of indexed tasks (which should match their original) and
+near misses that differ in one word, number, or glob (which should not
+match anything). Precision is the share of offered answers that belong to
+the right task; recall is the share of rewordings that found it. Character
+n-grams cannot match synonyms, so recall is also shown for rewordings that
+kept the original verb.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+VERBS = {
+    "find": ["locate", "search for", "look for"],
+    "delete": ["remove", "erase"],
+    "list": ["show", "print"],
+    "count": ["count the number of", "tally"],
+    "compress": ["archive", "zip up"],
+    "copy": ["duplicate", "cp"],
+}
+OBJECTS = [
+    "log files",
+    "docker images",
+    "git branches",
+    "empty directories",
+    "png images",
+    "python files",
+    "open ports",
+    "zombie processes",
+    "cron jobs",
+    "symlinks",
+    "hidden files",
+    "csv files",
+]
+QUALIFIERS = [
+    "older than {n} days",
+    "larger than {n} MB",
+    "modified in the last {n} hours",
+    "in the {dir} directory",
+    "matching *.{ext}",
+    "owned by user {user}",
+]
+DIRECTORIES = ["/var/log", "/tmp", "~/projects", "/etc", "./build", "/srv/data"]
+EXTENSIONS = ["log", "txt", "bak", "tmp", "json", "gz"]
+USERS = ["alice", "deploy", "www-data", "postgres", "root", "backup"]
+FILLERS = ["", "please ", "how do I ", "I want to ", "can you "]
+
+
+def intent(rng: random.Random) -> tuple[str, str, str]:
+    qualifier = rng.choice(QUALIFIERS).format(
+        n=rng.randrange(1, 120),
+        dir=rng.choice(DIRECTORIES),
+        ext=rng.choice(EXTENSIONS),
+        user=rng.choice(USERS),
+    )
+    return rng.choice(list(VERBS)), rng.choice(OBJECTS), qualifier
+
+
+def phrase(verb: str, obj: str, qualifier: str) -> str:
+    return f"{verb} {obj} {qualifier}"
+
+
+def reword(rng: random.Random, verb: str, obj: str, qualifier: str) -> tuple[str, bool]:
+    """A paraphrase a user might type for the same intent, and whether it kept the verb."""
+    chosen = rng.choice([verb, *VERBS[verb]])
+    words = [chosen, rng.choice(["", "all ", "the "]) + obj, qualifier]
+    text = rng.choice(FILLERS) + " ".join(words)
+    if rng.random() < 0.3:
+        text = text.upper() if rng.random() < 0.2 else text.capitalize()
+    if rng.random() < 0.3:
+        # One adjacent-letter typo in a word without digits or punctuation.
+        candidates = [i for i, word in enumerate(text.split()) if word.isalpha() and len(word) > 3]
+        if candidates:
+            split = text.split()
+            position = rng.choice(candidates)
+            word = split[position]
+            offset = rng.randrange(len(word) - 1)
+            split[position] = word[:offset] + word[offset + 1] + word[offset] + word[offset + 2 :]
+            text = " ".join(split)
+    return text + rng.choice(["", "?", "."]), chosen == verb
+
+
+def near_miss(rng: random.Random, verb: str, obj: str, qualifier: str) -> tuple[str, str, str]:
+    """The same sentence with one detail changed, so the old answer is wrong."""
+    change = rng.randrange(3)
+    if change == 0:
+        return rng.choice([other for other in VERBS if other != verb]), obj, qualifier
+    if change == 1:
+        return verb, rng.choice([other for other in OBJECTS if other != obj]), qualifier
+    while True:
+        _, _, other = intent(rng)
+        if other != qualifier:
+            return verb, obj, other
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.7, 0.8, 0.85, 0.9, 0.95])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        os.environ["SHELLGENIUS_CACHE_DIR"] = cache_dir
+        from shellgenius import similarity
+
+        if not similarity.available():
+            raise SystemExit("NumPy is required: pip install 'shellgenius[similar]'")
+        similarity.MAX_INDEXED_TASKS = max(similarity.MAX_INDEXED_TASKS, args.tasks)
+
+        rng = random.Random(0)
+        intents = {}
+        while len(intents) < args.tasks:
+            parts = intent(rng)
+            intents[phrase(*parts)] = parts
+
+        start = time.perf_counter()
+        for task in intents:
+            similarity.add_task(task, "Linux", task, model="gpt-5.4-mini", explain=False)
+        elapsed = time.perf_counter() - start
+        print(
+            f"Indexed {args.tasks} tasks in {elapsed:.2f}s ({elapsed / args.tasks * 1000:.2f}ms each)"
+        )
+
+        indexed = list(intents.values())
+        positives = []
+        for _ in range(args.queries):
+            parts = rng.choice(indexed)
+            positives.append((*reword(rng, *parts), phrase(*parts)))
+        negatives = []
+        while len(negatives) < args.queries:
+            parts = near_miss(rng, *rng.choice(indexed))
+            if phrase(*parts) not in intents:
+                negatives.append(reword(rng, *parts)[0])
+
+        same_verb = sum(kept_verb for _, kept_verb, _ in positives)
+        print(
+            f"{'threshold':>9}  {'precision':>9}  {'recall':>6}"
+            f"  {'recall (same verb)':>18}  {'false offers':>12}"
+        )
+        for threshold in args.thresholds:
+            correct = correct_same_verb = wrong = 0
+            for query, kept_verb, expected in positives:
+                match = similarity.find_similar_task(query, "Linux", threshold=threshold)
+                if match is not None:
+                    correct += match.task == expected
+                    correct_same_verb += kept_verb and match.task == expected
+                    wrong += match.task != expected
+            false_offers = sum(
+                similarity.find_similar_task(query, "Linux", threshold=threshold) is not None
+                for query in negatives
+            )
+            offers = correct + wrong + false_offers
+            precision = correct / offers if offers else 1.0
+            print(
+                f"{threshold:>9.2f}  {precision:>9.1%}  {correct / len(positives):>6.1%}"
+                f"  {correct_same_verb / max(same_verb, 1):>18.1%}"
+                f"  {false_offers / len(negatives):>12.1%}"
+            )
+
+        timings = []
+        for query, _, _ in positives[:200]:
+            start = time.perf_counter()
+            similarity.find_similar_task(query, "Linux")
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(
+            f"Lookup over {args.tasks} tasks: p50 {statistics.median(timings) * 1000:.2f}ms, p95 {p95 * 1000:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Compare full prompt encoding with the cached template token count.
+
+Usage: python benchmarks/bench_token_count.py [--model MODEL] [--tasks N]
+
+Needs the tiktoken encoding for MODEL in the local tiktoken cache.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from shellgenius.gpt_integration import format_prompt, num_tokens_from_messages
+
+WORDS = (
+    "list find delete rename compress show count files directories logs older than "
+    "seven days largest recursively current git branch changed since yesterday json "
+    "csv column sort unique lines processes memory port listening docker images"
+).split()
+
+
+def make_tasks(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(4, 16))) for _ in range(count)]
+
+
+def bench(label: str, func, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<34} {best * 1000:9.2f} ms")
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="gpt-5.4-mini")
+    parser.add_argument("--tasks", type=int, default=10_000)
+    args = parser.parse_args()
+
+    tasks = make_tasks(args.tasks)
+    prompts = [format_prompt(task, "Linux") for task in tasks]
+    plain_prompts = [list(prompt) for prompt in prompts]
+
+    # Warm the encoding and the template cache outside the timed runs.
+    num_tokens_from_messages(prompts[0], args.model)
+
+    single_full = bench(
+        "--tokens, full encoding",
+        lambda: num_tokens_from_messages(plain_prompts[0], args.model),
+    )
+    single_cached = bench(
+        "--tokens, cached template",
+        lambda: num_tokens_from_messages(prompts[0], args.model),
+    )
+    batch_full = bench(
+        f"{args.tasks} tasks, full encoding",
+        lambda: [num_tokens_from_messages(prompt, args.model) for prompt in plain_prompts],
+    )
+    batch_cached = bench(
+        f"{args.tasks} tasks, cached template",
+        lambda: [num_tokens_from_messages(prompt, args.model) for prompt in prompts],
+    )
+
+    print(
+        f"speedup: single {single_full / single_cached:.1f}x, batch {batch_full / batch_cached:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,29 @@
 from __future__ import annotations
 
 import importlib
+import os
+import sys
+
+from .timings import get_timings
 
 
 def main() -> int | None:
     """Run the CLI with lazy imports so startup interrupts stay quiet."""
+    if "SHELLGENIUS_PROFILE" in os.environ or any(
+        arg.startswith("--profile") for arg in sys.argv[1:]
+    ):
+        profiling = importlib.import_module("shellgenius.profiling")
+        profile_request, sys.argv[1:] = profiling.extract_profile_request(sys.argv[1:], os.environ)
+        if profile_request is not None:
+            return profiling.run_profiled(_run_cli, profile_request)
+
+    return _run_cli()
+
+
+def _run_cli() -> int | None:
     try:
-        cli_module = importlib.import_module("shellgenius.cli")
+        with get_timings().measure("startup"):
+            cli_module = importlib.import_module("shellgenius.cli")
     except KeyboardInterrupt as error:
         raise SystemExit(130) from error
     return cli_module.shellgenius()
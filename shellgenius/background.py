@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Callable
+from typing import Any
+
+__all__ = ["BackgroundCall"]
+
+
+class BackgroundCall:
+    """Run ``func`` on a daemon thread and collect its result on demand.
+
+    Unlike ``concurrent.futures``, an unfinished call never delays
+    interpreter exit: if nobody asks for the result, it is abandoned.
+    """
+
+    def __init__(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        self._result: Any = None
+        self._error: BaseException | None = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(func, args, kwargs),
+            name="shellgenius-background",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _run(self, func: Callable[..., Any], args: tuple, kwargs: dict[str, Any]) -> None:
+        try:
+            self._result = func(*args, **kwargs)
+        except BaseException as error:
+            self._error = error
+        finally:
+            self._done.set()
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def result(self, timeout: float | None = None) -> Any:
+        """Wait up to ``timeout`` seconds and return the result or raise its error.
+
+        Raises ``TimeoutError`` if the call is still running.
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError("Background call did not finish in time.")
+        if self._error is not None:
+            raise self._error
+        return self._result
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .openai_backend import APIConnectionError, APIStatusError
+from .storage import get_cache_dir, read_json, update_json
+
+BREAKER_FILE = "breakers.json"
+BREAKER_VERSION = 1
+
+# Consecutive failures that open a model's circuit.
+FAILURE_THRESHOLD = 3
+
+# Seconds an open circuit rejects requests before letting one probe through.
+OPEN_SECONDS = 30.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+__all__ = [
+    "CLOSED",
+    "FAILURE_THRESHOLD",
+    "HALF_OPEN",
+    "OPEN",
+    "OPEN_SECONDS",
+    "BreakerState",
+    "CircuitOpenError",
+    "allow_request",
+    "get_breaker_path",
+    "is_breaker_failure",
+    "load_breaker_states",
+    "record_failure",
+    "record_success",
+]
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a model's circuit is open and no fallback model is available."""
+
+
+@dataclass(frozen=True, slots=True)
+class BreakerState:
+    """The circuit of one model, as shared by all ShellGenius processes.
+
+    ``since`` is when the circuit opened, or when the current probe of a
+    half-open circuit started.
+    """
+
+    state: str = CLOSED
+    failures: int = 0
+    since: float = 0.0
+
+    def retry_in(self, now: float | None = None) -> float:
+        """Seconds until an open circuit lets a probe through."""
+        if self.state == CLOSED:
+            return 0.0
+        now = time.time() if now is None else now
+        return max(self.since + OPEN_SECONDS - now, 0.0)
+
+    def describe(self, now: float | None = None) -> str:
+        failures = f"{self.failures} failure{'s' if self.failures != 1 else ''}"
+        if self.state == CLOSED:
+            return f"closed ({failures})"
+        if self.state == HALF_OPEN:
+            return f"half-open, probing ({failures})"
+        return f"open, retry in {self.retry_in(now):.0f}s ({failures})"
+
+
+def get_breaker_path() -> Path:
+    return get_cache_dir() / BREAKER_FILE
+
+
+def is_breaker_failure(error: BaseException) -> bool:
+    """Whether ``error`` means the model is unhealthy rather than the request wrong.
+
+    Timeouts, connection errors, rate limits (429), and server errors (5xx)
+    count; other client errors such as a bad request or key do not.
+    """
+    if isinstance(error, (APIConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def _empty_states() -> dict[str, Any]:
+    return {"version": BREAKER_VERSION, "models": {}}
+
+
+def _valid_states(data: Any) -> dict[str, Any]:
+    if (
+        not isinstance(data, dict)
+        or data.get("version") != BREAKER_VERSION
+        or not isinstance(data.get("models"), dict)
+    ):
+        return _empty_states()
+    return data
+
+
+def _state_from(entry: Any) -> BreakerState:
+    if not isinstance(entry, dict) or entry.get("state") not in (CLOSED, OPEN, HALF_OPEN):
+        return BreakerState()
+    return BreakerState(
+        state=entry["state"],
+        failures=int(entry.get("failures", 0)),
+        since=float(entry.get("since", 0.0)),
+    )
+
+
+def load_breaker_states() -> dict[str, BreakerState]:
+    """Return the recorded circuit of every model that has failed."""
+    models = _valid_states(read_json(get_breaker_path()))["models"]
+    return {model: _state_from(entry) for model, entry in models.items()}
+
+
+def _update(model: str, transition) -> BreakerState:
+    result = BreakerState()
+
+    def update(data: Any) -> dict[str, Any]:
+        nonlocal result
+        data = _valid_states(data)
+        result = transition(_state_from(data["models"].get(model)), time.time())
+        if result == BreakerState():
+            data["models"].pop(model, None)
+        else:
+            data["models"][model] = {
+                "state": result.state,
+                "failures": result.failures,
+                "since": result.since,
+            }
+        return data
+
+    try:
+        update_json(get_breaker_path(), update)
+    except OSError:
+        pass
+    return result
+
+
+def allow_request(model: str) -> bool:
+    """Whether a request to ``model`` may be sent now.
+
+    Closed circuits always allow it. Once an open circuit has waited
+    ``OPEN_SECONDS``, it turns half-open and lets exactly one process probe
+    the model; others keep being rejected until the probe succeeds or fails,
+    or takes longer than ``OPEN_SECONDS`` itself.
+    """
+    if load_breaker_states().get(model, BreakerState()).state == CLOSED:
+        return True
+
+    allowed = False
+
+    def transition(state: BreakerState, now: float) -> BreakerState:
+        nonlocal allowed
+        if state.state == CLOSED or state.retry_in(now) > 0:
+            allowed = state.state == CLOSED
+            return state
+        allowed = True
+        return BreakerState(HALF_OPEN, state.failures, now)
+
+    _update(model, transition)
+    return allowed
+
+
+def record_success(model: str) -> None:
+    """Close the circuit of ``model``. Writes only if it was not already closed."""
+    state = load_breaker_states().get(model)
+    if state is None:
+        return
+    _update(model, lambda state, now: BreakerState())
+
+
+def record_failure(model: str) -> BreakerState:
+    """Count a failure of ``model``; reopen a half-open circuit at once."""
+
+    def transition(state: BreakerState, now: float) -> BreakerState:
+        failures = state.failures + 1
+        if state.state == HALF_OPEN or failures >= FAILURE_THRESHOLD:
+            return BreakerState(OPEN, failures, now)
+        return BreakerState(CLOSED, failures, state.since)
+
+    return _update(model, transition)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import itertools
 import os
 import platform
 import select
@@ -7,18 +8,73 @@ import shutil
 import subprocess
 import sys
 from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
 
 import click
+from click.core import ParameterSource
 from click_default_group import DefaultGroup
 from rich.live import Live
 
-from .api_key import edit_key, set_key
+from .api_key import edit_key, get_api_key_path, set_key
+from .background import BackgroundCall
+from .circuit_breaker import CLOSED, OPEN, load_breaker_states
+from .config import BATCH, INTERACTIVE, load_settings, parse_duration
+from .deadline import (
+    DEADLINE_EXIT_CODE,
+    DEGRADED_EXIT_CODE,
+    Deadline,
+    complete_partial_response,
+    plan_request,
+)
 from .gpt_integration import (
+    APIConnectionError,
+    APITimeoutError,
+    CircuitOpenError,
     RateLimitError,
     chatgpt_request,
+    encoding_name_for_model,
     estimate_prompt_cost,
+    format_cost,
+    format_explanation_prompt,
     format_prompt,
+    input_cost,
+    iter_prompt_token_counts,
     num_tokens_from_messages,
+    output_cost,
+    priced_models,
+    request_kind,
+)
+from .hedging import DEFAULT_MAX_HEDGE_RATE, HedgePolicy
+from .model_stats import estimate_usage, record_parse_result, summarize_models
+from .models import (
+    DEFAULT_MODEL,
+    MIN_OUTPUT_TOKENS,
+    REASONING_EFFORTS,
+    SERVICE_TIERS,
+    VALID_MODELS,
+    VERBOSITY_LEVELS,
+    canonical_model_name,
+    custom_models,
+    get_model_capabilities,
+)
+from .offline import LocalAnswer, find_local_answer
+from .rate_limit import load_rate_limits
+from .response_cache import (
+    AGE_BUCKETS,
+    EXPIRED,
+    MAX_CACHED_RESPONSES,
+    STALE,
+    CachedResponse,
+    export_responses,
+    get_response_cache_path,
+    import_responses,
+    lookup_response,
+    prune_responses,
+    record_lookup,
+    response_cache_key,
+    response_cache_stats,
+    store_response,
 )
 from .response_parser import (
     ParsedShellResponse,
@@ -26,31 +82,23 @@ from .response_parser import (
     parse_shellgenius_response,
     validate_executable_shell_response,
 )
+from .routing import AUTO_MODEL, choose_model, estimate_task_tokens
+from .single_flight import SINGLE_FLIGHT_WAIT, SingleFlight, prune_lock_files
+from .storage import format_size
 from .theme import LmtTheme, load_lmt_theme, make_console, make_renderable
+from .timings import get_timings
 
-DEFAULT_MODEL = "gpt-5.4-mini"
-
-VALID_MODELS: dict[str, tuple[str, ...]] = {
-    "gpt-4.1": ("4.1",),
-    "gpt-4.1-mini": ("4.1-mini",),
-    "gpt-4.1-nano": ("4.1-nano",),
-    "gpt-4o": ("4o",),
-    "gpt-4o-mini": ("4o-mini",),
-    "gpt-5": ("5",),
-    "gpt-5-mini": ("5-mini",),
-    "gpt-5-nano": ("5-nano",),
-    "gpt-5.4": ("5.4",),
-    "gpt-5.4-mini": ("5.4-mini",),
-    "gpt-5.4-nano": ("5.4-nano",),
-}
+# Seconds to wait for a background explanation once the user asks for it.
+EXPLANATION_TIMEOUT = 60.0
 
 
 def validate_model_name(ctx, param, value):
     """Resolve aliases and validate model names."""
-    name = value.lower()
-    for canonical, aliases in VALID_MODELS.items():
-        if name == canonical or name in aliases:
-            return canonical
+    if value is None:
+        return None
+    canonical = canonical_model_name(value)
+    if canonical is not None:
+        return canonical
     raise click.BadParameter(
         f"{click.style('Invalid model name.', fg='red')}\n"
         f"{click.style('Use ', fg='red')}"
@@ -59,10 +107,55 @@ def validate_model_name(ctx, param, value):
     )
 
 
+class Duration(click.ParamType):
+    """A time span such as ``500ms``, ``2s``, or ``7d``, converted to seconds."""
+
+    name = "duration"
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, (int, float)):
+            return float(value)
+        try:
+            return parse_duration(value)
+        except ValueError as error:
+            self.fail(str(error), param, ctx)
+
+
+def validate_prompt_model(ctx, param, value):
+    """Like ``validate_model_name``, but also accept ``auto``."""
+    if value is not None and value.strip().lower() == AUTO_MODEL:
+        return AUTO_MODEL
+    return validate_model_name(ctx, param, value)
+
+
+def validate_model_names(ctx, param, value):
+    """Resolve aliases for a repeatable ``--model`` option."""
+    return tuple(validate_model_name(ctx, param, name) for name in value)
+
+
 def _list_models() -> None:
-    for model, aliases in VALID_MODELS.items():
+    breakers = load_breaker_states()
+    rate_limits = load_rate_limits()
+    custom = custom_models()
+    models = {**VALID_MODELS, **{model: caps.aliases for model, caps in custom.items()}}
+    for model, aliases in models.items():
         click.echo(model)
-        click.echo(f"  Alias: {', '.join(aliases)}")
+        if aliases:
+            click.echo(f"  Alias: {', '.join(aliases)}")
+        if model in custom:
+            capabilities = custom[model]
+            features = [capabilities.api]
+            features += [name for name in ("streaming", "stop") if getattr(capabilities, name)]
+            click.echo(f"  Custom: {', '.join(features)}")
+        if model in breakers:
+            state = breakers[model]
+            color = "green" if state.state == CLOSED else "red" if state.state == OPEN else "yellow"
+            click.echo(f"  Circuit: {click.style(state.describe(), fg=color)}")
+        if model in rate_limits:
+            limits = ", ".join(
+                f"{bucket.limit:,.0f} {kind}/min" for kind, bucket in rate_limits[model].items()
+            )
+            click.echo(f"  Rate limit: {limits}")
 
 
 @dataclass(frozen=True, slots=True)
@@ -85,6 +178,10 @@ class TTYState:
         return self.stdout
 
 
+def current_os_name() -> str:
+    return "macOS" if platform.system() == "Darwin" else platform.system()
+
+
 def get_tty_state() -> TTYState:
     return TTYState(
         stdin=sys.stdin.isatty(),
@@ -199,21 +296,36 @@ def echo_error(message: str) -> None:
     click.secho(f"Error: {message}", fg="red", err=True)
 
 
+def echo_timings() -> None:
+    lines = get_timings().format_lines()
+    if not lines:
+        return
+
+    click.echo(err=True)
+    click.secho("Timings:", fg="blue", err=True)
+    for line in lines:
+        click.echo(f"  {line}", err=True)
+
+
 def style_bad_usage(message: str) -> str:
     return click.style(message, fg="red")
 
 
-def parse_generated_command(generated_text: str) -> ParsedShellResponse:
+def parse_generated_command(
+    generated_text: str, *, command_only: bool = False
+) -> ParsedShellResponse:
     try:
-        parsed_response = parse_shellgenius_response(generated_text)
+        parsed_response = parse_shellgenius_response(generated_text, command_only=command_only)
         validate_executable_shell_response(parsed_response)
         return parsed_response
     except ShellGeniusResponseError as error:
         raise click.ClickException(str(error) or "No command found.") from error
 
 
-def parse_executable_command(generated_text: str) -> ParsedShellResponse:
-    parsed_response = parse_generated_command(generated_text)
+def parse_executable_command(
+    generated_text: str, *, command_only: bool = False
+) -> ParsedShellResponse:
+    parsed_response = parse_generated_command(generated_text, command_only=command_only)
     resolve_execution_command(parsed_response)
     return parsed_response
 
@@ -227,9 +339,15 @@ def render_response(
     command_only: bool,
     theme: LmtTheme,
     leading_blank_line: bool = True,
+    explain: bool = True,
+    note: str | None = None,
 ) -> None:
+    """Print an answer; ``note`` goes to stderr first, e.g. to mark a local answer."""
+    if note:
+        click.secho(note, fg="yellow", err=True)
+
     if command_only:
-        parsed_response = parse_executable_command(generated_text)
+        parsed_response = parse_executable_command(generated_text, command_only=not explain)
         click.echo(parsed_response.command)
         return
 
@@ -418,6 +536,18 @@ class ShellGeniusGroup(DefaultGroup):
     epilog="Run `shellgenius prompt --help` for the explicit default command.",
 )
 @click.version_option()
+@click.option(
+    "--profile",
+    metavar="PATH",
+    expose_value=False,
+    help=("Write cProfile stats to PATH and a report to PATH.txt (also SHELLGENIUS_PROFILE)."),
+)
+@click.option(
+    "--profile-memory",
+    is_flag=True,
+    expose_value=False,
+    help="With --profile, also trace memory and write PATH.tracemalloc.",
+)
 def shellgenius():
     """
     Generate a shell command from a natural-language task description.
@@ -427,11 +557,221 @@ def shellgenius():
 
 
 @shellgenius.command()
-def models():
-    """List supported models and their aliases."""
+@click.option(
+    "--stats", is_flag=True, help="Show latency, throughput, and cost recorded on this machine."
+)
+def models(stats):
+    """List supported models, their aliases, and circuit breaker states."""
+    if stats:
+        _echo_model_stats()
+        return
     _list_models()
 
 
+_STATS_COLUMNS = (
+    ("model", 14),
+    ("requests", 8),
+    ("TTFT p50", 8),
+    ("p95", 7),
+    ("total p50", 9),
+    ("p95", 7),
+    ("tok/s", 6),
+    ("parse", 6),
+    ("avg cost", 10),
+)
+
+
+def _format_stat(value: float | None, template: str) -> str:
+    return "-" if value is None else template.format(value)
+
+
+def _stats_row(cells) -> str:
+    """Left-align the model name and right-align the numbers."""
+    row = [
+        f"{cell:<{width}}" if index == 0 else f"{cell:>{width}}"
+        for index, (cell, (_, width)) in enumerate(zip(cells, _STATS_COLUMNS))
+    ]
+    return "  ".join(row).rstrip()
+
+
+def _echo_model_stats() -> None:
+    summaries = summarize_models()
+    if not summaries:
+        click.echo("No requests recorded yet.")
+        return
+
+    click.echo(click.style(_stats_row(name for name, _ in _STATS_COLUMNS), bold=True))
+    for model, summary in summaries.items():
+        cells = (
+            model,
+            str(summary.requests),
+            _format_stat(summary.first_token_p50, "{:.2f}s"),
+            _format_stat(summary.first_token_p95, "{:.2f}s"),
+            _format_stat(summary.latency_p50, "{:.2f}s"),
+            _format_stat(summary.latency_p95, "{:.2f}s"),
+            _format_stat(summary.tokens_per_second, "{:.0f}"),
+            _format_stat(summary.parse_success, "{:.0%}"),
+            _format_stat(summary.average_cost, "${:.5f}"),
+        )
+        click.echo(_stats_row(cells))
+
+
+@shellgenius.command()
+@click.option("--perf", is_flag=True, help="Time startup and environment, slowest first.")
+@click.option(
+    "--endpoint",
+    metavar="URL",
+    help="Endpoint for network checks (default: the configured base URL or the OpenAI API).",
+)
+@click.option("--no-network", is_flag=True, help="Skip DNS, TCP, and TLS checks.")
+def doctor(perf, endpoint, no_network):
+    """Check the environment for problems that slow ShellGenius down."""
+    from . import doctor as doctor_module
+
+    checks = doctor_module.run_checks(
+        model=DEFAULT_MODEL,
+        config_dir=get_api_key_path().parent,
+        endpoint=endpoint,
+        imports=perf,
+        network=not no_network,
+    )
+    _echo_doctor_report(checks, perf=perf)
+
+    proxies = doctor_module.proxy_settings(os.environ)
+    if proxies:
+        click.echo()
+        click.secho("Proxy settings:", fg="blue")
+        for name, value in proxies.items():
+            click.echo(f"  {name}={value}")
+        if not no_network:
+            click.echo("  Network checks connect directly and do not go through the proxy.")
+
+
+def _echo_doctor_report(checks, *, perf: bool) -> None:
+    from .doctor import rank_checks
+
+    if perf:
+        checks = rank_checks(checks)
+
+    name_width = max(len(check.name) for check in checks)
+    for check in checks:
+        if check.seconds is None:
+            timing = click.style(f"{'failed':>8}", fg="red")
+        else:
+            timing = f"{check.seconds * 1000:>5.0f} ms"
+        line = f"{check.name:<{name_width}}  {check.detail}".rstrip()
+        click.echo(f"{timing}  {line}" if perf else line)
+
+    if not perf:
+        return
+
+    hotspots = [check.hotspot for check in checks if check.hotspot]
+    click.echo()
+    if not hotspots:
+        click.secho("No hotspots found.", fg="green")
+        return
+
+    click.secho("Hotspots:", fg="yellow")
+    for hotspot in hotspots:
+        click.echo(f"* {hotspot}")
+
+
+@shellgenius.command(name="tokens")
+@click.argument("tasks_file", type=click.File("r", encoding="utf-8"))
+@click.option(
+    "--model",
+    "-m",
+    "models",
+    multiple=True,
+    callback=validate_model_names,
+    help="Model to estimate for; repeatable (default: every model with a known price).",
+)
+@click.option(
+    "--os",
+    "os_name",
+    default=lambda: current_os_name(),
+    show_default="current OS",
+    help="OS name used in the prompt.",
+)
+@click.option(
+    "--no-explain",
+    is_flag=True,
+    help="Estimate the command-only prompt used by --cmd and pipes.",
+)
+@click.option("--summary", is_flag=True, help="Print only the totals.")
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=1000,
+    show_default=True,
+    help="Tasks encoded per batch.",
+)
+@click.option(
+    "--threads",
+    type=click.IntRange(min=1),
+    default=8,
+    show_default=True,
+    help="Threads used by tiktoken batch encoding.",
+)
+def tokens_command(tasks_file, models, os_name, no_explain, summary, batch_size, threads):
+    """Estimate prompt tokens and cost for each task in TASKS_FILE.
+
+    TASKS_FILE has one task per line; blank lines are skipped. Use `-` to
+    read from stdin. Prints `line<TAB>tokens<TAB>task` per task, then totals.
+    """
+    models = models or priced_models()
+
+    # Models sharing an encoding share one pass over the tasks.
+    encoding_models: dict[str, str] = {}
+    for model in models:
+        encoding_models.setdefault(encoding_name_for_model(model), model)
+
+    tasks = (
+        (line_number, line.rstrip("\r\n"))
+        for line_number, line in enumerate(tasks_file, start=1)
+        if line.strip()
+    )
+    task_streams = itertools.tee(tasks, len(encoding_models) + 1)
+    count_streams = [
+        iter_prompt_token_counts(
+            (task for _, task in stream),
+            os_name,
+            model,
+            batch_size=batch_size,
+            num_threads=threads,
+            explain=not no_explain,
+        )
+        for stream, model in zip(task_streams[1:], encoding_models.values())
+    ]
+
+    task_count = 0
+    totals = dict.fromkeys(encoding_models, 0)
+    for (line_number, task), *counts in zip(task_streams[0], *count_streams):
+        task_count += 1
+        for encoding_name, count in zip(encoding_models, counts):
+            totals[encoding_name] += count
+        if not summary:
+            click.echo(f"{line_number}\t{counts[0]}\t{task}")
+
+    if not summary and task_count:
+        click.echo()
+
+    first_total = next(iter(totals.values()))
+    average = first_total / task_count if task_count else 0
+    click.echo(f"Tasks: {click.style(str(task_count), fg='yellow')}")
+    click.echo(f"Prompt tokens: {click.style(str(first_total), fg='yellow')} (avg {average:.1f})")
+    click.echo("Estimated input cost:")
+    model_width = max(len(model) for model in models)
+    for model in models:
+        total_tokens = totals[encoding_name_for_model(model)]
+        cost = input_cost(total_tokens, model)
+        cost_text = "unavailable" if cost is None else f"${format_cost(cost)}"
+        click.echo(
+            f"  {click.style(f'{model:<{model_width}}', fg='blue')}"
+            f"  {total_tokens:>12} tokens  {click.style(cost_text, fg='yellow')}"
+        )
+
+
 @shellgenius.group()
 def key():
     """Manage the OpenAI API key."""
@@ -449,6 +789,348 @@ def key_edit():
     edit_key()
 
 
+@shellgenius.group()
+def history():
+    """Search and maintain the history of generated commands."""
+
+
+@history.command(name="search")
+@click.argument("terms", nargs=-1, required=True)
+@click.option("--limit", "-n", type=click.IntRange(min=1), default=20, show_default=True)
+def history_search(terms, limit):
+    """Find earlier commands whose task, command, or explanation matches TERMS."""
+    from .history import HistoryError, search_history
+
+    try:
+        entries = search_history(" ".join(terms), limit=limit)
+    except HistoryError as error:
+        raise click.ClickException(str(error)) from error
+    if not entries:
+        click.echo("No matching commands.")
+        return
+
+    for entry in entries:
+        created = datetime.fromtimestamp(entry.created).strftime("%Y-%m-%d %H:%M")
+        status = ""
+        if entry.executed:
+            color = "green" if entry.exit_status == 0 else "red"
+            status = "  " + click.style(f"exit {entry.exit_status}", fg=color)
+        click.echo(f"{click.style(created, fg='blue')}  {entry.model}{status}  {entry.task}")
+        click.echo(f"  {entry.command}")
+
+
+@history.command(name="prune")
+@click.option(
+    "--max-entries",
+    type=click.IntRange(min=0),
+    help="Keep at most this many of the newest entries (default: the configured limit).",
+)
+@click.option(
+    "--max-age-days",
+    type=click.FloatRange(min=0),
+    help="Delete entries older than this many days (default: the configured limit).",
+)
+@click.option("--vacuum", is_flag=True, help="Rebuild the database file to reclaim free space.")
+def history_prune(max_entries, max_age_days, vacuum):
+    """Apply retention limits to the history."""
+    from .history import DEFAULT_MAX_ENTRIES, HistoryError, prune_history
+
+    settings = load_settings()
+    if max_entries is None:
+        max_entries = settings.history_max_entries or DEFAULT_MAX_ENTRIES
+    if max_age_days is None:
+        max_age_days = settings.history_max_age_days
+
+    try:
+        deleted = prune_history(max_entries=max_entries, max_age_days=max_age_days, vacuum=vacuum)
+    except HistoryError as error:
+        raise click.ClickException(str(error)) from error
+    click.echo(f"Deleted {deleted} entr{'y' if deleted == 1 else 'ies'}.")
+
+
+@shellgenius.group()
+def cache():
+    """Inspect, prune, warm, and share the response cache."""
+
+
+@cache.command(name="stats")
+def cache_stats():
+    """Show the size, hit rate, models, and ages of the cached answers."""
+    stats = response_cache_stats()
+    click.echo(
+        f"Entries: {click.style(str(stats.entries), fg='yellow')}"
+        f" ({format_size(stats.size_bytes)}) in {get_response_cache_path()}"
+    )
+    if stats.hit_rate is None:
+        click.echo("Hit rate: - (answers are looked up first only with a cache_ttl setting)")
+    else:
+        click.echo(
+            f"Hit rate: {click.style(f'{stats.hit_rate:.0%}', fg='yellow')}"
+            f" ({stats.hits} hit{'' if stats.hits == 1 else 's'},"
+            f" {stats.misses} miss{'' if stats.misses == 1 else 'es'})"
+        )
+    if not stats.entries:
+        return
+
+    click.echo("Models:")
+    model_width = max(len(model) for model in stats.models)
+    for model, count in stats.models.items():
+        click.echo(f"  {click.style(f'{model:<{model_width}}', fg='blue')}  {count:>5}")
+
+    click.echo("Age:")
+    labels = [f"< {label}" for label, _ in AGE_BUCKETS] + [f">= {AGE_BUCKETS[-1][0]}"]
+    largest = max(stats.ages)
+    for label, count in zip(labels, stats.ages):
+        bar = "#" * round(30 * count / largest)
+        click.echo(f"  {label:<6}  {count:>5}  {bar}".rstrip())
+
+
+@cache.command(name="prune")
+@click.option("--older-than", type=Duration(), help="Delete answers older than this, such as 7d.")
+@click.option(
+    "--max-entries",
+    type=click.IntRange(min=0),
+    help="Keep at most this many of the newest answers.",
+)
+@click.option(
+    "--model",
+    "-m",
+    "models",
+    multiple=True,
+    callback=validate_model_names,
+    help="Delete the answers from this model; repeatable.",
+)
+def cache_prune(older_than, max_entries, models):
+    """Delete cached answers, and lock files no process is using."""
+    deleted = prune_responses(max_age=older_than, max_entries=max_entries, models=models)
+    click.echo(f"Deleted {deleted} answer{'' if deleted == 1 else 's'}.")
+    locks = prune_lock_files()
+    if locks:
+        click.echo(f"Deleted {locks} unused lock file{'' if locks == 1 else 's'}.")
+
+
+def _warm_task(task: str, os_name: str, *, model: str, explain: bool, force: bool, settings):
+    from .revalidate import refresh_response
+
+    key = response_cache_key(task, os_name)
+    cached = lookup_response(key)
+    if not force and cached is not None and cached.model == model:
+        if cached.explain or not explain:
+            return "cached"
+    flight = SingleFlight(key)
+    if not flight.try_lead():
+        return "in flight"
+    try:
+        stored = refresh_response(task, os_name, model=model, explain=explain, settings=settings)
+    except Exception as error:
+        return f"failed: {error}"
+    finally:
+        flight.release()
+    return "stored" if stored else "failed: unparseable answer"
+
+
+@cache.command(name="warm")
+@click.argument("tasks_file", type=click.File("r", encoding="utf-8"))
+@click.option(
+    "--model",
+    "-m",
+    default=DEFAULT_MODEL,
+    show_default=True,
+    callback=validate_model_name,
+    help="Model to ask.",
+)
+@click.option(
+    "--os",
+    "os_name",
+    default=lambda: current_os_name(),
+    show_default="current OS",
+    help="OS name used in the prompt and cache key.",
+)
+@click.option(
+    "--no-explain",
+    is_flag=True,
+    help="Cache command-only answers; they serve only --cmd and piped output.",
+)
+@click.option("--force", is_flag=True, help="Ask again for tasks that already have an answer.")
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Requests sent at once.",
+)
+def cache_warm(tasks_file, model, os_name, no_explain, force, jobs):
+    """Ask for every task in TASKS_FILE ahead of time and cache the answers.
+
+    TASKS_FILE has one task per line; blank lines are skipped. Use `-` to
+    read from stdin. Prints `line<TAB>result<TAB>task` per task. Tasks that
+    already have an answer from MODEL are skipped unless --force is given,
+    and repeated tasks are asked once.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    tasks = [
+        (line_number, " ".join(line.split()))
+        for line_number, line in enumerate(tasks_file, start=1)
+        if line.strip()
+    ]
+    # Lines with the same cache key are asked once; otherwise parallel
+    # workers would race on the same miss.
+    keys = [response_cache_key(task, os_name) for _, task in tasks]
+    first_lines: dict[str, int] = {}
+    for (line_number, _), key in zip(tasks, keys):
+        first_lines.setdefault(key, line_number)
+    unique_tasks = [
+        task for (line_number, task), key in zip(tasks, keys) if first_lines[key] == line_number
+    ]
+    if len(unique_tasks) > MAX_CACHED_RESPONSES:
+        click.secho(
+            f"The cache keeps {MAX_CACHED_RESPONSES} answers: "
+            f"only the last ones of {len(unique_tasks)} tasks will stay.",
+            fg="yellow",
+            err=True,
+        )
+
+    settings = load_settings()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        unique_results = executor.map(
+            lambda task: _warm_task(
+                task,
+                os_name,
+                model=model,
+                explain=not no_explain,
+                force=force,
+                settings=settings,
+            ),
+            unique_tasks,
+        )
+        counts: dict[str, int] = {}
+        for (line_number, task), key in zip(tasks, keys):
+            first_line = first_lines[key]
+            if first_line == line_number:
+                result = next(unique_results)
+            else:
+                result = f"duplicate: line {first_line}"
+            outcome = result.split(":")[0]
+            counts[outcome] = counts.get(outcome, 0) + 1
+            color = {"stored": "green", "failed": "red"}.get(outcome)
+            click.echo(f"{line_number}\t{click.style(result, fg=color)}\t{task}")
+
+    summary = ", ".join(f"{count} {outcome}" for outcome, count in counts.items())
+    click.echo(f"Tasks: {len(tasks)}" + (f" ({summary})" if summary else ""))
+    if counts.get("failed"):
+        raise SystemExit(1)
+
+
+@cache.command(name="export")
+@click.argument("bundle", type=click.Path(dir_okay=False, writable=True, path_type=Path))
+@click.option(
+    "--model",
+    "-m",
+    "models",
+    multiple=True,
+    callback=validate_model_names,
+    help="Export only the answers from this model; repeatable.",
+)
+def cache_export(bundle, models):
+    """Write the cached answers to BUNDLE, a gzip-compressed JSON file."""
+    try:
+        exported = export_responses(bundle, models=models)
+    except OSError as error:
+        raise click.ClickException(f"Cannot write {bundle}: {error}") from error
+    click.echo(f"Exported {exported} answer{'' if exported == 1 else 's'} to {bundle}.")
+
+
+@cache.command(name="import")
+@click.argument("bundle", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option(
+    "--as-new",
+    is_flag=True,
+    help="Count imported answers as created now, so they start fresh under cache_ttl.",
+)
+def cache_import(bundle, as_new):
+    """Add the answers in BUNDLE to the response cache.
+
+    An answer replaces the cached one for the same task only if it is newer.
+    """
+    try:
+        imported = import_responses(bundle, as_new=as_new)
+    except ValueError as error:
+        raise click.ClickException(str(error)) from error
+    click.echo(f"Imported {imported} answer{'' if imported == 1 else 's'}.")
+
+
+@shellgenius.command()
+@click.option("--host", default="127.0.0.1", show_default=True, help="Address to listen on.")
+@click.option("--port", type=click.IntRange(0, 65535), default=8787, show_default=True)
+@click.option(
+    "--upstream",
+    help="API base URL to forward to (default: OPENAI_BASE_URL or the OpenAI API).",
+)
+@click.option(
+    "--ttl",
+    type=Duration(),
+    default="1d",
+    show_default=True,
+    help="Replay cached replies up to this old, such as 12h.",
+)
+@click.option(
+    "--rpm",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Forward at most this many requests per minute, shared by all clients.",
+)
+@click.option("--no-cache", is_flag=True, help="Forward every request without caching.")
+@click.option(
+    "--cache-sampled",
+    is_flag=True,
+    help="Also cache requests with a temperature above 0, replaying the first sample.",
+)
+@click.option("--quiet", "-q", is_flag=True, help="Do not log requests.")
+def proxy(host, port, upstream, ttl, rpm, no_cache, cache_sampled, quiet):
+    """Serve a local OpenAI-compatible endpoint that caches replies.
+
+    Identical requests for responses and chat completions with temperature
+    0 are answered from the cache, streams included. Point clients at the
+    printed URL, for example with OPENAI_BASE_URL.
+    """
+    from .proxy import DEFAULT_UPSTREAM, ProxyCache, ProxyServer, TokenBucket, get_proxy_cache_path
+
+    upstream = (upstream or os.environ.get("OPENAI_BASE_URL") or DEFAULT_UPSTREAM).rstrip("/")
+    cache = None
+    if not no_cache:
+        cache = ProxyCache(get_proxy_cache_path(), ttl=ttl, sampled=cache_sampled)
+    try:
+        server = ProxyServer(
+            (host, port),
+            upstream=upstream,
+            cache=cache,
+            rate_limit=TokenBucket(rpm) if rpm else None,
+            log=not quiet,
+        )
+    except OSError as error:
+        raise click.ClickException(f"Cannot listen on {host}:{port}: {error}") from error
+    if upstream == server.url:
+        server.server_close()
+        raise click.ClickException(f"The upstream {upstream} is the proxy itself; pass --upstream.")
+
+    click.echo(f"Proxying {server.url} -> {upstream}", err=True)
+    click.echo(f"Point clients at it with OPENAI_BASE_URL={server.url}", err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        metrics = server.metrics
+        hit_rate = metrics.hit_rate
+        click.echo(
+            f"Requests: {sum(metrics.requests.values())}"
+            + ("" if hit_rate is None else f", cache hit rate {hit_rate:.0%}"),
+            err=True,
+        )
+
+
 @shellgenius.command(cls=DefaultCommand)
 @click.argument("command_description", type=str, nargs=-1)
 @click.option(
@@ -456,8 +1138,8 @@ def key_edit():
     "-m",
     default=DEFAULT_MODEL,
     show_default=True,
-    callback=validate_model_name,
-    help="Model to use (run `shellgenius models` to list options).",
+    callback=validate_prompt_model,
+    help="Model to use, or `auto` to pick one per task (run `shellgenius models` to list options).",
 )
 @click.option("--no-stream", is_flag=True, help="Disable live streaming.")
 @click.option("--raw", "-r", is_flag=True, help="Print plain text instead of Rich output.")
@@ -469,9 +1151,66 @@ def key_edit():
     help="Force Rich formatting in a TTY; fall back to plain text otherwise.",
 )
 @click.option("--cmd", "command_only", is_flag=True, help="Print only the generated command.")
+@click.option(
+    "--no-explain",
+    is_flag=True,
+    help="Ask for the command without an explanation (implied by --cmd and pipes).",
+)
+@click.option(
+    "--explain-later",
+    is_flag=True,
+    help="Show the command first; fetch the explanation in the background (`e` at the prompt).",
+)
+@click.option(
+    "--effort",
+    type=click.Choice(REASONING_EFFORTS),
+    help="Reasoning effort for reasoning models (default: the model's lowest).",
+)
+@click.option(
+    "--verbosity",
+    type=click.Choice(VERBOSITY_LEVELS),
+    help="Answer verbosity for models that support it (default: low).",
+)
+@click.option(
+    "--max-output-tokens",
+    type=click.IntRange(min=MIN_OUTPUT_TOKENS),
+    help="Cap on output tokens, reasoning included.",
+)
+@click.option(
+    "--tier",
+    type=click.Choice(SERVICE_TIERS),
+    help="Service tier: `priority` for lower latency, `flex` for cheaper, slower processing.",
+)
+@click.option("--hedge", is_flag=True, help="Race a second request if the first token is slow.")
+@click.option(
+    "--hedge-after",
+    type=click.FloatRange(min=0, min_open=True),
+    metavar="SECONDS",
+    help="First-token wait before hedging (default: the model's observed p90). Implies --hedge.",
+)
+@click.option(
+    "--hedge-model",
+    callback=validate_model_name,
+    help="Model for the hedged request (default: the same model). Implies --hedge.",
+)
+@click.option(
+    "--deadline",
+    type=Duration(),
+    metavar="DURATION",
+    help="Answer within this time (e.g. 2s, 500ms), with a partial or cached answer if needed.",
+)
+@click.option(
+    "--fresh", is_flag=True, help="Ask the model even if a similar past task has an answer."
+)
+@click.option(
+    "--offline",
+    is_flag=True,
+    help="Answer from the response cache, history, and bundled patterns without the API.",
+)
 @click.option(
     "--tokens", is_flag=True, help="Print prompt token count and estimated cost, then exit."
 )
+@click.option("--timings", is_flag=True, help="Print a timing breakdown to stderr.")
 @click.pass_context
 def prompt(
     ctx,
@@ -481,7 +1220,20 @@ def prompt(
     raw,
     rich_flag,
     command_only,
+    no_explain,
+    explain_later,
+    effort,
+    verbosity,
+    max_output_tokens,
+    tier,
+    hedge,
+    hedge_after,
+    hedge_model,
+    deadline,
+    fresh,
+    offline,
     tokens,
+    timings,
 ):
     """Generate a shell command from a natural-language task description.
 
@@ -491,6 +1243,9 @@ def prompt(
         click.echo(ctx.get_help())
         return
 
+    if timings:
+        ctx.call_on_close(echo_timings)
+
     tty_state = get_tty_state()
 
     if raw and rich_flag:
@@ -503,100 +1258,611 @@ def prompt(
 
     # Non-TTY default: bare command output (pipe-safe)
     pipe_mode = command_only or (not tty_state.stdout and not plain_output)
+    # The explanation would be discarded in pipe mode, so do not generate it.
+    # A deadline leaves no time for an explanation.
+    explain = not (no_explain or pipe_mode or deadline is not None)
+    # Two-phase flow: ask for the command alone so the confirmation appears
+    # sooner, and fetch the explanation while the user reads the command.
+    explain_later = explain_later and explain and tty_state.can_prompt
+    if explain_later:
+        explain = False
 
     command_description = " ".join(command_description)
-    os_name = "macOS" if platform.system() == "Darwin" else platform.system()
-    messages = format_prompt(command_description, os_name)
+    os_name = current_os_name()
+    messages = format_prompt(command_description, os_name, explain=explain)
+
+    routed = model == AUTO_MODEL and not offline
+    if routed:
+        choice = choose_model(
+            command_description,
+            estimate_task_tokens(command_description),
+            kind=request_kind(messages),
+        )
+        model = choice.model
+        get_timings().note("routing", choice.describe())
+    elif model == AUTO_MODEL:
+        # Offline answers come from local sources; no model is asked.
+        model = DEFAULT_MODEL
 
     if tokens:
-        token_count = num_tokens_from_messages(messages, model)
-        cost = estimate_prompt_cost(messages, model)
-        click.echo(f"Prompt tokens: {click.style(str(token_count), fg='yellow')}")
-        if cost is not None:
-            click.echo(
-                f"Estimated cost for {click.style(model, fg='blue')}:"
-                f" {click.style(f'${cost}', fg='yellow')}"
-            )
-        else:
-            click.echo(f"Cost unavailable for {click.style(model, fg='blue')}.")
+        echo_token_estimate(messages, model)
         return
 
-    use_live_stream = should_stream_live(
+    use_live_stream = deadline is None and should_stream_live(
         tty_state=tty_state,
         raw=plain_output,
         command_only=command_only,
         no_stream=no_stream,
     )
 
-    theme = load_lmt_theme()
+    if tier is not None and tier not in get_model_capabilities(model).service_tiers:
+        click.secho(
+            f"{model} does not offer the {tier} service tier; using the default tier.",
+            fg="yellow",
+            err=True,
+        )
+
+    settings = load_settings()
+    if tier is None:
+        tier = settings.service_tier_for(BATCH if pipe_mode else INTERACTIVE)
+
+    hedge_policy = None
+    if hedge or hedge_after is not None or hedge_model is not None or settings.hedge:
+        hedge_policy = HedgePolicy(
+            after=hedge_after if hedge_after is not None else settings.hedge_after,
+            model=hedge_model or settings.hedge_model,
+            max_rate=settings.hedge_max_rate or DEFAULT_MAX_HEDGE_RATE,
+        )
+
+    # Only pass settings the user chose; chatgpt_request fills in per-model defaults.
+    request_options = {
+        name: value
+        for name, value in (
+            ("reasoning_effort", effort),
+            ("verbosity", verbosity),
+            ("max_output_tokens", max_output_tokens),
+            ("service_tier", tier),
+            ("hedge", hedge_policy),
+            ("fallback_model", settings.fallback_for(model)),
+        )
+        if value is not None
+    }
+
+    phase_timings = get_timings()
+    phase_timings.note("model", model)
+
+    with phase_timings.measure("theme"):
+        theme = load_lmt_theme()
+
+    if not fresh and not offline and settings.similar_tasks:
+        similar = find_similar_answer(command_description, os_name, settings)
+        if similar is not None and offer_similar_answer(
+            similar,
+            tty_state=tty_state,
+            raw=plain_output,
+            rich_flag=rich_flag,
+            pipe_mode=pipe_mode,
+            command_only=command_only,
+            theme=theme,
+        ):
+            return
+
+    cache_key = response_cache_key(command_description, os_name)
+    generated_text = ""
+    degraded = None
+    local_answer = None
+    note = None
+
+    ttl = settings.cache_ttl_for(model)
+    if ttl is not None and not fresh and not offline:
+        local_answer, note = serve_cached_response(
+            command_description, os_name, cache_key, ttl=ttl, model=model, explain=explain
+        )
+
+    flight = None
+    if local_answer is None and not offline:
+        # Identical tasks started at the same time share one request.
+        flight, shared = join_single_flight(
+            cache_key, explain=explain, model=model, deadline=deadline
+        )
+        ctx.call_on_close(flight.release)
+        if shared is not None:
+            local_answer = LocalAnswer(shared.text, shared.explain, "concurrent request")
+            note = f"Shared the answer of a concurrent request for this task ({shared.model})."
+
+    render_options = {
+        "tty_state": tty_state,
+        "raw": plain_output,
+        "rich_flag": rich_flag,
+        "command_only": pipe_mode,
+        "theme": theme,
+    }
 
     try:
-        if use_live_stream:
+        if offline:
+            local_answer = answer_locally(command_description, os_name, settings)
+            if local_answer is None:
+                raise click.ClickException(
+                    "No local answer for this task. Run without `--offline` to ask the model."
+                )
+            note = f"Offline: {local_answer.describe()}."
+        if local_answer is not None:
+            generated_text, explain = local_answer.text, local_answer.explain
+            with phase_timings.measure("render"):
+                render_response(generated_text, explain=explain, note=note, **render_options)
+        elif deadline is not None:
+            generated_text, degraded = request_within_deadline(
+                messages,
+                deadline,
+                model=model,
+                model_explicit=not routed
+                and ctx.get_parameter_source("model") is not ParameterSource.DEFAULT,
+                request_options=request_options,
+                cache_key=cache_key,
+            )
+            response = None
+            with phase_timings.measure("render"):
+                render_response(
+                    generated_text,
+                    **render_options,
+                    explain=explain,
+                )
+        elif use_live_stream:
             console = make_console(theme)
             live = Live(make_renderable("", theme), console=console)
             live_callback = LiveMarkdownCallback(live, theme)
             click.echo()
-            with live:
-                generated_text = chatgpt_request(
+            with phase_timings.measure("request"), live:
+                generated_text, _, response = chatgpt_request(
                     messages,
                     model=model,
                     stream=True,
                     chunk_callback=live_callback,
-                )[0]
+                    **request_options,
+                )
             if live_callback.has_output:
                 click.echo()
             elif generated_text:
+                with phase_timings.measure("render"):
+                    render_response(
+                        generated_text,
+                        **render_options,
+                        leading_blank_line=False,
+                        explain=explain,
+                    )
+        else:
+            with phase_timings.measure("request"):
+                generated_text, _, response = chatgpt_request(
+                    messages,
+                    model=model,
+                    stream=False,
+                    **request_options,
+                )
+            with phase_timings.measure("render"):
                 render_response(
                     generated_text,
-                    tty_state=tty_state,
-                    raw=plain_output,
-                    rich_flag=rich_flag,
-                    command_only=pipe_mode,
-                    theme=theme,
-                    leading_blank_line=False,
+                    **render_options,
+                    explain=explain,
                 )
-        else:
-            generated_text = chatgpt_request(
-                messages,
-                model=model,
-                stream=False,
-            )[0]
-            render_response(
-                generated_text,
-                tty_state=tty_state,
-                raw=plain_output,
-                rich_flag=rich_flag,
-                command_only=pipe_mode,
-                theme=theme,
-            )
     except RateLimitError as error:
         echo_error(str(error))
         handle_rate_limit_error()
         raise SystemExit(1) from error
     except click.ClickException:
+        if generated_text and local_answer is None:
+            remember_response(cache_key, generated_text, model=model, explain=explain)
         raise
+    except (APIConnectionError, CircuitOpenError) as error:
+        # Timeouts are connection errors too: fall back to a local answer.
+        local_answer = answer_locally(command_description, os_name, settings)
+        if local_answer is None:
+            echo_error(str(error))
+            raise SystemExit(1) from error
+        generated_text, explain = local_answer.text, local_answer.explain
+        render_response(
+            generated_text,
+            explain=explain,
+            note=f"API unreachable ({error}): showing a {local_answer.describe()}.",
+            **render_options,
+        )
     except Exception as error:
         echo_error(str(error))
         raise SystemExit(1) from error
 
+    if degraded is not None:
+        click.secho(f"Deadline reached: showing {degraded}.", fg="yellow", err=True)
+        raise SystemExit(DEGRADED_EXIT_CODE)
+
+    history_id = None
+    parsed_response = None
+    if local_answer is None:
+        parsed_response = remember_response(cache_key, generated_text, model=model, explain=explain)
+    if flight is not None:
+        # The answer is stored: processes waiting for this task can use it.
+        flight.release()
+    if parsed_response is not None and settings.history:
+        history_id = save_to_history(
+            command_description, parsed_response, model=model, os_name=os_name, settings=settings
+        )
+    if parsed_response is not None and settings.similar_tasks:
+        index_similar_task(
+            command_description, os_name, generated_text, model=model, explain=explain
+        )
+
     if command_only:
         return
 
     if not tty_state.can_prompt or not stdin_has_prompt_input():
         return
 
-    parsed_response = parse_generated_command(generated_text)
+    parsed_response = parse_generated_command(generated_text, command_only=not explain)
+
+    explanation = None
+    if explain_later and local_answer is None:
+        explanation = BackgroundCall(
+            fetch_explanation,
+            messages,
+            generated_text,
+            response,
+            model=model,
+            request_options=request_options,
+        )
 
     click.echo()
 
-    if not click.confirm("Execute this command?", default=False):
+    with phase_timings.measure("confirm"):
+        confirmed = confirm_execution(explanation, theme)
+
+    if not confirmed:
         click.echo("Not executed.")
         return
 
     try:
-        run_generated_command(parsed_response)
+        with phase_timings.measure("execute"):
+            run_generated_command(parsed_response)
+    except subprocess.CalledProcessError as error:
+        if history_id is not None:
+            save_execution(history_id, error.returncode)
+        raise click.ClickException(f"Command failed: {error}") from error
+
+    if history_id is not None:
+        save_execution(history_id, 0)
+
+
+def format_age(seconds: float) -> str:
+    for unit, unit_seconds in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= unit_seconds:
+            return f"{int(seconds // unit_seconds)}{unit}"
+    return f"{int(seconds)}s"
+
+
+def serve_cached_response(
+    command_description: str, os_name: str, cache_key: str, *, ttl, model: str, explain: bool
+) -> tuple[LocalAnswer | None, str | None]:
+    """Answer from the response cache under ``model``'s ``cache_ttl`` setting.
+
+    Stale answers are served while a detached process refreshes them.
+    Returns the answer and the note to show with it, or ``(None, None)``
+    when the caller must ask the model.
+    """
+    cached = lookup_response(cache_key)
+    if cached is None or cached.model != model or (explain and not cached.explain):
+        record_lookup(hit=False)
+        return None, None
+
+    freshness = ttl.freshness(cached.age_seconds)
+    get_timings().note("response cache", freshness)
+    record_lookup(hit=freshness != EXPIRED)
+    if freshness == EXPIRED:
+        return None, None
+
+    note = f"Cached answer from {format_age(cached.age_seconds)} ago ({cached.model})"
+    if freshness == STALE:
+        from .revalidate import spawn_revalidation
+
+        if spawn_revalidation(command_description, os_name, model=model, explain=explain):
+            note += ", refreshing in the background"
+    return LocalAnswer(cached.text, cached.explain, "response cache", cached.model), f"{note}."
+
+
+def join_single_flight(
+    cache_key: str, *, explain: bool, model: str, deadline: float | None
+) -> tuple[SingleFlight, CachedResponse | None]:
+    """Lead the request for ``cache_key``, or wait for the process that does.
+
+    Returns the flight, to release once the answer is stored, and the other
+    process's answer when it came from ``model`` and can be shared.
+    """
+    phase_timings = get_timings()
+    flight = SingleFlight(cache_key)
+    if flight.try_lead():
+        phase_timings.note("single-flight", "leader")
+        return flight, None
+
+    click.secho("Waiting for the same task running in another process...", fg="yellow", err=True)
+    wait = SINGLE_FLIGHT_WAIT
+    if deadline is not None:
+        wait = min(wait, Deadline(deadline).remaining())
+    with phase_timings.measure("single-flight"):
+        shared = flight.wait(wait, explain=explain, model=model)
+    if shared is not None:
+        outcome = "shared"
+    else:
+        outcome = "leader" if flight.leading else "timed out"
+    phase_timings.note("single-flight", outcome)
+    return flight, shared
+
+
+def request_within_deadline(
+    messages, budget: float, *, model: str, model_explicit: bool, request_options, cache_key
+) -> tuple[str, str | None]:
+    """Request a command within ``budget`` seconds of process start.
+
+    Returns ``(text, degraded)``, where ``degraded`` describes a partial or
+    cached answer used in place of a full one and is ``None`` otherwise.
+    Exits with ``DEADLINE_EXIT_CODE`` when there is nothing to show.
+    """
+    phase_timings = get_timings()
+    deadline = Deadline(budget)
+    plan = plan_request(
+        deadline,
+        model=model,
+        model_explicit=model_explicit,
+        reasoning_effort=request_options.get("reasoning_effort"),
+    )
+    phase_timings.note("deadline", plan.describe())
+
+    # The request streams on a background thread so it can be abandoned
+    # mid-stream; the chunks received so far may still hold a whole command.
+    chunks: list[str] = []
+    call = BackgroundCall(
+        chatgpt_request,
+        messages,
+        model=plan.model,
+        stream=True,
+        chunk_callback=chunks.append,
+        timeout=plan.timeout,
+        **{**request_options, "reasoning_effort": plan.reasoning_effort},
+    )
+    try:
+        with phase_timings.measure("request"):
+            return call.result(timeout=plan.timeout)[0], None
+    except (TimeoutError, APITimeoutError):
+        failure = None
+    except Exception as error:
+        failure = error
+
+    partial = complete_partial_response("".join(chunks))
+    if partial is not None:
+        phase_timings.note("deadline result", "partial")
+        return partial, "a partial answer"
+
+    cached = lookup_response(cache_key)
+    if cached is not None:
+        phase_timings.note("deadline result", f"cached ({cached.model})")
+        return cached.text, f"a cached answer from {cached.model}"
+
+    if failure is not None:
+        raise failure
+    echo_error(f"No answer within {budget:g}s.")
+    raise SystemExit(DEADLINE_EXIT_CODE)
+
+
+def remember_response(
+    cache_key: str, generated_text: str, *, model: str, explain: bool
+) -> ParsedShellResponse | None:
+    """Record whether the answer parsed, and keep it as a fallback if it did.
+
+    The parse-success rate guides ``--model auto``; kept answers serve
+    deadline misses. Returns the parsed answer, or ``None``.
+    """
+    try:
+        parsed_response = parse_shellgenius_response(generated_text, command_only=not explain)
+    except ShellGeniusResponseError:
+        record_parse_result(model, ok=False)
+        return None
+    record_parse_result(model, ok=True)
+    store_response(cache_key, generated_text, model=model, explain=explain)
+    return parsed_response
+
+
+def save_to_history(
+    command_description: str,
+    parsed_response: ParsedShellResponse,
+    *,
+    model: str,
+    os_name: str,
+    settings,
+) -> int | None:
+    from .history import DEFAULT_MAX_ENTRIES, record_generation
+
+    return record_generation(
+        command_description,
+        parsed_response,
+        model=model,
+        os_name=os_name,
+        max_entries=settings.history_max_entries or DEFAULT_MAX_ENTRIES,
+        max_age_days=settings.history_max_age_days,
+    )
+
+
+def save_execution(history_id: int, exit_status: int) -> None:
+    from .history import record_execution
+
+    record_execution(history_id, exit_status)
+
+
+def answer_locally(command_description: str, os_name: str, settings) -> LocalAnswer | None:
+    with get_timings().measure("local answer"):
+        return find_local_answer(
+            command_description,
+            os_name,
+            history=settings.history,
+            similar_tasks=settings.similar_tasks,
+            threshold=settings.similar_tasks_threshold,
+        )
+
+
+def find_similar_answer(command_description: str, os_name: str, settings):
+    """Return the stored answer to a similar past task, if NumPy is installed."""
+    with get_timings().measure("similar"):
+        from . import similarity
+
+        if not similarity.available():
+            return None
+        return similarity.find_similar_task(
+            command_description,
+            os_name,
+            threshold=settings.similar_tasks_threshold or similarity.DEFAULT_THRESHOLD,
+        )
+
+
+def index_similar_task(
+    command_description: str, os_name: str, generated_text: str, *, model: str, explain: bool
+) -> None:
+    from . import similarity
+
+    if similarity.available():
+        similarity.add_task(
+            command_description, os_name, generated_text, model=model, explain=explain
+        )
+
+
+def offer_similar_answer(
+    similar,
+    *,
+    tty_state: TTYState,
+    raw: bool,
+    rich_flag: bool,
+    pipe_mode: bool,
+    command_only: bool,
+    theme: LmtTheme,
+) -> bool:
+    """Show the answer to a similar past task and offer to run it.
+
+    Returns ``False`` when the model should be asked after all: the user
+    chose to, or the stored answer no longer parses.
+    """
+    get_timings().note("similar task", similar.describe())
+    try:
+        render_response(
+            similar.text,
+            tty_state=tty_state,
+            raw=raw,
+            rich_flag=rich_flag,
+            command_only=pipe_mode,
+            theme=theme,
+            explain=similar.explain,
+            note=f"Reused a past answer ({similar.describe()}).",
+        )
+        parsed_response = parse_generated_command(similar.text, command_only=not similar.explain)
+    except click.ClickException:
+        return False
+
+    if command_only or not tty_state.can_prompt or not stdin_has_prompt_input():
+        return True
+
+    click.echo()
+    answer = click.prompt(
+        "Execute this command? [y/N/a=ask the model]",
+        type=click.Choice(["y", "yes", "n", "no", "a"], case_sensitive=False),
+        default="n",
+        show_choices=False,
+        show_default=False,
+    ).lower()
+    if answer == "a":
+        return False
+    if answer not in {"y", "yes"}:
+        click.echo("Not executed.")
+        return True
+
+    try:
+        with get_timings().measure("execute"):
+            run_generated_command(parsed_response)
     except subprocess.CalledProcessError as error:
         raise click.ClickException(f"Command failed: {error}") from error
+    return True
+
+
+def fetch_explanation(messages, generated_text, response, *, model, request_options) -> str:
+    """Ask for the explanation of ``generated_text``, continuing its conversation."""
+    follow_up, previous_response_id = format_explanation_prompt(messages, generated_text, response)
+    return chatgpt_request(
+        follow_up,
+        model=model,
+        stream=False,
+        previous_response_id=previous_response_id,
+        **request_options,
+    )[0]
+
+
+def confirm_execution(explanation: BackgroundCall | None, theme: LmtTheme) -> bool:
+    if explanation is not None:
+        answer = click.prompt(
+            "Execute this command? [y/N/e=explain]",
+            type=click.Choice(["y", "yes", "n", "no", "e"], case_sensitive=False),
+            default="n",
+            show_choices=False,
+            show_default=False,
+        ).lower()
+        if answer != "e":
+            return answer in {"y", "yes"}
+
+        echo_explanation(explanation, theme)
+        click.echo()
+
+    return click.confirm("Execute this command?", default=False)
+
+
+def echo_explanation(explanation: BackgroundCall, theme: LmtTheme) -> None:
+    phase_timings = get_timings()
+    phase_timings.note("explanation", "ready" if explanation.done() else "waited")
+    try:
+        with phase_timings.measure("confirm.explanation"):
+            text = explanation.result(timeout=EXPLANATION_TIMEOUT)
+    except Exception as error:
+        echo_error(f"Could not fetch the explanation: {error}")
+        return
+
+    click.echo()
+    make_console(theme).print(make_renderable(text, theme))
+
+
+def echo_token_estimate(messages, model: str) -> None:
+    token_count = num_tokens_from_messages(messages, model)
+    cost = estimate_prompt_cost(messages, model)
+    click.echo(f"Prompt tokens: {click.style(str(token_count), fg='yellow')}")
+    if cost is not None:
+        click.echo(
+            f"Estimated cost for {click.style(model, fg='blue')}:"
+            f" {click.style(f'${cost}', fg='yellow')}"
+        )
+    else:
+        click.echo(f"Cost unavailable for {click.style(model, fg='blue')}.")
+
+    usage = estimate_usage(model, request_kind(messages))
+    if usage.is_default:
+        source = "default estimate"
+    else:
+        source = f"from {usage.samples} recorded request{'s' if usage.samples != 1 else ''}"
+
+    output_tokens = f"{usage.output_tokens}"
+    if usage.reasoning_tokens:
+        output_tokens += f" + {usage.reasoning_tokens} reasoning"
+    click.echo(f"Expected output tokens: {click.style(output_tokens, fg='yellow')} ({source})")
+
+    completion_cost = output_cost(usage.output_tokens + usage.reasoning_tokens, model)
+    if cost is not None and completion_cost is not None:
+        total_cost = format_cost(float(cost) + completion_cost)
+        click.echo(f"Estimated total cost: {click.style(f'${total_cost}', fg='yellow')}")
+
+    click.echo(
+        f"Expected latency: {click.style(f'{usage.latency_seconds:.1f}s', fg='yellow')} ({source})"
+    )
+
+    if usage.cache_hit_rate is not None:
+        hit_rate = f"{usage.cache_hit_rate:.0%}"
+        click.echo(f"Prompt cache hit rate: {click.style(hit_rate, fg='yellow')} ({source})")
 
 
 def handle_rate_limit_error() -> None:
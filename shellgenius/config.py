@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import os
+import re
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from .models import (
+    MODEL_APIS,
+    MODEL_CAPABILITIES,
+    RESPONSES_API,
+    SERVICE_TIERS,
+    VALID_MODELS,
+    ModelCapabilities,
+    canonical_model_name,
+)
+from .response_cache import CacheTTL
+from .storage import read_json
+
+CONFIG_PATH = Path.home() / ".config" / "lmt" / "config.json"
+
+# Overrides the ``base_url`` setting, e.g. for one shell session.
+BASE_URL_ENV = "SHELLGENIUS_BASE_URL"
+
+# Traffic classes with their own defaults: a person waiting at the prompt, or
+# a script consuming `--cmd`/piped output.
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# Key of a ``fallback_model`` or ``cache_ttl`` entry that applies to every model.
+ANY_MODEL = "*"
+
+_DURATION_PATTERN = re.compile(r"(?P<value>\d+(?:\.\d*)?|\.\d+)\s*(?P<unit>ms|s|m|h|d)?")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0, "d": 86400.0, None: 1.0}
+
+__all__ = [
+    "ANY_MODEL",
+    "BASE_URL_ENV",
+    "BATCH",
+    "CONFIG_PATH",
+    "INTERACTIVE",
+    "Settings",
+    "get_base_url",
+    "get_config_path",
+    "load_settings",
+    "parse_duration",
+]
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """ShellGenius settings from the ``shellgenius`` block of the lmt config.
+
+    Invalid values are ignored individually, like the theme settings.
+    """
+
+    service_tiers: Mapping[str, str] = field(default_factory=dict)
+    hedge: bool = False
+    hedge_after: float | None = None
+    hedge_model: str | None = None
+    hedge_max_rate: float | None = None
+    fallback_models: Mapping[str, str] = field(default_factory=dict)
+    history: bool = True
+    history_max_entries: int | None = None
+    history_max_age_days: float | None = None
+    similar_tasks: bool = True
+    similar_tasks_threshold: float | None = None
+    cache_ttls: Mapping[str, CacheTTL] = field(default_factory=dict)
+    base_url: str | None = None
+    models: Mapping[str, ModelCapabilities] = field(default_factory=dict)
+
+    def service_tier_for(self, traffic: str) -> str | None:
+        return self.service_tiers.get(traffic)
+
+    def fallback_for(self, model: str) -> str | None:
+        """The model to use while ``model``'s circuit breaker is open."""
+        fallback = self.fallback_models.get(model) or self.fallback_models.get(ANY_MODEL)
+        return fallback if fallback != model else None
+
+    def cache_ttl_for(self, model: str) -> CacheTTL | None:
+        """How long cached answers from ``model`` are served, if at all."""
+        return self.cache_ttls.get(model) or self.cache_ttls.get(ANY_MODEL)
+
+
+def get_config_path() -> Path:
+    return CONFIG_PATH
+
+
+def get_base_url(environ: Mapping[str, str] = os.environ) -> str | None:
+    """The API base URL from ``SHELLGENIUS_BASE_URL`` or the config, if set.
+
+    ``None`` leaves the choice to the OpenAI client, which reads
+    ``OPENAI_BASE_URL``.
+    """
+    return _validated_base_url(environ.get(BASE_URL_ENV)) or load_settings().base_url
+
+
+def _validated_service_tiers(value: Any) -> dict[str, str]:
+    if isinstance(value, str):
+        value = {INTERACTIVE: value, BATCH: value}
+    if not isinstance(value, dict):
+        return {}
+    return {
+        traffic: tier
+        for traffic, tier in value.items()
+        if traffic in (INTERACTIVE, BATCH) and tier in SERVICE_TIERS
+    }
+
+
+def _positive_number(value: Any) -> float | None:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        return None
+    return float(value)
+
+
+def _validated_hedge(value: Any, models: Mapping[str, ModelCapabilities]) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"hedge": value}
+    if not isinstance(value, dict):
+        return {}
+
+    model = value.get("model")
+    max_rate = _positive_number(value.get("max_rate"))
+    return {
+        "hedge": value.get("enabled", True) is not False,
+        "hedge_after": _positive_number(value.get("after")),
+        "hedge_model": canonical_model_name(model, models) if isinstance(model, str) else None,
+        "hedge_max_rate": max_rate if max_rate is not None and max_rate <= 1 else None,
+    }
+
+
+def _validated_fallback_models(
+    value: Any, models: Mapping[str, ModelCapabilities]
+) -> dict[str, str]:
+    if isinstance(value, str):
+        value = {ANY_MODEL: value}
+    if not isinstance(value, dict):
+        return {}
+
+    fallbacks = {}
+    for model, fallback in value.items():
+        if not isinstance(model, str) or not isinstance(fallback, str):
+            continue
+        model = model if model == ANY_MODEL else canonical_model_name(model, models)
+        fallback = canonical_model_name(fallback, models)
+        if model is not None and fallback is not None:
+            fallbacks[model] = fallback
+    return fallbacks
+
+
+def _validated_history(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"history": value}
+    if not isinstance(value, dict):
+        return {}
+
+    max_entries = _positive_number(value.get("max_entries"))
+    return {
+        "history": value.get("enabled", True) is not False,
+        "history_max_entries": int(max_entries) if max_entries is not None else None,
+        "history_max_age_days": _positive_number(value.get("max_age_days")),
+    }
+
+
+def _validated_similar_tasks(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"similar_tasks": value}
+    if not isinstance(value, dict):
+        return {}
+
+    threshold = _positive_number(value.get("threshold"))
+    return {
+        "similar_tasks": value.get("enabled", True) is not False,
+        "similar_tasks_threshold": threshold if threshold is not None and threshold <= 1 else None,
+    }
+
+
+def parse_duration(value: str) -> float:
+    """Parse ``500ms``, ``2s``, ``10m``, ``12h``, ``7d``, or plain seconds into seconds.
+
+    Raises ``ValueError`` for anything else, including zero.
+    """
+    match = _DURATION_PATTERN.fullmatch(value.strip().lower())
+    if match is None:
+        raise ValueError(f"{value!r} is not a duration such as 500ms, 2s, 12h, or 7d.")
+    seconds = float(match["value"]) * _DURATION_UNITS[match["unit"]]
+    if seconds <= 0:
+        raise ValueError("The duration must be positive.")
+    return seconds
+
+
+def _ttl_seconds(value: Any) -> float | None:
+    if isinstance(value, str):
+        try:
+            return parse_duration(value)
+        except ValueError:
+            return None
+    return _positive_number(value)
+
+
+def _validated_cache_ttl(value: Any) -> CacheTTL | None:
+    if not isinstance(value, dict):
+        return None
+    soft = _ttl_seconds(value.get("soft"))
+    hard = _ttl_seconds(value.get("hard"))
+    if soft is None or (value.get("hard") is not None and (hard is None or hard < soft)):
+        return None
+    return CacheTTL(soft=soft, hard=hard)
+
+
+def _validated_cache_ttls(
+    value: Any, models: Mapping[str, ModelCapabilities]
+) -> dict[str, CacheTTL]:
+    if isinstance(value, dict) and "soft" in value:
+        value = {ANY_MODEL: value}
+    if not isinstance(value, dict):
+        return {}
+
+    ttls = {}
+    for model, entry in value.items():
+        if not isinstance(model, str):
+            continue
+        model = model if model == ANY_MODEL else canonical_model_name(model, models)
+        ttl = _validated_cache_ttl(entry)
+        if model is not None and ttl is not None:
+            ttls[model] = ttl
+    return ttls
+
+
+def _validated_base_url(value: Any) -> str | None:
+    if not isinstance(value, str) or not value.strip().startswith(("http://", "https://")):
+        return None
+    return value.strip().rstrip("/")
+
+
+def _validated_model(name: str, value: Any, taken: set[str]) -> ModelCapabilities | None:
+    if not isinstance(value, dict):
+        return None
+    aliases = value.get("aliases", [])
+    if isinstance(aliases, str):
+        aliases = [aliases]
+    if not isinstance(aliases, list) or not all(isinstance(alias, str) for alias in aliases):
+        return None
+    aliases = tuple(alias.strip().lower() for alias in aliases)
+    api = value.get("api", RESPONSES_API)
+    streaming = value.get("streaming", True)
+    stop = value.get("stop", True)
+    if api not in MODEL_APIS or not isinstance(streaming, bool) or not isinstance(stop, bool):
+        return None
+    if taken.intersection((name.lower(), *aliases)):
+        return None
+    return ModelCapabilities(
+        aliases=aliases,
+        service_tiers=(),
+        api=api,
+        streaming=streaming,
+        stop=stop,
+        prompt_caching=False,
+    )
+
+
+def _validated_models(value: Any) -> dict[str, ModelCapabilities]:
+    if not isinstance(value, dict):
+        return {}
+
+    # Custom models cannot shadow built-in names or aliases, or each other.
+    taken = {
+        *MODEL_CAPABILITIES,
+        *(alias for aliases in VALID_MODELS.values() for alias in aliases),
+    }
+    models = {}
+    for name, entry in value.items():
+        if not isinstance(name, str) or not name.strip():
+            continue
+        name = name.strip()
+        capabilities = _validated_model(name, entry, taken)
+        if capabilities is not None:
+            models[name] = capabilities
+            taken.update((name.lower(), *capabilities.aliases))
+    return models
+
+
+def load_settings() -> Settings:
+    data = read_json(get_config_path())
+    if not isinstance(data, dict) or not isinstance(data.get("shellgenius"), dict):
+        return Settings()
+
+    config = data["shellgenius"]
+    models = _validated_models(config.get("models"))
+    return Settings(
+        service_tiers=_validated_service_tiers(config.get("service_tier")),
+        fallback_models=_validated_fallback_models(config.get("fallback_model"), models),
+        cache_ttls=_validated_cache_ttls(config.get("cache_ttl"), models),
+        base_url=_validated_base_url(config.get("base_url")),
+        models=models,
+        **_validated_hedge(config.get("hedge"), models),
+        **_validated_history(config.get("history")),
+        **_validated_similar_tasks(config.get("similar_tasks")),
+    )
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import re
+import time
+from dataclasses import dataclass
+
+from .model_stats import COMMAND, estimate_usage
+from .models import MODEL_CAPABILITIES
+from .response_parser import ShellGeniusResponseError, parse_shellgenius_response
+from .timings import get_timings
+
+# Exit status when the deadline passes with nothing to show, as in timeout(1).
+DEADLINE_EXIT_CODE = 124
+
+# Exit status when a partial or cached answer is shown instead of a full one.
+DEGRADED_EXIT_CODE = 3
+
+# Seconds kept back for parsing and printing once the request returns.
+RENDER_RESERVE = 0.05
+
+_SIZE_SUFFIX = re.compile(r"-(?:mini|nano)$")
+
+__all__ = [
+    "DEADLINE_EXIT_CODE",
+    "DEGRADED_EXIT_CODE",
+    "Deadline",
+    "DeadlinePlan",
+    "complete_partial_response",
+    "plan_request",
+]
+
+
+class Deadline:
+    """A time budget for the whole invocation.
+
+    The clock starts when the process did: time already spent, as recorded
+    in the global timings (startup, theme), counts against the budget.
+    """
+
+    def __init__(self, budget: float, *, elapsed: float | None = None) -> None:
+        self.budget = budget
+        if elapsed is None:
+            elapsed = get_timings().total
+        self._end = time.monotonic() - elapsed + budget
+
+    def remaining(self) -> float:
+        return max(self._end - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+@dataclass(frozen=True, slots=True)
+class DeadlinePlan:
+    """How one request is shaped to fit a deadline."""
+
+    model: str
+    reasoning_effort: str
+    timeout: float
+    expected_latency: float
+
+    @property
+    def fits(self) -> bool:
+        return self.expected_latency <= self.timeout
+
+    def describe(self) -> str:
+        verdict = "fits" if self.fits else "may not fit"
+        return (
+            f"{self.model}, expected {self.expected_latency:.2f}s, "
+            f"timeout {self.timeout:.2f}s ({verdict})"
+        )
+
+
+def plan_request(
+    deadline: Deadline,
+    *,
+    model: str,
+    model_explicit: bool = False,
+    reasoning_effort: str | None = None,
+) -> DeadlinePlan:
+    """Pick the model, effort, and request timeout for ``deadline``.
+
+    A model chosen with ``--model`` is always kept. Otherwise ``model`` is
+    kept if its expected latency for a command-only answer fits, and the
+    fastest of its sizes (``-mini``, ``-nano``) with recorded requests is
+    used if not; the built-in defaults alone never switch the family.
+    Effort drops to the model's lowest unless one was given.
+    """
+    timeout = max(deadline.remaining() - RENDER_RESERVE, 0.0)
+    estimates = {model: estimate_usage(model, COMMAND)}
+    if not model_explicit:
+        for candidate in MODEL_CAPABILITIES:
+            if candidate != model and _family(candidate) == _family(model):
+                estimate = estimate_usage(candidate, COMMAND)
+                if estimate.latency_samples:
+                    estimates[candidate] = estimate
+    latencies = {candidate: estimate.latency_seconds for candidate, estimate in estimates.items()}
+
+    chosen = model
+    if latencies[model] > timeout:
+        chosen = min(latencies, key=latencies.__getitem__)
+
+    return DeadlinePlan(
+        model=chosen,
+        reasoning_effort=reasoning_effort or "minimal",
+        timeout=timeout,
+        expected_latency=latencies[chosen],
+    )
+
+
+def _family(model: str) -> str:
+    return _SIZE_SUFFIX.sub("", model)
+
+
+def complete_partial_response(text: str) -> str | None:
+    """Return the usable part of a response cut off by the deadline.
+
+    Only a command whose code block was closed is usable; a command cut off
+    mid-block may be truncated and is never returned.
+    """
+    try:
+        parsed = parse_shellgenius_response(text, command_only=True)
+    except ShellGeniusResponseError:
+        return None
+    fence = parsed.fence_language or ""
+    return f"```{fence}\n{parsed.command}\n```\n"
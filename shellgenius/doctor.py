@@ -0,0 +1,341 @@
+from __future__ import annotations
+
+import os
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from importlib import metadata
+from pathlib import Path
+from urllib.parse import urlsplit
+
+DEFAULT_ENDPOINT = "https://api.openai.com/v1"
+
+DEPENDENCY_MODULES = (
+    "click",
+    "click_default_group",
+    "rich",
+    "pygments",
+    "requests",
+    "tiktoken",
+    "openai",
+    "shellgenius.cli",
+)
+
+PYGMENTS_PLUGIN_GROUPS = (
+    "pygments.lexers",
+    "pygments.formatters",
+    "pygments.styles",
+    "pygments.filters",
+)
+
+PROXY_ENV_VARS = (
+    "HTTPS_PROXY",
+    "https_proxy",
+    "HTTP_PROXY",
+    "http_proxy",
+    "ALL_PROXY",
+    "all_proxy",
+)
+
+NETWORK_TIMEOUT = 5.0
+
+# Seconds above which a check is reported as a hotspot.
+IMPORT_HOTSPOT = 0.3
+LOCAL_IO_HOTSPOT = 0.05
+PYGMENTS_PLUGINS_HOTSPOT = 0.1
+TIKTOKEN_HOTSPOT = 0.5
+NETWORK_HOTSPOT = 0.3
+
+__all__ = [
+    "DEFAULT_ENDPOINT",
+    "PerfCheck",
+    "check_api_key",
+    "check_config_dir",
+    "check_endpoint",
+    "check_import",
+    "check_pygments_plugins",
+    "check_theme",
+    "check_tiktoken",
+    "proxy_settings",
+    "rank_checks",
+    "resolve_endpoint",
+    "run_checks",
+]
+
+
+@dataclass(frozen=True, slots=True)
+class PerfCheck:
+    name: str
+    seconds: float | None
+    detail: str = ""
+    hotspot: str | None = None
+
+
+def _timed(func: Callable[[], object]) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.0f} ms"
+
+
+def parse_import_time(stderr: str, module: str) -> float | None:
+    """Return the cumulative import time of ``module`` from ``-X importtime`` output."""
+    seconds = None
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or fields[2].strip() != module:
+            continue
+        try:
+            seconds = int(fields[1]) / 1e6
+        except ValueError:
+            continue
+    return seconds
+
+
+def check_import(module: str) -> PerfCheck:
+    """Measure a cold import of ``module`` in a fresh interpreter."""
+    name = f"import {module}"
+    try:
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            timeout=60,
+            check=False,
+        )
+    except (OSError, subprocess.TimeoutExpired) as error:
+        return PerfCheck(name, None, f"failed: {error}")
+
+    seconds = parse_import_time(completed.stderr, module)
+    if completed.returncode != 0 or seconds is None:
+        return PerfCheck(name, None, "failed to import")
+
+    hotspot = None
+    if seconds > IMPORT_HOTSPOT:
+        hotspot = (
+            f"Importing `{module}` takes {_ms(seconds)}. A cold bytecode cache (first run "
+            "after an upgrade) or site-packages on a slow filesystem are the usual causes."
+        )
+    return PerfCheck(name, seconds, hotspot=hotspot)
+
+
+def check_pygments_plugins() -> PerfCheck:
+    """Count third-party Pygments plugins and time loading every style."""
+    from pygments.styles import get_all_styles
+
+    entry_points = metadata.entry_points()
+    plugin_count = sum(len(entry_points.select(group=group)) for group in PYGMENTS_PLUGIN_GROUPS)
+    seconds, styles = _timed(lambda: list(get_all_styles()))
+
+    hotspot = None
+    if seconds > PYGMENTS_PLUGINS_HOTSPOT:
+        hotspot = (
+            f"Loading Pygments styles takes {_ms(seconds)} with {plugin_count} plugins "
+            "installed. Uninstall unused Pygments plugins from this environment."
+        )
+    return PerfCheck(
+        "pygments plugins",
+        seconds,
+        f"{plugin_count} plugins, {len(styles)} styles",
+        hotspot,
+    )
+
+
+def check_config_dir(config_dir: Path) -> PerfCheck:
+    """Time listing and reading the shared ``lmt`` config directory."""
+
+    def read_config_dir() -> int:
+        total = 0
+        if not config_dir.is_dir():
+            return total
+        for path in config_dir.iterdir():
+            if path.is_file():
+                total += len(path.read_bytes())
+        return total
+
+    try:
+        seconds, size = _timed(read_config_dir)
+    except OSError as error:
+        return PerfCheck("config dir", None, f"{config_dir}: {error}")
+
+    hotspot = None
+    if seconds > LOCAL_IO_HOTSPOT:
+        hotspot = (
+            f"Reading {config_dir} takes {_ms(seconds)}. The home directory may be on a "
+            "network filesystem; every ShellGenius run reads the key and config from it."
+        )
+    return PerfCheck("config dir", seconds, f"{config_dir} ({size} bytes)", hotspot)
+
+
+def check_api_key(environ: Mapping[str, str]) -> PerfCheck:
+    from .api_key import get_api_key, get_api_key_path
+
+    seconds, api_key = _timed(get_api_key)
+    if environ.get("OPENAI_API_KEY", "").strip():
+        detail = "from OPENAI_API_KEY"
+    elif api_key:
+        detail = f"from {get_api_key_path()}"
+    else:
+        detail = "not found"
+
+    hotspot = None
+    if seconds > LOCAL_IO_HOTSPOT:
+        hotspot = (
+            f"Resolving the API key takes {_ms(seconds)}; set OPENAI_API_KEY to skip the file."
+        )
+    return PerfCheck("api key", seconds, detail, hotspot)
+
+
+def check_theme() -> PerfCheck:
+    from .theme import load_lmt_theme
+
+    seconds, theme = _timed(load_lmt_theme)
+    detail = theme.resolved_code_block_theme or "default"
+
+    hotspot = None
+    if seconds > LOCAL_IO_HOTSPOT:
+        hotspot = f"Loading the theme takes {_ms(seconds)}; check the config dir timing."
+    return PerfCheck("theme", seconds, detail, hotspot)
+
+
+def tiktoken_cache_dir(environ: Mapping[str, str]) -> Path:
+    """Return the directory tiktoken uses to cache encoding files."""
+    for name in ("TIKTOKEN_CACHE_DIR", "DATA_GYM_CACHE_DIR"):
+        if environ.get(name):
+            return Path(environ[name])
+    return Path(tempfile.gettempdir()) / "data-gym-cache"
+
+
+def check_tiktoken(model: str, environ: Mapping[str, str]) -> PerfCheck:
+    import tiktoken
+
+    cache_dir = tiktoken_cache_dir(environ)
+    was_cached = cache_dir.is_dir() and any(cache_dir.iterdir())
+
+    def load_encoding():
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+
+    try:
+        seconds, encoding = _timed(load_encoding)
+    except Exception as error:
+        return PerfCheck(
+            "tiktoken encoding",
+            None,
+            f"failed: {type(error).__name__}",
+            f"Could not load the tiktoken encoding ({error}). `--tokens` downloads it "
+            "once into the tiktoken cache; set TIKTOKEN_CACHE_DIR to a pre-populated "
+            "directory on machines without internet access.",
+        )
+
+    detail = f"{encoding.name}, cache {'warm' if was_cached else 'cold'} in {cache_dir}"
+    hotspot = None
+    if seconds > TIKTOKEN_HOTSPOT:
+        hotspot = f"Loading the tiktoken encoding takes {_ms(seconds)}."
+        if not was_cached:
+            hotspot += " The encoding was downloaded because the cache was empty."
+        if "TIKTOKEN_CACHE_DIR" not in environ:
+            hotspot += " Set TIKTOKEN_CACHE_DIR to a persistent local directory."
+    return PerfCheck("tiktoken encoding", seconds, detail, hotspot)
+
+
+def resolve_endpoint(endpoint: str | None, environ: Mapping[str, str]) -> str:
+    from .config import get_base_url
+
+    return endpoint or get_base_url(environ) or environ.get("OPENAI_BASE_URL") or DEFAULT_ENDPOINT
+
+
+def check_endpoint(endpoint: str) -> list[PerfCheck]:
+    """Time DNS resolution, TCP connect, and TLS handshake to ``endpoint``."""
+    parts = urlsplit(endpoint)
+    host = parts.hostname
+    if not host:
+        return [PerfCheck("dns", None, f"invalid endpoint: {endpoint}")]
+    use_tls = parts.scheme == "https"
+    port = parts.port or (443 if use_tls else 80)
+
+    try:
+        seconds, addresses = _timed(lambda: socket.getaddrinfo(host, port, type=socket.SOCK_STREAM))
+    except OSError as error:
+        return [PerfCheck("dns", None, f"{host}: {error}")]
+    checks = [_network_check("dns", seconds, f"{host} -> {addresses[0][4][0]}")]
+
+    try:
+        seconds, sock = _timed(
+            lambda: socket.create_connection((host, port), timeout=NETWORK_TIMEOUT)
+        )
+    except OSError as error:
+        checks.append(PerfCheck("tcp connect", None, f"{host}:{port}: {error}"))
+        return checks
+    checks.append(_network_check("tcp connect", seconds, f"{host}:{port}"))
+
+    with sock:
+        if not use_tls:
+            return checks
+        context = ssl.create_default_context()
+        try:
+            seconds, tls_sock = _timed(lambda: context.wrap_socket(sock, server_hostname=host))
+        except (OSError, ssl.SSLError) as error:
+            checks.append(PerfCheck("tls handshake", None, f"failed: {error}"))
+            return checks
+        with tls_sock:
+            checks.append(_network_check("tls handshake", seconds, tls_sock.version() or ""))
+    return checks
+
+
+def _network_check(name: str, seconds: float, detail: str) -> PerfCheck:
+    hotspot = None
+    if seconds > NETWORK_HOTSPOT:
+        hotspot = f"{name} takes {_ms(seconds)}; every request pays this before the first token."
+    return PerfCheck(name, seconds, detail, hotspot)
+
+
+def proxy_settings(environ: Mapping[str, str]) -> dict[str, str]:
+    return {name: environ[name] for name in PROXY_ENV_VARS if environ.get(name)}
+
+
+def run_checks(
+    *,
+    model: str,
+    config_dir: Path,
+    endpoint: str | None,
+    environ: Mapping[str, str] | None = None,
+    imports: bool = True,
+    network: bool = True,
+) -> list[PerfCheck]:
+    environ = os.environ if environ is None else environ
+    checks: list[PerfCheck] = []
+
+    if imports:
+        checks.extend(check_import(module) for module in DEPENDENCY_MODULES)
+
+    checks.append(check_pygments_plugins())
+    checks.append(check_config_dir(config_dir))
+    checks.append(check_api_key(environ))
+    checks.append(check_theme())
+    checks.append(check_tiktoken(model, environ))
+
+    if network:
+        checks.extend(check_endpoint(resolve_endpoint(endpoint, environ)))
+
+    return checks
+
+
+def rank_checks(checks: list[PerfCheck]) -> list[PerfCheck]:
+    """Slowest first; failed checks (no timing) last."""
+    return sorted(
+        checks,
+        key=lambda check: (check.seconds is None, -(check.seconds or 0.0)),
+    )
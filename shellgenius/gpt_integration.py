@@ -1,76 +1,333 @@
+import functools
 import time
+from dataclasses import dataclass
 
 import tiktoken
 
-from .openai_backend import RateLimitError, create_openai_backend
+from .circuit_breaker import (
+    BreakerState,
+    CircuitOpenError,
+    allow_request,
+    is_breaker_failure,
+    load_breaker_states,
+    record_failure,
+    record_success,
+)
+from .hedging import HedgedBackend
+from .model_stats import COMMAND, EXPLAIN, FOLLOW_UP, estimate_usage, record_request
+from .models import resolve_request_options
+from .openai_backend import (
+    APIConnectionError,
+    APITimeoutError,
+    RateLimitError,
+    create_openai_backend,
+    extract_response_id,
+    extract_service_tier,
+    extract_usage,
+)
+from .rate_limit import MAX_PACING_WAIT, pace
+from .routing import estimate_task_tokens
+from .timings import get_timings
 
 __all__ = [
+    "PROMPT_TEMPLATE_VERSION",
+    "APIConnectionError",
+    "APITimeoutError",
+    "CircuitOpenError",
+    "FormattedPrompt",
+    "PromptTokenTemplate",
     "RateLimitError",
     "chatgpt_request",
+    "encoding_name_for_model",
     "estimate_prompt_cost",
+    "format_cost",
+    "format_explanation_prompt",
     "format_prompt",
+    "input_cost",
+    "iter_prompt_token_counts",
     "num_tokens_from_messages",
+    "output_cost",
+    "priced_models",
+    "prompt_cache_key",
+    "prompt_token_template",
+    "request_kind",
 ]
 
 
-def format_prompt(command_description, os_name):
-    shell_name = "powershell" if os_name == "Windows" else "bash"
-    prompt = [
-        {
-            "role": "system",
-            "content": (
-                f"You write shell commands for {os_name}. Reply in the same language as the user."
-            ),
-        },
-        {
-            "role": "user",
-            "content": f"""Return the command for this task in a {os_name} shell.
+PROMPT_TEMPLATE_VERSION = 2
+
+# The system message holds every instruction and is identical for all tasks
+# of a template and OS, so providers can serve it from their prompt cache.
+# Only the user message, the task, varies. The OS-specific line comes last
+# to keep the shared part of the prefix as long as possible.
+_SYSTEM_PROMPT = """You write shell commands. Reply in the same language as the user.
+
+Return the command for the user's task.
 
 Rules:
 * Start with exactly one fenced code block for the command.
-* Use this fence info string: `{shell_name}`.
+* Use the fence info string given below.
 * Do not write anything before the code block.
 * After the code block, add a short bullet-list explanation.
 * Keep the command concise and correct.
 
 Format:
-```{shell_name}
+```<fence info string>
 <command>
 ```
 
 Explanation:
 * ...
 
-Task:
-{command_description}
-""",
+Shell: {os_name}. Fence info string: `{shell_name}`."""
+
+# Used when the explanation would be discarded (``--cmd``, pipes,
+# ``--no-explain``): the explanation is most of the output otherwise.
+_COMMAND_ONLY_SYSTEM_PROMPT = """You write shell commands.
+
+Return the command for the user's task.
+
+Rules:
+* Reply with exactly one fenced code block for the command and nothing else.
+* Use the fence info string given below.
+* Keep the command concise and correct.
+
+Format:
+```<fence info string>
+<command>
+```
+
+Shell: {os_name}. Fence info string: `{shell_name}`."""
+
+_USER_PROMPT_PREFIX = "Task:\n"
+
+_USER_PROMPT_SUFFIX = "\n"
+
+_EXPLANATION_REQUEST = (
+    "Explain the command above as a short bullet list. Do not repeat the command."
+)
+
+
+class FormattedPrompt(list):
+    """Messages built by ``format_prompt``, remembering the template inputs.
+
+    Token counting uses these to encode only the task text; any later change
+    to the messages falls back to encoding everything.
+    """
+
+    __slots__ = ("command_description", "os_name", "explain", "_contents")
+
+    def __init__(self, messages, *, command_description, os_name, explain=True):
+        super().__init__(messages)
+        self.command_description = command_description
+        self.os_name = os_name
+        self.explain = explain
+        self._contents = tuple((message["role"], message["content"]) for message in messages)
+
+    @property
+    def cache_key(self) -> str:
+        """``prompt_cache_key`` shared by every prompt with this template and OS."""
+        return prompt_cache_key(self.os_name, explain=self.explain)
+
+    def is_unmodified(self) -> bool:
+        return len(self) == len(self._contents) and all(
+            message.keys() == {"role", "content"}
+            and (message["role"], message["content"]) == contents
+            for message, contents in zip(self, self._contents)
+        )
+
+
+def _shell_name(os_name):
+    return "powershell" if os_name == "Windows" else "bash"
+
+
+def prompt_cache_key(os_name, *, explain=True):
+    template = "explain" if explain else "command"
+    return f"shellgenius-v{PROMPT_TEMPLATE_VERSION}-{template}-{os_name.lower()}"
+
+
+def request_kind(prompt):
+    """The kind of ``prompt`` that its statistics are kept under."""
+    if isinstance(prompt, FormattedPrompt) and prompt.is_unmodified():
+        return EXPLAIN if prompt.explain else COMMAND
+    return FOLLOW_UP
+
+
+def format_prompt(command_description, os_name, *, explain=True):
+    """Build the messages for ``command_description``.
+
+    With ``explain=False`` the model is asked for the command alone.
+    """
+    system_prompt = _SYSTEM_PROMPT if explain else _COMMAND_ONLY_SYSTEM_PROMPT
+    prompt = [
+        {
+            "role": "system",
+            "content": system_prompt.format(os_name=os_name, shell_name=_shell_name(os_name)),
+        },
+        {
+            "role": "user",
+            "content": _USER_PROMPT_PREFIX + command_description + _USER_PROMPT_SUFFIX,
         },
     ]
-    return prompt
+    return FormattedPrompt(
+        prompt,
+        command_description=command_description,
+        os_name=os_name,
+        explain=explain,
+    )
+
+
+def format_explanation_prompt(prompt, generated_text, response=None):
+    """Build the follow-up request for the explanation of a generated command.
+
+    When ``response`` has a Responses API id, only the follow-up is sent and
+    the API continues the stored conversation (pass the id on as
+    ``previous_response_id``); otherwise the whole conversation is resent.
+    Returns ``(messages, previous_response_id)``.
+    """
+    follow_up = {"role": "user", "content": _EXPLANATION_REQUEST}
+    previous_response_id = extract_response_id(response)
+    if previous_response_id is not None:
+        return [follow_up], previous_response_id
+
+    return [*prompt, {"role": "assistant", "content": generated_text}, follow_up], None
 
 
 def chatgpt_request(
     prompt,
     model="gpt-5.4-mini",
     n=1,
-    temperature=1,
+    temperature=None,
     stop=None,
     stream=False,
     chunk_callback=None,
+    reasoning_effort=None,
+    verbosity=None,
+    max_output_tokens=None,
+    previous_response_id=None,
+    prompt_cache_key=None,
+    service_tier=None,
+    hedge=None,
+    timeout=None,
+    fallback_model=None,
 ):
+    """Send ``prompt`` to ``model`` and return ``(text, seconds, response)``.
+
+    Unset reasoning effort and verbosity fall back to the latency-oriented
+    defaults from ``MODEL_CAPABILITIES``; settings a model does not support
+    are not sent. Prompts from ``format_prompt`` carry their own
+    ``prompt_cache_key``. With a ``HedgePolicy`` as ``hedge``, a slow
+    request is raced against a second one; see ``HedgedBackend``.
+    ``timeout`` bounds the HTTP request in seconds. Without ``temperature``
+    the server's default applies.
+
+    While the circuit breaker of ``model`` is open, the request goes to
+    ``fallback_model`` instead, or fails with ``CircuitOpenError``.
+    """
+    model = _model_with_closed_circuit(model, fallback_model)
+    if prompt_cache_key is None and isinstance(prompt, FormattedPrompt):
+        prompt_cache_key = prompt.cache_key
+
+    def options_for(request_model):
+        options = resolve_request_options(
+            request_model,
+            reasoning_effort=reasoning_effort,
+            verbosity=verbosity,
+            max_output_tokens=max_output_tokens,
+            service_tier=service_tier,
+        )
+        return {
+            "reasoning_effort": options.reasoning_effort,
+            "verbosity": options.verbosity,
+            "max_output_tokens": options.max_output_tokens,
+            "service_tier": options.service_tier,
+        }
+
+    request_options = options_for(model)
+    if request_options["reasoning_effort"] is not None:
+        get_timings().note("effort", request_options["reasoning_effort"])
+
+    def estimate_tokens():
+        expected_output = max_output_tokens
+        if expected_output is None:
+            usage = estimate_usage(model, request_kind(prompt))
+            expected_output = usage.output_tokens + usage.reasoning_tokens
+        return _estimate_prompt_tokens(prompt) + expected_output * n
+
+    waited = pace(model, estimate_tokens, max_wait=min(timeout or MAX_PACING_WAIT, MAX_PACING_WAIT))
+    if waited:
+        get_timings().note("rate limit", f"waited {waited:.2f}s for {model}")
     start_time = time.monotonic_ns()
+    first_chunk_timer = None
+    if chunk_callback is not None:
+        chunk_callback = first_chunk_timer = _FirstChunkTimer(chunk_callback, start_time)
     backend = create_openai_backend()
-    generated_text, response = backend.create_text_response(
-        prompt=prompt,
-        model=model,
-        n=n,
-        temperature=temperature,
-        stop=stop,
-        stream=stream,
-        chunk_callback=chunk_callback,
-    )
+    if hedge is not None:
+        backend = HedgedBackend(backend, hedge, options_for=options_for)
+
+    def answering_model():
+        # The hedge may have served, or failed, on a different model.
+        if hedge is not None and backend.last_outcome is not None:
+            return backend.last_outcome.model
+        return model
+
+    try:
+        generated_text, response = backend.create_text_response(
+            prompt=prompt,
+            model=model,
+            n=n,
+            temperature=temperature,
+            stop=stop,
+            stream=stream,
+            chunk_callback=chunk_callback,
+            previous_response_id=previous_response_id,
+            prompt_cache_key=prompt_cache_key,
+            timeout=timeout,
+            **request_options,
+        )
+    except Exception as error:
+        # A timeout the caller asked for says nothing about the model's health.
+        caller_timeout = timeout is not None and isinstance(error, APITimeoutError)
+        if is_breaker_failure(error) and not caller_timeout:
+            record_failure(answering_model())
+        raise
     response_time = (time.monotonic_ns() - start_time) / 1e9
 
+    served_model = answering_model()
+    record_success(served_model)
+    if hedge is not None and backend.last_outcome is not None:
+        get_timings().note("hedge", backend.last_outcome.describe())
+
+    served_tier = extract_service_tier(response)
+    requested_tier = request_options["service_tier"]
+    if service_tier is not None and requested_tier is None:
+        get_timings().note(
+            "service tier",
+            f"{service_tier} not offered by {model}; {_format_service_tier('auto', served_tier)}",
+        )
+    elif requested_tier is not None or served_tier is not None:
+        get_timings().note(
+            "service tier",
+            _format_service_tier(requested_tier or "auto", served_tier),
+        )
+
+    usage = extract_usage(response)
+    if usage is not None and usage.cacheable:
+        get_timings().note(
+            "cached input",
+            f"{usage.cached_tokens}/{usage.input_tokens} tokens ({usage.cache_hit_rate:.0%})",
+        )
+
+    record_request(
+        served_model,
+        kind=request_kind(prompt),
+        latency=response_time,
+        first_token=first_chunk_timer.first_chunk_seconds if first_chunk_timer else None,
+        usage=usage,
+        service_tier=served_tier,
+        cost=_request_cost(usage, served_model),
+    )
+
     return (
         generated_text,
         response_time,
@@ -78,25 +335,143 @@ def chatgpt_request(
     )
 
 
-def num_tokens_from_messages(messages, model="gpt-5.4-mini"):
-    """Returns the number of tokens used by a list of messages."""
+def _model_with_closed_circuit(model, fallback_model):
+    if allow_request(model):
+        return model
+
+    state = load_breaker_states().get(model, BreakerState())
+    if fallback_model is not None and fallback_model != model and allow_request(fallback_model):
+        get_timings().note("circuit breaker", f"{model} {state.describe()}; used {fallback_model}")
+        return fallback_model
+
+    raise CircuitOpenError(
+        f"{model} is failing: circuit {state.describe()}. Try again later, pick another "
+        "model with --model, or set `fallback_model` in the config."
+    )
+
+
+def _request_cost(usage, model):
+    """Returns the USD cost of a request at list prices, or ``None`` if unknown."""
+    if usage is None:
+        return None
+    prompt_cost = input_cost(usage.input_tokens, model)
+    completion_cost = output_cost(usage.output_tokens, model)
+    if prompt_cost is None or completion_cost is None:
+        return None
+    return prompt_cost + completion_cost
+
+
+def _format_service_tier(requested, served):
+    if served is None or served == requested:
+        return requested
+    return f"{requested} (served by {served})"
+
+
+class _FirstChunkTimer:
+    """Chunk callback wrapper that records when the first chunk arrives."""
+
+    def __init__(self, chunk_callback, start_time):
+        self._chunk_callback = chunk_callback
+        self._start_time = start_time
+        self.first_chunk_seconds = None
+
+    def __call__(self, chunk):
+        if self.first_chunk_seconds is None:
+            self.first_chunk_seconds = (time.monotonic_ns() - self._start_time) / 1e9
+            get_timings().record("request.first_token", self.first_chunk_seconds)
+        self._chunk_callback(chunk)
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding_for_model(model):
     try:
-        encoding = tiktoken.encoding_for_model(model)
+        return tiktoken.encoding_for_model(model)
     except KeyError:
-        encoding = tiktoken.get_encoding("cl100k_base")
+        return tiktoken.get_encoding("cl100k_base")
+
 
-    tokens_per_message = 3
-    tokens_per_name = 1
+_TOKENS_PER_MESSAGE = 3
+_TOKENS_PER_NAME = 1
+_REPLY_PRIMER_TOKENS = 3  # every reply is primed with <|start|>assistant<|message|>
 
+
+def _count_message_tokens(messages, encoding):
     num_tokens = 0
     for message in messages:
-        num_tokens += tokens_per_message
+        num_tokens += _TOKENS_PER_MESSAGE
         for key, value in message.items():
             num_tokens += len(encoding.encode(value))
             if key == "name":
-                num_tokens += tokens_per_name
-    num_tokens += 3  # every reply is primed with <|start|>assistant<|message|>
-    return num_tokens
+                num_tokens += _TOKENS_PER_NAME
+    return num_tokens + _REPLY_PRIMER_TOKENS
+
+
+def _estimate_prompt_tokens(messages):
+    """Roughly count the tokens of ``messages`` from their length.
+
+    Used to pace requests, which must work even when the tokenizer cannot
+    be loaded.
+    """
+    return _REPLY_PRIMER_TOKENS + sum(
+        _TOKENS_PER_MESSAGE + estimate_task_tokens(message["content"]) for message in messages
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class PromptTokenTemplate:
+    """Token count of the fixed part of a ``format_prompt`` prompt.
+
+    ``fixed_tokens`` covers every message except the task text; the task is
+    encoded at runtime wrapped in ``task_prefix`` and ``task_suffix``, the
+    template text around it that shares its BPE chunks.
+    """
+
+    fixed_tokens: int
+    task_prefix: str
+    task_suffix: str
+
+    def task_text(self, command_description):
+        return self.task_prefix + command_description + self.task_suffix
+
+
+def prompt_token_template(os_name, encoding, *, explain=True):
+    return _prompt_token_template(PROMPT_TEMPLATE_VERSION, os_name, encoding.name, explain)
+
+
+@functools.lru_cache(maxsize=64)
+def _prompt_token_template(template_version, os_name, encoding_name, explain):
+    encoding = tiktoken.get_encoding(encoding_name)
+    messages = format_prompt("", os_name, explain=explain)
+    system_message, user_message = messages
+
+    # The user message is only the task wrapped in a short prefix and suffix,
+    # which are encoded with it at runtime since they share its BPE chunks.
+    fixed_tokens = (
+        _count_message_tokens([system_message], encoding)
+        + _TOKENS_PER_MESSAGE
+        + len(encoding.encode(user_message["role"]))
+    )
+    return PromptTokenTemplate(
+        fixed_tokens=fixed_tokens,
+        task_prefix=_USER_PROMPT_PREFIX,
+        task_suffix=_USER_PROMPT_SUFFIX,
+    )
+
+
+def num_tokens_from_messages(messages, model="gpt-5.4-mini"):
+    """Returns the number of tokens used by a list of messages.
+
+    Prompts from ``format_prompt`` reuse the cached template count and only
+    encode the task text.
+    """
+    encoding = _encoding_for_model(model)
+
+    if isinstance(messages, FormattedPrompt) and messages.is_unmodified():
+        template = prompt_token_template(messages.os_name, encoding, explain=messages.explain)
+        task_text = template.task_text(messages.command_description)
+        return template.fixed_tokens + len(encoding.encode(task_text))
+
+    return _count_message_tokens(messages, encoding)
 
 
 # Prices in USD per 1M input tokens (only models exposed via VALID_MODELS).
@@ -115,10 +490,90 @@ _INPUT_PRICES_PER_1M: dict[str, float] = {
 }
 
 
+# Prices in USD per 1M output tokens; reasoning tokens are billed as output.
+_OUTPUT_PRICES_PER_1M: dict[str, float] = {
+    "gpt-4.1": 8,
+    "gpt-4.1-mini": 1.60,
+    "gpt-4.1-nano": 0.40,
+    "gpt-4o": 10,
+    "gpt-4o-mini": 0.60,
+    "gpt-5": 10,
+    "gpt-5-mini": 2,
+    "gpt-5-nano": 0.40,
+    "gpt-5.4": 15,
+    "gpt-5.4-mini": 4.50,
+    "gpt-5.4-nano": 1.25,
+}
+
+
 def estimate_prompt_cost(messages, model="gpt-5.4-mini"):
     """Returns the estimated prompt cost as a string, or ``None`` if the price is unknown."""
-    num_tokens = num_tokens_from_messages(messages, model)
+    if model not in _INPUT_PRICES_PER_1M:
+        return None
+    return format_cost(input_cost(num_tokens_from_messages(messages, model), model))
+
+
+def input_cost(num_tokens, model):
+    """Returns the input cost in USD for ``num_tokens``, or ``None`` if the price is unknown."""
     price = _INPUT_PRICES_PER_1M.get(model)
     if price is None:
         return None
-    return f"{num_tokens / 10**6 * price:.6f}"
+    return num_tokens / 10**6 * price
+
+
+def output_cost(num_tokens, model):
+    """Returns the output cost in USD for ``num_tokens``, or ``None`` if the price is unknown."""
+    price = _OUTPUT_PRICES_PER_1M.get(model)
+    if price is None:
+        return None
+    return num_tokens / 10**6 * price
+
+
+def format_cost(cost):
+    return f"{cost:.6f}"
+
+
+def priced_models():
+    return tuple(_INPUT_PRICES_PER_1M)
+
+
+def iter_prompt_token_counts(
+    command_descriptions,
+    os_name,
+    model="gpt-5.4-mini",
+    *,
+    batch_size=1000,
+    num_threads=8,
+    explain=True,
+):
+    """Yield the prompt token count of each task, encoding tasks in batches.
+
+    Counts match ``num_tokens_from_messages(format_prompt(...))``. Only one
+    batch of encoded tasks is held at a time, so memory stays flat for
+    arbitrarily long inputs.
+    """
+    encoding = _encoding_for_model(model)
+    template = prompt_token_template(os_name, encoding, explain=explain)
+
+    for batch in _batched(command_descriptions, batch_size):
+        encoded_tasks = encoding.encode_batch(
+            [template.task_text(command_description) for command_description in batch],
+            num_threads=num_threads,
+        )
+        for tokens in encoded_tasks:
+            yield template.fixed_tokens + len(tokens)
+
+
+def encoding_name_for_model(model):
+    return _encoding_for_model(model).name
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
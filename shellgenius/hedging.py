@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from .model_stats import first_token_quantile, load_model_stats, record_hedge
+from .openai_backend import ChunkCallback, PromptMessage
+
+# First-token quantile used as the threshold when none is configured.
+HEDGE_QUANTILE = 0.9
+
+# Threshold in seconds until a model has enough first-token history.
+DEFAULT_HEDGE_AFTER = 2.0
+
+# Largest rolling share of requests allowed to fire a second request.
+DEFAULT_MAX_HEDGE_RATE = 0.1
+
+__all__ = [
+    "DEFAULT_HEDGE_AFTER",
+    "DEFAULT_MAX_HEDGE_RATE",
+    "HedgeOutcome",
+    "HedgePolicy",
+    "HedgedBackend",
+]
+
+
+@dataclass(frozen=True, slots=True)
+class HedgePolicy:
+    """When to race a second request against a slow first one.
+
+    ``after`` is the first-token wait in seconds before hedging; ``None``
+    uses the model's observed p90. ``model`` is the model for the second
+    request; ``None`` repeats the first model.
+    """
+
+    after: float | None = None
+    model: str | None = None
+    max_rate: float = DEFAULT_MAX_HEDGE_RATE
+
+    def threshold(self, model: str) -> float:
+        if self.after is not None:
+            return self.after
+        learned = first_token_quantile(model, HEDGE_QUANTILE)
+        return DEFAULT_HEDGE_AFTER if learned is None else learned
+
+    def allows_hedge(self, model: str) -> bool:
+        rate = (load_model_stats().get(model) or {}).get("hedge_rate") or {}
+        return rate.get("mean", 0.0) < self.max_rate
+
+
+@dataclass(frozen=True, slots=True)
+class HedgeOutcome:
+    """What happened to one hedged request; ``model`` is the model that served it."""
+
+    model: str
+    threshold: float
+    fired: bool = False
+    skipped: bool = False
+    winner: str = "primary"
+
+    def describe(self) -> str:
+        if self.skipped:
+            return f"skipped after {self.threshold:.2f}s (rate cap reached)"
+        if not self.fired:
+            return f"not needed (threshold {self.threshold:.2f}s)"
+        return f"fired after {self.threshold:.2f}s, {self.winner} won ({self.model})"
+
+
+class _Cancelled(Exception):
+    """Raised inside a losing attempt's chunk callback to stop its stream."""
+
+
+class _Attempt:
+    def __init__(self, name: str, model: str, events: queue.Queue, options: dict[str, Any]) -> None:
+        self.name = name
+        self.model = model
+        self.cancelled = threading.Event()
+        self._events = events
+        self._options = options
+
+    def start(self, backend, request: dict[str, Any]) -> None:
+        threading.Thread(
+            target=self._run,
+            args=(backend, {**request, **self._options}),
+            name=f"shellgenius-hedge-{self.name}",
+            daemon=True,
+        ).start()
+
+    def _run(self, backend, request: dict[str, Any]) -> None:
+        try:
+            result = backend.create_text_response(
+                **request,
+                model=self.model,
+                stream=True,
+                chunk_callback=self._on_chunk,
+            )
+        except _Cancelled:
+            return
+        except Exception as error:
+            self._events.put(("error", self, error))
+            return
+        self._events.put(("done", self, result))
+
+    def _on_chunk(self, delta: str) -> None:
+        if self.cancelled.is_set():
+            raise _Cancelled
+        self._events.put(("chunk", self, delta))
+
+
+class HedgedBackend:
+    """Backend wrapper that hedges slow streaming requests.
+
+    The first request streams on a worker thread. If no text arrives within
+    the policy threshold, a second request starts, the first one to stream
+    wins, and the loser's stream is abandoned at its next chunk. Chunks are
+    forwarded on the calling thread. Requests the Responses API cannot serve
+    (``n`` or ``stop``) are passed through unhedged.
+
+    ``options_for(model)`` returns request options for the hedge model when
+    it differs from the first, since models accept different settings.
+    """
+
+    def __init__(
+        self,
+        backend,
+        policy: HedgePolicy,
+        *,
+        options_for: Callable[[str], dict[str, Any]] | None = None,
+    ) -> None:
+        self._backend = backend
+        self.policy = policy
+        self._options_for = options_for
+        self.last_outcome: HedgeOutcome | None = None
+
+    def _attempt(self, name: str, model: str, events: queue.Queue) -> _Attempt:
+        options = self._options_for(model) if self._options_for is not None else {}
+        return _Attempt(name, model, events, options)
+
+    def create_text_response(
+        self,
+        *,
+        prompt: list[PromptMessage],
+        model: str,
+        n: int,
+        temperature: float | None,
+        stop: Any,
+        stream: bool,
+        chunk_callback: ChunkCallback | None,
+        **options: Any,
+    ) -> tuple[str, Any]:
+        if n != 1 or stop is not None:
+            self.last_outcome = None
+            return self._backend.create_text_response(
+                prompt=prompt,
+                model=model,
+                n=n,
+                temperature=temperature,
+                stop=stop,
+                stream=stream,
+                chunk_callback=chunk_callback,
+                **options,
+            )
+
+        request = {"prompt": prompt, "n": n, "temperature": temperature, "stop": stop, **options}
+        forward = chunk_callback if stream else None
+        threshold = self.policy.threshold(model)
+        events: queue.Queue = queue.Queue()
+
+        primary = _Attempt("primary", model, events, {})
+        primary.start(self._backend, request)
+        attempts = [primary]
+        outcome = HedgeOutcome(model=model, threshold=threshold)
+
+        winner: _Attempt | None = None
+        deadline = time.monotonic() + threshold
+        while True:
+            timeout = None
+            if len(attempts) == 1 and winner is None and not (outcome.fired or outcome.skipped):
+                timeout = max(deadline - time.monotonic(), 0.0)
+            try:
+                kind, attempt, payload = events.get(timeout=timeout)
+            except queue.Empty:
+                if not self.policy.allows_hedge(model):
+                    outcome = HedgeOutcome(model=model, threshold=threshold, skipped=True)
+                    continue
+                hedge = self._attempt("hedge", self.policy.model or model, events)
+                hedge.start(self._backend, request)
+                attempts.append(hedge)
+                outcome = HedgeOutcome(model=model, threshold=threshold, fired=True)
+                continue
+
+            if attempt.cancelled.is_set():
+                continue
+
+            if kind == "error":
+                attempts.remove(attempt)
+                if attempt is winner or not attempts:
+                    self._finish(model, outcome)
+                    raise payload
+                continue
+
+            if winner is None:
+                winner = attempt
+                for other in attempts:
+                    if other is not winner:
+                        other.cancelled.set()
+                outcome = HedgeOutcome(
+                    model=winner.model,
+                    threshold=threshold,
+                    fired=outcome.fired,
+                    skipped=outcome.skipped,
+                    winner=winner.name,
+                )
+
+            if kind == "chunk":
+                if forward is not None:
+                    forward(payload)
+                continue
+
+            self._finish(model, outcome)
+            return payload
+
+    def _finish(self, model: str, outcome: HedgeOutcome) -> None:
+        self.last_outcome = outcome
+        record_hedge(model, fired=outcome.fired, winner=outcome.winner if outcome.fired else None)
@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from collections.abc import Iterator
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from .response_parser import ParsedShellResponse
+from .storage import get_cache_dir
+
+HISTORY_FILE = "history.sqlite3"
+HISTORY_SCHEMA_VERSION = 1
+
+# Entries kept by default; the oldest are deleted beyond this.
+DEFAULT_MAX_ENTRIES = 100_000
+
+# Retention limits are enforced on every this-many inserts, not on each one.
+PRUNE_INTERVAL = 100
+
+# Seconds to wait for another process holding the database lock.
+BUSY_TIMEOUT = 2.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    task TEXT NOT NULL,
+    model TEXT NOT NULL,
+    os_name TEXT NOT NULL,
+    command TEXT NOT NULL,
+    explanation TEXT NOT NULL DEFAULT '',
+    fence_language TEXT,
+    executed_at REAL,
+    exit_status INTEGER
+);
+CREATE INDEX IF NOT EXISTS generations_created ON generations (created);
+"""
+
+# External-content FTS5 index over the searchable columns, kept in sync by
+# triggers so the text is stored only once.
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS generations_fts USING fts5(
+    task, command, explanation, content='generations', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS generations_ai AFTER INSERT ON generations BEGIN
+    INSERT INTO generations_fts (rowid, task, command, explanation)
+    VALUES (new.id, new.task, new.command, new.explanation);
+END;
+CREATE TRIGGER IF NOT EXISTS generations_ad AFTER DELETE ON generations BEGIN
+    INSERT INTO generations_fts (generations_fts, rowid, task, command, explanation)
+    VALUES ('delete', old.id, old.task, old.command, old.explanation);
+END;
+"""
+
+__all__ = [
+    "DEFAULT_MAX_ENTRIES",
+    "HistoryEntry",
+    "HistoryError",
+    "connect_history",
+    "find_generation",
+    "get_history_path",
+    "prune_history",
+    "record_execution",
+    "record_generation",
+    "search_history",
+]
+
+
+class HistoryError(Exception):
+    """The history database could not be read or changed."""
+
+
+@dataclass(frozen=True, slots=True)
+class HistoryEntry:
+    id: int
+    created: float
+    task: str
+    model: str
+    os_name: str
+    command: str
+    explanation: str
+    fence_language: str | None
+    executed_at: float | None
+    exit_status: int | None
+
+    @property
+    def executed(self) -> bool:
+        return self.executed_at is not None
+
+
+def get_history_path() -> Path:
+    return get_cache_dir() / HISTORY_FILE
+
+
+def _has_fts(connection: sqlite3.Connection) -> bool:
+    row = connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'generations_fts'"
+    ).fetchone()
+    return row is not None
+
+
+def _create_schema(connection: sqlite3.Connection) -> None:
+    # auto_vacuum only takes effect before the first table is created.
+    connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    connection.executescript(_SCHEMA)
+    try:
+        connection.executescript(_FTS_SCHEMA)
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5: searches fall back to LIKE scans.
+        pass
+    connection.execute(f"PRAGMA user_version = {HISTORY_SCHEMA_VERSION}")
+
+
+@contextmanager
+def connect_history(path: Path | None = None) -> Iterator[sqlite3.Connection]:
+    """Open the history database, creating it on first use.
+
+    Commits on success and rolls back on error. WAL mode lets concurrent
+    ShellGenius processes read while one writes.
+    """
+    path = get_history_path() if path is None else path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with closing(sqlite3.connect(path, timeout=BUSY_TIMEOUT)) as connection:
+        connection.row_factory = sqlite3.Row
+        if connection.execute("PRAGMA user_version").fetchone()[0] == 0:
+            _create_schema(connection)
+        connection.execute("PRAGMA journal_mode = WAL")
+        with connection:
+            yield connection
+
+
+def record_generation(
+    command_description: str,
+    parsed_response: ParsedShellResponse,
+    *,
+    model: str,
+    os_name: str,
+    max_entries: int | None = DEFAULT_MAX_ENTRIES,
+    max_age_days: float | None = None,
+) -> int | None:
+    """Store one generated command and return its id.
+
+    Retention limits are applied every ``PRUNE_INTERVAL`` inserts. Returns
+    ``None`` if the database cannot be written: history must never break a
+    request.
+    """
+    try:
+        with connect_history() as connection:
+            entry_id = connection.execute(
+                "INSERT INTO generations"
+                " (created, task, model, os_name, command, explanation, fence_language)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    time.time(),
+                    " ".join(command_description.split()),
+                    model,
+                    os_name,
+                    parsed_response.command,
+                    parsed_response.explanation,
+                    parsed_response.fence_language,
+                ),
+            ).lastrowid
+            if entry_id % PRUNE_INTERVAL == 0:
+                _prune(connection, max_entries=max_entries, max_age_days=max_age_days)
+        return entry_id
+    except (sqlite3.Error, OSError):
+        return None
+
+
+def record_execution(entry_id: int, exit_status: int) -> None:
+    """Mark a stored command as executed with its exit status."""
+    try:
+        with connect_history() as connection:
+            connection.execute(
+                "UPDATE generations SET executed_at = ?, exit_status = ? WHERE id = ?",
+                (time.time(), exit_status, entry_id),
+            )
+    except (sqlite3.Error, OSError):
+        pass
+
+
+def _like_pattern(term: str) -> str:
+    # Escape LIKE wildcards so `%` and `_` in user input are taken literally.
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _fts_query(terms: str) -> str:
+    # Quote every term so FTS5 operators in user input are taken literally,
+    # and match prefixes so `comp` finds `compress`.
+    return " ".join('"' + term.replace('"', '""') + '"*' for term in terms.split())
+
+
+def search_history(terms: str, *, limit: int = 20) -> list[HistoryEntry]:
+    """Return stored commands matching every term, newest first.
+
+    Ordering by rowid lets FTS5 stop after ``limit`` matches instead of
+    ranking every match, which keeps common terms fast on large histories.
+    Raises ``HistoryError`` if the database cannot be read.
+    """
+    if not terms.split():
+        return []
+
+    try:
+        with connect_history() as connection:
+            if _has_fts(connection):
+                rows = connection.execute(
+                    "SELECT generations.* FROM generations"
+                    " WHERE id IN ("
+                    "  SELECT rowid FROM generations_fts WHERE generations_fts MATCH ?"
+                    "  ORDER BY rowid DESC LIMIT ?"
+                    " ) ORDER BY id DESC",
+                    (_fts_query(terms), limit),
+                ).fetchall()
+            else:
+                conditions = " AND ".join(
+                    "(task || ' ' || command || ' ' || explanation) LIKE ? ESCAPE '\\'"
+                    for _ in terms.split()
+                )
+                rows = connection.execute(
+                    f"SELECT * FROM generations WHERE {conditions} ORDER BY id DESC LIMIT ?",
+                    (*(_like_pattern(term) for term in terms.split()), limit),
+                ).fetchall()
+    except (sqlite3.Error, OSError) as error:
+        raise HistoryError(f"Cannot read the history in {get_history_path()}: {error}") from error
+    return [HistoryEntry(**dict(row)) for row in rows]
+
+
+def find_generation(command_description: str, os_name: str) -> HistoryEntry | None:
+    """Return the stored command for exactly this task and OS, if any.
+
+    Case and whitespace are ignored. Commands that ran successfully are
+    preferred over newer ones that failed or were never run.
+    """
+    if not get_history_path().exists():
+        return None
+
+    task = " ".join(command_description.split()).lower()
+    try:
+        with connect_history() as connection:
+            row = connection.execute(
+                "SELECT * FROM generations WHERE lower(task) = ? AND lower(os_name) = ?"
+                " ORDER BY exit_status IS 0 DESC, id DESC LIMIT 1",
+                (task, os_name.lower()),
+            ).fetchone()
+    except (sqlite3.Error, OSError):
+        return None
+    return HistoryEntry(**dict(row)) if row is not None else None
+
+
+def _prune(
+    connection: sqlite3.Connection, *, max_entries: int | None, max_age_days: float | None
+) -> int:
+    deleted = 0
+    if max_age_days is not None:
+        cutoff = time.time() - max_age_days * 86400
+        deleted += connection.execute(
+            "DELETE FROM generations WHERE created < ?", (cutoff,)
+        ).rowcount
+    if max_entries is not None:
+        deleted += connection.execute(
+            "DELETE FROM generations WHERE id <= ("
+            " SELECT id FROM generations ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (max_entries,),
+        ).rowcount
+    if deleted:
+        connection.execute("PRAGMA incremental_vacuum")
+    return deleted
+
+
+def prune_history(
+    *,
+    max_entries: int | None = DEFAULT_MAX_ENTRIES,
+    max_age_days: float | None = None,
+    vacuum: bool = False,
+) -> int:
+    """Delete entries beyond the retention limits; return how many were deleted.
+
+    ``vacuum`` also rebuilds the database file to reclaim all free space,
+    which rewrites the whole file and is not done automatically. Raises
+    ``HistoryError`` if the database cannot be changed.
+    """
+    try:
+        with connect_history() as connection:
+            deleted = _prune(connection, max_entries=max_entries, max_age_days=max_age_days)
+            if vacuum and _has_fts(connection):
+                connection.execute(
+                    "INSERT INTO generations_fts (generations_fts) VALUES ('optimize')"
+                )
+
+        if vacuum:
+            with closing(sqlite3.connect(get_history_path(), timeout=BUSY_TIMEOUT)) as connection:
+                connection.execute("VACUUM")
+    except (sqlite3.Error, OSError) as error:
+        raise HistoryError(f"Cannot prune the history in {get_history_path()}: {error}") from error
+    return deleted
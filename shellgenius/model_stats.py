@@ -0,0 +1,396 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .openai_backend import ResponseUsage
+from .storage import get_cache_dir, read_json, update_json
+
+MODEL_STATS_FILE = "model_stats.json"
+MODEL_STATS_VERSION = 1
+
+# Weight of a new sample once a metric has enough history. Early samples use
+# a plain running mean, so the first few requests count fully.
+ROLLING_WEIGHT = 0.1
+
+# Upper bounds in seconds of the fixed latency histogram buckets, growing
+# geometrically from 50 ms to about 110 s; a last bucket catches the rest.
+HISTOGRAM_BOUNDS = tuple(round(0.05 * 1.5**index, 3) for index in range(20))
+
+# Samples needed before a histogram quantile is trusted over defaults.
+MIN_QUANTILE_SAMPLES = 20
+
+# Kinds of request, whose answers differ widely in length: a command with its
+# explanation, a bare command, and anything else, such as a follow-up.
+EXPLAIN = "explain"
+COMMAND = "command"
+FOLLOW_UP = "follow-up"
+REQUEST_KINDS = (EXPLAIN, COMMAND, FOLLOW_UP)
+
+__all__ = [
+    "COMMAND",
+    "EXPLAIN",
+    "FOLLOW_UP",
+    "REQUEST_KINDS",
+    "ModelSummary",
+    "UsageDefaults",
+    "UsageEstimate",
+    "estimate_usage",
+    "first_token_quantile",
+    "get_model_stats_path",
+    "histogram_quantile",
+    "latency_quantile",
+    "load_model_stats",
+    "parse_success_rate",
+    "record_hedge",
+    "record_parse_result",
+    "record_request",
+    "summarize_models",
+]
+
+
+@dataclass(frozen=True, slots=True)
+class UsageDefaults:
+    """Rough per-model expectations used until local history exists."""
+
+    output_tokens: int
+    reasoning_tokens: int
+    first_token_seconds: float
+    tokens_per_second: float
+
+
+_DEFAULT_OUTPUT_TOKENS = 110
+
+# A bare command in a code block, without the explanation.
+_DEFAULT_COMMAND_OUTPUT_TOKENS = 30
+
+# Reasoning defaults assume the lowest effort ShellGenius requests by default
+# (``minimal`` on GPT-5, ``none`` on GPT-5.4); see ``models.MODEL_CAPABILITIES``.
+_USAGE_DEFAULTS: dict[str, UsageDefaults] = {
+    "gpt-4.1": UsageDefaults(_DEFAULT_OUTPUT_TOKENS, 0, 0.6, 80),
+    "gpt-4.1-mini": UsageDefaults(_DEFAULT_OUTPUT_TOKENS, 0, 0.5, 100),
+    "gpt-4.1-nano": UsageDefaults(_DEFAULT_OUTPUT_TOKENS, 0, 0.4, 150),
+    "gpt-4o": UsageDefaults(_DEFAULT_OUTPUT_TOKENS, 0, 0.6, 90),
+    "gpt-4o-mini": UsageDefaults(_DEFAULT_OUTPUT_TOKENS, 0, 0.5, 100),
+    "gpt-5": UsageDefaults(_DEFAULT_OUTPUT_TOKENS, 40, 0.8, 60),
+    "gpt-5-mini": UsageDefaults(_DEFAULT_OUTPUT_TOKENS, 30, 0.6, 90),
+    "gpt-5-nano": UsageDefaults(_DEFAULT_OUTPUT_TOKENS, 30, 0.5, 140),
+    "gpt-5.4": UsageDefaults(_DEFAULT_OUTPUT_TOKENS, 0, 0.8, 70),
+    "gpt-5.4-mini": UsageDefaults(_DEFAULT_OUTPUT_TOKENS, 0, 0.6, 110),
+    "gpt-5.4-nano": UsageDefaults(_DEFAULT_OUTPUT_TOKENS, 0, 0.5, 160),
+}
+
+_FALLBACK_DEFAULTS = UsageDefaults(_DEFAULT_OUTPUT_TOKENS, 0, 1.0, 80)
+
+
+@dataclass(frozen=True, slots=True)
+class UsageEstimate:
+    output_tokens: int
+    reasoning_tokens: int
+    latency_seconds: float
+    samples: int
+    cache_hit_rate: float | None = None
+    latency_samples: int = 0
+
+    @property
+    def is_default(self) -> bool:
+        return self.samples == 0
+
+
+def get_model_stats_path() -> Path:
+    return get_cache_dir() / MODEL_STATS_FILE
+
+
+def _empty_stats() -> dict[str, Any]:
+    return {"version": MODEL_STATS_VERSION, "models": {}}
+
+
+def _valid_stats(data: Any) -> dict[str, Any]:
+    if (
+        not isinstance(data, dict)
+        or data.get("version") != MODEL_STATS_VERSION
+        or not isinstance(data.get("models"), dict)
+    ):
+        return _empty_stats()
+    return data
+
+
+def load_model_stats() -> dict[str, dict[str, Any]]:
+    """Return the recorded per-model statistics, keyed by model name."""
+    return _valid_stats(read_json(get_model_stats_path()))["models"]
+
+
+def _add_sample(entry: dict[str, Any], metric: str, value: float) -> None:
+    summary = entry.get(metric)
+    if not isinstance(summary, dict):
+        summary = {"n": 0, "mean": 0.0}
+    count = summary["n"] + 1
+    weight = max(1 / count, ROLLING_WEIGHT)
+    summary["mean"] += (value - summary["mean"]) * weight
+    summary["n"] = count
+    entry[metric] = summary
+
+
+def _add_histogram_sample(entry: dict[str, Any], metric: str, value: float) -> None:
+    counts = entry.get(metric)
+    if not isinstance(counts, list) or len(counts) != len(HISTOGRAM_BOUNDS) + 1:
+        counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+    index = next(
+        (index for index, bound in enumerate(HISTOGRAM_BOUNDS) if value <= bound),
+        len(HISTOGRAM_BOUNDS),
+    )
+    counts[index] += 1
+    entry[metric] = counts
+
+
+def histogram_quantile(counts: list[int], quantile: float) -> float | None:
+    """Upper bound of the bucket holding ``quantile`` of the samples.
+
+    Overestimates by at most one bucket width, which errs on the side of
+    waiting slightly longer. Returns ``None`` for an empty histogram.
+    """
+    total = sum(counts)
+    if not total:
+        return None
+    rank = quantile * total
+    seen = 0
+    for index, count in enumerate(counts):
+        seen += count
+        if seen >= rank and count:
+            return HISTOGRAM_BOUNDS[min(index, len(HISTOGRAM_BOUNDS) - 1)]
+    return HISTOGRAM_BOUNDS[-1]
+
+
+def _kind_entry(entry: dict[str, Any], kind: str) -> dict[str, Any]:
+    kinds = entry.get("kinds")
+    if not isinstance(kinds, dict):
+        kinds = entry["kinds"] = {}
+    if not isinstance(kinds.get(kind), dict):
+        kinds[kind] = {}
+    return kinds[kind]
+
+
+def _recorded_kind(entry: dict[str, Any] | None, kind: str) -> dict[str, Any] | None:
+    kinds = (entry or {}).get("kinds")
+    kind_entry = kinds.get(kind) if isinstance(kinds, dict) else None
+    return kind_entry if isinstance(kind_entry, dict) else None
+
+
+def record_request(
+    model: str,
+    *,
+    kind: str = EXPLAIN,
+    latency: float,
+    first_token: float | None = None,
+    usage: ResponseUsage | None = None,
+    service_tier: str | None = None,
+    cost: float | None = None,
+) -> None:
+    """Fold one completed request into the local statistics.
+
+    Every metric is a rolling mean or a fixed-size histogram, so the file
+    stays the same size however many requests are recorded. Output size and
+    latency are also kept per request ``kind``, under ``kinds``, since an
+    explained command takes several times as long as a bare one. Failures
+    to write are ignored: statistics must never break a request.
+    """
+
+    def update(data: Any) -> dict[str, Any]:
+        data = _valid_stats(data)
+        entry = data["models"].setdefault(model, {})
+        kind_entry = _kind_entry(entry, kind)
+        entry["requests"] = entry.get("requests", 0) + 1
+        for target in (entry, kind_entry):
+            _add_sample(target, "latency", latency)
+            _add_histogram_sample(target, "latency_histogram", latency)
+        if first_token is not None:
+            _add_sample(entry, "first_token", first_token)
+            _add_histogram_sample(entry, "first_token_histogram", first_token)
+        if usage is not None:
+            _add_sample(kind_entry, "output_tokens", usage.visible_output_tokens)
+            _add_sample(kind_entry, "reasoning_tokens", usage.reasoning_tokens)
+            if usage.cacheable:
+                _add_sample(entry, "cache_hit_rate", usage.cache_hit_rate)
+            if latency > 0:
+                _add_sample(entry, "tokens_per_second", usage.output_tokens / latency)
+        if cost is not None:
+            _add_sample(entry, "cost", cost)
+        if service_tier is not None:
+            tiers = entry.get("service_tiers")
+            if not isinstance(tiers, dict):
+                tiers = entry["service_tiers"] = {}
+            tiers[service_tier] = tiers.get(service_tier, 0) + 1
+        return data
+
+    try:
+        update_json(get_model_stats_path(), update)
+    except OSError:
+        pass
+
+
+def record_hedge(model: str, *, fired: bool, winner: str | None = None) -> None:
+    """Record whether a hedged request fired its second request, and who won.
+
+    ``hedge_rate`` is a rolling share of requests that fired, used to cap
+    extra spend. ``winner`` is ``"primary"`` or ``"hedge"``.
+    """
+
+    def update(data: Any) -> dict[str, Any]:
+        data = _valid_stats(data)
+        entry = data["models"].setdefault(model, {})
+        _add_sample(entry, "hedge_rate", 1.0 if fired else 0.0)
+        if winner is not None:
+            wins = entry.get("hedge_wins")
+            if not isinstance(wins, dict):
+                wins = entry["hedge_wins"] = {}
+            wins[winner] = wins.get(winner, 0) + 1
+        return data
+
+    try:
+        update_json(get_model_stats_path(), update)
+    except OSError:
+        pass
+
+
+def record_parse_result(model: str, *, ok: bool) -> None:
+    """Fold whether an answer of ``model`` followed the response contract.
+
+    Kept as the rolling ``parse_success`` rate used by ``--model auto``.
+    """
+
+    def update(data: Any) -> dict[str, Any]:
+        data = _valid_stats(data)
+        _add_sample(data["models"].setdefault(model, {}), "parse_success", 1.0 if ok else 0.0)
+        return data
+
+    try:
+        update_json(get_model_stats_path(), update)
+    except OSError:
+        pass
+
+
+def _observed_quantile(
+    model: str, metric: str, quantile: float, kind: str | None = None
+) -> float | None:
+    entry = load_model_stats().get(model) or {}
+    if kind is not None:
+        entry = _recorded_kind(entry, kind) or {}
+    counts = entry.get(metric)
+    if not isinstance(counts, list) or sum(counts) < MIN_QUANTILE_SAMPLES:
+        return None
+    return histogram_quantile(counts, quantile)
+
+
+def first_token_quantile(model: str, quantile: float) -> float | None:
+    """Observed first-token latency quantile, or ``None`` without enough history."""
+    return _observed_quantile(model, "first_token_histogram", quantile)
+
+
+def latency_quantile(model: str, quantile: float, kind: str | None = None) -> float | None:
+    """Observed total latency quantile, or ``None`` without enough history.
+
+    With ``kind``, only requests of that kind count.
+    """
+    return _observed_quantile(model, "latency_histogram", quantile, kind)
+
+
+def parse_success_rate(model: str) -> tuple[float, int]:
+    """Rolling share of parseable answers and the number of samples behind it.
+
+    Models without history count as always parseable, with zero samples.
+    """
+    summary = (load_model_stats().get(model) or {}).get("parse_success")
+    if not isinstance(summary, dict) or not summary.get("n"):
+        return 1.0, 0
+    return summary["mean"], summary["n"]
+
+
+@dataclass(frozen=True, slots=True)
+class ModelSummary:
+    """Recorded performance of one model, as shown by ``models --stats``.
+
+    Quantiles are bucket upper bounds from the fixed histograms; any field
+    is ``None`` when nothing was recorded for it.
+    """
+
+    requests: int
+    first_token_p50: float | None
+    first_token_p95: float | None
+    latency_p50: float | None
+    latency_p95: float | None
+    tokens_per_second: float | None
+    parse_success: float | None
+    average_cost: float | None
+
+
+def _quantile(entry: dict[str, Any], metric: str, quantile: float) -> float | None:
+    counts = entry.get(metric)
+    if not isinstance(counts, list):
+        return None
+    return histogram_quantile(counts, quantile)
+
+
+def summarize_models() -> dict[str, ModelSummary]:
+    """Summaries of every model with recorded requests, keyed by model name."""
+    summaries = {}
+    for model, entry in load_model_stats().items():
+        if not entry.get("requests"):
+            continue
+        summaries[model] = ModelSummary(
+            requests=entry["requests"],
+            first_token_p50=_quantile(entry, "first_token_histogram", 0.5),
+            first_token_p95=_quantile(entry, "first_token_histogram", 0.95),
+            latency_p50=_quantile(entry, "latency_histogram", 0.5),
+            latency_p95=_quantile(entry, "latency_histogram", 0.95),
+            tokens_per_second=_mean(entry, "tokens_per_second"),
+            parse_success=_mean(entry, "parse_success"),
+            average_cost=_mean(entry, "cost"),
+        )
+    return summaries
+
+
+def _mean(entry: dict[str, Any] | None, metric: str) -> float | None:
+    if not entry:
+        return None
+    summary = entry.get(metric)
+    if not isinstance(summary, dict) or not summary.get("n"):
+        return None
+    return summary["mean"]
+
+
+def estimate_usage(model: str, kind: str = EXPLAIN) -> UsageEstimate:
+    """Expected output tokens, reasoning tokens, and latency for one request.
+
+    Uses the history recorded for requests of ``kind`` when available, per
+    metric, and the rough defaults above otherwise.
+    """
+    model_entry = load_model_stats().get(model)
+    entry = _recorded_kind(model_entry, kind)
+    defaults = _USAGE_DEFAULTS.get(model, _FALLBACK_DEFAULTS)
+
+    output_tokens = _mean(entry, "output_tokens")
+    reasoning_tokens = _mean(entry, "reasoning_tokens")
+    if output_tokens is None:
+        output_tokens = (
+            _DEFAULT_COMMAND_OUTPUT_TOKENS if kind == COMMAND else defaults.output_tokens
+        )
+    if reasoning_tokens is None:
+        reasoning_tokens = defaults.reasoning_tokens
+
+    latency = _mean(entry, "latency")
+    if latency is None:
+        latency = (
+            defaults.first_token_seconds
+            + (output_tokens + reasoning_tokens) / defaults.tokens_per_second
+        )
+
+    entry = entry or {}
+    return UsageEstimate(
+        output_tokens=round(output_tokens),
+        reasoning_tokens=round(reasoning_tokens),
+        latency_seconds=latency,
+        samples=entry.get("output_tokens", {}).get("n", 0),
+        cache_hit_rate=_mean(model_entry, "cache_hit_rate"),
+        latency_samples=entry.get("latency", {}).get("n", 0),
+    )
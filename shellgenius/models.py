@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+
+DEFAULT_MODEL = "gpt-5.4-mini"
+
+REASONING_EFFORTS = ("minimal", "low", "medium", "high")
+VERBOSITY_LEVELS = ("low", "medium", "high")
+SERVICE_TIERS = ("auto", "default", "priority", "flex")
+
+# Smallest value the Responses API accepts for ``max_output_tokens``.
+MIN_OUTPUT_TOKENS = 16
+
+# APIs a model can be called through.
+RESPONSES_API = "responses"
+CHAT_COMPLETIONS_API = "chat_completions"
+MODEL_APIS = (RESPONSES_API, CHAT_COMPLETIONS_API)
+
+__all__ = [
+    "CHAT_COMPLETIONS_API",
+    "DEFAULT_MODEL",
+    "MIN_OUTPUT_TOKENS",
+    "MODEL_APIS",
+    "MODEL_CAPABILITIES",
+    "REASONING_EFFORTS",
+    "RESPONSES_API",
+    "SERVICE_TIERS",
+    "VALID_MODELS",
+    "VERBOSITY_LEVELS",
+    "ModelCapabilities",
+    "RequestOptions",
+    "canonical_model_name",
+    "custom_models",
+    "get_model_capabilities",
+    "resolve_request_options",
+]
+
+
+@dataclass(frozen=True, slots=True)
+class ModelCapabilities:
+    """What a model accepts, and the request defaults ShellGenius uses for it.
+
+    ``reasoning_efforts`` lists the API values in increasing order; it is
+    empty for models without reasoning. Defaults favor latency: a shell
+    command rarely benefits from long reasoning or verbose explanations.
+    ``service_tiers`` lists the processing tiers the model accepts.
+    ``api`` is the API requests go to unless they need the other one;
+    without ``streaming`` the answer arrives in one piece, without
+    ``stop`` requests with stop sequences are refused, and without
+    ``prompt_caching`` no ``prompt_cache_key`` is sent, since servers other
+    than OpenAI's may reject it.
+    """
+
+    aliases: tuple[str, ...]
+    reasoning_efforts: tuple[str, ...] = ()
+    default_effort: str | None = None
+    verbosity: bool = False
+    default_verbosity: str | None = None
+    service_tiers: tuple[str, ...] = ("auto", "default", "priority")
+    api: str = RESPONSES_API
+    streaming: bool = True
+    stop: bool = True
+    prompt_caching: bool = True
+
+    @property
+    def reasoning(self) -> bool:
+        return bool(self.reasoning_efforts)
+
+
+_GPT_5_EFFORTS = ("minimal", "low", "medium", "high")
+_GPT_5_4_EFFORTS = ("none", "low", "medium", "high")
+
+
+def _gpt_5(alias: str) -> ModelCapabilities:
+    return ModelCapabilities(
+        aliases=(alias,),
+        reasoning_efforts=_GPT_5_EFFORTS,
+        default_effort="minimal",
+        verbosity=True,
+        default_verbosity="low",
+        service_tiers=SERVICE_TIERS,
+    )
+
+
+def _gpt_5_4(alias: str) -> ModelCapabilities:
+    return ModelCapabilities(
+        aliases=(alias,),
+        reasoning_efforts=_GPT_5_4_EFFORTS,
+        default_effort="none",
+        verbosity=True,
+        default_verbosity="low",
+        service_tiers=SERVICE_TIERS,
+        stop=False,
+    )
+
+
+MODEL_CAPABILITIES: dict[str, ModelCapabilities] = {
+    "gpt-4.1": ModelCapabilities(aliases=("4.1",)),
+    "gpt-4.1-mini": ModelCapabilities(aliases=("4.1-mini",)),
+    "gpt-4.1-nano": ModelCapabilities(aliases=("4.1-nano",)),
+    "gpt-4o": ModelCapabilities(aliases=("4o",)),
+    "gpt-4o-mini": ModelCapabilities(aliases=("4o-mini",)),
+    "gpt-5": _gpt_5("5"),
+    "gpt-5-mini": _gpt_5("5-mini"),
+    "gpt-5-nano": _gpt_5("5-nano"),
+    "gpt-5.4": _gpt_5_4("5.4"),
+    "gpt-5.4-mini": _gpt_5_4("5.4-mini"),
+    "gpt-5.4-nano": _gpt_5_4("5.4-nano"),
+}
+
+VALID_MODELS: dict[str, tuple[str, ...]] = {
+    model: capabilities.aliases for model, capabilities in MODEL_CAPABILITIES.items()
+}
+
+
+def custom_models() -> dict[str, ModelCapabilities]:
+    """Models registered under ``models`` in the config, e.g. on a local server.
+
+    Read on each call, so only lookups of names that are not built in pay
+    for reading the config.
+    """
+    from .config import load_settings
+
+    return dict(load_settings().models)
+
+
+def canonical_model_name(
+    name: str, custom: Mapping[str, ModelCapabilities] | None = None
+) -> str | None:
+    """Resolve a model name or alias, case-insensitively; ``None`` if unknown.
+
+    Built-in models are tried first, then ``custom``, which defaults to
+    ``custom_models()``.
+    """
+    name = name.strip().lower()
+    for canonical, aliases in VALID_MODELS.items():
+        if name == canonical or name in aliases:
+            return canonical
+    if custom is None:
+        custom = custom_models()
+    for canonical, capabilities in custom.items():
+        if name == canonical.lower() or name in capabilities.aliases:
+            return canonical
+    return None
+
+
+def get_model_capabilities(model: str) -> ModelCapabilities:
+    """Return the capabilities of ``model``; unknown models get none."""
+    capabilities = MODEL_CAPABILITIES.get(model)
+    if capabilities is None:
+        capabilities = custom_models().get(model, ModelCapabilities(aliases=()))
+    return capabilities
+
+
+@dataclass(frozen=True, slots=True)
+class RequestOptions:
+    reasoning_effort: str | None = None
+    verbosity: str | None = None
+    max_output_tokens: int | None = None
+    service_tier: str | None = None
+
+
+def resolve_request_options(
+    model: str,
+    *,
+    reasoning_effort: str | None = None,
+    verbosity: str | None = None,
+    max_output_tokens: int | None = None,
+    service_tier: str | None = None,
+) -> RequestOptions:
+    """Fill in per-model defaults and drop settings ``model`` does not accept.
+
+    ``minimal`` maps to the lowest effort the model offers, which is ``none``
+    on GPT-5.4 models. A service tier the model does not offer is dropped,
+    so the request uses the project default.
+    """
+    capabilities = get_model_capabilities(model)
+
+    effort = None
+    if capabilities.reasoning:
+        effort = reasoning_effort or capabilities.default_effort
+        if effort not in capabilities.reasoning_efforts:
+            effort = capabilities.reasoning_efforts[0] if effort == "minimal" else None
+
+    resolved_verbosity = None
+    if capabilities.verbosity:
+        resolved_verbosity = verbosity or capabilities.default_verbosity
+
+    if service_tier not in capabilities.service_tiers:
+        service_tier = None
+
+    return RequestOptions(
+        reasoning_effort=effort,
+        verbosity=resolved_verbosity,
+        max_output_tokens=max_output_tokens,
+        service_tier=service_tier,
+    )
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from .patterns import match_pattern
+from .response_cache import lookup_response, response_cache_key
+
+__all__ = ["LocalAnswer", "find_local_answer", "format_answer"]
+
+
+@dataclass(frozen=True, slots=True)
+class LocalAnswer:
+    """An answer found without the API, and where it came from."""
+
+    text: str
+    explain: bool
+    source: str
+    detail: str = ""
+
+    def describe(self) -> str:
+        detail = f" ({self.detail})" if self.detail else ""
+        return f"local answer from the {self.source}{detail}"
+
+
+def format_answer(command: str, explanation: str, fence_language: str | None) -> str:
+    """Write a command in the fenced format the model is asked to use."""
+    text = f"```{fence_language or ''}\n{command}\n```"
+    if explanation:
+        text += f"\n\nExplanation:\n{explanation}"
+    return text
+
+
+def _from_history(command_description: str, os_name: str) -> LocalAnswer | None:
+    from .history import find_generation
+
+    entry = find_generation(command_description, os_name)
+    if entry is None:
+        return None
+    return LocalAnswer(
+        text=format_answer(entry.command, entry.explanation, entry.fence_language),
+        explain=bool(entry.explanation),
+        source="history",
+        detail=entry.model,
+    )
+
+
+def _from_similar_task(
+    command_description: str, os_name: str, threshold: float | None
+) -> LocalAnswer | None:
+    from . import similarity
+
+    if not similarity.available():
+        return None
+    similar = similarity.find_similar_task(
+        command_description, os_name, threshold=threshold or similarity.DEFAULT_THRESHOLD
+    )
+    if similar is None:
+        return None
+    return LocalAnswer(similar.text, similar.explain, "similar-task index", similar.describe())
+
+
+def find_local_answer(
+    command_description: str,
+    os_name: str,
+    *,
+    history: bool = True,
+    similar_tasks: bool = True,
+    threshold: float | None = None,
+) -> LocalAnswer | None:
+    """Answer ``command_description`` from local sources only.
+
+    Tries, in order: the response cache and the history (exact task), the
+    similar-task index, and the bundled pattern library. Sources turned off
+    in the settings are skipped.
+    """
+    cached = lookup_response(response_cache_key(command_description, os_name))
+    if cached is not None:
+        return LocalAnswer(cached.text, cached.explain, "response cache", cached.model)
+
+    answer = _from_history(command_description, os_name) if history else None
+    if answer is None and similar_tasks:
+        answer = _from_similar_task(command_description, os_name, threshold)
+    if answer is not None:
+        return answer
+
+    match = match_pattern(command_description, os_name)
+    if match is None:
+        return None
+    return LocalAnswer(
+        text=format_answer(match.command, f"* {match.explanation}", match.fence_language),
+        explain=True,
+        source="pattern library",
+    )
@@ -6,20 +6,48 @@ from dataclasses import dataclass
 from typing import Any
 
 import click
-from openai import OpenAI, RateLimitError
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    DefaultHttpxClient,
+    OpenAI,
+    RateLimitError,
+)
 
 from .api_key import get_api_key
+from .config import get_base_url
+from .models import CHAT_COMPLETIONS_API, get_model_capabilities
+from .proxy import REPLAY_HEADER
+from .rate_limit import learn_from_response
 
 PromptMessage = Mapping[str, str]
 ChunkCallback = Callable[[str], None]
 
+# Sent as the API key to a configured base URL when none is set up; local
+# OpenAI-compatible servers usually ignore it, but the client requires one.
+PLACEHOLDER_API_KEY = "shellgenius-local"
+
+# OpenAI only caches prompts of at least this many tokens; shorter prompts
+# never report cached input, so no hit rate is shown for them.
+MIN_CACHED_PROMPT_TOKENS = 1024
+
 __all__ = [
+    "APIConnectionError",
+    "APIStatusError",
+    "APITimeoutError",
     "ChunkCallback",
+    "MIN_CACHED_PROMPT_TOKENS",
+    "PLACEHOLDER_API_KEY",
     "OpenAIResponsesBackend",
     "PreparedResponsesRequest",
     "PromptMessage",
     "RateLimitError",
+    "ResponseUsage",
     "create_openai_backend",
+    "extract_response_id",
+    "extract_service_tier",
+    "extract_usage",
     "prepare_prompt_for_responses_api",
 ]
 
@@ -30,6 +58,102 @@ class PreparedResponsesRequest:
     input: str | list[dict[str, str]]
 
 
+@dataclass(frozen=True, slots=True)
+class ResponseUsage:
+    input_tokens: int
+    output_tokens: int
+    reasoning_tokens: int = 0
+    cached_tokens: int = 0
+
+    @property
+    def visible_output_tokens(self) -> int:
+        """Output tokens excluding reasoning, i.e. the text the user sees."""
+        return max(self.output_tokens - self.reasoning_tokens, 0)
+
+    @property
+    def cacheable(self) -> bool:
+        """Whether the prompt was long enough for the provider to cache it."""
+        return self.input_tokens >= MIN_CACHED_PROMPT_TOKENS
+
+    @property
+    def cache_hit_rate(self) -> float:
+        """Share of input tokens served from the provider's prompt cache."""
+        if not self.input_tokens:
+            return 0.0
+        return self.cached_tokens / self.input_tokens
+
+
+def extract_usage(response: Any) -> ResponseUsage | None:
+    """Return token usage from a Responses or chat completions result.
+
+    Accepts what ``create_text_response`` returns: a response object, or the
+    list of collected stream events/chunks. Returns ``None`` when the result
+    carries no usage, e.g. chat completion streams.
+    """
+    if isinstance(response, list):
+        for item in reversed(response):
+            usage = extract_usage(getattr(item, "response", item))
+            if usage is not None:
+                return usage
+        return None
+
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+
+    if hasattr(usage, "input_tokens"):
+        input_details = getattr(usage, "input_tokens_details", None)
+        output_details = getattr(usage, "output_tokens_details", None)
+        return ResponseUsage(
+            input_tokens=usage.input_tokens or 0,
+            output_tokens=usage.output_tokens or 0,
+            reasoning_tokens=getattr(output_details, "reasoning_tokens", 0) or 0,
+            cached_tokens=getattr(input_details, "cached_tokens", 0) or 0,
+        )
+
+    if hasattr(usage, "prompt_tokens"):
+        prompt_details = getattr(usage, "prompt_tokens_details", None)
+        completion_details = getattr(usage, "completion_tokens_details", None)
+        return ResponseUsage(
+            input_tokens=usage.prompt_tokens or 0,
+            output_tokens=usage.completion_tokens or 0,
+            reasoning_tokens=getattr(completion_details, "reasoning_tokens", 0) or 0,
+            cached_tokens=getattr(prompt_details, "cached_tokens", 0) or 0,
+        )
+
+    return None
+
+
+def extract_response_id(response: Any) -> str | None:
+    """Return the Responses API id of a result, for ``previous_response_id``.
+
+    Accepts the same results as ``extract_usage``. Chat completions have no
+    reusable id and return ``None``.
+    """
+    if isinstance(response, list):
+        for event in reversed(response):
+            if getattr(event, "type", None) == "response.completed":
+                return extract_response_id(getattr(event, "response", None))
+        return None
+
+    if response is None or hasattr(response, "choices"):
+        return None
+    return getattr(response, "id", None)
+
+
+def extract_service_tier(response: Any) -> str | None:
+    """Return the service tier that actually processed a result, if reported."""
+    if isinstance(response, list):
+        for item in reversed(response):
+            tier = extract_service_tier(getattr(item, "response", item))
+            if tier is not None:
+                return tier
+        return None
+
+    tier = getattr(response, "service_tier", None)
+    return tier if isinstance(tier, str) else None
+
+
 def prepare_prompt_for_responses_api(prompt: Sequence[PromptMessage]) -> PreparedResponsesRequest:
     input_messages: list[dict[str, str]] = []
 
@@ -46,12 +170,12 @@ def prepare_prompt_for_responses_api(prompt: Sequence[PromptMessage]) -> Prepare
 
 
 class OpenAIResponsesBackend:
-    def __init__(self, client: OpenAI | None = None) -> None:
+    def __init__(self, client: OpenAI | None = None, *, base_url: str | None = None) -> None:
         if client is not None:
             self._client = client
             return
 
-        api_key = get_api_key()
+        api_key = get_api_key() or (PLACEHOLDER_API_KEY if base_url else None)
         if not api_key:
             click.secho("Error: ", fg="red", nl=False, err=True)
             click.echo("No OpenAI API key found.", err=True)
@@ -62,7 +186,14 @@ class OpenAIResponsesBackend:
             )
             sys.exit(1)
 
-        self._client = OpenAI(api_key=api_key)
+        # Every response teaches the shared rate limiter the model's limits.
+        http_client = DefaultHttpxClient(event_hooks={"response": [learn_from_response]})
+        # Behind `shellgenius proxy`, answers may be replayed from its cache
+        # as they would be from the local one; other servers ignore this.
+        headers = {REPLAY_HEADER: "1"} if base_url else None
+        self._client = OpenAI(
+            api_key=api_key, base_url=base_url, http_client=http_client, default_headers=headers
+        )
 
     def create_text_response(
         self,
@@ -74,14 +205,55 @@ class OpenAIResponsesBackend:
         stop: Any,
         stream: bool,
         chunk_callback: ChunkCallback | None,
+        reasoning_effort: str | None = None,
+        verbosity: str | None = None,
+        max_output_tokens: int | None = None,
+        previous_response_id: str | None = None,
+        prompt_cache_key: str | None = None,
+        service_tier: str | None = None,
+        timeout: float | None = None,
     ) -> tuple[str, Any]:
-        if stop is not None and _is_gpt_5_4_model(model):
+        capabilities = get_model_capabilities(model)
+        if stop is not None and not capabilities.stop:
             raise ValueError(
-                "`stop` is not supported for GPT-5.4 models. Remove `stop` or use a "
+                f"`stop` is not supported for {model}. Remove `stop` or use a "
                 "model that supports it."
             )
 
-        if n != 1 or stop is not None:
+        if not capabilities.prompt_caching:
+            prompt_cache_key = None
+
+        if stream and not capabilities.streaming:
+            # Deliver the whole answer as a single chunk, so callers that
+            # render chunks still show it.
+            generated_text, response = self.create_text_response(
+                prompt=prompt,
+                model=model,
+                n=n,
+                temperature=temperature,
+                stop=stop,
+                stream=False,
+                chunk_callback=None,
+                reasoning_effort=reasoning_effort,
+                verbosity=verbosity,
+                max_output_tokens=max_output_tokens,
+                previous_response_id=previous_response_id,
+                prompt_cache_key=prompt_cache_key,
+                service_tier=service_tier,
+                timeout=timeout,
+            )
+            if chunk_callback and generated_text:
+                chunk_callback(generated_text)
+            return generated_text, response
+
+        if n != 1 or stop is not None or capabilities.api == CHAT_COMPLETIONS_API:
+            if previous_response_id is not None:
+                reason = (
+                    f"is not used for {model}"
+                    if n == 1 and stop is None
+                    else "does not support `n` or `stop`"
+                )
+                raise ValueError(f"`previous_response_id` needs the Responses API, which {reason}.")
             return self._create_chat_completion_response(
                 prompt=prompt,
                 model=model,
@@ -90,6 +262,12 @@ class OpenAIResponsesBackend:
                 stop=stop,
                 stream=stream,
                 chunk_callback=chunk_callback,
+                reasoning_effort=reasoning_effort,
+                verbosity=verbosity,
+                max_output_tokens=max_output_tokens,
+                prompt_cache_key=prompt_cache_key,
+                service_tier=service_tier,
+                timeout=timeout,
             )
 
         request = prepare_prompt_for_responses_api(prompt)
@@ -105,6 +283,27 @@ class OpenAIResponsesBackend:
         if temperature is not None:
             request_kwargs["temperature"] = temperature
 
+        if reasoning_effort is not None:
+            request_kwargs["reasoning"] = {"effort": reasoning_effort}
+
+        if verbosity is not None:
+            request_kwargs["text"] = {"verbosity": verbosity}
+
+        if max_output_tokens is not None:
+            request_kwargs["max_output_tokens"] = max_output_tokens
+
+        if previous_response_id is not None:
+            request_kwargs["previous_response_id"] = previous_response_id
+
+        if prompt_cache_key is not None:
+            request_kwargs["prompt_cache_key"] = prompt_cache_key
+
+        if service_tier is not None:
+            request_kwargs["service_tier"] = service_tier
+
+        if timeout is not None:
+            request_kwargs["timeout"] = timeout
+
         response = self._client.responses.create(**request_kwargs)
 
         if not stream:
@@ -114,18 +313,25 @@ class OpenAIResponsesBackend:
         collected_text_parts: list[str] = []
         completed_response = None
 
-        for event in response:
-            collected_events.append(event)
-
-            if getattr(event, "type", None) == "response.output_text.delta":
-                delta = event.delta
-                if not delta:
-                    continue
-                collected_text_parts.append(delta)
-                if chunk_callback:
-                    chunk_callback(delta)
-            elif getattr(event, "type", None) == "response.completed":
-                completed_response = getattr(event, "response", None)
+        try:
+            for event in response:
+                collected_events.append(event)
+
+                if getattr(event, "type", None) == "response.output_text.delta":
+                    delta = event.delta
+                    if not delta:
+                        continue
+                    collected_text_parts.append(delta)
+                    if chunk_callback:
+                        chunk_callback(delta)
+                elif getattr(event, "type", None) == "response.completed":
+                    completed_response = getattr(event, "response", None)
+        finally:
+            # Release the connection promptly when a callback aborts the
+            # stream, e.g. the losing side of a hedged request.
+            close = getattr(response, "close", None)
+            if close is not None:
+                close()
 
         generated_text = "".join(collected_text_parts)
         if not generated_text and completed_response is not None:
@@ -143,6 +349,12 @@ class OpenAIResponsesBackend:
         stop: Any,
         stream: bool,
         chunk_callback: ChunkCallback | None,
+        reasoning_effort: str | None = None,
+        verbosity: str | None = None,
+        max_output_tokens: int | None = None,
+        prompt_cache_key: str | None = None,
+        service_tier: str | None = None,
+        timeout: float | None = None,
     ) -> tuple[str, Any]:
         request_kwargs: dict[str, Any] = {
             "messages": list(prompt),
@@ -157,6 +369,24 @@ class OpenAIResponsesBackend:
         if stop is not None:
             request_kwargs["stop"] = stop
 
+        if reasoning_effort is not None:
+            request_kwargs["reasoning_effort"] = reasoning_effort
+
+        if verbosity is not None:
+            request_kwargs["verbosity"] = verbosity
+
+        if max_output_tokens is not None:
+            request_kwargs["max_completion_tokens"] = max_output_tokens
+
+        if prompt_cache_key is not None:
+            request_kwargs["prompt_cache_key"] = prompt_cache_key
+
+        if service_tier is not None:
+            request_kwargs["service_tier"] = service_tier
+
+        if timeout is not None:
+            request_kwargs["timeout"] = timeout
+
         response = self._client.chat.completions.create(**request_kwargs)
 
         if not stream:
@@ -176,9 +406,4 @@ class OpenAIResponsesBackend:
 
 
 def create_openai_backend() -> OpenAIResponsesBackend:
-    return OpenAIResponsesBackend()
-
-
-def _is_gpt_5_4_model(model: str) -> bool:
-    normalized_model = model.strip().lower()
-    return normalized_model == "gpt-5.4" or normalized_model.startswith("gpt-5.4-")
+    return OpenAIResponsesBackend(base_url=get_base_url())
@@ -0,0 +1,410 @@
+from __future__ import annotations
+
+import re
+import shlex
+from dataclasses import dataclass, field
+from string import Template
+
+# Polite or question-style openings that may precede any pattern.
+_PREFIX = r"(?:(?:please|how\s+(?:do|can)\s+i|i\s+want\s+to|can\s+you|show\s+me\s+how\s+to)\s+)*"
+
+# An optional location; paths must look like paths so ordinary words are not
+# taken for directories.
+_LOCATION = (
+    r"(?:\s+in\s+(?:the\s+)?current\s+(?:directory|folder)"
+    r"|\s+(?:in|under|inside)\s+(?:the\s+)?(?:directory\s+|folder\s+)?"
+    r"(?P<path>(?:[~./]|[a-z]:[\\/])\S*)(?:\s+(?:directory|folder))?)?"
+)
+_ALL = r"(?:all\s+(?:the\s+)?|the\s+)?"
+_FILE = r"(?P<file>\S+)"
+
+__all__ = ["PATTERNS", "CommandPattern", "PatternMatch", "match_pattern"]
+
+
+@dataclass(frozen=True, slots=True)
+class CommandPattern:
+    """A common task and its command templates.
+
+    ``regex`` must match the whole task. Templates use ``$name`` fields
+    filled from the regex groups (quoted for the shell) or ``defaults``.
+    ``posix`` applies to Linux and macOS unless ``linux`` or ``macos``
+    overrides it; tasks on an OS without a template do not match.
+    """
+
+    keywords: tuple[str, ...]
+    regex: str
+    explanation: str
+    posix: str | None = None
+    linux: str | None = None
+    macos: str | None = None
+    windows: str | None = None
+    defaults: dict[str, str] = field(default_factory=dict)
+
+    def template_for(self, os_name: str) -> str | None:
+        if os_name == "Windows":
+            return self.windows
+        if os_name == "macOS":
+            return self.macos or self.posix
+        return self.linux or self.posix
+
+
+@dataclass(frozen=True, slots=True)
+class PatternMatch:
+    command: str
+    explanation: str
+    fence_language: str
+
+
+PATTERNS = (
+    CommandPattern(
+        keywords=("disk", "space"),
+        regex=r"(?:show|check|how\s+much)\s+(?:free\s+)?disk\s+space"
+        r"(?:\s+is)?(?:\s+(?:left|free|available))?",
+        explanation="Shows used and available space on each mounted file system.",
+        posix="df -h",
+        windows="Get-PSDrive -PSProvider FileSystem",
+    ),
+    CommandPattern(
+        keywords=("usage",),
+        regex=r"(?:show|check|get)\s+(?:the\s+)?disk\s+usage\s+of\s+(?:the\s+)?"
+        r"(?:current\s+(?:directory|folder)|(?P<path>(?:[~./]|[a-z]:[\\/])\S*))",
+        explanation="Prints the total size of $path in human-readable units.",
+        posix="du -sh $path",
+        windows="(Get-ChildItem $path -Recurse -File | Measure-Object Length -Sum).Sum / 1MB",
+        defaults={"path": "."},
+    ),
+    CommandPattern(
+        keywords=("memory",),
+        regex=r"(?:show|check)\s+(?:free\s+|available\s+)?memory(?:\s+usage)?",
+        explanation="Shows total, used, and free memory.",
+        linux="free -h",
+        macos="vm_stat",
+        windows="Get-CimInstance Win32_OperatingSystem"
+        " | Select-Object FreePhysicalMemory, TotalVisibleMemorySize",
+    ),
+    CommandPattern(
+        keywords=("files", "than"),
+        regex=rf"(?:find|list|show)\s+{_ALL}files\s+(?:larger|bigger)\s+than\s+"
+        rf"(?P<size>\d+)\s*(?P<unit>[kmg])b?{_LOCATION}",
+        explanation="Lists regular files under $path larger than $size$unit.",
+        posix="find $path -type f -size +$size$unit",
+        windows="Get-ChildItem $path -Recurse -File | Where-Object Length -gt $size${unit}B",
+        defaults={"path": "."},
+    ),
+    CommandPattern(
+        keywords=("largest",),
+        regex=r"(?:show|list|find)\s+(?:the\s+)?(?:top\s+)?(?P<count>\d+)\s+"
+        rf"(?:largest|biggest)\s+files{_LOCATION}",
+        explanation="Lists the $count largest files under $path, biggest first.",
+        posix="find $path -type f -exec du -h {} + | sort -rh | head -n $count",
+        windows="Get-ChildItem $path -Recurse -File | Sort-Object Length -Descending"
+        " | Select-Object -First $count FullName, Length",
+        defaults={"path": "."},
+    ),
+    CommandPattern(
+        keywords=("files", "extension"),
+        regex=rf"(?:find|list)\s+{_ALL}files\s+"
+        r"(?:with\s+(?:the\s+)?extension|ending\s+(?:in|with))"
+        rf"\s+\.?(?P<extension>[a-z0-9]+){_LOCATION}",
+        explanation="Lists files under $path whose names end in .$extension.",
+        posix="find $path -type f -name '*.'$extension",
+        windows="Get-ChildItem $path -Recurse -File -Filter ('*.' + $extension)",
+        defaults={"path": "."},
+    ),
+    CommandPattern(
+        keywords=("modified",),
+        regex=rf"(?:find|list|show)\s+{_ALL}files\s+(?:modified|changed)\s+in\s+the\s+last\s+"
+        rf"(?P<days>\d+)\s+days?{_LOCATION}",
+        explanation="Lists files under $path modified less than $days days ago.",
+        posix="find $path -type f -mtime -$days",
+        windows="Get-ChildItem $path -Recurse -File"
+        " | Where-Object LastWriteTime -gt (Get-Date).AddDays(-$days)",
+        defaults={"path": "."},
+    ),
+    CommandPattern(
+        keywords=("older",),
+        regex=rf"(?:find|list|show)\s+{_ALL}files\s+older\s+than\s+"
+        rf"(?P<days>\d+)\s+days?{_LOCATION}",
+        explanation="Lists files under $path last modified more than $days days ago.",
+        posix="find $path -type f -mtime +$days",
+        windows="Get-ChildItem $path -Recurse -File"
+        " | Where-Object LastWriteTime -lt (Get-Date).AddDays(-$days)",
+        defaults={"path": "."},
+    ),
+    CommandPattern(
+        keywords=("empty",),
+        regex=rf"(?:find|list|show)\s+{_ALL}empty\s+(?:directories|folders){_LOCATION}",
+        explanation="Lists empty directories, searching $path recursively.",
+        posix="find $path -type d -empty",
+        windows="Get-ChildItem $path -Recurse -Directory"
+        " | Where-Object { -not (Get-ChildItem $$_.FullName -Force) }",
+        defaults={"path": "."},
+    ),
+    CommandPattern(
+        keywords=("empty",),
+        regex=rf"(?:delete|remove)\s+{_ALL}empty\s+(?:directories|folders){_LOCATION}",
+        explanation="Deletes empty directories, searching $path recursively.",
+        posix="find $path -type d -empty -delete",
+        defaults={"path": "."},
+    ),
+    CommandPattern(
+        keywords=("count", "files"),
+        regex=rf"count\s+(?:the\s+)?(?:number\s+of\s+)?files{_LOCATION}",
+        explanation="Counts regular files in $path and its subdirectories.",
+        posix="find $path -type f | wc -l",
+        windows="(Get-ChildItem $path -Recurse -File).Count",
+        defaults={"path": "."},
+    ),
+    CommandPattern(
+        keywords=("count", "lines"),
+        regex=rf"count\s+(?:the\s+)?(?:number\s+of\s+)?lines\s+(?:in|of)\s+{_FILE}",
+        explanation="Prints the number of lines in $file.",
+        posix="wc -l < $file",
+        windows="(Get-Content $file | Measure-Object -Line).Lines",
+    ),
+    CommandPattern(
+        keywords=("files",),
+        regex=r"(?:search|grep|look)\s+(?:for\s+)?(?P<text>\"[^\"]+\"|'[^']+'|\S+)\s+in\s+"
+        rf"{_ALL}files{_LOCATION}",
+        explanation="Searches files under $path for $text and prints matching lines with numbers.",
+        posix="grep -rn -- $text $path",
+        windows="Get-ChildItem $path -Recurse -File | Select-String -SimpleMatch $text",
+        defaults={"path": "."},
+    ),
+    CommandPattern(
+        keywords=("ports",),
+        regex=r"(?:list|show)\s+(?:all\s+)?(?:the\s+)?(?:open|listening)\s+(?:tcp\s+)?ports",
+        explanation="Lists TCP ports with a listening process.",
+        linux="ss -tlnp",
+        macos="lsof -nP -iTCP -sTCP:LISTEN",
+        windows="Get-NetTCPConnection -State Listen",
+    ),
+    CommandPattern(
+        keywords=("port", "process"),
+        regex=r"(?:which|what)\s+process\s+is\s+(?:using|listening\s+on|on)\s+port\s+(?P<port>\d+)",
+        explanation="Shows the processes with a socket on port $port.",
+        posix="lsof -nP -i :$port",
+        windows="Get-Process -Id (Get-NetTCPConnection -LocalPort $port).OwningProcess",
+    ),
+    CommandPattern(
+        keywords=("kill", "port"),
+        regex=r"kill\s+(?:the\s+)?(?:process|whatever\s+is)\s+(?:on|using|listening\s+on)\s+port\s+"
+        r"(?P<port>\d+)",
+        explanation="Terminates the processes with a socket on port $port.",
+        posix="lsof -t -i :$port | xargs kill",
+        windows="Stop-Process -Id (Get-NetTCPConnection -LocalPort $port).OwningProcess",
+    ),
+    CommandPattern(
+        keywords=("processes", "memory"),
+        regex=r"(?:show|list)\s+(?:the\s+)?(?:top\s+)?processes\s+"
+        r"(?:by|using\s+the\s+most)\s+memory",
+        explanation="Lists the processes using the most memory.",
+        linux="ps aux --sort=-%mem | head",
+        macos="ps aux -m | head",
+        windows="Get-Process | Sort-Object WorkingSet -Descending | Select-Object -First 10",
+    ),
+    CommandPattern(
+        keywords=("processes", "cpu"),
+        regex=r"(?:show|list)\s+(?:the\s+)?(?:top\s+)?processes\s+"
+        r"(?:by|using\s+the\s+most)\s+cpu",
+        explanation="Lists the processes using the most CPU.",
+        linux="ps aux --sort=-%cpu | head",
+        macos="ps aux -r | head",
+        windows="Get-Process | Sort-Object CPU -Descending | Select-Object -First 10",
+    ),
+    CommandPattern(
+        keywords=("public", "ip"),
+        regex=r"(?:show|get|what\s+is)\s+my\s+public\s+ip(?:\s+address)?",
+        explanation="Asks an external service for your public IP address.",
+        posix="curl -s https://ifconfig.me",
+        windows="(Invoke-WebRequest -UseBasicParsing https://ifconfig.me).Content",
+    ),
+    CommandPattern(
+        keywords=("ip",),
+        regex=r"(?:show|get|what\s+is)\s+my\s+(?:local\s+)?ip(?:\s+address)?",
+        explanation="Shows the IP addresses of the network interfaces.",
+        linux="ip -brief address",
+        macos="ifconfig | grep 'inet '",
+        windows="Get-NetIPAddress -AddressFamily IPv4",
+    ),
+    CommandPattern(
+        keywords=("extract",),
+        regex=r"(?:extract|unpack|untar|decompress)\s+(?:the\s+)?(?:archive\s+)?"
+        r"(?P<file>\S+\.(?:tar\.gz|tgz|tar\.bz2|tbz2|tar\.xz|txz|tar))",
+        explanation="Extracts $file into the current directory; tar detects the compression.",
+        posix="tar -xf $file",
+        windows="tar -xf $file",
+    ),
+    CommandPattern(
+        keywords=("unzip",),
+        regex=r"(?:extract|unzip|unpack)\s+(?:the\s+)?(?:archive\s+)?(?P<file>\S+\.zip)",
+        explanation="Extracts $file into the current directory.",
+        posix="unzip $file",
+        windows="Expand-Archive $file",
+    ),
+    CommandPattern(
+        keywords=("executable",),
+        regex=rf"make\s+{_FILE}\s+executable",
+        explanation="Adds execute permission to $file.",
+        posix="chmod +x $file",
+    ),
+    CommandPattern(
+        keywords=("follow",),
+        regex=r"(?:follow|tail|watch)\s+(?:the\s+)?(?:log\s+)?(?:file\s+)?"
+        r"(?P<file>(?:[~./]|[a-z]:[\\/])\S*)",
+        explanation="Prints the end of $file and keeps printing lines as they are appended.",
+        posix="tail -f $file",
+        windows="Get-Content $file -Wait -Tail 10",
+    ),
+    CommandPattern(
+        keywords=("download",),
+        regex=r"download\s+(?:the\s+file\s+(?:at\s+)?)?(?P<url>https?://\S+)",
+        explanation="Downloads $url into the current directory under its remote name.",
+        posix="curl -LO $url",
+        windows="Invoke-WebRequest $url -OutFile (Split-Path $url -Leaf)",
+    ),
+    CommandPattern(
+        keywords=("ssh", "key"),
+        regex=r"(?:generate|create)\s+(?:a\s+)?(?:new\s+)?ssh\s+key(?:\s+pair)?",
+        explanation="Creates an Ed25519 SSH key pair, prompting for the file and passphrase.",
+        posix="ssh-keygen -t ed25519",
+        windows="ssh-keygen -t ed25519",
+    ),
+    CommandPattern(
+        keywords=("environment", "variables"),
+        regex=r"(?:show|list|print)\s+(?:all\s+)?(?:the\s+)?environment\s+variables",
+        explanation="Prints every environment variable of the current shell.",
+        posix="env",
+        windows="Get-ChildItem Env:",
+    ),
+    CommandPattern(
+        keywords=("uptime",),
+        regex=r"(?:show|check)\s+(?:the\s+)?(?:system\s+)?uptime",
+        explanation="Shows how long the system has been running and its load averages.",
+        posix="uptime",
+        windows="(Get-Date) - (Get-CimInstance Win32_OperatingSystem).LastBootUpTime",
+    ),
+    CommandPattern(
+        keywords=("hidden",),
+        regex=r"(?:list|show)\s+(?:all\s+)?"
+        r"(?:files\s+including\s+hidden(?:\s+ones|\s+files)?|hidden\s+files)",
+        explanation="Lists the current directory in long format, including dotfiles.",
+        posix="ls -la",
+        windows="Get-ChildItem -Force",
+    ),
+    CommandPattern(
+        keywords=("size",),
+        regex=r"(?:list|sort)\s+(?:the\s+)?files\s+(?:sorted\s+)?by\s+size",
+        explanation="Lists the current directory with the largest files first.",
+        posix="ls -lhS",
+        windows="Get-ChildItem -File | Sort-Object Length -Descending",
+    ),
+    CommandPattern(
+        keywords=("git", "branch"),
+        regex=r"(?:show|what\s+is|get|print)\s+(?:the\s+)?current\s+git\s+branch",
+        explanation="Prints the name of the checked-out branch.",
+        posix="git branch --show-current",
+        windows="git branch --show-current",
+    ),
+    CommandPattern(
+        keywords=("undo", "commit"),
+        regex=r"undo\s+(?:the\s+)?last\s+(?:git\s+)?commit"
+        r"(?:\s+(?:but\s+)?(?:and\s+)?keep(?:ing)?\s+(?:the\s+|my\s+)?changes)?",
+        explanation="Removes the last commit and leaves its changes staged.",
+        posix="git reset --soft HEAD~1",
+        windows="git reset --soft HEAD~1",
+    ),
+    CommandPattern(
+        keywords=("docker", "containers"),
+        regex=r"(?:list|show)\s+(?:the\s+)?(?:running\s+)?docker\s+containers",
+        explanation="Lists running Docker containers.",
+        posix="docker ps",
+        windows="docker ps",
+    ),
+    CommandPattern(
+        keywords=("docker", "containers"),
+        regex=r"(?:list|show)\s+all\s+(?:the\s+)?docker\s+containers"
+        r"(?:\s+including\s+stopped(?:\s+ones)?)?",
+        explanation="Lists all Docker containers, stopped ones included.",
+        posix="docker ps -a",
+        windows="docker ps -a",
+    ),
+    CommandPattern(
+        keywords=("stopped", "containers"),
+        regex=r"(?:remove|delete)\s+(?:all\s+)?(?:the\s+)?stopped\s+(?:docker\s+)?containers",
+        explanation="Removes all stopped Docker containers after asking for confirmation.",
+        posix="docker container prune",
+        windows="docker container prune",
+    ),
+)
+
+# Groups copied into commands as-is: they can only hold digits or a unit.
+_UNQUOTED_GROUPS = frozenset({"count", "days", "port", "size", "unit"})
+
+# Size units as find(1) and PowerShell expect them.
+_UNITS = {"k": "k", "m": "M", "g": "G"}
+
+_COMPILED = tuple(
+    re.compile(_PREFIX + pattern.regex + r"(?:\s+please)?", re.IGNORECASE) for pattern in PATTERNS
+)
+
+# The precompiled index: each pattern is filed under its first keyword, so a
+# task is only tested against patterns that share a word with it.
+_INDEX: dict[str, tuple[int, ...]] = {}
+for _position, _pattern in enumerate(PATTERNS):
+    _INDEX[_pattern.keywords[0]] = (*_INDEX.get(_pattern.keywords[0], ()), _position)
+del _position, _pattern
+
+
+def _normalized(task: str) -> str:
+    # Trailing punctuation is dropped, but not a trailing `.` that is a path.
+    return re.sub(r"(?<=[^\s./])[.?!]+$", "", " ".join(task.split()))
+
+
+def _quote(value: str, os_name: str) -> str:
+    if os_name == "Windows":
+        return "'" + value.replace("'", "''") + "'"
+    if value.startswith("~/"):
+        # A quoted tilde is not expanded, so keep it outside the quotes.
+        return "~/" + shlex.quote(value[2:])
+    return shlex.quote(value)
+
+
+def _values(pattern: CommandPattern, match: re.Match[str]) -> dict[str, str]:
+    groups = {name: value for name, value in match.groupdict().items() if value is not None}
+    values = {**pattern.defaults, **groups}
+    if "unit" in values:
+        values["unit"] = _UNITS[values["unit"].lower()]
+    text = values.get("text", "")
+    if len(text) > 1 and text[0] in "\"'" and text[-1] == text[0]:
+        values["text"] = text[1:-1]
+    return values
+
+
+def _quoted(values: dict[str, str], os_name: str) -> dict[str, str]:
+    return {
+        name: value if name in _UNQUOTED_GROUPS else _quote(value, os_name)
+        for name, value in values.items()
+    }
+
+
+def match_pattern(task: str, os_name: str) -> PatternMatch | None:
+    """Return the bundled command for ``task`` if a pattern matches all of it."""
+    text = _normalized(task)
+    words = set(re.findall(r"[a-z]+", text.lower()))
+    candidates = sorted({position for word in words for position in _INDEX.get(word, ())})
+    for position in candidates:
+        pattern = PATTERNS[position]
+        template = pattern.template_for(os_name)
+        if template is None or not words.issuperset(pattern.keywords):
+            continue
+        match = _COMPILED[position].fullmatch(text)
+        if match is None:
+            continue
+        values = _values(pattern, match)
+        return PatternMatch(
+            command=Template(template).substitute(_quoted(values, os_name)),
+            explanation=Template(pattern.explanation).substitute(values),
+            fence_language="powershell" if os_name == "Windows" else "bash",
+        )
+    return None
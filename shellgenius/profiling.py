@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import os
+import platform
+import pstats
+import sys
+import tracemalloc
+from collections.abc import Callable, Mapping, Sequence
+from dataclasses import dataclass
+from importlib import metadata
+from pathlib import Path
+from typing import TypeVar
+
+from .storage import format_size
+from .timings import Timings, get_timings
+
+PROFILE_ENV_VAR = "SHELLGENIUS_PROFILE"
+PROFILE_MEMORY_ENV_VAR = "SHELLGENIUS_PROFILE_MEMORY"
+
+PROFILE_OPTION = "--profile"
+PROFILE_MEMORY_OPTION = "--profile-memory"
+
+TOP_FUNCTIONS = 40
+TOP_ALLOCATORS = 15
+TRACEMALLOC_FRAMES = 25
+
+_T = TypeVar("_T")
+
+__all__ = [
+    "PROFILE_ENV_VAR",
+    "PROFILE_MEMORY_ENV_VAR",
+    "ProfileRequest",
+    "extract_profile_request",
+    "run_profiled",
+]
+
+
+@dataclass(frozen=True, slots=True)
+class ProfileRequest:
+    path: Path
+    trace_memory: bool = False
+
+    @property
+    def report_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".txt")
+
+    @property
+    def snapshot_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".tracemalloc")
+
+
+def extract_profile_request(
+    args: Sequence[str],
+    environ: Mapping[str, str],
+) -> tuple[ProfileRequest | None, list[str]]:
+    """Split profiling options from ``args``.
+
+    ``--profile PATH`` and ``--profile-memory`` are consumed here, before the
+    CLI module is imported, so the profile covers startup too. Arguments after
+    ``--`` belong to the task description and are left untouched. A trailing
+    ``--profile`` without a path stays in place so Click reports the usage
+    error.
+    """
+    remaining: list[str] = []
+    path = environ.get(PROFILE_ENV_VAR, "").strip() or None
+    trace_memory = _env_flag(environ.get(PROFILE_MEMORY_ENV_VAR, ""))
+
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        if arg == "--":
+            remaining.extend(args[index:])
+            break
+        if arg == PROFILE_MEMORY_OPTION:
+            trace_memory = True
+        elif arg.startswith(PROFILE_OPTION + "="):
+            path = arg[len(PROFILE_OPTION) + 1 :] or path
+        elif arg == PROFILE_OPTION and index + 1 < len(args):
+            index += 1
+            path = args[index]
+        else:
+            remaining.append(arg)
+        index += 1
+
+    if path is None:
+        return None, remaining
+    return ProfileRequest(Path(path).expanduser(), trace_memory=trace_memory), remaining
+
+
+def _env_flag(value: str) -> bool:
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def run_profiled(main: Callable[[], _T], request: ProfileRequest) -> _T:
+    """Run ``main`` under cProfile and write the report, even when it exits."""
+    if request.trace_memory:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return main()
+    finally:
+        profiler.disable()
+        snapshot = None
+        peak_bytes = None
+        if request.trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        try:
+            write_profile(request, profiler, get_timings(), snapshot, peak_bytes)
+        except OSError as error:
+            print(f"Warning: could not write profile: {error}", file=sys.stderr)
+
+
+def write_profile(
+    request: ProfileRequest,
+    profiler: cProfile.Profile,
+    timings: Timings,
+    snapshot: tracemalloc.Snapshot | None,
+    peak_bytes: int | None,
+) -> None:
+    """Write the pstats dump, the text report, and the tracemalloc snapshot.
+
+    The pstats file loads with ``python -m pstats PATH``; two snapshots can be
+    diffed with ``tracemalloc.Snapshot.load(...).compare_to(...)``.
+    """
+    request.path.parent.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(request.path)
+    if snapshot is not None:
+        snapshot.dump(str(request.snapshot_path))
+    request.report_path.write_text(
+        format_profile_report(profiler, timings, snapshot, peak_bytes),
+        encoding="utf-8",
+    )
+
+
+def format_profile_report(
+    profiler: cProfile.Profile,
+    timings: Timings,
+    snapshot: tracemalloc.Snapshot | None,
+    peak_bytes: int | None,
+) -> str:
+    sections = [
+        "\n".join(
+            [
+                "# ShellGenius profile",
+                f"shellgenius: {_package_version()}",
+                f"python: {platform.python_version()} ({sys.executable})",
+                f"platform: {platform.platform()}",
+                f"pid: {os.getpid()}",
+            ]
+        ),
+        "\n".join(["# Timings", *(timings.format_lines() or ["(no phases recorded)"])]),
+        "\n".join(["# Top functions by cumulative time", _format_stats(profiler)]),
+    ]
+
+    if snapshot is not None:
+        sections.append(_format_memory(snapshot, peak_bytes))
+
+    return "\n\n".join(sections) + "\n"
+
+
+def _package_version() -> str:
+    try:
+        return metadata.version("shellgenius")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _format_stats(profiler: cProfile.Profile) -> str:
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+    return stream.getvalue().strip()
+
+
+def _format_memory(snapshot: tracemalloc.Snapshot, peak_bytes: int | None) -> str:
+    lines = ["# Memory"]
+    if peak_bytes is not None:
+        lines.append(f"peak traced: {format_size(peak_bytes)}")
+    lines.append(f"top {TOP_ALLOCATORS} allocators by size:")
+    for stat in snapshot.statistics("lineno")[:TOP_ALLOCATORS]:
+        frame = stat.traceback[0]
+        lines.append(
+            f"  {format_size(stat.size):>10}  {stat.count:>7} blocks  "
+            f"{frame.filename}:{frame.lineno}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,447 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from .segment_store import SegmentStore
+from .storage import get_cache_dir
+
+# The proxy serves cached answers to anyone who can reach it: listen on the
+# loopback interface unless told otherwise.
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8787
+DEFAULT_UPSTREAM = "https://api.openai.com/v1"
+
+# Clients use the proxy as their base URL, so API paths start with this.
+API_PREFIX = "/v1"
+
+PROXY_CACHE_FILE = "proxy_responses.seg"
+
+# Seconds a cached reply is replayed before the request is forwarded again.
+DEFAULT_PROXY_TTL = 86400.0
+
+# Oldest replies are dropped beyond this many, by a compaction once there
+# are 10% more.
+MAX_PROXY_RESPONSES = 50_000
+
+# POST endpoints whose replies are cached. Only requests with temperature 0
+# are treated as deterministic unless the cache is told to replay samples;
+# clients opt out with `Cache-Control: no-cache`.
+CACHEABLE_PATHS = ("/responses", "/chat/completions")
+
+# Request header with which a client accepts a replayed sample, whatever
+# its temperature. ShellGenius sends it, since it caches its own answers
+# the same way.
+REPLAY_HEADER = "X-ShellGenius-Replay"
+
+# Request fields that do not change the reply, left out of the cache key.
+IGNORED_FIELDS = (
+    "metadata",
+    "prompt_cache_key",
+    "safety_identifier",
+    "service_tier",
+    "store",
+    "user",
+)
+
+# Longest a request waits for the shared rate limit before getting a 429.
+MAX_RATE_LIMIT_WAIT = 30.0
+
+# Headers that describe one connection, not the request or reply.
+_HOP_BY_HOP_HEADERS = {
+    "accept-encoding",
+    "connection",
+    "content-encoding",
+    "content-length",
+    "host",
+    "keep-alive",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+}
+
+__all__ = [
+    "DEFAULT_HOST",
+    "DEFAULT_PORT",
+    "DEFAULT_UPSTREAM",
+    "REPLAY_HEADER",
+    "CachedReply",
+    "ProxyCache",
+    "ProxyMetrics",
+    "ProxyServer",
+    "TokenBucket",
+    "get_proxy_cache_path",
+]
+
+
+def get_proxy_cache_path() -> Path:
+    return get_cache_dir() / PROXY_CACHE_FILE
+
+
+@dataclass(frozen=True, slots=True)
+class CachedReply:
+    """An upstream reply kept for replay: a JSON body or a whole SSE stream."""
+
+    status: int
+    content_type: str
+    body: bytes
+
+    def encode(self) -> bytes:
+        header = json.dumps({"status": self.status, "content_type": self.content_type})
+        return header.encode() + b"\n" + self.body
+
+    @classmethod
+    def decode(cls, payload: bytes) -> CachedReply | None:
+        header, _, body = payload.partition(b"\n")
+        try:
+            fields = json.loads(header)
+            return cls(int(fields["status"]), str(fields["content_type"]), body)
+        except (ValueError, KeyError, TypeError):
+            return None
+
+
+def _is_complete(content_type: str, body: bytes) -> bool:
+    """Whether an SSE stream ran to its end, so replaying it is safe."""
+    if not content_type.startswith("text/event-stream"):
+        return True
+    return b"data: [DONE]" in body or b'"response.completed"' in body
+
+
+class ProxyCache:
+    """Replies to cacheable requests, in a ``SegmentStore`` keyed by request hash."""
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        ttl: float = DEFAULT_PROXY_TTL,
+        max_entries: int = MAX_PROXY_RESPONSES,
+        sampled: bool = False,
+    ) -> None:
+        self.store = SegmentStore(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sampled = sampled
+
+    @staticmethod
+    def key_for(
+        path: str, body: bytes, *, sampled: bool = False, authorization: str = ""
+    ) -> bytes | None:
+        """Hash a request, or return ``None`` if its reply must not be cached.
+
+        JSON field order and fields in ``IGNORED_FIELDS`` do not matter; the
+        ``Authorization`` header does, so a reply is only replayed to
+        clients sending the same API key. Requests continuing a stored
+        conversation are never cached, and neither are requests sampled at a
+        temperature other than 0 (the API default is 1) unless ``sampled``
+        is set.
+        """
+        if path not in CACHEABLE_PATHS:
+            return None
+        try:
+            request = json.loads(body)
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return None
+        if not isinstance(request, dict) or request.get("previous_response_id"):
+            return None
+        if not sampled and request.get("temperature") != 0:
+            return None
+        for field in IGNORED_FIELDS:
+            request.pop(field, None)
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"))
+        credential = hashlib.sha256(authorization.encode()).hexdigest()
+        return hashlib.sha256(f"{path}\0{credential}\0{canonical}".encode()).digest()
+
+    def get(self, key: bytes) -> CachedReply | None:
+        record = self.store.get(key)
+        if record is None:
+            return None
+        created, payload = record
+        if time.time() - created > self.ttl:
+            return None
+        return CachedReply.decode(payload)
+
+    def put(self, key: bytes, reply: CachedReply) -> None:
+        try:
+            with self.store.writer() as writer:
+                writer.put(key, time.time(), reply.encode())
+                if writer.count > self.max_entries * 1.1:
+                    writer.compact(max_records=self.max_entries)
+                elif writer.needs_compaction():
+                    writer.compact()
+        except OSError:
+            pass
+
+
+class TokenBucket:
+    """Requests per minute shared by every client of the proxy.
+
+    Holds up to a minute's worth of requests, refilled continuously.
+    """
+
+    def __init__(self, requests_per_minute: float) -> None:
+        self.rate = requests_per_minute / 60
+        self.capacity = max(requests_per_minute, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float = MAX_RATE_LIMIT_WAIT) -> float | None:
+        """Take a request slot; return the seconds to wait before using it.
+
+        Returns ``None``, taking nothing, if that would be over ``max_wait``.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(1 - self._tokens, 0) / self.rate
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+
+class ProxyMetrics:
+    """Counters exposed in the Prometheus text format at ``/metrics``."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = {"hit": 0, "miss": 0, "bypass": 0}
+        self.upstream_errors = 0
+        self.rate_limited = 0
+        self.rate_limit_wait_seconds = 0.0
+        self.upstream_seconds = 0.0
+        self.upstream_requests = 0
+
+    def count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def count_request(self, result: str) -> None:
+        with self._lock:
+            self.requests[result] += 1
+
+    @property
+    def hit_rate(self) -> float | None:
+        lookups = self.requests["hit"] + self.requests["miss"]
+        return self.requests["hit"] / lookups if lookups else None
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                "# HELP shellgenius_proxy_requests_total API requests by cache result.",
+                "# TYPE shellgenius_proxy_requests_total counter",
+            ]
+            lines += [
+                f'shellgenius_proxy_requests_total{{cache="{result}"}} {count}'
+                for result, count in self.requests.items()
+            ]
+            hit_rate = self.hit_rate
+            lines += [
+                "# HELP shellgenius_proxy_cache_hit_ratio Hits over cacheable requests.",
+                "# TYPE shellgenius_proxy_cache_hit_ratio gauge",
+                f"shellgenius_proxy_cache_hit_ratio {0.0 if hit_rate is None else hit_rate:.6f}",
+                "# HELP shellgenius_proxy_upstream_seconds Time spent on upstream requests.",
+                "# TYPE shellgenius_proxy_upstream_seconds summary",
+                f"shellgenius_proxy_upstream_seconds_sum {self.upstream_seconds:.6f}",
+                f"shellgenius_proxy_upstream_seconds_count {self.upstream_requests}",
+                "# HELP shellgenius_proxy_upstream_errors_total Upstream requests that failed.",
+                "# TYPE shellgenius_proxy_upstream_errors_total counter",
+                f"shellgenius_proxy_upstream_errors_total {self.upstream_errors}",
+                "# HELP shellgenius_proxy_rate_limited_total Requests refused by the rate limit.",
+                "# TYPE shellgenius_proxy_rate_limited_total counter",
+                f"shellgenius_proxy_rate_limited_total {self.rate_limited}",
+                "# HELP shellgenius_proxy_rate_limit_wait_seconds_total Time requests were paced.",
+                "# TYPE shellgenius_proxy_rate_limit_wait_seconds_total counter",
+                f"shellgenius_proxy_rate_limit_wait_seconds_total {self.rate_limit_wait_seconds:.6f}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+class ProxyServer(ThreadingHTTPServer):
+    """Local OpenAI-compatible endpoint that forwards to ``upstream``.
+
+    Replies to identical cacheable requests are replayed from ``cache``,
+    streams included; other requests pass through. Forwarded requests share
+    ``rate_limit``.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        *,
+        upstream: str = DEFAULT_UPSTREAM,
+        cache: ProxyCache | None = None,
+        rate_limit: TokenBucket | None = None,
+        client: httpx.Client | None = None,
+        log: bool = True,
+    ) -> None:
+        super().__init__(address, _ProxyHandler)
+        self.upstream = upstream.rstrip("/")
+        self.cache = cache
+        self.rate_limit = rate_limit
+        self.client = client or httpx.Client(
+            timeout=httpx.Timeout(connect=10.0, read=600.0, write=60.0, pool=60.0)
+        )
+        self.metrics = ProxyMetrics()
+        self.log = log
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.client.close()
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    server: ProxyServer
+    server_version = "shellgenius-proxy"
+
+    def handle_one_request(self) -> None:
+        try:
+            super().handle_one_request()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client hung up; a reply cut short this way is not cached.
+            self.close_connection = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.log:
+            sys.stderr.write(f"{self.log_date_time_string()} {format % args}\n")
+
+    def do_GET(self) -> None:
+        if self.path == "/metrics":
+            self._send(200, "text/plain; version=0.0.4", self.server.metrics.render().encode())
+            return
+        self._proxy(b"")
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        self._proxy(self.rfile.read(length))
+
+    def do_DELETE(self) -> None:
+        self._proxy(b"")
+
+    def _send(
+        self, status: int, content_type: str, body: bytes, headers: dict[str, str] | None = None
+    ) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str, headers: dict[str, str] | None = None) -> None:
+        body = json.dumps({"error": {"message": message, "type": "proxy_error"}}).encode()
+        self._send(status, "application/json", body, headers)
+
+    def _proxy(self, body: bytes) -> None:
+        if not self.path.startswith(API_PREFIX + "/"):
+            self._send_error(404, f"Not found: {self.path}. API paths start with {API_PREFIX}/.")
+            return
+        path = self.path[len(API_PREFIX) :]
+
+        key = None
+        cache = self.server.cache
+        no_cache = "no-cache" in self.headers.get("Cache-Control", "").lower()
+        if cache is not None and self.command == "POST" and not no_cache:
+            key = cache.key_for(
+                path.split("?")[0],
+                body,
+                sampled=cache.sampled or REPLAY_HEADER in self.headers,
+                authorization=self.headers.get("Authorization", ""),
+            )
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                self.server.metrics.count_request("hit")
+                self._send(
+                    cached.status,
+                    cached.content_type,
+                    cached.body,
+                    {"X-ShellGenius-Cache": "hit"},
+                )
+                return
+        cache_result = "miss" if key is not None else "bypass"
+        self.server.metrics.count_request(cache_result)
+
+        if self.server.rate_limit is not None:
+            wait = self.server.rate_limit.reserve()
+            if wait is None:
+                self.server.metrics.count("rate_limited")
+                self._send_error(
+                    429,
+                    "Local rate limit reached: too many requests through the proxy.",
+                    {"Retry-After": str(int(MAX_RATE_LIMIT_WAIT))},
+                )
+                return
+            if wait:
+                self.server.metrics.count("rate_limit_wait_seconds", wait)
+                time.sleep(wait)
+
+        self._forward(path, body, key, cache_result)
+
+    def _forward(self, path: str, body: bytes, key: bytes | None, cache_result: str) -> None:
+        headers = {
+            name: value
+            for name, value in self.headers.items()
+            if name.lower() not in _HOP_BY_HOP_HEADERS
+        }
+        start = time.monotonic()
+        replying = False
+        try:
+            with self.server.client.stream(
+                self.command, self.server.upstream + path, headers=headers, content=body
+            ) as upstream:
+                content_type = upstream.headers.get("content-type", "application/json")
+                replying = True
+                self.send_response(upstream.status_code)
+                for name, value in upstream.headers.items():
+                    if name.lower() not in _HOP_BY_HOP_HEADERS:
+                        self.send_header(name, value)
+                self.send_header("X-ShellGenius-Cache", cache_result)
+                self.end_headers()
+
+                # Stream chunks as they arrive; HTTP/1.0 ends the body at close.
+                received = bytearray()
+                for chunk in upstream.iter_bytes():
+                    self.wfile.write(chunk)
+                    self.wfile.flush()
+                    if key is not None:
+                        received += chunk
+        except httpx.HTTPError as error:
+            self.server.metrics.count("upstream_errors")
+            if replying:
+                # The status line went out already: cut the reply short, so
+                # the client sees an incomplete body rather than a bogus one.
+                self.close_connection = True
+                return
+            try:
+                self._send_error(502, f"Upstream request failed: {error}")
+            except OSError:
+                pass
+            return
+        finally:
+            self.server.metrics.count("upstream_seconds", time.monotonic() - start)
+            self.server.metrics.count("upstream_requests")
+
+        if key is not None and upstream.status_code == 200 and _is_complete(content_type, received):
+            self.server.cache.put(key, CachedReply(200, content_type, bytes(received)))
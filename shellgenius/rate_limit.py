@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import json
+import time
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from .storage import get_cache_dir, read_json, update_json
+
+RATE_LIMIT_FILE = "rate_limits.json"
+RATE_LIMIT_VERSION = 1
+
+# Limits a model has, as named in the ``x-ratelimit-*`` response headers.
+REQUESTS = "requests"
+TOKENS = "tokens"
+LIMIT_KINDS = (REQUESTS, TOKENS)
+
+# Longest a request is held back; past that it is sent anyway and the API
+# has the last word.
+MAX_PACING_WAIT = 60.0
+
+# Learned limits are forgotten after a day without responses, in case the
+# organization's limits changed meanwhile.
+LIMIT_MAX_AGE = 86400.0
+
+__all__ = [
+    "LIMIT_KINDS",
+    "MAX_PACING_WAIT",
+    "REQUESTS",
+    "TOKENS",
+    "Bucket",
+    "get_rate_limit_path",
+    "learn_from_response",
+    "learn_limits",
+    "load_rate_limits",
+    "pace",
+    "reserve",
+]
+
+
+@dataclass(frozen=True, slots=True)
+class Bucket:
+    """One per-minute limit of one model, shared by all ShellGenius processes.
+
+    The bucket holds up to ``limit`` and refills at ``limit`` per minute.
+    ``level`` is what was left at ``updated``; it goes below zero while
+    reserved requests wait for their turn.
+    """
+
+    limit: float
+    level: float
+    updated: float
+
+    def level_at(self, now: float) -> float:
+        return min(self.limit, self.level + max(now - self.updated, 0.0) * self.limit / 60)
+
+    def wait_for(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` is available, capped at a full bucket."""
+        missing = min(amount, self.limit) - self.level_at(now)
+        return max(missing, 0.0) * 60 / self.limit
+
+
+def get_rate_limit_path() -> Path:
+    return get_cache_dir() / RATE_LIMIT_FILE
+
+
+def _empty_limits() -> dict[str, Any]:
+    return {"version": RATE_LIMIT_VERSION, "models": {}}
+
+
+def _valid_limits(data: Any) -> dict[str, Any]:
+    if (
+        not isinstance(data, dict)
+        or data.get("version") != RATE_LIMIT_VERSION
+        or not isinstance(data.get("models"), dict)
+    ):
+        return _empty_limits()
+    return data
+
+
+def _bucket_from(entry: Any, now: float) -> Bucket | None:
+    try:
+        bucket = Bucket(float(entry["limit"]), float(entry["level"]), float(entry["updated"]))
+    except (TypeError, KeyError, ValueError):
+        return None
+    if bucket.limit <= 0 or now - bucket.updated > LIMIT_MAX_AGE:
+        return None
+    return bucket
+
+
+def _buckets_from(entry: Any, now: float) -> dict[str, Bucket]:
+    if not isinstance(entry, dict):
+        return {}
+    buckets = {kind: _bucket_from(entry.get(kind), now) for kind in LIMIT_KINDS}
+    return {kind: bucket for kind, bucket in buckets.items() if bucket is not None}
+
+
+def load_rate_limits() -> dict[str, dict[str, Bucket]]:
+    """Return the limits learned for each model, by kind."""
+    now = time.time()
+    models = _valid_limits(read_json(get_rate_limit_path()))["models"]
+    limits = {model: _buckets_from(entry, now) for model, entry in models.items()}
+    return {model: buckets for model, buckets in limits.items() if buckets}
+
+
+def _update(model: str, change: Callable[[dict[str, Bucket], float], dict[str, Bucket]]) -> None:
+    def update(data: Any) -> dict[str, Any]:
+        data = _valid_limits(data)
+        now = time.time()
+        buckets = change(_buckets_from(data["models"].get(model), now), now)
+        if buckets:
+            data["models"][model] = {
+                kind: {"limit": bucket.limit, "level": bucket.level, "updated": bucket.updated}
+                for kind, bucket in buckets.items()
+            }
+        else:
+            data["models"].pop(model, None)
+        return data
+
+    try:
+        update_json(get_rate_limit_path(), update)
+    except OSError:
+        pass
+
+
+def _header_number(headers: Mapping[str, str], name: str) -> float | None:
+    try:
+        value = float(headers[name])
+    except (KeyError, ValueError):
+        return None
+    return value if value >= 0 else None
+
+
+def learn_limits(model: str, headers: Mapping[str, str]) -> None:
+    """Record the limits of ``model`` reported in ``x-ratelimit-*`` headers.
+
+    The remaining amount replaces the local one only when lower: requests
+    other processes reserved may not have reached the API yet.
+    """
+    reported = {}
+    for kind in LIMIT_KINDS:
+        limit = _header_number(headers, f"x-ratelimit-limit-{kind}")
+        remaining = _header_number(headers, f"x-ratelimit-remaining-{kind}")
+        if limit:
+            reported[kind] = (limit, limit if remaining is None else min(remaining, limit))
+    if not reported:
+        return
+
+    def change(buckets: dict[str, Bucket], now: float) -> dict[str, Bucket]:
+        for kind, (limit, remaining) in reported.items():
+            bucket = buckets.get(kind)
+            if bucket is not None and bucket.limit == limit:
+                remaining = min(remaining, bucket.level_at(now))
+            buckets[kind] = Bucket(limit, remaining, now)
+        return buckets
+
+    _update(model, change)
+
+
+def learn_from_response(response: httpx.Response) -> None:
+    """An httpx response hook that learns limits from API responses."""
+    if not any(f"x-ratelimit-limit-{kind}" in response.headers for kind in LIMIT_KINDS):
+        return
+    try:
+        model = json.loads(response.request.content).get("model")
+    except (httpx.RequestNotRead, ValueError, AttributeError):
+        return
+    if isinstance(model, str):
+        learn_limits(model, response.headers)
+
+
+def reserve(model: str, tokens: int) -> float:
+    """Take one request and ``tokens`` from the limits of ``model``.
+
+    Returns the seconds to wait before sending, 0 if no limits are known.
+    The reservation is taken at once, so requests from other processes
+    queue up behind it.
+    """
+    if model not in load_rate_limits():
+        return 0.0
+    return _reserve(model, tokens)
+
+
+def _reserve(model: str, tokens: int) -> float:
+    wait = 0.0
+
+    def change(buckets: dict[str, Bucket], now: float) -> dict[str, Bucket]:
+        nonlocal wait
+        amounts = {REQUESTS: 1, TOKENS: tokens}
+        wait = max(
+            (bucket.wait_for(amounts[kind], now) for kind, bucket in buckets.items()),
+            default=0.0,
+        )
+        return {
+            kind: Bucket(bucket.limit, bucket.level_at(now) - amounts[kind], now)
+            for kind, bucket in buckets.items()
+        }
+
+    _update(model, change)
+    return wait
+
+
+def pace(
+    model: str,
+    estimate_tokens: Callable[[], int],
+    *,
+    max_wait: float = MAX_PACING_WAIT,
+    sleep: Callable[[float], None] = time.sleep,
+) -> float:
+    """Wait until a request to ``model`` fits its learned limits.
+
+    ``estimate_tokens`` is called only when limits are known; if it fails,
+    only the request itself is counted. Returns the seconds waited, at most
+    ``max_wait``.
+    """
+    if model not in load_rate_limits():
+        return 0.0
+    try:
+        tokens = estimate_tokens()
+    except Exception:
+        # Pacing is best effort and must never break the request.
+        tokens = 0
+    wait = min(_reserve(model, tokens), max_wait)
+    if wait > 0:
+        sleep(wait)
+    return wait
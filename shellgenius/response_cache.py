@@ -0,0 +1,389 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import re
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .segment_store import SegmentStore, SegmentWriter
+from .storage import get_cache_dir, read_json, update_json
+
+# Answers live in an append-only segment file with a memory-mapped index next
+# to it (see ``SegmentStore``); earlier versions kept them in one JSON file,
+# which the first write migrates.
+RESPONSE_CACHE_FILE = "responses.seg"
+LEGACY_RESPONSE_CACHE_FILE = "responses.json"
+LEGACY_RESPONSE_CACHE_VERSION = 1
+
+# Hit and miss counts of lookups made under a ``cache_ttl``.
+LOOKUPS_FILE = "response_lookups.json"
+LOOKUPS_VERSION = 1
+
+# Identifies exported cache bundles, gzip-compressed JSON documents.
+BUNDLE_FORMAT = "shellgenius-response-cache"
+BUNDLE_VERSION = 1
+
+# Oldest answers are dropped beyond this many tasks, by a compaction once
+# there are 10% more.
+MAX_CACHED_RESPONSES = 50_000
+
+# Freshness of a cached answer under a ``CacheTTL``: served as is, served
+# while refreshed in the background, or too old to serve.
+FRESH = "fresh"
+STALE = "stale"
+EXPIRED = "expired"
+
+# Upper bounds in seconds of the age buckets shown by `shellgenius cache stats`.
+AGE_BUCKETS = (("1h", 3600.0), ("1d", 86400.0), ("7d", 604800.0), ("30d", 2592000.0))
+
+_KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+__all__ = [
+    "AGE_BUCKETS",
+    "EXPIRED",
+    "FRESH",
+    "STALE",
+    "CacheTTL",
+    "CachedResponse",
+    "ResponseCacheStats",
+    "export_responses",
+    "get_response_cache_path",
+    "import_responses",
+    "lookup_response",
+    "prune_responses",
+    "record_lookup",
+    "response_cache_key",
+    "response_cache_stats",
+    "store_response",
+]
+
+
+@dataclass(frozen=True, slots=True)
+class CachedResponse:
+    """A previous answer for the same task, kept as a fallback."""
+
+    text: str
+    model: str
+    explain: bool
+    created: float
+
+    @property
+    def age_seconds(self) -> float:
+        return max(time.time() - self.created, 0.0)
+
+
+@dataclass(frozen=True, slots=True)
+class CacheTTL:
+    """When a cached answer may be served instead of asking the model.
+
+    Answers younger than ``soft`` seconds are fresh. Older ones are stale
+    and served while a refresh runs, until ``hard`` seconds (never if
+    ``None``), after which the caller waits for a new answer.
+    """
+
+    soft: float
+    hard: float | None = None
+
+    def freshness(self, age_seconds: float) -> str:
+        if age_seconds < self.soft:
+            return FRESH
+        if self.hard is None or age_seconds < self.hard:
+            return STALE
+        return EXPIRED
+
+
+@dataclass(frozen=True, slots=True)
+class ResponseCacheStats:
+    """Size, use, and age of the response cache."""
+
+    entries: int
+    size_bytes: int
+    hits: int
+    misses: int
+    models: dict[str, int]
+    # Entry counts per ``AGE_BUCKETS`` bucket, plus one for older entries.
+    ages: tuple[int, ...]
+
+    @property
+    def hit_rate(self) -> float | None:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+
+def get_response_cache_path() -> Path:
+    return get_cache_dir() / RESPONSE_CACHE_FILE
+
+
+def _store() -> SegmentStore:
+    return SegmentStore(get_response_cache_path())
+
+
+def response_cache_key(command_description: str, os_name: str) -> str:
+    """Key answers by task and OS, ignoring case and whitespace differences.
+
+    The model and template are left out on purpose: a fallback answer from
+    another model is better than none.
+    """
+    task = " ".join(command_description.split()).casefold()
+    return hashlib.sha256(f"{os_name.lower()}\0{task}".encode()).hexdigest()
+
+
+def _key_bytes(key: str) -> bytes | None:
+    return bytes.fromhex(key) if _KEY_PATTERN.fullmatch(key) else None
+
+
+def _payload(text: str, model: str, explain: bool) -> bytes:
+    return json.dumps({"text": text, "model": model, "explain": explain}).encode()
+
+
+def _cached_response(created: float, payload: bytes) -> CachedResponse | None:
+    try:
+        entry = json.loads(payload)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None
+    if not isinstance(entry, dict) or not isinstance(entry.get("text"), str):
+        return None
+    return CachedResponse(
+        text=entry["text"],
+        model=str(entry.get("model", "")),
+        explain=bool(entry.get("explain", True)),
+        created=created,
+    )
+
+
+def _migrate_legacy_cache(writer: SegmentWriter) -> None:
+    path = get_cache_dir() / LEGACY_RESPONSE_CACHE_FILE
+    if not path.exists():
+        return
+    data = read_json(path)
+    if isinstance(data, dict) and data.get("version") == LEGACY_RESPONSE_CACHE_VERSION:
+        entries = data.get("entries")
+        for key, entry in (entries if isinstance(entries, dict) else {}).items():
+            key_bytes = _key_bytes(key)
+            if key_bytes is None or not isinstance(entry, dict):
+                continue
+            if not isinstance(entry.get("text"), str):
+                continue
+            created = entry.get("created")
+            writer.put(
+                key_bytes,
+                float(created) if isinstance(created, (int, float)) else 0.0,
+                _payload(
+                    entry["text"], str(entry.get("model", "")), entry.get("explain") is not False
+                ),
+            )
+    path.unlink()
+
+
+@contextmanager
+def _writer() -> Iterator[SegmentWriter]:
+    """Open the cache for writing, and compact it when it grew too large or sparse."""
+    with _store().writer() as writer:
+        _migrate_legacy_cache(writer)
+        yield writer
+        if writer.count > MAX_CACHED_RESPONSES * 1.1:
+            writer.compact(max_records=MAX_CACHED_RESPONSES)
+        elif writer.needs_compaction():
+            writer.compact()
+
+
+def _responses() -> Iterator[tuple[str, CachedResponse]]:
+    """Yield every cached answer with its key, least recently stored first."""
+    for key, created, payload in _store().items():
+        response = _cached_response(created, payload)
+        if response is not None:
+            yield key.hex(), response
+
+
+def lookup_response(key: str) -> CachedResponse | None:
+    key_bytes = _key_bytes(key)
+    if key_bytes is None:
+        return None
+    store = _store()
+    if not store.path.exists() and (get_cache_dir() / LEGACY_RESPONSE_CACHE_FILE).exists():
+        try:
+            with _writer():
+                pass
+        except OSError:
+            return None
+    record = store.get(key_bytes)
+    return None if record is None else _cached_response(*record)
+
+
+def store_response(
+    key: str, text: str, *, model: str, explain: bool, created: float | None = None
+) -> None:
+    """Remember ``text`` as the latest answer for ``key``.
+
+    ``created`` defaults to now. Failures to write are ignored: the cache
+    must never break a request.
+    """
+    key_bytes = _key_bytes(key)
+    if key_bytes is None:
+        return
+    try:
+        with _writer() as writer:
+            writer.put(
+                key_bytes,
+                time.time() if created is None else created,
+                _payload(text, model, explain),
+            )
+    except OSError:
+        pass
+
+
+def _get_lookups_path() -> Path:
+    return get_cache_dir() / LOOKUPS_FILE
+
+
+def _valid_lookups(data: Any) -> dict[str, Any]:
+    if not isinstance(data, dict) or data.get("version") != LOOKUPS_VERSION:
+        return {"version": LOOKUPS_VERSION, "hits": 0, "misses": 0}
+    return data
+
+
+def record_lookup(*, hit: bool) -> None:
+    """Count a lookup that could have replaced a request, for the hit rate."""
+
+    def update(data: Any) -> dict[str, Any]:
+        data = _valid_lookups(data)
+        counter = "hits" if hit else "misses"
+        count = data.get(counter)
+        data[counter] = (count if isinstance(count, int) else 0) + 1
+        return data
+
+    try:
+        update_json(_get_lookups_path(), update)
+    except OSError:
+        pass
+
+
+def response_cache_stats() -> ResponseCacheStats:
+    models: dict[str, int] = {}
+    ages = [0] * (len(AGE_BUCKETS) + 1)
+    entries = 0
+    for _, response in _responses():
+        entries += 1
+        models[response.model] = models.get(response.model, 0) + 1
+        bucket = next(
+            (index for index, (_, limit) in enumerate(AGE_BUCKETS) if response.age_seconds < limit),
+            len(AGE_BUCKETS),
+        )
+        ages[bucket] += 1
+
+    lookups = _valid_lookups(read_json(_get_lookups_path()))
+    hits, misses = lookups.get("hits"), lookups.get("misses")
+    return ResponseCacheStats(
+        entries=entries,
+        size_bytes=_store().size_bytes(),
+        hits=hits if isinstance(hits, int) else 0,
+        misses=misses if isinstance(misses, int) else 0,
+        models=dict(sorted(models.items(), key=lambda item: (-item[1], item[0]))),
+        ages=tuple(ages),
+    )
+
+
+def prune_responses(
+    *,
+    max_age: float | None = None,
+    max_entries: int | None = None,
+    models: tuple[str, ...] = (),
+) -> int:
+    """Delete answers older than ``max_age`` seconds or from ``models``.
+
+    Then keep at most ``max_entries`` of the newest ones. Returns the
+    number of answers deleted.
+    """
+
+    def keep(key: bytes, created: float, payload: bytes) -> bool:
+        response = _cached_response(created, payload)
+        if response is None or response.model in models:
+            return False
+        return max_age is None or response.age_seconds <= max_age
+
+    with _writer() as writer:
+        return writer.compact(keep, max_records=max_entries)
+
+
+def export_responses(path: Path, *, models: tuple[str, ...] = ()) -> int:
+    """Write the cached answers, or those from ``models``, to a bundle at ``path``.
+
+    Returns the number of answers written.
+    """
+    responses = {
+        key: {
+            "text": response.text,
+            "model": response.model,
+            "explain": response.explain,
+            "created": response.created,
+        }
+        for key, response in _responses()
+        if not models or response.model in models
+    }
+    bundle = {"format": BUNDLE_FORMAT, "version": BUNDLE_VERSION, "entries": responses}
+    with gzip.open(path, "wt", encoding="utf-8") as bundle_file:
+        bundle_file.write(json.dumps(bundle, separators=(",", ":")))
+    return len(responses)
+
+
+def _read_bundle(path: Path) -> dict[str, CachedResponse]:
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as bundle_file:
+            bundle = json.loads(bundle_file.read())
+    except (OSError, EOFError, UnicodeDecodeError, json.JSONDecodeError) as error:
+        raise ValueError(f"{path} is not a response cache bundle: {error}") from error
+    if (
+        not isinstance(bundle, dict)
+        or bundle.get("format") != BUNDLE_FORMAT
+        or not isinstance(bundle.get("entries"), dict)
+    ):
+        raise ValueError(f"{path} is not a response cache bundle.")
+    if bundle.get("version") != BUNDLE_VERSION:
+        raise ValueError(f"{path} has unsupported bundle version {bundle.get('version')!r}.")
+
+    responses = {}
+    for key, entry in bundle["entries"].items():
+        if not _KEY_PATTERN.fullmatch(key) or not isinstance(entry, dict):
+            continue
+        created = entry.get("created")
+        response = _cached_response(
+            float(created) if isinstance(created, (int, float)) else 0.0,
+            _payload(
+                entry.get("text"), str(entry.get("model", "")), entry.get("explain") is not False
+            ),
+        )
+        if response is not None:
+            responses[key] = response
+    return responses
+
+
+def import_responses(path: Path, *, as_new: bool = False) -> int:
+    """Merge the answers of the bundle at ``path`` into the response cache.
+
+    An answer replaces the cached one for the same task only if it is newer.
+    With ``as_new``, imported answers count as created now, so they start
+    fresh under a ``cache_ttl``. Returns the number of answers imported.
+    Raises ``ValueError`` if ``path`` is not a valid bundle.
+    """
+    responses = _read_bundle(path)
+    now = time.time()
+    imported = 0
+    with _writer() as writer:
+        # Oldest first, so the cache keeps its least recently stored answers first.
+        for key, response in sorted(responses.items(), key=lambda item: item[1].created):
+            key_bytes = bytes.fromhex(key)
+            created = now if as_new else response.created
+            current = writer.get(key_bytes)
+            if current is not None and current[0] >= created:
+                continue
+            writer.put(
+                key_bytes, created, _payload(response.text, response.model, response.explain)
+            )
+            imported += 1
+    return imported
@@ -30,7 +30,14 @@ def validate_executable_shell_response(response: ParsedShellResponse) -> None:
     )
 
 
-def parse_shellgenius_response(text: str) -> ParsedShellResponse:
+def parse_shellgenius_response(text: str, *, command_only: bool = False) -> ParsedShellResponse:
+    """Split a response into its command and explanation.
+
+    With ``command_only`` the response follows the command-only contract,
+    which has no explanation: a blank line no longer ends the command, so
+    multi-line commands with blank lines are kept whole. An explanation the
+    model adds anyway is still split off at its heading or bullet list.
+    """
     normalized_text = text.replace("\r\n", "\n").replace("\r", "\n")
     stripped_text = normalized_text.lstrip()
 
@@ -45,10 +52,15 @@ def parse_shellgenius_response(text: str) -> ParsedShellResponse:
     remaining_text = stripped_text[opening_line_end + 1 :]
     closing_fence_match: re.Match[str] | None = None
 
-    for match in re.finditer(r"(?m)^[ \t]*```[ \t]*$", remaining_text):
-        if _starts_with_explanation(remaining_text[match.end() :]):
-            closing_fence_match = match
-            break
+    fence_matches = list(re.finditer(r"(?m)^[ \t]*```[ \t]*$", remaining_text))
+    if command_only:
+        closing_fence_match = _command_only_closing_fence(remaining_text, fence_matches)
+
+    if closing_fence_match is None:
+        for match in fence_matches:
+            if _starts_with_explanation(remaining_text[match.end() :]):
+                closing_fence_match = match
+                break
 
     if closing_fence_match is None:
         raise ShellGeniusResponseError("Closing code fence is missing.")
@@ -82,6 +94,16 @@ def _normalize_explanation(explanation: str) -> str:
     return match.group("body").lstrip()
 
 
+def _command_only_closing_fence(
+    text: str, fence_matches: list[re.Match[str]]
+) -> re.Match[str] | None:
+    for match in fence_matches:
+        tail = text[match.end() :]
+        if not tail.strip() or _starts_with_explanation_marker(tail.lstrip()):
+            return match
+    return None
+
+
 def _starts_with_explanation(text: str) -> bool:
     stripped_text = text.lstrip()
     if not stripped_text:
@@ -90,6 +112,10 @@ def _starts_with_explanation(text: str) -> bool:
     if _starts_with_blank_line(text) and not stripped_text.startswith("```"):
         return True
 
+    return _starts_with_explanation_marker(stripped_text)
+
+
+def _starts_with_explanation_marker(stripped_text: str) -> bool:
     if re.match(
         r"^(?:#{1,6}\s*)?\*{0,2}Explanation\*{0,2}\s*:?(?:\n|\s|$)",
         stripped_text,
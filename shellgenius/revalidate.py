@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+
+from .config import BATCH, load_settings
+from .response_cache import FRESH, lookup_response, response_cache_key, store_response
+from .single_flight import SingleFlight, get_inflight_dir
+from .storage import FileLock
+
+# Background refreshes running at once across all processes. Each one holds
+# one of these slot locks; when all are taken, stale answers wait for a later
+# invocation to refresh them.
+MAX_REFRESHES = 2
+
+__all__ = ["MAX_REFRESHES", "refresh_response", "revalidate", "spawn_revalidation"]
+
+
+def spawn_revalidation(
+    command_description: str, os_name: str, *, model: str, explain: bool
+) -> bool:
+    """Refresh the cached answer to a task in a detached process.
+
+    The process outlives this one, so the stale answer can be shown and the
+    shell prompt returned at once. Returns whether a process was started:
+    none is when the task is already being generated or refreshed.
+    """
+    flight = SingleFlight(response_cache_key(command_description, os_name))
+    if not flight.try_lead():
+        return False
+    flight.release()
+
+    task = json.dumps(
+        {"task": command_description, "os_name": os_name, "model": model, "explain": explain}
+    )
+    if os.name == "nt":
+        detach = {
+            "creationflags": subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        }
+    else:
+        detach = {"start_new_session": True}
+    try:
+        subprocess.Popen(
+            [sys.executable, "-m", "shellgenius.revalidate", task],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            **detach,
+        )
+    except OSError:
+        return False
+    return True
+
+
+def _acquire_refresh_slot() -> FileLock | None:
+    for slot in range(MAX_REFRESHES):
+        lock = FileLock(get_inflight_dir() / f"refresh-{slot}.lock")
+        try:
+            if lock.acquire(timeout=0):
+                return lock
+        except OSError:
+            return None
+    return None
+
+
+def refresh_response(
+    command_description: str, os_name: str, *, model: str, explain: bool, settings
+) -> bool:
+    """Ask ``model`` for a task and store a parseable answer in the response cache.
+
+    Background traffic uses the ``batch`` service tier. API errors
+    propagate; returns whether an answer was stored.
+    """
+    from .gpt_integration import chatgpt_request, format_prompt
+    from .response_parser import ShellGeniusResponseError, parse_shellgenius_response
+
+    request_options = {
+        name: value
+        for name, value in (
+            ("service_tier", settings.service_tier_for(BATCH)),
+            ("fallback_model", settings.fallback_for(model)),
+        )
+        if value is not None
+    }
+    text, _, _ = chatgpt_request(
+        format_prompt(command_description, os_name, explain=explain),
+        model=model,
+        stream=False,
+        **request_options,
+    )
+    try:
+        parse_shellgenius_response(text, command_only=not explain)
+    except ShellGeniusResponseError:
+        return False
+    store_response(
+        response_cache_key(command_description, os_name), text, model=model, explain=explain
+    )
+    return True
+
+
+def revalidate(command_description: str, os_name: str, *, model: str, explain: bool) -> bool:
+    """Ask ``model`` again for a task and store the answer in the response cache.
+
+    Skipped when every refresh slot is taken, when another process is
+    already generating the task, or when the cached answer turned fresh in
+    the meantime. Returns whether a new answer was stored.
+    """
+    settings = load_settings()
+    ttl = settings.cache_ttl_for(model)
+    key = response_cache_key(command_description, os_name)
+    slot = _acquire_refresh_slot()
+    if slot is None:
+        return False
+    flight = SingleFlight(key)
+    try:
+        if not flight.try_lead():
+            return False
+        cached = lookup_response(key)
+        if ttl is not None and cached is not None and ttl.freshness(cached.age_seconds) == FRESH:
+            return False
+        return refresh_response(
+            command_description, os_name, model=model, explain=explain, settings=settings
+        )
+    finally:
+        flight.release()
+        slot.release()
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = sys.argv[1:] if argv is None else argv
+    try:
+        task = json.loads(args[0])
+        revalidate(
+            task["task"], task["os_name"], model=task["model"], explain=bool(task["explain"])
+        )
+    except Exception:
+        # Nobody sees this process's output; the stale answer simply stays.
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
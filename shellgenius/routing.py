@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+from .model_stats import EXPLAIN, estimate_usage, latency_quantile, parse_success_rate
+
+# Value of ``--model`` that picks a model per task.
+AUTO_MODEL = "auto"
+
+# Models ``--model auto`` chooses from, smallest first.
+AUTO_MODELS = ("gpt-5.4-nano", "gpt-5.4-mini", "gpt-5.4")
+
+SIMPLE = "simple"
+MODERATE = "moderate"
+COMPLEX = "complex"
+
+# Smallest model size class for each task complexity: 0 nano, 1 mini, 2 full.
+_MIN_SIZE = {SIMPLE: 0, MODERATE: 1, COMPLEX: 2}
+
+# Tasks longer than these token counts get one complexity point each.
+_LONG_TASK_TOKENS = (16, 48)
+
+# Characters per token in English text, for estimating a task's length
+# without loading a tokenizer.
+_CHARS_PER_TOKEN = 4
+
+# Words that tend to need multi-step commands or careful quoting.
+_COMPLEX_KEYWORDS = frozenset(
+    {
+        "awk",
+        "cron",
+        "csv",
+        "docker",
+        "json",
+        "kubectl",
+        "loop",
+        "parallel",
+        "parse",
+        "recursively",
+        "regex",
+        "retry",
+        "rsync",
+        "script",
+        "sed",
+        "ssh",
+        "xargs",
+    }
+)
+_CLAUSE_PATTERN = re.compile(r",|;|\b(?:and|then|but|except|while)\b")
+
+# Models whose answers parse less often than this, over at least
+# ``MIN_PARSE_SAMPLES`` answers, are skipped while another one qualifies.
+MIN_PARSE_SUCCESS = 0.9
+MIN_PARSE_SAMPLES = 5
+
+__all__ = [
+    "AUTO_MODEL",
+    "AUTO_MODELS",
+    "COMPLEX",
+    "MODERATE",
+    "SIMPLE",
+    "ModelChoice",
+    "TaskProfile",
+    "choose_model",
+    "classify_task",
+    "estimate_task_tokens",
+]
+
+
+@dataclass(frozen=True, slots=True)
+class TaskProfile:
+    """How demanding a task looks, and why."""
+
+    complexity: str
+    tokens: int
+    reasons: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class ModelChoice:
+    """The model ``--model auto`` picked, with the numbers behind it."""
+
+    model: str
+    task: TaskProfile
+    p50_latency: float
+    parse_success: float
+    parse_samples: int
+    observed: bool
+
+    @property
+    def reliable(self) -> bool:
+        return self.parse_success >= MIN_PARSE_SUCCESS or self.parse_samples < MIN_PARSE_SAMPLES
+
+    @property
+    def expected_seconds(self) -> float:
+        """p50 latency inflated by the retries that unparseable answers cost."""
+        return self.p50_latency / max(self.parse_success, 0.01)
+
+    def describe(self) -> str:
+        reasons = ", ".join((f"~{self.task.tokens} tokens", *self.task.reasons))
+        source = "observed" if self.observed else "default estimate"
+        return (
+            f"{self.model} for a {self.task.complexity} task ({reasons}); "
+            f"p50 {self.p50_latency:.2f}s ({source}), parse success {self.parse_success:.0%}"
+        )
+
+
+def estimate_task_tokens(command_description: str) -> int:
+    """Roughly count the tokens of a task from its length.
+
+    Routing only compares the count with coarse limits, and the tokenizer
+    may need a download, which must not delay or break the request.
+    """
+    return -(-len(command_description.strip()) // _CHARS_PER_TOKEN)
+
+
+def classify_task(command_description: str, tokens: int) -> TaskProfile:
+    """Classify a task locally from its length, keywords, and clauses."""
+    reasons = []
+    points = sum(tokens > limit for limit in _LONG_TASK_TOKENS)
+
+    words = set(re.findall(r"[a-z]+", command_description.lower()))
+    keywords = sorted(words & _COMPLEX_KEYWORDS)
+    if keywords:
+        points += min(len(keywords), 2)
+        reasons.append("keywords: " + ", ".join(keywords))
+
+    clauses = len(_CLAUSE_PATTERN.findall(command_description.lower())) + 1
+    if clauses >= 3:
+        points += 1
+        reasons.append(f"{clauses} clauses")
+
+    complexity = SIMPLE if points == 0 else MODERATE if points <= 2 else COMPLEX
+    return TaskProfile(complexity=complexity, tokens=tokens, reasons=tuple(reasons))
+
+
+def _size_class(model: str) -> int:
+    if model.endswith("-nano"):
+        return 0
+    if model.endswith("-mini"):
+        return 1
+    return 2
+
+
+def _p50_latency(model: str, kind: str) -> tuple[float, bool]:
+    observed = latency_quantile(model, 0.5, kind)
+    if observed is not None:
+        return observed, True
+    return estimate_usage(model, kind).latency_seconds, False
+
+
+def choose_model(
+    command_description: str,
+    tokens: int,
+    *,
+    kind: str = EXPLAIN,
+    models: tuple[str, ...] = AUTO_MODELS,
+) -> ModelChoice:
+    """Pick the model expected to give a usable answer soonest.
+
+    Models too small for the task's complexity are skipped, and so are
+    models with a poor parse-success record while others remain. Of the
+    rest, the one with the lowest p50 latency divided by its parse-success
+    rate wins: an answer that does not parse costs a second request.
+    Latencies are those of requests of ``kind``.
+    """
+    task = classify_task(command_description, tokens)
+    large_enough = [model for model in models if _size_class(model) >= _MIN_SIZE[task.complexity]]
+    candidates = large_enough or list(models)
+
+    choices = []
+    for model in candidates:
+        parse_success, samples = parse_success_rate(model)
+        latency, observed = _p50_latency(model, kind)
+        choices.append(ModelChoice(model, task, latency, parse_success, samples, observed))
+
+    reliable = [choice for choice in choices if choice.reliable]
+    return min(reliable or choices, key=lambda choice: choice.expected_seconds)
@@ -0,0 +1,444 @@
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import zlib
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from .storage import FileLock
+
+# Segment file: a header, then records appended in store order. A record is a
+# fixed header (magic, 32-byte key, creation time, payload length, CRC-32 of
+# key, time, and payload) followed by the zlib-compressed payload.
+_SEGMENT_HEADER = struct.Struct("<4sH2x16s")
+_SEGMENT_MAGIC = b"SGSG"
+_RECORD_HEADER = struct.Struct("<2s32sdII")
+_RECORD_MAGIC = b"RC"
+
+# Index file: a header, then an open-addressing hash table of 16-byte slots
+# probed linearly. A slot holds the first 8 bytes of the key and the record's
+# offset plus one (0 marks an empty slot) packed with its size.
+_INDEX_HEADER = struct.Struct("<4sH2x16sQQQQ")
+_INDEX_HEADER_SIZE = 64
+_INDEX_MAGIC = b"SGIX"
+_SLOT = struct.Struct("<QQ")
+_OFFSET_BITS = 40
+_OFFSET_MASK = (1 << _OFFSET_BITS) - 1
+
+FORMAT_VERSION = 1
+
+KEY_SIZE = 32
+
+# The index doubles when more than this share of its slots is used.
+MAX_LOAD_FACTOR = 0.7
+MIN_INDEX_SLOTS = 1024
+
+# Compaction rewrites the segment once superseded records take more space
+# than live ones, but not for segments smaller than this.
+COMPACT_MIN_BYTES = 1 << 20
+
+__all__ = ["KEY_SIZE", "SegmentStore", "SegmentWriter"]
+
+
+def _key_prefix(key: bytes) -> int:
+    return int.from_bytes(key[:8], "little")
+
+
+def _pack_slot(offset: int, size: int) -> int:
+    return (offset + 1) | (size << _OFFSET_BITS)
+
+
+def _unpack_slot(value: int) -> tuple[int, int]:
+    return (value & _OFFSET_MASK) - 1, value >> _OFFSET_BITS
+
+
+def _encode_record(key: bytes, created: float, payload: bytes) -> bytes:
+    data = zlib.compress(payload)
+    checksum = zlib.crc32(data, zlib.crc32(key + struct.pack("<d", created)))
+    return _RECORD_HEADER.pack(_RECORD_MAGIC, key, created, len(data), checksum) + data
+
+
+def _decode_record(record: bytes, key: bytes | None = None) -> tuple[bytes, float, bytes] | None:
+    """Return ``(key, created, payload)``, or ``None`` if ``record`` is torn or corrupt."""
+    if len(record) < _RECORD_HEADER.size:
+        return None
+    magic, record_key, created, length, checksum = _RECORD_HEADER.unpack_from(record)
+    data = record[_RECORD_HEADER.size : _RECORD_HEADER.size + length]
+    if magic != _RECORD_MAGIC or len(data) != length or (key is not None and record_key != key):
+        return None
+    if zlib.crc32(data, zlib.crc32(record_key + struct.pack("<d", created))) != checksum:
+        return None
+    try:
+        return record_key, created, zlib.decompress(data)
+    except zlib.error:
+        return None
+
+
+class SegmentStore:
+    """Key-value records in an append-only, compressed segment file with a hash index.
+
+    ``path`` is the segment; the index sits next to it with an ``.idx``
+    suffix, and writers serialize on a ``.lock`` file. Lookups take no lock:
+    they probe the memory-mapped index and read one record, whose key and
+    checksum are verified, so a torn or stale index can only cause a miss.
+    Writers append, then update the index; after a crash, the next writer
+    truncates a torn last record and re-indexes what the index missed.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.index_path = path.with_name(path.name + ".idx")
+        self.lock_path = path.with_name(path.name + ".lock")
+
+    def get(self, key: bytes) -> tuple[float, bytes] | None:
+        """Return ``(created, payload)`` for ``key``, or ``None``."""
+        try:
+            with open(self.index_path, "rb") as index_file:
+                if os.fstat(index_file.fileno()).st_size < _INDEX_HEADER_SIZE:
+                    return None
+                with mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as index:
+                    location = _probe(index, key)
+            if location is None:
+                return None
+            offset, size = location
+            with open(self.path, "rb") as segment:
+                segment.seek(offset)
+                record = _decode_record(segment.read(size), key)
+        except (OSError, ValueError):
+            return None
+        return None if record is None else record[1:]
+
+    def items(self) -> Iterator[tuple[bytes, float, bytes]]:
+        """Yield ``(key, created, payload)`` of every live record, oldest first."""
+        try:
+            with open(self.index_path, "rb") as index_file:
+                if os.fstat(index_file.fileno()).st_size < _INDEX_HEADER_SIZE:
+                    return
+                with mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as index:
+                    locations = sorted(_live_slots(index))
+            with open(self.path, "rb") as segment:
+                for offset, size in locations:
+                    segment.seek(offset)
+                    record = _decode_record(segment.read(size))
+                    if record is not None:
+                        yield record
+        except (OSError, ValueError):
+            return
+
+    def size_bytes(self) -> int:
+        size = 0
+        for path in (self.path, self.index_path):
+            try:
+                size += path.stat().st_size
+            except OSError:
+                pass
+        return size
+
+    @contextmanager
+    def writer(self) -> Iterator[SegmentWriter]:
+        """Open the store for writing under its cross-process lock."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with FileLock(self.lock_path):
+            writer = SegmentWriter(self)
+            try:
+                yield writer
+            finally:
+                writer.close()
+
+
+def _header(index) -> tuple[bytes, int, int, int, int] | None:
+    magic, version, generation, capacity, used, live_bytes, indexed_size = (
+        _INDEX_HEADER.unpack_from(index)
+    )
+    if (
+        magic != _INDEX_MAGIC
+        or version != FORMAT_VERSION
+        or capacity == 0
+        or len(index) < _INDEX_HEADER_SIZE + capacity * _SLOT.size
+    ):
+        return None
+    return generation, capacity, used, live_bytes, indexed_size
+
+
+def _probe(index, key: bytes) -> tuple[int, int] | None:
+    header = _header(index)
+    if header is None:
+        return None
+    capacity = header[1]
+    prefix = _key_prefix(key)
+    slot = prefix % capacity
+    for _ in range(capacity):
+        slot_prefix, value = _SLOT.unpack_from(index, _INDEX_HEADER_SIZE + slot * _SLOT.size)
+        if value == 0:
+            return None
+        if slot_prefix == prefix:
+            return _unpack_slot(value)
+        slot = (slot + 1) % capacity
+    return None
+
+
+def _live_slots(index) -> Iterator[tuple[int, int]]:
+    header = _header(index)
+    if header is None:
+        return
+    for slot in range(header[1]):
+        _, value = _SLOT.unpack_from(index, _INDEX_HEADER_SIZE + slot * _SLOT.size)
+        if value:
+            yield _unpack_slot(value)
+
+
+class SegmentWriter:
+    """Appends records and keeps the index in step; use ``SegmentStore.writer``."""
+
+    def __init__(self, store: SegmentStore) -> None:
+        self.store = store
+        self._segment = None
+        self._index_file = None
+        self._index = None
+        self._open_segment()
+        self._open_index()
+
+    # -- opening and recovery --------------------------------------------------
+
+    def _open_segment(self) -> None:
+        try:
+            segment = open(self.store.path, "r+b")
+        except FileNotFoundError:
+            self._create_segment()
+            return
+        header = segment.read(_SEGMENT_HEADER.size)
+        if len(header) == _SEGMENT_HEADER.size:
+            magic, version, generation = _SEGMENT_HEADER.unpack(header)
+            if magic == _SEGMENT_MAGIC and version == FORMAT_VERSION:
+                self._segment, self.generation = segment, generation
+                return
+        # Not a segment this version can read: start over, it is only a cache.
+        segment.close()
+        self._create_segment()
+
+    def _create_segment(self, records: Iterable[bytes] = ()) -> None:
+        generation = os.urandom(16)
+        temp_path = self.store.path.with_name(self.store.path.name + ".tmp")
+        with open(temp_path, "wb") as temp_file:
+            temp_file.write(_SEGMENT_HEADER.pack(_SEGMENT_MAGIC, FORMAT_VERSION, generation))
+            for record in records:
+                temp_file.write(record)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        if self._segment is not None:
+            self._segment.close()
+        os.replace(temp_path, self.store.path)
+        self._segment = open(self.store.path, "r+b")
+        self.generation = generation
+
+    def _open_index(self) -> None:
+        try:
+            index_file = open(self.store.index_path, "r+b")
+        except FileNotFoundError:
+            self._rebuild_index()
+            return
+        index = None
+        if os.fstat(index_file.fileno()).st_size >= _INDEX_HEADER_SIZE:
+            index = mmap.mmap(index_file.fileno(), 0)
+            header = _header(index)
+            if header is not None and header[0] == self.generation:
+                self._index_file, self._index = index_file, index
+                indexed_size = header[4]
+                segment_size = self._segment_size()
+                if indexed_size < segment_size:
+                    self._index_records(indexed_size)
+                    return
+                if indexed_size == segment_size:
+                    return
+            self._index_file = self._index = None
+            index.close()
+        index_file.close()
+        self._rebuild_index()
+
+    def _segment_size(self) -> int:
+        return os.fstat(self._segment.fileno()).st_size
+
+    def _rebuild_index(self) -> None:
+        self._write_index(MIN_INDEX_SLOTS, (), indexed_size=_SEGMENT_HEADER.size)
+        self._index_records(_SEGMENT_HEADER.size)
+
+    def _index_records(self, start: int) -> None:
+        """Index the records from ``start`` on, truncating a torn last record."""
+        start = max(start, _SEGMENT_HEADER.size)
+        self._segment.seek(start)
+        data = self._segment.read()
+        position = 0
+        while position < len(data):
+            record = None
+            if len(data) - position >= _RECORD_HEADER.size:
+                size = _RECORD_HEADER.size + _RECORD_HEADER.unpack_from(data, position)[3]
+                record = _decode_record(data[position : position + size])
+            if record is None:
+                self._segment.truncate(start + position)
+                break
+            self._set(record[0], start + position, size)
+            position += size
+            self._set_indexed_size(start + position)
+
+    def _write_index(
+        self, capacity: int, slots: Iterable[tuple[int, int]], *, indexed_size: int
+    ) -> None:
+        """Replace the index with one of ``capacity`` slots holding ``slots``."""
+        temp_path = self.store.index_path.with_name(self.store.index_path.name + ".tmp")
+        with open(temp_path, "wb") as temp_file:
+            temp_file.truncate(_INDEX_HEADER_SIZE + capacity * _SLOT.size)
+        if self._index is not None:
+            self._index.close()
+            self._index_file.close()
+        index_file = open(temp_path, "r+b")
+        index = mmap.mmap(index_file.fileno(), 0)
+        _INDEX_HEADER.pack_into(
+            index, 0, _INDEX_MAGIC, FORMAT_VERSION, self.generation, capacity, 0, 0, indexed_size
+        )
+        self._index_file, self._index = index_file, index
+        for prefix, value in slots:
+            self._insert_slot(prefix, value)
+        os.replace(temp_path, self.store.index_path)
+
+    # -- index updates ---------------------------------------------------------
+
+    def _header(self) -> tuple[bytes, int, int, int, int]:
+        return _header(self._index)
+
+    def _set_header(self, *, used: int, live_bytes: int, indexed_size: int) -> None:
+        _, capacity = self._header()[:2]
+        _INDEX_HEADER.pack_into(
+            self._index,
+            0,
+            _INDEX_MAGIC,
+            FORMAT_VERSION,
+            self.generation,
+            capacity,
+            used,
+            live_bytes,
+            indexed_size,
+        )
+
+    def _set_indexed_size(self, indexed_size: int) -> None:
+        _, _, used, live_bytes, _ = self._header()
+        self._set_header(used=used, live_bytes=live_bytes, indexed_size=indexed_size)
+
+    def _insert_slot(self, prefix: int, value: int) -> int | None:
+        """Point the slot of ``prefix`` at ``value``; return the size it replaced."""
+        _, capacity, used, live_bytes, indexed_size = self._header()
+        slot = prefix % capacity
+        while True:
+            position = _INDEX_HEADER_SIZE + slot * _SLOT.size
+            slot_prefix, old_value = _SLOT.unpack_from(self._index, position)
+            if old_value == 0 or slot_prefix == prefix:
+                break
+            slot = (slot + 1) % capacity
+        _SLOT.pack_into(self._index, position, prefix, value)
+        replaced = _unpack_slot(old_value)[1] if old_value else None
+        self._set_header(
+            used=used + (replaced is None),
+            live_bytes=live_bytes - (replaced or 0) + _unpack_slot(value)[1],
+            indexed_size=indexed_size,
+        )
+        return replaced
+
+    def _set(self, key: bytes, offset: int, size: int) -> None:
+        _, capacity, used, _, _ = self._header()
+        if used + 1 > capacity * MAX_LOAD_FACTOR:
+            slots = list(self._slots())
+            self._write_index(capacity * 2, slots, indexed_size=self._header()[4])
+        self._insert_slot(_key_prefix(key), _pack_slot(offset, size))
+
+    def _slots(self) -> Iterator[tuple[int, int]]:
+        for slot in range(self._header()[1]):
+            prefix, value = _SLOT.unpack_from(self._index, _INDEX_HEADER_SIZE + slot * _SLOT.size)
+            if value:
+                yield prefix, value
+
+    # -- public API ------------------------------------------------------------
+
+    @property
+    def count(self) -> int:
+        return self._header()[2]
+
+    @property
+    def live_bytes(self) -> int:
+        return self._header()[3]
+
+    def put(self, key: bytes, created: float, payload: bytes) -> None:
+        """Append a record for ``key``, superseding any earlier one."""
+        if len(key) != KEY_SIZE:
+            raise ValueError(f"Keys must be {KEY_SIZE} bytes.")
+        record = _encode_record(key, created, payload)
+        offset = self._segment_size()
+        self._segment.seek(offset)
+        self._segment.write(record)
+        self._segment.flush()
+        # The record is complete on disk before the index points at it.
+        self._set(key, offset, len(record))
+        self._set_indexed_size(offset + len(record))
+
+    def get(self, key: bytes) -> tuple[float, bytes] | None:
+        location = _probe(self._index, key)
+        if location is None:
+            return None
+        offset, size = location
+        self._segment.seek(offset)
+        record = _decode_record(self._segment.read(size), key)
+        return None if record is None else record[1:]
+
+    def items(self) -> Iterator[tuple[bytes, float, bytes]]:
+        """Yield ``(key, created, payload)`` of every live record, oldest first."""
+        for offset, size in sorted(_unpack_slot(value) for _, value in self._slots()):
+            self._segment.seek(offset)
+            record = _decode_record(self._segment.read(size))
+            if record is not None:
+                yield record
+
+    def needs_compaction(self) -> bool:
+        size = self._segment_size()
+        dead_bytes = size - _SEGMENT_HEADER.size - self.live_bytes
+        return size > COMPACT_MIN_BYTES and dead_bytes > self.live_bytes
+
+    def compact(
+        self,
+        keep: Callable[[bytes, float, bytes], bool] | None = None,
+        *,
+        max_records: int | None = None,
+    ) -> int:
+        """Rewrite the segment with only the live records ``keep`` accepts.
+
+        With ``max_records``, only that many of the newest ones are kept.
+        Returns the number of live records dropped.
+        """
+        records = list(self.items())
+        kept = [record for record in records if keep is None or keep(*record)]
+        if max_records is not None:
+            kept = kept[max(len(kept) - max_records, 0) :]
+
+        encoded = [_encode_record(*record) for record in kept]
+        self._create_segment(encoded)
+        capacity = MIN_INDEX_SLOTS
+        while len(kept) + 1 > capacity * MAX_LOAD_FACTOR:
+            capacity *= 2
+        # Index the new segment; readers holding the old one see only misses.
+        offset = _SEGMENT_HEADER.size
+        slots = []
+        for (key, _, _), record in zip(kept, encoded):
+            slots.append((_key_prefix(key), _pack_slot(offset, len(record))))
+            offset += len(record)
+        self._write_index(capacity, slots, indexed_size=offset)
+        return len(records) - len(kept)
+
+    def close(self) -> None:
+        if self._index is not None:
+            self._index.flush()
+            self._index.close()
+            self._index_file.close()
+            self._index = self._index_file = None
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .response_cache import response_cache_key
+from .segment_store import SegmentStore, SegmentWriter
+from .storage import get_cache_dir
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without the extra
+    np = None
+
+# The index is a header line, then one JSON line per task; row ``i`` of the
+# flat float32 vectors file belongs to line ``i``. Both are only appended to
+# until a compaction rewrites them.
+INDEX_FILE = "similar_tasks.jsonl"
+VECTORS_FILE = "similar_tasks.f32"
+# Answers live apart from the index, which every lookup reads, because they
+# are most of its size and only the best match's answer is needed.
+ANSWERS_FILE = "similar_answers.seg"
+INDEX_VERSION = 2
+
+# Files of the first index version, which rewrote them on every add.
+LEGACY_FILES = ("similar_tasks.json", "similar_answers.json")
+
+# Hashed feature space of the character n-gram vectors. Collisions cost a
+# little precision; a fixed width lets vectors be appended without a vocabulary.
+DIMENSIONS = 1024
+
+# Character n-gram lengths, taken over the task padded with spaces.
+NGRAM_SIZES = (3, 4)
+
+# Default cosine similarity above which a past answer is offered.
+DEFAULT_THRESHOLD = 0.85
+
+# Tasks kept in the index; the oldest are dropped once it grows 10% past this.
+MAX_INDEXED_TASKS = 5000
+
+_KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+# Characters that separate task words.
+_WORD_PATTERN = re.compile(r"[^\s,;:!?()\"']+")
+
+# Politeness and question words that say nothing about the command.
+_FILLER_WORDS = frozenset(
+    {"a", "all", "an", "can", "could", "do", "how", "i", "me", "please", "the", "to", "want", "you"}
+)
+
+__all__ = [
+    "DEFAULT_THRESHOLD",
+    "MAX_INDEXED_TASKS",
+    "SimilarTask",
+    "add_task",
+    "available",
+    "find_similar_task",
+    "get_index_path",
+    "task_anchors",
+    "task_vector",
+]
+
+
+@dataclass(frozen=True, slots=True)
+class SimilarTask:
+    """A past task close enough to the current one to reuse its answer."""
+
+    task: str
+    text: str
+    model: str
+    explain: bool
+    similarity: float
+
+    def describe(self) -> str:
+        return f"{self.similarity:.0%} match with {self.task!r}"
+
+
+def available() -> bool:
+    """Whether NumPy is installed (``pip install 'shellgenius[similar]'``)."""
+    return np is not None
+
+
+def get_index_path() -> Path:
+    return get_cache_dir() / INDEX_FILE
+
+
+def _vectors_path() -> Path:
+    return get_cache_dir() / VECTORS_FILE
+
+
+def _words(task: str) -> list[str]:
+    words = (word.rstrip(".") for word in _WORD_PATTERN.findall(task.casefold()))
+    return [word for word in words if word]
+
+
+def _content_words(task: str) -> list[str]:
+    return [word for word in _words(task) if word not in _FILLER_WORDS]
+
+
+def task_anchors(task: str) -> frozenset[str]:
+    """Words that must match exactly: the leading verb, numbers, paths, and globs.
+
+    Character n-grams barely tell ``delete logs`` from ``list logs``, ``older
+    than 7 days`` from ``older than 70 days``, or ``*.log`` from ``*.txt``,
+    yet the answers to such tasks differ.
+    """
+    words = _content_words(task)
+    anchors = {word for word in words if not word.replace("-", "").isalpha()}
+    return frozenset(anchors | set(words[:1]))
+
+
+def task_vector(task: str):
+    """Sublinear term frequencies of the hashed words and character n-grams of ``task``.
+
+    Case, punctuation, and filler words are ignored. Character n-grams
+    tolerate typos and inflections; whole words keep distinct words apart.
+    """
+    words = _content_words(task)
+    padded = f" {' '.join(words)} "
+    grams = [padded[i : i + size] for size in NGRAM_SIZES for i in range(len(padded) - size + 1)]
+    counts: dict[int, int] = {}
+    for gram in (*grams, *(f"\0{word}" for word in words)):
+        feature = zlib.crc32(gram.encode()) % DIMENSIONS
+        counts[feature] = counts.get(feature, 0) + 1
+
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    if counts:
+        features = np.fromiter(counts, dtype=np.intp, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        vector[features] = 1 + np.log(values)
+    return vector
+
+
+def _index_header() -> bytes:
+    return json.dumps({"version": INDEX_VERSION, "dimensions": DIMENSIONS}).encode() + b"\n"
+
+
+def _read_index() -> tuple[list[bytes], int] | None:
+    """Return the index lines and the size of the index up to its last whole line.
+
+    Line ``i`` belongs to stored vector ``i``; lines are parsed with
+    ``_entry`` only when needed. A last line without its newline was cut
+    short by a crash and is left out. Returns ``None`` if there is no index
+    this version can read.
+    """
+    try:
+        data = get_index_path().read_bytes()
+    except OSError:
+        return None
+    if not data.startswith(_index_header()):
+        return None
+    size = data.rfind(b"\n") + 1
+    return data[len(_index_header()) : size].splitlines(), size
+
+
+def _entry(line: bytes) -> dict[str, Any]:
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return {}
+    return entry if isinstance(entry, dict) else {}
+
+
+def _vector_rows() -> int:
+    try:
+        return _vectors_path().stat().st_size // (DIMENSIONS * 4)
+    except OSError:
+        return 0
+
+
+def _answers() -> SegmentStore:
+    return SegmentStore(get_cache_dir() / ANSWERS_FILE)
+
+
+def _key_bytes(key: Any) -> bytes | None:
+    return bytes.fromhex(key) if isinstance(key, str) and _KEY_PATTERN.fullmatch(key) else None
+
+
+def _load_answer(answers: SegmentStore, key: Any) -> dict[str, Any] | None:
+    key_bytes = _key_bytes(key)
+    record = None if key_bytes is None else answers.get(key_bytes)
+    if record is None:
+        return None
+    try:
+        answer = json.loads(record[1])
+    except ValueError:
+        return None
+    if not isinstance(answer, dict) or not isinstance(answer.get("text"), str):
+        return None
+    return answer
+
+
+def _load_vectors(count: int):
+    """Map the first ``count`` stored vectors; a crash may have left more."""
+    if count == 0:
+        return np.zeros((0, DIMENSIONS), dtype=np.float32)
+    return np.memmap(_vectors_path(), dtype=np.float32, mode="r", shape=(count, DIMENSIONS))
+
+
+def _idf(df, count: int):
+    # Smoothed like scikit-learn's TfidfTransformer, so unseen n-grams still count.
+    return np.log((1 + count) / (1 + df)) + 1
+
+
+def find_similar_task(
+    task: str, os_name: str, *, threshold: float = DEFAULT_THRESHOLD
+) -> SimilarTask | None:
+    """Return the most similar past task for ``os_name`` above ``threshold``.
+
+    Similarity is the cosine of TF-IDF weighted n-gram vectors. Candidates
+    whose anchors differ from the task's are skipped.
+    """
+    index = _read_index()
+    if index is None or not index[0]:
+        return None
+    lines = index[0]
+    try:
+        vectors = _load_vectors(len(lines))
+    except (OSError, ValueError):
+        return None
+
+    # Document frequencies are counted here rather than kept up to date on
+    # every add, which lets the index files only ever be appended to.
+    df = np.count_nonzero(vectors, axis=0).astype(np.float32)
+    idf_squared = _idf(df, len(lines)) ** 2
+    query = task_vector(task)
+    query_norm = math.sqrt(float(query**2 @ idf_squared))
+    if query_norm == 0:
+        return None
+
+    row_norms = np.sqrt((vectors * vectors) @ idf_squared)
+    scores = (vectors @ (query * idf_squared)) / np.maximum(row_norms * query_norm, 1e-12)
+
+    anchors = task_anchors(task)
+    os_name = os_name.lower()
+    answers = _answers()
+    for position in np.argsort(scores)[::-1]:
+        score = float(scores[position])
+        if score < threshold:
+            break
+        entry = _entry(lines[position])
+        if entry.get("os_name") != os_name or task_anchors(entry.get("task", "")) != anchors:
+            continue
+        answer = _load_answer(answers, entry.get("key"))
+        if answer is None:
+            continue
+        return SimilarTask(
+            task=str(entry.get("task", "")),
+            text=answer["text"],
+            model=str(answer.get("model", "")),
+            explain=answer.get("explain") is not False,
+            similarity=min(score, 1.0),
+        )
+    return None
+
+
+def _replace_file(path: Path, data: bytes) -> None:
+    temp_path = path.with_name(f".{path.name}.tmp")
+    temp_path.write_bytes(data)
+    os.replace(temp_path, path)
+
+
+def _reset_index() -> int:
+    """Start an empty index and return its size."""
+    _replace_file(get_index_path(), _index_header())
+    _replace_file(_vectors_path(), b"")
+    for name in LEGACY_FILES:
+        (get_cache_dir() / name).unlink(missing_ok=True)
+    return len(_index_header())
+
+
+def _compact(lines: list[bytes], answers: SegmentWriter) -> None:
+    """Keep the newest ``MAX_INDEXED_TASKS`` entries, their vectors, and their answers.
+
+    Vectors are rewritten first: if the index rewrite does not follow, the
+    next add finds fewer vectors than entries and starts over.
+    """
+    kept = lines[-MAX_INDEXED_TASKS:]
+    vectors = np.array(_load_vectors(len(lines))[-MAX_INDEXED_TASKS:])
+    _replace_file(_vectors_path(), vectors.astype(np.float32).tobytes())
+    _replace_file(get_index_path(), _index_header() + b"".join(line + b"\n" for line in kept))
+    keys = {_entry(line).get("key") for line in kept}
+    answers.compact(lambda key, created, payload: key.hex() in keys)
+
+
+def add_task(task: str, os_name: str, text: str, *, model: str, explain: bool) -> None:
+    """Index ``task`` with its answer ``text``, or refresh an indexed duplicate.
+
+    Every file is appended to: the vector to a flat float32 file, the entry
+    as one line to the index, and the answer to a segment store, in that
+    order, so a crash in between leaves only an extra vector or a torn line,
+    which the next add truncates, or an entry without an answer, which
+    lookups skip. A duplicate only appends its new answer. Failures to write
+    are ignored.
+    """
+    key = response_cache_key(task, os_name)
+    answer = json.dumps({"text": text, "model": model, "explain": explain}).encode()
+    try:
+        # The answers' lock also serializes writers of the index.
+        with _answers().writer() as answers:
+            index = _read_index()
+            if index is None or _vector_rows() < len(index[0]):
+                index = [], _reset_index()
+            lines, size = index
+
+            indexed = any(key.encode() in line and _entry(line).get("key") == key for line in lines)
+            if not indexed:
+                entry = {
+                    "key": key,
+                    "task": " ".join(task.split()),
+                    "os_name": os_name.lower(),
+                    "created": time.time(),
+                }
+                with open(_vectors_path(), "ab") as vectors_file:
+                    vectors_file.truncate(len(lines) * DIMENSIONS * 4)
+                    vectors_file.write(task_vector(task).tobytes())
+                line = json.dumps(entry).encode()
+                with open(get_index_path(), "ab") as index_file:
+                    index_file.truncate(size)
+                    index_file.write(line + b"\n")
+                lines.append(line)
+            answers.put(bytes.fromhex(key), time.time(), answer)
+
+            if len(lines) > MAX_INDEXED_TASKS * 1.1:
+                _compact(lines, answers)
+            elif answers.needs_compaction():
+                answers.compact()
+    except (OSError, ValueError):
+        pass
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from .response_cache import CachedResponse, lookup_response
+from .storage import FileLock, get_cache_dir
+
+# Directory of the per-task lock files, one empty file per cache key. They are
+# left in place: deleting a lock file another process is waiting on would let
+# a third process lock a new file and lead a second identical request.
+INFLIGHT_DIR = "inflight"
+
+# Seconds a process waits for another one generating the same task before
+# sending its own request.
+SINGLE_FLIGHT_WAIT = 20.0
+
+__all__ = ["SINGLE_FLIGHT_WAIT", "SingleFlight", "get_inflight_dir", "prune_lock_files"]
+
+
+def get_inflight_dir() -> Path:
+    return get_cache_dir() / INFLIGHT_DIR
+
+
+class SingleFlight:
+    """Let one process generate a task while others running it wait for its answer.
+
+    The leader holds a lock file keyed by the response cache key until its
+    answer is stored in the response cache. Followers wait for the lock,
+    then read that answer instead of sending an identical request.
+    """
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self._lock = FileLock(get_inflight_dir() / f"{key}.lock")
+
+    @property
+    def leading(self) -> bool:
+        return self._lock.locked
+
+    def try_lead(self) -> bool:
+        """Become the leader unless another process already is."""
+        try:
+            return self._lock.acquire(timeout=0)
+        except OSError:
+            return False
+
+    def wait(
+        self, timeout: float = SINGLE_FLIGHT_WAIT, *, explain: bool, model: str
+    ) -> CachedResponse | None:
+        """Wait for the leader and return its answer.
+
+        Returns ``None`` when there is no usable answer: the leader failed,
+        asked another model, or answered without the explanation this process
+        needs, in which case this process becomes the leader; or the wait
+        timed out, in which case it generates independently without leading.
+        """
+        before = lookup_response(self.key)
+        try:
+            if not self._lock.acquire(timeout=timeout):
+                return None
+        except OSError:
+            return None
+
+        answer = lookup_response(self.key)
+        if (
+            answer is None
+            or answer == before
+            or answer.model != model
+            or (explain and not answer.explain)
+        ):
+            return None
+        self.release()
+        return answer
+
+    def release(self) -> None:
+        self._lock.release()
+
+
+def prune_lock_files() -> int:
+    """Delete the lock files no process holds; returns how many were deleted.
+
+    A process that opened a file just before it is deleted may still
+    generate a task another process generates too; that only costs one
+    duplicate request.
+    """
+    deleted = 0
+    for path in get_inflight_dir().glob("*.lock"):
+        lock = FileLock(path)
+        try:
+            if not lock.acquire(timeout=0):
+                continue
+        except OSError:
+            continue
+        try:
+            path.unlink()
+            deleted += 1
+        except OSError:
+            pass
+        finally:
+            lock.release()
+    return deleted
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+CACHE_DIR_ENV_VAR = "SHELLGENIUS_CACHE_DIR"
+
+LOCK_POLL_INTERVAL = 0.02
+
+__all__ = [
+    "CACHE_DIR_ENV_VAR",
+    "FileLock",
+    "format_size",
+    "get_cache_dir",
+    "read_json",
+    "update_json",
+    "write_json_atomic",
+]
+
+
+def get_cache_dir() -> Path:
+    """Return the directory for ShellGenius's local state.
+
+    Resolution order:
+    1. ``SHELLGENIUS_CACHE_DIR`` environment variable.
+    2. ``%LOCALAPPDATA%\\shellgenius`` on Windows.
+    3. ``$XDG_CACHE_HOME/shellgenius``, defaulting to ``~/.cache/shellgenius``.
+    """
+    override = os.environ.get(CACHE_DIR_ENV_VAR, "").strip()
+    if override:
+        return Path(override).expanduser()
+
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or str(Path.home() / "AppData" / "Local")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "shellgenius"
+
+
+class FileLock:
+    """Advisory, cross-process lock on ``path``.
+
+    Uses ``flock`` on POSIX and ``msvcrt.locking`` on Windows. The lock file
+    is created on demand and left in place.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._fd: int | None = None
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        """Acquire the lock, waiting up to ``timeout`` seconds (forever if ``None``)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            if _try_lock(fd):
+                self._fd = fd
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                os.close(fd)
+                return False
+            time.sleep(LOCK_POLL_INTERVAL)
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        try:
+            _unlock(fd)
+        finally:
+            os.close(fd)
+
+    @property
+    def locked(self) -> bool:
+        return self._fd is not None
+
+    def __enter__(self) -> FileLock:
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+
+if os.name == "nt":
+    import msvcrt
+
+    def _try_lock(fd: int) -> bool:
+        try:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def _unlock(fd: int) -> None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _try_lock(fd: int) -> bool:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def _unlock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def read_json(path: Path) -> Any:
+    """Return the JSON document at ``path``, or ``None`` if missing or unreadable."""
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, UnicodeDecodeError, json.JSONDecodeError, OSError):
+        return None
+
+
+def write_json_atomic(path: Path, data: Any) -> None:
+    """Write ``data`` to ``path`` so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as temp_file:
+            # json.dumps uses the C encoder; json.dump streams through the
+            # pure-Python one, which is several times slower on large documents.
+            temp_file.write(json.dumps(data, separators=(",", ":")))
+        os.replace(temp_name, path)
+    except BaseException:
+        try:
+            os.unlink(temp_name)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    with FileLock(path.with_name(path.name + ".lock")):
+        yield
+
+
+def update_json(path: Path, update: Callable[[Any], Any]) -> Any:
+    """Read, transform, and atomically rewrite ``path`` under a cross-process lock.
+
+    ``update`` receives the current document (``None`` if missing or corrupt)
+    and returns the new one.
+    """
+    with _locked(path):
+        data = update(read_json(path))
+        write_json_atomic(path, data)
+    return data
+
+
+def format_size(size: int) -> str:
+    """Format a byte count for display, such as ``1.5 MiB``."""
+    value = float(size)
+    for unit in ("B", "KiB", "MiB"):
+        if value < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GiB"
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+__all__ = [
+    "Timings",
+    "get_timings",
+    "reset_timings",
+]
+
+
+@dataclass(slots=True)
+class Timings:
+    """Wall-clock breakdown of one ShellGenius invocation.
+
+    Phases are recorded in the order they first run; repeated phases
+    accumulate. Notes carry short facts that explain the numbers, such as the
+    model that served the request.
+    """
+
+    phases: dict[str, float] = field(default_factory=dict)
+    notes: dict[str, str] = field(default_factory=dict)
+
+    @contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - start)
+
+    def record(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def note(self, name: str, value: object) -> None:
+        self.notes[name] = str(value)
+
+    @property
+    def total(self) -> float:
+        return sum(seconds for phase, seconds in self.phases.items() if "." not in phase)
+
+    def format_lines(self) -> list[str]:
+        """Return a plain-text report, one phase per line.
+
+        Phases named ``parent.child`` are nested details of ``parent`` and are
+        indented instead of being added to the total.
+        """
+        if not self.phases and not self.notes:
+            return []
+
+        width = max((len(_display_name(phase)) for phase in self.phases), default=0)
+        width = max(width, len("total"))
+        lines = []
+        for phase, seconds in self.phases.items():
+            lines.append(f"{_display_name(phase):<{width}}  {seconds * 1000:9.1f} ms")
+        if self.phases:
+            lines.append(f"{'total':<{width}}  {self.total * 1000:9.1f} ms")
+        for name, value in self.notes.items():
+            lines.append(f"{name}: {value}")
+        return lines
+
+
+def _display_name(phase: str) -> str:
+    if "." not in phase:
+        return phase
+    return "  " + phase.rsplit(".", 1)[1]
+
+
+_current = Timings()
+
+
+def get_timings() -> Timings:
+    return _current
+
+
+def reset_timings() -> Timings:
+    global _current
+    _current = Timings()
+    return _current
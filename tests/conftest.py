@@ -30,3 +30,58 @@ def pytest_collection_modifyitems(config, items):
     for item in items:
         if "real" in item.keywords:
             item.add_marker(skip_real)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_timings():
+    from shellgenius.timings import reset_timings
+
+    reset_timings()
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv("SHELLGENIUS_CACHE_DIR", str(tmp_path / "shellgenius-cache"))
+
+
+@pytest.fixture(autouse=True)
+def _isolated_config(monkeypatch, tmp_path):
+    monkeypatch.setattr("shellgenius.config.CONFIG_PATH", tmp_path / "lmt-config.json")
+
+
+@pytest.fixture
+def tokenizer_unavailable(monkeypatch):
+    """Fail like tiktoken does offline with a cold cache."""
+
+    def encoding_for_model(model):
+        raise OSError(f"cannot download the tokenizer for {model}")
+
+    monkeypatch.setattr("shellgenius.gpt_integration._encoding_for_model", encoding_for_model)
+
+
+class _ByteEncoding:
+    """Counts one token per UTF-8 byte; stands in for a tiktoken encoding."""
+
+    name = "test-bytes"
+
+    def encode(self, text):
+        return list(text.encode("utf-8"))
+
+    def encode_batch(self, texts, num_threads=8):
+        return [self.encode(text) for text in texts]
+
+
+@pytest.fixture
+def offline_tokenizer(monkeypatch):
+    """Count tokens without loading, or downloading, a tiktoken encoding."""
+    import tiktoken
+
+    encoding = _ByteEncoding()
+    get_encoding = tiktoken.get_encoding
+
+    monkeypatch.setattr("shellgenius.gpt_integration._encoding_for_model", lambda model: encoding)
+    monkeypatch.setattr(
+        "shellgenius.gpt_integration.tiktoken.get_encoding",
+        lambda name: encoding if name == encoding.name else get_encoding(name),
+    )
+    return encoding
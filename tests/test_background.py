@@ -0,0 +1,34 @@
+import threading
+
+import pytest
+
+from shellgenius.background import BackgroundCall
+
+
+def test_background_call_returns_result():
+    call = BackgroundCall(lambda value, *, suffix: value + suffix, "ls", suffix=" -la")
+
+    assert call.result(timeout=5) == "ls -la"
+    assert call.done()
+
+
+def test_background_call_reraises_error():
+    def fail():
+        raise RuntimeError("boom")
+
+    call = BackgroundCall(fail)
+
+    with pytest.raises(RuntimeError, match="boom"):
+        call.result(timeout=5)
+
+
+def test_background_call_times_out_while_running():
+    release = threading.Event()
+    call = BackgroundCall(release.wait)
+
+    with pytest.raises(TimeoutError):
+        call.result(timeout=0.01)
+    assert not call.done()
+
+    release.set()
+    assert call.result(timeout=5) is True
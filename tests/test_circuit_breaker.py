@@ -0,0 +1,183 @@
+import threading
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import APITimeoutError, BadRequestError, InternalServerError, RateLimitError
+
+from shellgenius import circuit_breaker
+from shellgenius.circuit_breaker import (
+    CLOSED,
+    FAILURE_THRESHOLD,
+    HALF_OPEN,
+    OPEN,
+    CircuitOpenError,
+    allow_request,
+    is_breaker_failure,
+    load_breaker_states,
+    record_failure,
+    record_success,
+)
+from shellgenius.gpt_integration import chatgpt_request, format_prompt
+from shellgenius.hedging import HedgePolicy
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/responses")
+
+
+def status_error(error_type, status_code):
+    response = httpx.Response(status_code, request=REQUEST)
+    return error_type("failed", response=response, body={"error": {}})
+
+
+def open_circuit(model):
+    for _ in range(FAILURE_THRESHOLD):
+        record_failure(model)
+
+
+@pytest.mark.parametrize(
+    ("error", "expected"),
+    [
+        (APITimeoutError(request=REQUEST), True),
+        (TimeoutError(), True),
+        (status_error(RateLimitError, 429), True),
+        (status_error(InternalServerError, 503), True),
+        (status_error(BadRequestError, 400), False),
+        (ValueError("bad"), False),
+    ],
+)
+def test_is_breaker_failure(error, expected):
+    assert is_breaker_failure(error) is expected
+
+
+def test_circuit_opens_after_consecutive_failures():
+    for _ in range(FAILURE_THRESHOLD - 1):
+        record_failure("gpt-5.4-mini")
+    assert load_breaker_states()["gpt-5.4-mini"].state == CLOSED
+    assert allow_request("gpt-5.4-mini")
+
+    record_failure("gpt-5.4-mini")
+
+    assert load_breaker_states()["gpt-5.4-mini"].state == OPEN
+    assert not allow_request("gpt-5.4-mini")
+
+
+def test_success_closes_and_forgets_circuit():
+    record_failure("gpt-5.4-mini")
+    record_success("gpt-5.4-mini")
+
+    assert load_breaker_states() == {}
+
+
+def test_open_circuit_lets_one_probe_through(monkeypatch):
+    open_circuit("gpt-5.4-mini")
+    monkeypatch.setattr(circuit_breaker, "OPEN_SECONDS", 0.0)
+
+    assert allow_request("gpt-5.4-mini")
+    assert load_breaker_states()["gpt-5.4-mini"].state == HALF_OPEN
+
+    monkeypatch.setattr(circuit_breaker, "OPEN_SECONDS", 60.0)
+    assert not allow_request("gpt-5.4-mini")
+
+
+def test_failed_probe_reopens_circuit(monkeypatch):
+    open_circuit("gpt-5.4-mini")
+    monkeypatch.setattr(circuit_breaker, "OPEN_SECONDS", 0.0)
+    allow_request("gpt-5.4-mini")
+
+    state = record_failure("gpt-5.4-mini")
+
+    assert state.state == OPEN
+    assert state.failures == FAILURE_THRESHOLD + 1
+
+
+def fake_backend(monkeypatch, result=None, error=None):
+    calls = []
+
+    def create_text_response(**kwargs):
+        calls.append(kwargs)
+        if error is not None:
+            raise error
+        return result, None
+
+    monkeypatch.setattr(
+        "shellgenius.gpt_integration.create_openai_backend",
+        lambda: SimpleNamespace(create_text_response=create_text_response),
+    )
+    return calls
+
+
+def test_chatgpt_request_records_breaker_failures(monkeypatch):
+    fake_backend(monkeypatch, error=status_error(InternalServerError, 500))
+
+    for _ in range(FAILURE_THRESHOLD):
+        with pytest.raises(InternalServerError):
+            chatgpt_request(format_prompt("list files", "Linux"), model="gpt-5.4-mini")
+
+    assert load_breaker_states()["gpt-5.4-mini"].state == OPEN
+
+
+def test_chatgpt_request_uses_fallback_while_circuit_is_open(monkeypatch):
+    open_circuit("gpt-5.4-mini")
+    calls = fake_backend(monkeypatch, result="done")
+
+    text, _, _ = chatgpt_request(
+        format_prompt("list files", "Linux"),
+        model="gpt-5.4-mini",
+        fallback_model="gpt-4.1-mini",
+    )
+
+    assert text == "done"
+    assert calls[0]["model"] == "gpt-4.1-mini"
+    assert calls[0]["reasoning_effort"] is None
+
+
+def test_chatgpt_request_fails_fast_without_fallback(monkeypatch):
+    open_circuit("gpt-5.4-mini")
+    calls = fake_backend(monkeypatch, result="done")
+
+    with pytest.raises(CircuitOpenError, match="gpt-5.4-mini is failing"):
+        chatgpt_request(format_prompt("list files", "Linux"), model="gpt-5.4-mini")
+
+    assert calls == []
+
+
+def test_chatgpt_request_ignores_timeouts_the_caller_asked_for(monkeypatch):
+    fake_backend(monkeypatch, error=APITimeoutError(request=REQUEST))
+
+    with pytest.raises(APITimeoutError):
+        chatgpt_request(format_prompt("list files", "Linux"), model="gpt-5.4-mini", timeout=2)
+    assert load_breaker_states() == {}
+
+    with pytest.raises(APITimeoutError):
+        chatgpt_request(format_prompt("list files", "Linux"), model="gpt-5.4-mini")
+    assert load_breaker_states()["gpt-5.4-mini"].failures == 1
+
+
+def test_chatgpt_request_records_success_for_the_hedge_model(monkeypatch):
+    release = threading.Event()
+
+    def create_text_response(*, model, chunk_callback, **kwargs):
+        if model == "gpt-5.4-mini":
+            release.wait(5)
+        chunk_callback("ls")
+        return "ls", None
+
+    monkeypatch.setattr(
+        "shellgenius.gpt_integration.create_openai_backend",
+        lambda: SimpleNamespace(create_text_response=create_text_response),
+    )
+    record_failure("gpt-5.4-mini")
+    record_failure("gpt-4.1-mini")
+
+    try:
+        chatgpt_request(
+            format_prompt("list files", "Linux"),
+            model="gpt-5.4-mini",
+            stream=True,
+            chunk_callback=lambda chunk: None,
+            hedge=HedgePolicy(after=0.01, model="gpt-4.1-mini"),
+        )
+    finally:
+        release.set()
+
+    assert list(load_breaker_states()) == ["gpt-5.4-mini"]
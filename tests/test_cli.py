@@ -1,6 +1,8 @@
+import json
 import os
 import subprocess
 import sys
+import threading
 import time
 import types
 from types import SimpleNamespace
@@ -8,10 +10,32 @@ from types import SimpleNamespace
 import httpx
 import pytest
 from click.testing import CliRunner
-from openai import RateLimitError
+from openai import APIConnectionError, RateLimitError
 
 import shellgenius._entrypoint as entrypoint_module
 import shellgenius.cli as cli_module
+import shellgenius.config as config_module
+from shellgenius import response_cache, revalidate, similarity
+from shellgenius.circuit_breaker import record_failure
+from shellgenius.gpt_integration import format_prompt, num_tokens_from_messages
+from shellgenius.hedging import HedgePolicy
+from shellgenius.history import (
+    get_history_path,
+    record_execution,
+    record_generation,
+    search_history,
+)
+from shellgenius.model_stats import COMMAND, EXPLAIN, record_request
+from shellgenius.openai_backend import ResponseUsage
+from shellgenius.rate_limit import learn_limits
+from shellgenius.response_cache import (
+    lookup_response,
+    response_cache_key,
+    response_cache_stats,
+    store_response,
+)
+from shellgenius.response_parser import parse_shellgenius_response
+from shellgenius.single_flight import SingleFlight
 from shellgenius.theme import LmtTheme
 
 
@@ -274,6 +298,287 @@ def test_shellgenius_uses_selected_model(monkeypatch):
     assert calls == [{"model": "gpt-4.1", "stream": False}]
 
 
+def test_shellgenius_passes_reasoning_options_when_set(monkeypatch):
+    runner = CliRunner()
+    calls = []
+
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(
+        cli_module,
+        "chatgpt_request",
+        lambda *args, **kwargs: calls.append(kwargs) or (response_text(), 0, object()),
+    )
+
+    result = runner.invoke(
+        cli_module.shellgenius,
+        ["--effort", "low", "--verbosity", "medium", "--max-output-tokens", "200", "print", "ok"],
+    )
+
+    assert result.exit_code == 0
+    assert calls == [
+        {
+            "model": cli_module.DEFAULT_MODEL,
+            "stream": False,
+            "reasoning_effort": "low",
+            "verbosity": "medium",
+            "max_output_tokens": 200,
+        }
+    ]
+
+
+@pytest.mark.parametrize(
+    ("tty_state", "args", "expected_tier"),
+    [
+        (cli_module.TTYState(True, True, True), ["--raw", "print", "ok"], "priority"),
+        (cli_module.TTYState(False, False, False), ["print", "ok"], "flex"),
+        (cli_module.TTYState(False, False, False), ["--tier", "default", "print", "ok"], "default"),
+    ],
+)
+def test_shellgenius_service_tier_defaults_per_traffic_class(
+    monkeypatch, tty_state, args, expected_tier
+):
+    runner = CliRunner()
+    calls = []
+    config_module.CONFIG_PATH.write_text(
+        json.dumps({"shellgenius": {"service_tier": {"interactive": "priority", "batch": "flex"}}}),
+        encoding="utf-8",
+    )
+
+    monkeypatch.setattr(cli_module, "get_tty_state", lambda: tty_state)
+    monkeypatch.setattr(cli_module, "stdin_has_prompt_input", lambda: False)
+    monkeypatch.setattr(
+        cli_module,
+        "chatgpt_request",
+        lambda *args, **kwargs: calls.append(kwargs) or (response_text(), 0, object()),
+    )
+
+    result = runner.invoke(cli_module.shellgenius, args)
+
+    assert result.exit_code == 0
+    assert calls[0]["service_tier"] == expected_tier
+
+
+def test_shellgenius_warns_when_the_model_does_not_offer_the_tier(monkeypatch):
+    runner = CliRunner()
+
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(cli_module, "stdin_has_prompt_input", lambda: False)
+    monkeypatch.setattr(
+        cli_module, "chatgpt_request", lambda *args, **kwargs: (response_text(), 0, object())
+    )
+
+    result = runner.invoke(
+        cli_module.shellgenius, ["--model", "gpt-4.1", "--tier", "flex", "print", "ok"]
+    )
+
+    assert result.exit_code == 0
+    assert "gpt-4.1 does not offer the flex service tier" in result.stderr
+
+
+def test_shellgenius_passes_hedge_policy(monkeypatch):
+    runner = CliRunner()
+    calls = []
+
+    monkeypatch.setattr(cli_module, "get_tty_state", lambda: cli_module.TTYState(True, True, True))
+    monkeypatch.setattr(cli_module, "stdin_has_prompt_input", lambda: False)
+    monkeypatch.setattr(
+        cli_module,
+        "chatgpt_request",
+        lambda *args, **kwargs: calls.append(kwargs) or (response_text(), 0, object()),
+    )
+
+    result = runner.invoke(
+        cli_module.shellgenius,
+        ["--raw", "--hedge-after", "0.5", "--hedge-model", "5.4-nano", "print", "ok"],
+    )
+
+    assert result.exit_code == 0
+    assert calls[0]["hedge"] == HedgePolicy(after=0.5, model="gpt-5.4-nano")
+
+
+def test_shellgenius_deadline_plans_command_only_request(monkeypatch):
+    runner = CliRunner()
+    calls = []
+
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(cli_module, "stdin_has_prompt_input", lambda: False)
+    monkeypatch.setattr(
+        cli_module,
+        "chatgpt_request",
+        lambda messages, **kwargs: (
+            calls.append((messages, kwargs)) or ("```bash\nprintf 'ok'\n```", 0, object())
+        ),
+    )
+
+    result = runner.invoke(cli_module.shellgenius, ["--deadline", "5s", "print", "ok"])
+
+    assert result.exit_code == 0
+    assert result.output == "printf 'ok'\n"
+    messages, kwargs = calls[0]
+    assert messages.explain is False
+    assert kwargs["model"] == cli_module.DEFAULT_MODEL
+    assert kwargs["reasoning_effort"] == "minimal"
+    assert 0 < kwargs["timeout"] < 5
+
+
+def slow_request(first_chunk=None):
+    def request(messages, **kwargs):
+        if first_chunk is not None:
+            kwargs["chunk_callback"](first_chunk)
+        time.sleep(1)
+        return response_text(), 1, object()
+
+    return request
+
+
+@pytest.mark.parametrize(
+    ("first_chunk", "cached", "expected_exit", "expected_output"),
+    [
+        ("```bash\nprintf 'partial'\n```\n", False, 3, "printf 'partial'\n"),
+        ("```bash\nprintf 'trunc", True, 3, "printf 'ok'\n"),
+        ("```bash\nprintf 'trunc", False, 124, ""),
+    ],
+)
+def test_shellgenius_deadline_miss_degrades(
+    monkeypatch, first_chunk, cached, expected_exit, expected_output
+):
+    runner = CliRunner()
+
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(cli_module, "stdin_has_prompt_input", lambda: False)
+    if cached:
+        cli_module.remember_response(
+            cli_module.response_cache_key("print ok", cli_module.current_os_name()),
+            response_text(),
+            model="gpt-5.4-nano",
+            explain=True,
+        )
+    monkeypatch.setattr(cli_module, "chatgpt_request", slow_request(first_chunk))
+
+    result = runner.invoke(cli_module.shellgenius, ["--deadline", "200ms", "print", "ok"])
+
+    assert result.exit_code == expected_exit
+    assert result.stdout == expected_output
+
+
+def test_shellgenius_rejects_invalid_deadline():
+    result = CliRunner().invoke(cli_module.shellgenius, ["--deadline", "soon", "print", "ok"])
+
+    assert result.exit_code == 2
+    assert "--deadline" in result.output
+
+
+def test_shellgenius_rejects_tiny_max_output_tokens():
+    result = CliRunner().invoke(cli_module.shellgenius, ["--max-output-tokens", "4", "print", "ok"])
+
+    assert result.exit_code == 2
+    assert "--max-output-tokens" in result.output
+
+
+@pytest.mark.parametrize(
+    ("tty_state", "args", "expected_explain"),
+    [
+        (cli_module.TTYState(False, False, False), ["print", "ok"], False),
+        (cli_module.TTYState(True, True, True), ["--cmd", "print", "ok"], False),
+        (cli_module.TTYState(True, True, True), ["--no-explain", "--raw", "print", "ok"], False),
+        (cli_module.TTYState(True, True, True), ["--raw", "print", "ok"], True),
+    ],
+)
+def test_shellgenius_selects_command_only_prompt(monkeypatch, tty_state, args, expected_explain):
+    runner = CliRunner()
+    prompts = []
+
+    monkeypatch.setattr(cli_module, "get_tty_state", lambda: tty_state)
+    monkeypatch.setattr(cli_module, "stdin_has_prompt_input", lambda: False)
+    monkeypatch.setattr(
+        cli_module,
+        "chatgpt_request",
+        lambda messages, **kwargs: prompts.append(messages) or (response_text(), 0, object()),
+    )
+
+    result = runner.invoke(cli_module.shellgenius, args)
+
+    assert result.exit_code == 0
+    assert prompts[0].explain is expected_explain
+
+
+def test_shellgenius_no_explain_confirms_multi_line_command(monkeypatch):
+    runner = CliRunner()
+    executed = []
+    generated = "```bash\nprintf 'a'\n\nprintf 'b'\n```"
+
+    monkeypatch.setattr(cli_module, "get_tty_state", lambda: cli_module.TTYState(True, True, True))
+    monkeypatch.setattr(cli_module, "stdin_has_prompt_input", lambda: True)
+    monkeypatch.setattr(cli_module.shutil, "which", lambda shell_name: f"/mock/{shell_name}")
+    monkeypatch.setattr(
+        cli_module, "chatgpt_request", lambda *args, **kwargs: (generated, 0, object())
+    )
+    monkeypatch.setattr(cli_module.subprocess, "run", lambda args, **kwargs: executed.append(args))
+
+    result = runner.invoke(
+        cli_module.shellgenius, ["--no-explain", "--raw", "print", "ab"], input="y\n"
+    )
+
+    assert result.exit_code == 0
+    assert executed == [["/mock/bash", "-c", "printf 'a'\n\nprintf 'b'"]]
+
+
+def test_shellgenius_explain_later_fetches_explanation_on_request(monkeypatch):
+    runner = CliRunner()
+    calls = []
+    executed = []
+    first_response = SimpleNamespace(id="resp_1", output_text="")
+
+    def fake_chatgpt_request(messages, **kwargs):
+        calls.append((messages, kwargs))
+        if len(calls) == 1:
+            return "```bash\nprintf 'ok'\n```", 0, first_response
+        return "* Prints ok.", 0, object()
+
+    monkeypatch.setattr(cli_module, "get_tty_state", lambda: cli_module.TTYState(True, True, True))
+    monkeypatch.setattr(cli_module, "stdin_has_prompt_input", lambda: True)
+    monkeypatch.setattr(cli_module.shutil, "which", lambda shell_name: f"/mock/{shell_name}")
+    monkeypatch.setattr(cli_module, "chatgpt_request", fake_chatgpt_request)
+    monkeypatch.setattr(cli_module.subprocess, "run", lambda args, **kwargs: executed.append(args))
+
+    result = runner.invoke(
+        cli_module.shellgenius, ["--explain-later", "--raw", "print", "ok"], input="e\ny\n"
+    )
+
+    assert result.exit_code == 0
+    assert calls[0][0].explain is False
+    assert calls[1][1]["previous_response_id"] == "resp_1"
+    assert "Prints ok." in result.output
+    assert executed == [["/mock/bash", "-c", "printf 'ok'"]]
+
+
+def test_shellgenius_explain_later_skips_explanation_when_declined(monkeypatch):
+    runner = CliRunner()
+
+    monkeypatch.setattr(cli_module, "get_tty_state", lambda: cli_module.TTYState(True, True, True))
+    monkeypatch.setattr(cli_module, "stdin_has_prompt_input", lambda: True)
+    monkeypatch.setattr(
+        cli_module, "chatgpt_request", lambda *args, **kwargs: (response_text(), 0, object())
+    )
+    monkeypatch.setattr(cli_module, "fetch_explanation", lambda *args, **kwargs: "* Explained.")
+
+    result = runner.invoke(
+        cli_module.shellgenius, ["--explain-later", "--raw", "print", "ok"], input="n\n"
+    )
+
+    assert result.exit_code == 0
+    assert "Not executed." in result.output
+    assert "Explained." not in result.output
+
+
 def test_shellgenius_piped_stdin_with_tty_stdout_can_confirm(monkeypatch):
     """``printf 'y\\n' | shellgenius …`` should execute when stdout is a TTY."""
     runner = CliRunner()
@@ -1138,109 +1443,829 @@ def test_shellgenius_executes_no_fence_language_with_sh(monkeypatch):
     assert calls == [((["/mock/sh", "-c", "printf 'ok'"],), {"check": True})]
 
 
-# -- model aliases and `models` command ----------------------------------------
+# -- history ---------------------------------------------------------------------
 
 
-def test_shellgenius_models_lists_all_valid_models():
+@pytest.mark.parametrize(("returncode", "expected_exit"), [(0, 0), (3, 1)])
+def test_shellgenius_records_generation_and_execution_in_history(
+    monkeypatch, returncode, expected_exit
+):
     runner = CliRunner()
 
-    result = runner.invoke(cli_module.shellgenius, ["models"])
-
-    assert result.exit_code == 0
-    for model in cli_module.VALID_MODELS:
-        assert model in result.output
-
+    def run(command, check):
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, command)
 
-def test_shellgenius_models_shows_aliases():
-    runner = CliRunner()
-
-    result = runner.invoke(cli_module.shellgenius, ["models"])
+    monkeypatch.setattr(cli_module, "get_tty_state", lambda: cli_module.TTYState(True, True, True))
+    monkeypatch.setattr(cli_module, "Live", DummyLive)
+    monkeypatch.setattr(cli_module.shutil, "which", lambda shell_name: f"/mock/{shell_name}")
+    monkeypatch.setattr(
+        cli_module, "chatgpt_request", lambda *args, **kwargs: (response_text(), 0, object())
+    )
+    monkeypatch.setattr(cli_module.subprocess, "run", run)
 
-    assert result.exit_code == 0
-    assert "Alias: 4.1\n" in result.output
-    assert "Alias: 5.4-mini\n" in result.output
+    result = runner.invoke(cli_module.shellgenius, ["print", "ok"], input="y\n")
 
+    assert result.exit_code == expected_exit
+    [entry] = search_history("print")
+    assert entry.command == "printf 'ok'"
+    assert entry.explanation == "* Prints ok."
+    assert entry.exit_status == returncode
 
-def test_shellgenius_alias_resolves_to_canonical(monkeypatch):
-    runner = CliRunner()
-    calls = []
 
+def test_shellgenius_history_can_be_disabled(monkeypatch):
+    config_module.CONFIG_PATH.write_text(
+        json.dumps({"shellgenius": {"history": False}}), encoding="utf-8"
+    )
     monkeypatch.setattr(
         cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
     )
     monkeypatch.setattr(
-        cli_module,
-        "chatgpt_request",
-        lambda *args, **kwargs: calls.append(kwargs) or (response_text(), 0, object()),
+        cli_module, "chatgpt_request", lambda *args, **kwargs: (response_text(), 0, object())
     )
 
-    result = runner.invoke(cli_module.shellgenius, ["--model", "4.1", "print", "ok"])
+    result = CliRunner().invoke(cli_module.shellgenius, ["print", "ok"])
 
     assert result.exit_code == 0
-    assert calls == [{"model": "gpt-4.1", "stream": False}]
+    assert not get_history_path().exists()
 
 
-def test_shellgenius_alias_resolves_case_insensitively(monkeypatch):
-    runner = CliRunner()
-    calls = []
-
-    monkeypatch.setattr(
-        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
-    )
-    monkeypatch.setattr(
-        cli_module,
-        "chatgpt_request",
-        lambda *args, **kwargs: calls.append(kwargs) or (response_text(), 0, object()),
+def test_shellgenius_history_search_prints_matches():
+    entry_id = record_generation(
+        "compress the logs folder",
+        parse_shellgenius_response("```bash\ntar czf logs.tgz logs\n```"),
+        model="gpt-5.4-mini",
+        os_name="Linux",
     )
+    record_execution(entry_id, 0)
 
-    result = runner.invoke(cli_module.shellgenius, ["--model", "GPT-4.1", "print", "ok"])
+    result = CliRunner().invoke(cli_module.shellgenius, ["history", "search", "logs"])
 
     assert result.exit_code == 0
-    assert calls == [{"model": "gpt-4.1", "stream": False}]
+    first_line, second_line = result.output.splitlines()
+    assert first_line.endswith("  gpt-5.4-mini  exit 0  compress the logs folder")
+    assert second_line == "  tar czf logs.tgz logs"
 
 
-def test_shellgenius_invalid_model_fails_with_hint():
-    runner = CliRunner()
+def test_shellgenius_history_search_without_matches():
+    result = CliRunner().invoke(cli_module.shellgenius, ["history", "search", "logs"])
 
-    result = runner.invoke(cli_module.shellgenius, ["--model", "invalid", "print", "ok"])
+    assert result.exit_code == 0
+    assert result.output == "No matching commands.\n"
 
-    assert result.exit_code != 0
-    assert "Invalid value for '--model' / '-m': Invalid model name." in result.output
-    assert "Use shellgenius models to list supported models and aliases." in result.output
 
+def test_shellgenius_history_commands_report_unreadable_history():
+    get_history_path().parent.mkdir(parents=True, exist_ok=True)
+    get_history_path().write_bytes(b"not a database" * 100)
 
-def test_shellgenius_invalid_model_styles_message_and_command():
-    runner = CliRunner()
+    search = CliRunner().invoke(cli_module.shellgenius, ["history", "search", "logs"])
+    prune = CliRunner().invoke(cli_module.shellgenius, ["history", "prune"])
 
-    result = runner.invoke(
-        cli_module.shellgenius,
-        ["--model", "invalid", "print", "ok"],
-        color=True,
+    assert search.exit_code == prune.exit_code == 1
+    assert "Error: Cannot read the history in" in search.output
+    assert "Error: Cannot prune the history in" in prune.output
+
+
+def test_shellgenius_history_prune():
+    for index in range(3):
+        record_generation(
+            f"task {index}",
+            parse_shellgenius_response(f"```bash\necho {index}\n```"),
+            model="gpt-5.4-mini",
+            os_name="Linux",
+        )
+
+    result = CliRunner().invoke(
+        cli_module.shellgenius, ["history", "prune", "--max-entries", "1", "--vacuum"]
     )
 
-    assert result.exit_code != 0
-    assert "\x1b[31mInvalid model name.\x1b[0m" in result.output
-    assert "\x1b[31mUse \x1b[0m\x1b[34mshellgenius models\x1b[0m" in result.output
+    assert result.exit_code == 0
+    assert result.output == "Deleted 2 entries.\n"
 
 
-def test_shellgenius_routes_leaf_option_value_sequences_to_subcommand_parser(monkeypatch):
-    runner = CliRunner()
-    chatgpt_calls = []
+# -- similar tasks ---------------------------------------------------------------
 
-    monkeypatch.setattr(
-        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
-    )
-    monkeypatch.setattr(
-        cli_module,
-        "chatgpt_request",
-        lambda *args, **kwargs: chatgpt_calls.append((args, kwargs)),
-    )
+needs_numpy = pytest.mark.skipif(not similarity.available(), reason="NumPy is not installed")
 
-    result = runner.invoke(cli_module.shellgenius, ["models", "-m", "gpt-5"])
 
-    assert result.exit_code == 2
-    assert "No such option: -m" in result.output
-    assert chatgpt_calls == []
+def answer_once(monkeypatch, tty_state):
+    """Answer one request through the model; fail if asked again."""
+    calls = []
+
+    def fake_chatgpt_request(messages, **kwargs):
+        calls.append(messages.command_description)
+        return response_text(), 0, object()
+
+    monkeypatch.setattr(cli_module, "get_tty_state", lambda: tty_state)
+    monkeypatch.setattr(cli_module, "Live", DummyLive)
+    monkeypatch.setattr(cli_module, "chatgpt_request", fake_chatgpt_request)
+    monkeypatch.setattr(cli_module, "stdin_has_prompt_input", lambda: True)
+    return calls
+
+
+@needs_numpy
+def test_shellgenius_reuses_answer_to_similar_task(monkeypatch):
+    calls = answer_once(monkeypatch, cli_module.TTYState(False, False, False))
+    runner = CliRunner()
+
+    runner.invoke(cli_module.shellgenius, ["print", "ok", "in", "the", "terminal"])
+    result = runner.invoke(cli_module.shellgenius, ["please", "print", "ok", "in", "terminal"])
+
+    assert result.exit_code == 0
+    assert calls == ["print ok in the terminal"]
+    assert result.stdout == "printf 'ok'\n"
+    assert "Reused a past answer (100% match with 'print ok in the terminal')" in result.stderr
+
+
+@needs_numpy
+@pytest.mark.parametrize(
+    "args", [["print", "ok", "in", "tmux"], ["--fresh", "print", "ok", "in", "the", "terminal"]]
+)
+def test_shellgenius_asks_model_for_different_task_or_fresh(monkeypatch, args):
+    calls = answer_once(monkeypatch, cli_module.TTYState(False, False, False))
+    runner = CliRunner()
+
+    runner.invoke(cli_module.shellgenius, ["print", "ok", "in", "the", "terminal"])
+    result = runner.invoke(cli_module.shellgenius, args)
+
+    assert result.exit_code == 0
+    assert len(calls) == 2
+    assert "Reused a past answer" not in result.stderr
+
+
+@needs_numpy
+def test_shellgenius_asks_model_on_demand_after_similar_answer(monkeypatch):
+    calls = answer_once(monkeypatch, cli_module.TTYState(True, True, True))
+    runner = CliRunner()
+
+    runner.invoke(cli_module.shellgenius, ["print", "ok"], input="n\n")
+    result = runner.invoke(cli_module.shellgenius, ["print", "ok"], input="a\nn\n")
+
+    assert result.exit_code == 0
+    assert calls == ["print ok", "print ok"]
+    assert "[y/N/a=ask the model]" in result.output
+    assert result.output.endswith("Not executed.\n")
+
+
+def test_shellgenius_similar_tasks_can_be_disabled(monkeypatch):
+    config_module.CONFIG_PATH.write_text(
+        json.dumps({"shellgenius": {"similar_tasks": False}}), encoding="utf-8"
+    )
+    calls = answer_once(monkeypatch, cli_module.TTYState(False, False, False))
+    runner = CliRunner()
+
+    runner.invoke(cli_module.shellgenius, ["print", "ok"])
+    result = runner.invoke(cli_module.shellgenius, ["print", "ok"])
+
+    assert result.exit_code == 0
+    assert len(calls) == 2
+    assert not similarity.get_index_path().exists()
+
+
+# -- offline ---------------------------------------------------------------------
+
+
+def test_shellgenius_offline_answers_from_pattern_library(monkeypatch):
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(cli_module, "current_os_name", lambda: "Linux")
+    monkeypatch.setattr(
+        cli_module, "chatgpt_request", lambda *args, **kwargs: pytest.fail("API called")
+    )
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["--offline", "list", "open", "ports"])
+
+    assert result.exit_code == 0
+    assert result.stdout == "ss -tlnp\n"
+    assert "Offline: local answer from the pattern library." in result.stderr
+
+
+def test_shellgenius_offline_without_local_answer(monkeypatch):
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(
+        cli_module, "chatgpt_request", lambda *args, **kwargs: pytest.fail("API called")
+    )
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["--offline", "write", "a", "haiku"])
+
+    assert result.exit_code == 1
+    assert "No local answer for this task." in result.stderr
+
+
+@pytest.mark.parametrize("model_args", [[], ["--model", "auto"]])
+def test_shellgenius_offline_works_without_the_tokenizer(
+    monkeypatch, tokenizer_unavailable, model_args
+):
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(cli_module, "current_os_name", lambda: "Linux")
+    monkeypatch.setattr(
+        cli_module, "chatgpt_request", lambda *args, **kwargs: pytest.fail("API called")
+    )
+
+    result = CliRunner().invoke(
+        cli_module.shellgenius, [*model_args, "--offline", "--timings", "list", "open", "ports"]
+    )
+
+    assert result.exit_code == 0
+    assert result.stdout == "ss -tlnp\n"
+    assert "routing:" not in result.stderr
+
+
+def unreachable(*args, **kwargs):
+    raise APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/responses"))
+
+
+def test_shellgenius_falls_back_to_local_answer_when_api_unreachable(monkeypatch):
+    record_generation(
+        "print ok",
+        parse_shellgenius_response(response_text()),
+        model="gpt-5.4-mini",
+        os_name=cli_module.current_os_name(),
+    )
+    runs = []
+    monkeypatch.setattr(cli_module, "get_tty_state", lambda: cli_module.TTYState(True, True, True))
+    monkeypatch.setattr(cli_module, "Live", DummyLive)
+    monkeypatch.setattr(cli_module, "chatgpt_request", unreachable)
+    monkeypatch.setattr(cli_module, "stdin_has_prompt_input", lambda: True)
+    monkeypatch.setattr(cli_module.shutil, "which", lambda shell_name: f"/mock/{shell_name}")
+    monkeypatch.setattr(cli_module.subprocess, "run", lambda *args, **kwargs: runs.append(args))
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["--fresh", "print", "ok"], input="y\n")
+
+    assert result.exit_code == 0
+    assert "API unreachable (Connection error.): showing a local answer from the history" in (
+        result.stderr
+    )
+    assert runs == [(["/mock/bash", "-c", "printf 'ok'"],)]
+    assert len(search_history("print")) == 1
+
+
+def test_shellgenius_reports_unreachable_api_without_local_answer(monkeypatch):
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(cli_module, "chatgpt_request", unreachable)
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["write", "a", "haiku"])
+
+    assert result.exit_code == 1
+    assert "Connection error." in result.stderr
+
+
+def test_shellgenius_routes_history_prose_to_prompt(monkeypatch):
+    prompts = []
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(
+        cli_module,
+        "chatgpt_request",
+        lambda messages, **kwargs: prompts.append(messages) or (response_text(), 0, object()),
+    )
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["history", "of", "bash"])
+
+    assert result.exit_code == 0
+    assert prompts[0].command_description == "history of bash"
+
+
+# -- single-flight ---------------------------------------------------------------
+
+
+def test_shellgenius_shares_answer_of_concurrent_identical_task(monkeypatch):
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(
+        cli_module, "chatgpt_request", lambda *args, **kwargs: pytest.fail("API called")
+    )
+    key = response_cache_key("print ok", cli_module.current_os_name())
+    leader = SingleFlight(key)
+    assert leader.try_lead()
+
+    def finish():
+        store_response(key, response_text(), model="gpt-5.4-mini", explain=True)
+        leader.release()
+
+    threading.Timer(0.05, finish).start()
+    result = CliRunner().invoke(cli_module.shellgenius, ["print", "ok"])
+
+    assert result.exit_code == 0
+    assert result.stdout == "printf 'ok'\n"
+    assert "Waiting for the same task running in another process" in result.stderr
+    assert "Shared the answer of a concurrent request for this task (gpt-5.4-mini)." in (
+        result.stderr
+    )
+
+
+def test_shellgenius_leads_and_releases_single_flight(monkeypatch):
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(
+        cli_module, "chatgpt_request", lambda *args, **kwargs: (response_text(), 0, object())
+    )
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["print", "ok"])
+
+    assert result.exit_code == 0
+    assert "Waiting" not in result.stderr
+    key = response_cache_key("print ok", cli_module.current_os_name())
+    assert SingleFlight(key).try_lead()
+
+
+# -- cache TTL -------------------------------------------------------------------
+
+
+def cache_answer(age, *, model="gpt-5.4-mini", task="print ok"):
+    key = response_cache_key(task, cli_module.current_os_name())
+    store_response(key, response_text(), model=model, explain=True, created=time.time() - age)
+
+
+@pytest.fixture
+def cache_ttl(monkeypatch):
+    config_module.CONFIG_PATH.write_text(
+        json.dumps({"shellgenius": {"cache_ttl": {"soft": "1h", "hard": "1d"}}})
+    )
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    spawned = []
+    monkeypatch.setattr(
+        revalidate, "spawn_revalidation", lambda *args, **kwargs: spawned.append(args) or True
+    )
+    return spawned
+
+
+def test_shellgenius_serves_fresh_cached_answer(monkeypatch, cache_ttl):
+    monkeypatch.setattr(
+        cli_module, "chatgpt_request", lambda *args, **kwargs: pytest.fail("API called")
+    )
+    cache_answer(120)
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["print", "ok"])
+
+    assert result.exit_code == 0
+    assert result.stdout == "printf 'ok'\n"
+    assert "Cached answer from 2m ago (gpt-5.4-mini)." in result.stderr
+    assert cache_ttl == []
+
+
+def test_shellgenius_serves_stale_answer_and_refreshes_it(monkeypatch, cache_ttl):
+    monkeypatch.setattr(
+        cli_module, "chatgpt_request", lambda *args, **kwargs: pytest.fail("API called")
+    )
+    cache_answer(3 * 3600)
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["print", "ok"])
+
+    assert result.exit_code == 0
+    assert result.stdout == "printf 'ok'\n"
+    assert "Cached answer from 3h ago (gpt-5.4-mini), refreshing in the background." in (
+        result.stderr
+    )
+    assert cache_ttl == [("print ok", cli_module.current_os_name())]
+
+
+@pytest.mark.parametrize(
+    ("age", "model", "args"),
+    [
+        (2 * 86400, "gpt-5.4-mini", ["print", "ok"]),
+        (120, "gpt-5.4-nano", ["print", "ok"]),
+        (120, "gpt-5.4-mini", ["--fresh", "print", "ok"]),
+    ],
+)
+def test_shellgenius_asks_model_instead_of_cache(monkeypatch, cache_ttl, age, model, args):
+    requests = []
+    monkeypatch.setattr(
+        cli_module,
+        "chatgpt_request",
+        lambda *a, **kwargs: requests.append(kwargs) or (response_text(), 0, object()),
+    )
+    cache_answer(age, model=model)
+
+    result = CliRunner().invoke(cli_module.shellgenius, args)
+
+    assert result.exit_code == 0
+    assert len(requests) == 1
+    assert "Cached answer" not in result.stderr
+    assert cache_ttl == []
+
+
+# -- `cache` subcommands ---------------------------------------------------------
+
+
+def test_shellgenius_cache_stats(monkeypatch, cache_ttl):
+    monkeypatch.setattr(
+        cli_module, "chatgpt_request", lambda *args, **kwargs: (response_text(), 0, object())
+    )
+    cache_answer(120)
+    cache_answer(2 * 86400, model="gpt-5.4-nano", task="list files")
+    CliRunner().invoke(cli_module.shellgenius, ["print", "ok"])
+    CliRunner().invoke(cli_module.shellgenius, ["list", "files"])
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["cache", "stats"])
+
+    assert result.exit_code == 0
+    assert "Entries: 2 (" in result.output
+    assert "Hit rate: 50% (1 hit, 1 miss)" in result.output
+    assert "gpt-5.4-mini      2" in result.output
+    assert "< 1h        2  ##############################" in result.output
+    assert ">= 30d      0" in result.output
+
+
+def test_shellgenius_cache_stats_without_lookups():
+    result = CliRunner().invoke(cli_module.shellgenius, ["cache", "stats"])
+
+    assert result.exit_code == 0
+    assert "Entries: 0" in result.output
+    assert "Hit rate: - " in result.output
+
+
+def test_shellgenius_cache_prune():
+    cache_answer(2 * 86400)
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["cache", "prune", "--older-than", "1d"])
+
+    assert result.exit_code == 0
+    assert result.output == "Deleted 1 answer.\n"
+    assert response_cache_stats().entries == 0
+
+
+def test_shellgenius_cache_prune_rejects_invalid_age():
+    result = CliRunner().invoke(cli_module.shellgenius, ["cache", "prune", "--older-than", "soon"])
+
+    assert result.exit_code == 2
+    assert "is not a duration such as 500ms, 2s, 12h, or 7d" in result.output
+
+
+def test_shellgenius_cache_warm(monkeypatch, tmp_path):
+    requests = []
+
+    def chatgpt_request(prompt, **kwargs):
+        if prompt.command_description == "broken":
+            raise RuntimeError("boom")
+        requests.append((prompt.command_description, kwargs["model"]))
+        return response_text(), 0, object()
+
+    monkeypatch.setattr("shellgenius.gpt_integration.chatgpt_request", chatgpt_request)
+    tasks_file = tmp_path / "tasks.txt"
+    tasks_file.write_text("print ok\n\nlist   files\nbroken\n", encoding="utf-8")
+
+    result = CliRunner().invoke(
+        cli_module.shellgenius, ["cache", "warm", str(tasks_file), "--os", "Linux"]
+    )
+
+    assert result.exit_code == 1
+    lines = result.output.splitlines()
+    assert lines[:3] == [
+        "1\tstored\tprint ok",
+        "3\tstored\tlist files",
+        "4\tfailed: boom\tbroken",
+    ]
+    assert lines[3] == "Tasks: 3 (2 stored, 1 failed)"
+    assert sorted(requests) == [("list files", "gpt-5.4-mini"), ("print ok", "gpt-5.4-mini")]
+    assert lookup_response(response_cache_key("list files", "Linux")).text == response_text()
+
+
+def test_shellgenius_cache_warm_asks_repeated_tasks_once(monkeypatch, tmp_path):
+    requests = []
+    monkeypatch.setattr(
+        "shellgenius.gpt_integration.chatgpt_request",
+        lambda prompt, **kwargs: (
+            requests.append(prompt.command_description) or (response_text(), 0, object())
+        ),
+    )
+    tasks_file = tmp_path / "tasks.txt"
+    tasks_file.write_text("print ok\nprint  ok\nlist files\nprint ok\n", encoding="utf-8")
+
+    result = CliRunner().invoke(
+        cli_module.shellgenius, ["cache", "warm", str(tasks_file), "--jobs", "4"]
+    )
+
+    assert result.exit_code == 0
+    assert result.output.splitlines() == [
+        "1\tstored\tprint ok",
+        "2\tduplicate: line 1\tprint ok",
+        "3\tstored\tlist files",
+        "4\tduplicate: line 1\tprint ok",
+        "Tasks: 4 (2 stored, 2 duplicate)",
+    ]
+    assert sorted(requests) == ["list files", "print ok"]
+
+
+def test_shellgenius_cache_warm_skips_cached_tasks(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        "shellgenius.gpt_integration.chatgpt_request",
+        lambda *args, **kwargs: pytest.fail("API called"),
+    )
+    tasks_file = tmp_path / "tasks.txt"
+    tasks_file.write_text("print ok\n", encoding="utf-8")
+    cache_answer(60)
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["cache", "warm", str(tasks_file)])
+
+    assert result.exit_code == 0
+    assert result.output == "1\tcached\tprint ok\nTasks: 1 (1 cached)\n"
+
+
+def test_shellgenius_cache_export_and_import(tmp_path):
+    bundle = tmp_path / "runbooks.json.gz"
+    cache_answer(60)
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["cache", "export", str(bundle)])
+    assert result.exit_code == 0
+    assert result.output == f"Exported 1 answer to {bundle}.\n"
+
+    response_cache.get_response_cache_path().unlink()
+    result = CliRunner().invoke(cli_module.shellgenius, ["cache", "import", str(bundle)])
+
+    assert result.exit_code == 0
+    assert result.output == "Imported 1 answer.\n"
+    assert response_cache_stats().entries == 1
+
+
+def test_shellgenius_cache_import_rejects_invalid_bundle(tmp_path):
+    bundle = tmp_path / "bundle.json.gz"
+    bundle.write_text("nope", encoding="utf-8")
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["cache", "import", str(bundle)])
+
+    assert result.exit_code == 1
+    assert "is not a response cache bundle" in result.output
+
+
+def test_shellgenius_routes_cache_prose_to_prompt(monkeypatch):
+    prompts = []
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(
+        cli_module,
+        "chatgpt_request",
+        lambda messages, **kwargs: prompts.append(messages) or (response_text(), 0, object()),
+    )
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["cache", "dns", "lookups"])
+
+    assert result.exit_code == 0
+    assert prompts[0].command_description == "cache dns lookups"
+
+
+# -- model aliases and `models` command ----------------------------------------
+
+
+def test_shellgenius_models_lists_all_valid_models():
+    runner = CliRunner()
+
+    result = runner.invoke(cli_module.shellgenius, ["models"])
+
+    assert result.exit_code == 0
+    for model in cli_module.VALID_MODELS:
+        assert model in result.output
+
+
+def test_shellgenius_models_shows_aliases():
+    runner = CliRunner()
+
+    result = runner.invoke(cli_module.shellgenius, ["models"])
+
+    assert result.exit_code == 0
+    assert "Alias: 4.1\n" in result.output
+    assert "Alias: 5.4-mini\n" in result.output
+
+
+def test_shellgenius_models_shows_circuit_breaker_states():
+    for _ in range(3):
+        record_failure("gpt-5.4-mini")
+    record_failure("gpt-4.1")
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["models"])
+
+    assert result.exit_code == 0
+    assert "gpt-5.4-mini\n  Alias: 5.4-mini\n  Circuit: open, retry in 30s (3 failures)\n" in (
+        result.output
+    )
+    assert "  Circuit: closed (1 failure)\n" in result.output
+    assert result.output.count("Circuit:") == 2
+
+
+def test_shellgenius_models_shows_learned_rate_limits():
+    learn_limits(
+        "gpt-5.4-mini",
+        {"x-ratelimit-limit-requests": "5000", "x-ratelimit-limit-tokens": "2000000"},
+    )
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["models"])
+
+    assert result.exit_code == 0
+    assert "  Rate limit: 5,000 requests/min, 2,000,000 tokens/min\n" in result.output
+    assert result.output.count("Rate limit:") == 1
+
+
+def write_custom_models():
+    models = {"local-coder": {"aliases": ["lc"], "api": "chat_completions", "streaming": False}}
+    config_module.CONFIG_PATH.write_text(
+        json.dumps({"shellgenius": {"models": models}}), encoding="utf-8"
+    )
+
+
+def test_shellgenius_models_lists_custom_models():
+    write_custom_models()
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["models"])
+
+    assert result.exit_code == 0
+    assert "local-coder\n  Alias: lc\n  Custom: chat_completions, stop\n" in result.output
+
+
+def test_shellgenius_accepts_custom_model_aliases(monkeypatch):
+    calls = []
+    write_custom_models()
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(
+        cli_module,
+        "chatgpt_request",
+        lambda *args, **kwargs: calls.append(kwargs) or (response_text(), 0, object()),
+    )
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["-m", "LC", "print", "ok"])
+
+    assert result.exit_code == 0
+    assert calls == [{"model": "local-coder", "stream": False}]
+
+
+def test_shellgenius_passes_configured_fallback_model(monkeypatch):
+    calls = []
+    config_module.CONFIG_PATH.write_text(
+        json.dumps({"shellgenius": {"fallback_model": "4.1-mini"}}), encoding="utf-8"
+    )
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(
+        cli_module,
+        "chatgpt_request",
+        lambda *args, **kwargs: calls.append(kwargs) or (response_text(), 0, object()),
+    )
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["print", "ok"])
+
+    assert result.exit_code == 0
+    assert calls == [{"model": "gpt-5.4-mini", "stream": False, "fallback_model": "gpt-4.1-mini"}]
+
+
+def test_shellgenius_auto_model_routes_and_explains_choice(monkeypatch, tokenizer_unavailable):
+    calls = []
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(
+        cli_module,
+        "chatgpt_request",
+        lambda *args, **kwargs: calls.append(kwargs) or (response_text(), 0, object()),
+    )
+
+    result = CliRunner().invoke(
+        cli_module.shellgenius, ["--model", "auto", "--timings", "list", "files"]
+    )
+
+    assert result.exit_code == 0
+    assert calls == [{"model": "gpt-5.4-nano", "stream": False}]
+    assert "routing: gpt-5.4-nano for a simple task" in result.output
+
+
+def test_shellgenius_models_stats_without_history():
+    result = CliRunner().invoke(cli_module.shellgenius, ["models", "--stats"])
+
+    assert result.exit_code == 0
+    assert result.output == "No requests recorded yet.\n"
+
+
+def test_shellgenius_models_stats_shows_recorded_requests():
+    usage = ResponseUsage(input_tokens=100, output_tokens=50)
+    record_request("gpt-5.4-mini", latency=1.0, first_token=0.3, usage=usage, cost=0.00032)
+    record_request("gpt-4.1", latency=2.0)
+
+    result = CliRunner().invoke(cli_module.shellgenius, ["models", "--stats"])
+
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    assert lines[0].split() == [
+        "model",
+        "requests",
+        "TTFT",
+        "p50",
+        "p95",
+        "total",
+        "p50",
+        "p95",
+        "tok/s",
+        "parse",
+        "avg",
+        "cost",
+    ]
+    assert lines[1].split() == [
+        "gpt-5.4-mini",
+        "1",
+        "0.38s",
+        "0.38s",
+        "1.28s",
+        "1.28s",
+        "50",
+        "-",
+        "$0.00032",
+    ]
+    assert lines[2].split() == ["gpt-4.1", "1", "-", "-", "2.88s", "2.88s", "-", "-", "-"]
+
+
+def test_shellgenius_alias_resolves_to_canonical(monkeypatch):
+    runner = CliRunner()
+    calls = []
+
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(
+        cli_module,
+        "chatgpt_request",
+        lambda *args, **kwargs: calls.append(kwargs) or (response_text(), 0, object()),
+    )
+
+    result = runner.invoke(cli_module.shellgenius, ["--model", "4.1", "print", "ok"])
+
+    assert result.exit_code == 0
+    assert calls == [{"model": "gpt-4.1", "stream": False}]
+
+
+def test_shellgenius_alias_resolves_case_insensitively(monkeypatch):
+    runner = CliRunner()
+    calls = []
+
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(
+        cli_module,
+        "chatgpt_request",
+        lambda *args, **kwargs: calls.append(kwargs) or (response_text(), 0, object()),
+    )
+
+    result = runner.invoke(cli_module.shellgenius, ["--model", "GPT-4.1", "print", "ok"])
+
+    assert result.exit_code == 0
+    assert calls == [{"model": "gpt-4.1", "stream": False}]
+
+
+def test_shellgenius_invalid_model_fails_with_hint():
+    runner = CliRunner()
+
+    result = runner.invoke(cli_module.shellgenius, ["--model", "invalid", "print", "ok"])
+
+    assert result.exit_code != 0
+    assert "Invalid value for '--model' / '-m': Invalid model name." in result.output
+    assert "Use shellgenius models to list supported models and aliases." in result.output
+
+
+def test_shellgenius_invalid_model_styles_message_and_command():
+    runner = CliRunner()
+
+    result = runner.invoke(
+        cli_module.shellgenius,
+        ["--model", "invalid", "print", "ok"],
+        color=True,
+    )
+
+    assert result.exit_code != 0
+    assert "\x1b[31mInvalid model name.\x1b[0m" in result.output
+    assert "\x1b[31mUse \x1b[0m\x1b[34mshellgenius models\x1b[0m" in result.output
+
+
+def test_shellgenius_routes_leaf_option_value_sequences_to_subcommand_parser(monkeypatch):
+    runner = CliRunner()
+    chatgpt_calls = []
+
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(
+        cli_module,
+        "chatgpt_request",
+        lambda *args, **kwargs: chatgpt_calls.append((args, kwargs)),
+    )
+
+    result = runner.invoke(cli_module.shellgenius, ["models", "-m", "gpt-5"])
+
+    assert result.exit_code == 2
+    assert "No such option: -m" in result.output
+    assert chatgpt_calls == []
 
 
 @pytest.mark.parametrize(
@@ -1317,6 +2342,55 @@ def test_shellgenius_tokens_prints_count_and_cost_without_api_call(monkeypatch,
     assert "$" in result.output
 
 
+def test_shellgenius_tokens_estimates_output_cost_and_latency_from_history(monkeypatch):
+    runner = CliRunner()
+
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(cli_module, "num_tokens_from_messages", lambda _msgs, _model: 1000)
+    monkeypatch.setattr(cli_module, "estimate_prompt_cost", lambda _msgs, _model: "0.000750")
+    record_request(
+        "gpt-5.4-mini",
+        kind=COMMAND,
+        latency=2.5,
+        usage=ResponseUsage(
+            input_tokens=1200, output_tokens=300, reasoning_tokens=100, cached_tokens=300
+        ),
+    )
+    record_request(
+        "gpt-5.4-mini",
+        kind=EXPLAIN,
+        latency=9.0,
+        usage=ResponseUsage(input_tokens=1200, output_tokens=900, cached_tokens=300),
+    )
+
+    result = runner.invoke(cli_module.shellgenius, ["--tokens", "print", "ok"])
+
+    assert result.exit_code == 0
+    assert "Expected output tokens: 200 + 100 reasoning (from 1 recorded request)" in result.output
+    assert "Estimated total cost: $0.002100" in result.output
+    assert "Expected latency: 2.5s (from 1 recorded request)" in result.output
+    assert "Prompt cache hit rate: 25% (from 1 recorded request)" in result.output
+
+
+def test_shellgenius_tokens_falls_back_to_default_output_estimate(monkeypatch):
+    runner = CliRunner()
+
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(cli_module, "num_tokens_from_messages", lambda _msgs, _model: 1000)
+    monkeypatch.setattr(cli_module, "estimate_prompt_cost", lambda _msgs, _model: "0.002000")
+
+    result = runner.invoke(cli_module.shellgenius, ["--tokens", "-m", "4.1", "print", "ok"])
+
+    assert result.exit_code == 0
+    assert "Expected output tokens: 30 (default estimate)" in result.output
+    assert "Estimated total cost: $0.002240" in result.output
+    assert "Expected latency: 1.0s (default estimate)" in result.output
+
+
 def test_shellgenius_tokens_has_no_short_flag():
     runner = CliRunner()
 
@@ -1380,8 +2454,8 @@ def test_shellgenius_routes_ambiguous_top_level_commands_to_prompt(
     monkeypatch.setattr(
         cli_module,
         "format_prompt",
-        lambda command_description, os_name: (
-            prompts.append((command_description, os_name))
+        lambda command_description, os_name, explain=True: (
+            prompts.append((command_description, os_name, explain))
             or [{"role": "user", "content": command_description}]
         ),
     )
@@ -1394,7 +2468,7 @@ def test_shellgenius_routes_ambiguous_top_level_commands_to_prompt(
     result = runner.invoke(cli_module.shellgenius, args)
 
     assert result.exit_code == 0
-    assert prompts == [(description, "Linux")]
+    assert prompts == [(description, "Linux", False)]
     assert result.output == "printf 'ok'\n"
 
 
@@ -1430,3 +2504,124 @@ def test_shellgenius_keeps_malformed_key_subcommands_on_subcommand_path(monkeypa
     assert "Got unexpected extra argument" in result.output
     assert prompts == []
     assert chatgpt_calls == []
+
+
+# -- `--timings` flag ----------------------------------------------------------
+
+
+def test_shellgenius_timings_prints_breakdown_to_stderr(monkeypatch):
+    runner = CliRunner()
+
+    monkeypatch.setattr(
+        cli_module, "get_tty_state", lambda: cli_module.TTYState(False, False, False)
+    )
+    monkeypatch.setattr(
+        cli_module,
+        "chatgpt_request",
+        lambda *args, **kwargs: (response_text(), 0, object()),
+    )
+
+    result = runner.invoke(cli_module.shellgenius, ["--timings", "print", "ok"])
+
+    assert result.exit_code == 0
+    assert result.stdout == "printf 'ok'\n"
+    assert "Timings:" in result.stderr
+    assert "request" in result.stderr
+    assert "model: gpt-5.4-mini" in result.stderr
+
+
+def test_shellgenius_help_lists_profile_option():
+    runner = CliRunner()
+
+    result = runner.invoke(cli_module.shellgenius, ["--help"])
+
+    assert result.exit_code == 0
+    assert "--profile PATH" in result.output
+    assert "--timings" in result.output
+
+
+# -- `tokens` subcommand ---------------------------------------------------------
+
+
+def test_shellgenius_tokens_command_streams_per_task_counts_and_totals(tmp_path, offline_tokenizer):
+    runner = CliRunner()
+    tasks_file = tmp_path / "tasks.txt"
+    tasks_file.write_text("list files\n\nshow disk usage\n", encoding="utf-8")
+
+    result = runner.invoke(
+        cli_module.shellgenius,
+        ["tokens", str(tasks_file), "-m", "4.1", "-m", "5.4-mini", "--os", "Linux"],
+    )
+
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    first_count = num_tokens_from_messages(format_prompt("list files", "Linux"), "gpt-4.1")
+    second_count = num_tokens_from_messages(format_prompt("show disk usage", "Linux"), "gpt-4.1")
+    assert lines[0] == f"1\t{first_count}\tlist files"
+    assert lines[1] == f"3\t{second_count}\tshow disk usage"
+    assert "Tasks: 2" in result.output
+    assert f"Prompt tokens: {first_count + second_count}" in result.output
+    assert "gpt-4.1" in lines[-2]
+    assert "gpt-5.4-mini" in lines[-1]
+    assert "$0." in lines[-1]
+
+
+def test_shellgenius_tokens_command_reads_stdin_and_prints_summary_only():
+    runner = CliRunner()
+
+    result = runner.invoke(
+        cli_module.shellgenius,
+        ["tokens", "-", "--summary", "-m", "5.4-nano"],
+        input="print ok\nprint ko\n",
+    )
+
+    assert result.exit_code == 0
+    assert result.output.startswith("Tasks: 2\n")
+    assert "\t" not in result.output
+    assert "gpt-5.4-nano" in result.output
+
+
+def test_shellgenius_tokens_command_defaults_to_every_priced_model(tmp_path, offline_tokenizer):
+    runner = CliRunner()
+    tasks_file = tmp_path / "tasks.txt"
+    tasks_file.write_text("", encoding="utf-8")
+
+    result = runner.invoke(cli_module.shellgenius, ["tokens", str(tasks_file)])
+
+    assert result.exit_code == 0
+    assert "Tasks: 0" in result.output
+    for model in cli_module.VALID_MODELS:
+        assert model in result.output
+
+
+# -- `proxy` subcommand ----------------------------------------------------------
+
+
+def test_shellgenius_proxy_command_serves_until_interrupted(monkeypatch):
+    from shellgenius.proxy import ProxyServer
+
+    served = []
+
+    def serve_forever(server, poll_interval=0.5):
+        served.append(server)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(ProxyServer, "serve_forever", serve_forever)
+    monkeypatch.setenv("OPENAI_BASE_URL", "https://example.test/v1/")
+    runner = CliRunner()
+
+    result = runner.invoke(cli_module.shellgenius, ["proxy", "--port", "0", "--rpm", "100"])
+
+    assert result.exit_code == 0
+    assert served[0].upstream == "https://example.test/v1"
+    assert served[0].rate_limit.capacity == 100
+    assert f"Proxying {served[0].url} -> https://example.test/v1" in result.stderr
+    assert "Requests: 0" in result.stderr
+
+
+def test_shellgenius_proxy_command_rejects_bad_ttl():
+    runner = CliRunner()
+
+    result = runner.invoke(cli_module.shellgenius, ["proxy", "--ttl", "soon"])
+
+    assert result.exit_code == 2
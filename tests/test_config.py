@@ -0,0 +1,231 @@
+import json
+
+import pytest
+
+from shellgenius import config as config_module
+from shellgenius.config import (
+    BASE_URL_ENV,
+    BATCH,
+    INTERACTIVE,
+    Settings,
+    get_base_url,
+    load_settings,
+    parse_duration,
+)
+from shellgenius.models import ModelCapabilities
+from shellgenius.response_cache import CacheTTL
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("2s", 2.0),
+        ("500ms", 0.5),
+        ("1.5", 1.5),
+        (" 1m ", 60.0),
+        (".25s", 0.25),
+        ("12h", 43200.0),
+        ("7d", 604800.0),
+    ],
+)
+def test_parse_duration(value, expected):
+    assert parse_duration(value) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("value", ["", "soon", "2w", "0s", "-1s"])
+def test_parse_duration_rejects_invalid_values(value):
+    with pytest.raises(ValueError):
+        parse_duration(value)
+
+
+def write_config(data):
+    config_module.CONFIG_PATH.write_text(json.dumps(data), encoding="utf-8")
+
+
+def test_load_settings_without_config_file():
+    assert load_settings() == Settings()
+
+
+@pytest.mark.parametrize("data", [[], {"shellgenius": "nope"}, {"code_block_theme": "monokai"}])
+def test_load_settings_ignores_unrelated_or_invalid_config(data):
+    write_config(data)
+
+    assert load_settings() == Settings()
+
+
+def test_load_settings_reads_service_tier_per_traffic_class():
+    write_config({"shellgenius": {"service_tier": {"interactive": "priority", "batch": "flex"}}})
+
+    settings = load_settings()
+
+    assert settings.service_tier_for(INTERACTIVE) == "priority"
+    assert settings.service_tier_for(BATCH) == "flex"
+
+
+def test_load_settings_applies_single_service_tier_to_all_traffic():
+    write_config({"shellgenius": {"service_tier": "flex"}})
+
+    settings = load_settings()
+
+    assert settings.service_tier_for(INTERACTIVE) == "flex"
+    assert settings.service_tier_for(BATCH) == "flex"
+
+
+def test_load_settings_drops_invalid_service_tiers():
+    write_config({"shellgenius": {"service_tier": {"interactive": "turbo", "batch": "flex"}}})
+
+    settings = load_settings()
+
+    assert settings.service_tier_for(INTERACTIVE) is None
+    assert settings.service_tier_for(BATCH) == "flex"
+
+
+def test_load_settings_reads_hedge_block():
+    write_config({"shellgenius": {"hedge": {"after": 1.5, "model": "5.4-nano", "max_rate": 2}}})
+
+    settings = load_settings()
+
+    assert settings.hedge
+    assert settings.hedge_after == 1.5
+    assert settings.hedge_model == "gpt-5.4-nano"
+    assert settings.hedge_max_rate is None
+
+
+@pytest.mark.parametrize(
+    ("value", "model", "expected"),
+    [
+        ("4.1-mini", "gpt-5.4-mini", "gpt-4.1-mini"),
+        ("4.1-mini", "gpt-4.1-mini", None),
+        ({"5.4-mini": "5.4-nano", "*": "4o-mini"}, "gpt-5.4-mini", "gpt-5.4-nano"),
+        ({"5.4-mini": "5.4-nano", "*": "4o-mini"}, "gpt-5", "gpt-4o-mini"),
+        ({"5.4-mini": "unknown"}, "gpt-5.4-mini", None),
+    ],
+)
+def test_load_settings_reads_fallback_models(value, model, expected):
+    write_config({"shellgenius": {"fallback_model": value}})
+
+    assert load_settings().fallback_for(model) == expected
+
+
+def test_load_settings_reads_history_retention():
+    write_config({"shellgenius": {"history": {"max_entries": 5000, "max_age_days": 90}}})
+
+    settings = load_settings()
+
+    assert settings.history
+    assert settings.history_max_entries == 5000
+    assert settings.history_max_age_days == 90
+
+
+@pytest.mark.parametrize(
+    ("value", "enabled", "threshold"),
+    [
+        (False, False, None),
+        ({"threshold": 0.95}, True, 0.95),
+        ({"enabled": False, "threshold": 0.8}, False, 0.8),
+        ({"threshold": 1.5}, True, None),
+    ],
+)
+def test_load_settings_reads_similar_tasks(value, enabled, threshold):
+    write_config({"shellgenius": {"similar_tasks": value}})
+
+    settings = load_settings()
+
+    assert settings.similar_tasks is enabled
+    assert settings.similar_tasks_threshold == threshold
+
+
+@pytest.mark.parametrize(
+    ("value", "model", "expected"),
+    [
+        ({"soft": "1h", "hard": "2d"}, "gpt-5.4-mini", CacheTTL(soft=3600, hard=172800)),
+        ({"soft": 60}, "gpt-5.4-mini", CacheTTL(soft=60)),
+        ({"5.4-nano": {"soft": "10m"}, "*": {"soft": "1d"}}, "gpt-5.4-nano", CacheTTL(soft=600)),
+        ({"5.4-nano": {"soft": "10m"}, "*": {"soft": "1d"}}, "gpt-5.4-mini", CacheTTL(soft=86400)),
+        ({"gpt-5.4-nano": {"soft": "10m"}}, "gpt-5.4-mini", None),
+        ({"soft": "2h", "hard": "1h"}, "gpt-5.4-mini", None),
+        ({"soft": "soon"}, "gpt-5.4-mini", None),
+        ({"soft": "1h", "hard": "later"}, "gpt-5.4-mini", None),
+        ("1h", "gpt-5.4-mini", None),
+    ],
+)
+def test_load_settings_reads_cache_ttl(value, model, expected):
+    write_config({"shellgenius": {"cache_ttl": value}})
+
+    assert load_settings().cache_ttl_for(model) == expected
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("http://127.0.0.1:8000/v1/", "http://127.0.0.1:8000/v1"),
+        ("https://llm.internal/v1", "https://llm.internal/v1"),
+        ("localhost:8000", None),
+        (8000, None),
+    ],
+)
+def test_load_settings_reads_base_url(value, expected):
+    write_config({"shellgenius": {"base_url": value}})
+
+    assert load_settings().base_url == expected
+
+
+def test_get_base_url_prefers_environment():
+    write_config({"shellgenius": {"base_url": "http://127.0.0.1:8000/v1"}})
+
+    assert get_base_url({}) == "http://127.0.0.1:8000/v1"
+    assert get_base_url({BASE_URL_ENV: "http://gpu-box:9000/v1"}) == "http://gpu-box:9000/v1"
+    write_config({})
+    assert get_base_url({}) is None
+
+
+def test_load_settings_reads_custom_models():
+    write_config(
+        {
+            "shellgenius": {
+                "models": {
+                    "qwen2.5-coder-7b": {
+                        "aliases": ["Qwen"],
+                        "api": "chat_completions",
+                        "streaming": False,
+                    },
+                    "llama-3.1-8b": {"aliases": "llama", "stop": False},
+                },
+                "fallback_model": {"5.4-mini": "qwen"},
+                "cache_ttl": {"llama": {"soft": "1h"}},
+            }
+        }
+    )
+
+    settings = load_settings()
+
+    assert settings.models == {
+        "qwen2.5-coder-7b": ModelCapabilities(
+            aliases=("qwen",),
+            service_tiers=(),
+            api="chat_completions",
+            streaming=False,
+            prompt_caching=False,
+        ),
+        "llama-3.1-8b": ModelCapabilities(
+            aliases=("llama",), service_tiers=(), stop=False, prompt_caching=False
+        ),
+    }
+    assert settings.fallback_for("gpt-5.4-mini") == "qwen2.5-coder-7b"
+    assert settings.cache_ttl_for("llama-3.1-8b") == CacheTTL(soft=3600)
+
+
+@pytest.mark.parametrize(
+    "entry",
+    [
+        "chat_completions",
+        {"api": "completions"},
+        {"streaming": "yes"},
+        {"aliases": [1]},
+        {"aliases": ["5.4-mini"]},
+    ],
+)
+def test_load_settings_drops_invalid_custom_models(entry):
+    write_config({"shellgenius": {"models": {"local": entry, "gpt-5.4-mini": {}}}})
+
+    assert load_settings().models == {}
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from shellgenius.deadline import (
+    Deadline,
+    complete_partial_response,
+    plan_request,
+)
+from shellgenius.model_stats import COMMAND, EXPLAIN, record_request
+
+
+def test_deadline_counts_time_already_spent():
+    deadline = Deadline(2.0, elapsed=0.5)
+
+    assert 1.4 < deadline.remaining() <= 1.5
+    assert Deadline(0.1, elapsed=0.2).expired
+
+
+def test_plan_request_keeps_model_that_fits():
+    plan = plan_request(Deadline(5.0, elapsed=0), model="gpt-5.4-mini")
+
+    assert plan.model == "gpt-5.4-mini"
+    assert plan.reasoning_effort == "minimal"
+    assert plan.fits
+    assert plan.timeout < 5.0
+
+
+def test_plan_request_switches_to_fastest_recorded_model():
+    for _ in range(3):
+        record_request("gpt-5.4-mini", kind=COMMAND, latency=3.0)
+        record_request("gpt-5.4-nano", kind=COMMAND, latency=0.3)
+
+    plan = plan_request(Deadline(1.0, elapsed=0), model="gpt-5.4-mini", reasoning_effort="low")
+
+    assert plan.model == "gpt-5.4-nano"
+    assert plan.reasoning_effort == "low"
+    assert plan.expected_latency == pytest.approx(0.3)
+
+
+def test_plan_request_only_switches_to_recorded_models_of_the_same_family():
+    record_request("gpt-5.4-mini", kind=COMMAND, latency=3.0)
+    record_request("gpt-4.1-nano", kind=COMMAND, latency=0.2)
+    record_request("gpt-5.4-nano", kind=EXPLAIN, latency=0.3)
+
+    plan = plan_request(Deadline(1.0, elapsed=0), model="gpt-5.4-mini")
+
+    assert plan.model == "gpt-5.4-mini"
+    assert plan.expected_latency == pytest.approx(3.0)
+
+
+def test_plan_request_keeps_explicit_model():
+    record_request("gpt-5.4-mini", kind=COMMAND, latency=3.0)
+
+    plan = plan_request(Deadline(1.0, elapsed=0), model="gpt-5.4-mini", model_explicit=True)
+
+    assert plan.model == "gpt-5.4-mini"
+    assert not plan.fits
+
+
+def test_complete_partial_response_needs_closed_fence():
+    assert complete_partial_response("```bash\nls -la\n```\n\nExpl") == "```bash\nls -la\n```\n"
+    assert complete_partial_response("```bash\nls -la") is None
+    assert complete_partial_response("") is None
+
+
+def test_deadline_remaining_decreases():
+    deadline = Deadline(1.0, elapsed=0)
+    first = deadline.remaining()
+    time.sleep(0.01)
+
+    assert deadline.remaining() < first
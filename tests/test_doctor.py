@@ -0,0 +1,184 @@
+import socket
+import subprocess
+from types import SimpleNamespace
+
+from click.testing import CliRunner
+
+import shellgenius.cli as cli_module
+import shellgenius.doctor as doctor_module
+from shellgenius.doctor import PerfCheck
+
+IMPORTTIME_STDERR = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      2000 |      45000 |     openai._client
+import time:      1500 |     812345 | openai
+"""
+
+
+def test_parse_import_time_reads_top_level_cumulative_time():
+    assert doctor_module.parse_import_time(IMPORTTIME_STDERR, "openai") == 0.812345
+    assert doctor_module.parse_import_time(IMPORTTIME_STDERR, "rich") is None
+
+
+def test_check_import_flags_slow_imports(monkeypatch):
+    monkeypatch.setattr(
+        doctor_module.subprocess,
+        "run",
+        lambda *args, **kwargs: SimpleNamespace(returncode=0, stderr=IMPORTTIME_STDERR),
+    )
+
+    check = doctor_module.check_import("openai")
+
+    assert check.name == "import openai"
+    assert check.seconds == 0.812345
+    assert "Importing `openai` takes 812 ms" in check.hotspot
+
+
+def test_check_import_reports_failures(monkeypatch):
+    def raise_timeout(*args, **kwargs):
+        raise subprocess.TimeoutExpired("python", 60)
+
+    monkeypatch.setattr(doctor_module.subprocess, "run", raise_timeout)
+
+    check = doctor_module.check_import("openai")
+
+    assert check.seconds is None
+    assert check.detail.startswith("failed:")
+
+
+def test_check_config_dir_reads_every_file(tmp_path):
+    (tmp_path / "key.env").write_text("OPENAI_API_KEY=sk-test\n", encoding="utf-8")
+    (tmp_path / "config.json").write_text("{}", encoding="utf-8")
+
+    check = doctor_module.check_config_dir(tmp_path)
+
+    assert check.seconds is not None
+    assert check.detail == f"{tmp_path} (25 bytes)"
+    assert check.hotspot is None
+
+
+def test_tiktoken_cache_dir_prefers_environment(tmp_path):
+    assert doctor_module.tiktoken_cache_dir({"TIKTOKEN_CACHE_DIR": str(tmp_path)}) == tmp_path
+
+
+def test_check_endpoint_times_dns_and_tcp_for_plain_http(monkeypatch):
+    connections = []
+
+    class FakeSocket:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+    monkeypatch.setattr(
+        doctor_module.socket,
+        "getaddrinfo",
+        lambda host, port, type: [(socket.AF_INET, type, 6, "", ("127.0.0.1", port))],
+    )
+    monkeypatch.setattr(
+        doctor_module.socket,
+        "create_connection",
+        lambda address, timeout: connections.append(address) or FakeSocket(),
+    )
+
+    checks = doctor_module.check_endpoint("http://localhost:8765/v1")
+
+    assert [check.name for check in checks] == ["dns", "tcp connect"]
+    assert checks[0].detail == "localhost -> 127.0.0.1"
+    assert connections == [("localhost", 8765)]
+
+
+def test_check_endpoint_reports_dns_failure(monkeypatch):
+    def fail(*args, **kwargs):
+        raise socket.gaierror("Name or service not known")
+
+    monkeypatch.setattr(doctor_module.socket, "getaddrinfo", fail)
+
+    checks = doctor_module.check_endpoint("https://api.invalid/v1")
+
+    assert len(checks) == 1
+    assert checks[0].seconds is None
+    assert "Name or service not known" in checks[0].detail
+
+
+def test_resolve_endpoint_prefers_option_then_environment():
+    environ = {"OPENAI_BASE_URL": "http://localhost:8765/v1"}
+
+    assert doctor_module.resolve_endpoint("http://mock/v1", environ) == "http://mock/v1"
+    assert doctor_module.resolve_endpoint(None, environ) == "http://localhost:8765/v1"
+    assert doctor_module.resolve_endpoint(None, {}) == doctor_module.DEFAULT_ENDPOINT
+
+
+def test_resolve_endpoint_prefers_shellgenius_base_url():
+    environ = {
+        "SHELLGENIUS_BASE_URL": "http://127.0.0.1:8000/v1",
+        "OPENAI_BASE_URL": "http://localhost:8765/v1",
+    }
+
+    assert doctor_module.resolve_endpoint(None, environ) == "http://127.0.0.1:8000/v1"
+
+
+def test_rank_checks_puts_slowest_first_and_failures_last():
+    checks = [
+        PerfCheck("fast", 0.001),
+        PerfCheck("failed", None),
+        PerfCheck("slow", 0.5),
+    ]
+
+    assert [check.name for check in doctor_module.rank_checks(checks)] == [
+        "slow",
+        "fast",
+        "failed",
+    ]
+
+
+def test_shellgenius_doctor_perf_prints_ranked_report_and_hotspots(monkeypatch):
+    runner = CliRunner()
+    calls = []
+
+    monkeypatch.setattr(
+        doctor_module,
+        "run_checks",
+        lambda **kwargs: (
+            calls.append(kwargs)
+            or [
+                PerfCheck("theme", 0.002, "default"),
+                PerfCheck("import openai", 0.9, hotspot="Importing `openai` takes 900 ms."),
+                PerfCheck("dns", None, "api.openai.com: timed out"),
+            ]
+        ),
+    )
+    monkeypatch.setenv("HTTPS_PROXY", "http://proxy:3128")
+
+    result = runner.invoke(cli_module.shellgenius, ["doctor", "--perf"])
+
+    assert result.exit_code == 0
+    assert calls[0]["imports"] is True
+    assert calls[0]["network"] is True
+    lines = result.output.splitlines()
+    assert lines[0].startswith("  900 ms  import openai")
+    assert lines[1].startswith("    2 ms  theme")
+    assert "failed  dns" in lines[2]
+    assert "Hotspots:\n* Importing `openai` takes 900 ms." in result.output
+    assert "HTTPS_PROXY=http://proxy:3128" in result.output
+
+
+def test_shellgenius_doctor_without_perf_skips_imports_and_timings(monkeypatch):
+    runner = CliRunner()
+    calls = []
+
+    monkeypatch.setattr(
+        doctor_module,
+        "run_checks",
+        lambda **kwargs: calls.append(kwargs) or [PerfCheck("api key", 0.001, "not found")],
+    )
+
+    result = runner.invoke(cli_module.shellgenius, ["doctor", "--no-network"])
+
+    assert result.exit_code == 0
+    assert calls[0]["imports"] is False
+    assert calls[0]["network"] is False
+    assert result.output.startswith("api key  not found\n")
+    assert "Hotspots" not in result.output
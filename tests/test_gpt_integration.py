@@ -1,3 +1,4 @@
+import json
 from types import SimpleNamespace
 
 import httpx
@@ -5,16 +6,28 @@ import pytest
 from openai import RateLimitError
 
 import shellgenius.api_key as api_key_module
+import shellgenius.gpt_integration as gpt_integration_module
 from shellgenius.gpt_integration import (
+    FormattedPrompt,
     chatgpt_request,
     estimate_prompt_cost,
+    format_explanation_prompt,
     format_prompt,
+    iter_prompt_token_counts,
     num_tokens_from_messages,
 )
+from shellgenius.model_stats import load_model_stats
 from shellgenius.openai_backend import (
+    PLACEHOLDER_API_KEY,
+    APIConnectionError,
     OpenAIResponsesBackend,
+    ResponseUsage,
+    extract_response_id,
+    extract_usage,
     prepare_prompt_for_responses_api,
 )
+from shellgenius.rate_limit import learn_from_response, learn_limits
+from shellgenius.timings import get_timings
 
 
 class FakeCreateAPI:
@@ -51,16 +64,36 @@ def test_format_prompt_uses_bash_for_unix_shells():
     assert prompt[0]["role"] == "system"
     assert "Linux" in prompt[0]["content"]
     assert "same language as the user" in prompt[0]["content"]
-    assert prompt[1]["role"] == "user"
-    assert "```bash" in prompt[1]["content"]
-    assert "Do not write anything before the code block." in prompt[1]["content"]
-    assert "list files in the current directory" in prompt[1]["content"]
+    assert "`bash`" in prompt[0]["content"]
+    assert "Do not write anything before the code block." in prompt[0]["content"]
+    assert prompt[1] == {"role": "user", "content": "Task:\nlist files in the current directory\n"}
 
 
 def test_format_prompt_uses_powershell_for_windows():
     prompt = format_prompt("list files in the current directory", "Windows")
 
-    assert "```powershell" in prompt[1]["content"]
+    assert "`powershell`" in prompt[0]["content"]
+
+
+def test_format_prompt_without_explanation_asks_for_command_only():
+    prompt = format_prompt("list files in the current directory", "Linux", explain=False)
+
+    assert "`bash`" in prompt[0]["content"]
+    assert "nothing else" in prompt[0]["content"]
+    assert "Explanation" not in prompt[0]["content"]
+    assert prompt.explain is False
+
+
+@pytest.mark.parametrize("explain", [True, False])
+def test_format_prompt_keeps_a_stable_prefix_per_template_and_os(explain):
+    first = format_prompt("list files", "Linux", explain=explain)
+    second = format_prompt("show disk usage", "Linux", explain=explain)
+    windows = format_prompt("list files", "Windows", explain=explain)
+
+    assert first[0] == second[0]
+    assert first.cache_key == second.cache_key
+    assert first.cache_key != windows.cache_key
+    assert first.cache_key != format_prompt("list files", "Linux", explain=not explain).cache_key
 
 
 def test_prepare_prompt_for_responses_api_preserves_system_messages_in_order():
@@ -119,6 +152,116 @@ def test_chatgpt_request_returns_non_streaming_response(monkeypatch):
     assert fake_backend.calls[0]["stream"] is False
 
 
+@pytest.mark.parametrize(
+    ("model", "expected_effort", "expected_verbosity"),
+    [
+        ("gpt-5.4-mini", "none", "low"),
+        ("gpt-5-mini", "minimal", "low"),
+        ("gpt-4.1", None, None),
+    ],
+)
+def test_chatgpt_request_uses_low_latency_defaults(
+    monkeypatch, model, expected_effort, expected_verbosity
+):
+    calls = []
+    monkeypatch.setattr(
+        "shellgenius.gpt_integration.create_openai_backend",
+        lambda: SimpleNamespace(
+            create_text_response=lambda **kwargs: calls.append(kwargs) or ("done", None)
+        ),
+    )
+
+    chatgpt_request(format_prompt("list files", "Linux"), model=model)
+
+    assert calls[0]["reasoning_effort"] == expected_effort
+    assert calls[0]["verbosity"] == expected_verbosity
+    assert calls[0]["max_output_tokens"] is None
+
+
+def test_chatgpt_request_passes_explicit_options(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        "shellgenius.gpt_integration.create_openai_backend",
+        lambda: SimpleNamespace(
+            create_text_response=lambda **kwargs: calls.append(kwargs) or ("done", None)
+        ),
+    )
+
+    chatgpt_request(
+        format_prompt("list files", "Linux"),
+        model="gpt-5.4-mini",
+        reasoning_effort="minimal",
+        verbosity="high",
+        max_output_tokens=300,
+    )
+
+    assert calls[0]["reasoning_effort"] == "none"
+    assert calls[0]["verbosity"] == "high"
+    assert calls[0]["max_output_tokens"] == 300
+
+
+def test_chatgpt_request_records_usage_and_first_token_latency(monkeypatch):
+    usage = SimpleNamespace(
+        input_tokens=120,
+        output_tokens=90,
+        input_tokens_details=SimpleNamespace(cached_tokens=0),
+        output_tokens_details=SimpleNamespace(reasoning_tokens=30),
+    )
+    events = [
+        SimpleNamespace(type="response.output_text.delta", delta="```bash\nls\n```"),
+        SimpleNamespace(type="response.completed", response=SimpleNamespace(usage=usage)),
+    ]
+
+    def create_text_response(**kwargs):
+        kwargs["chunk_callback"]("```bash\nls\n```")
+        return "```bash\nls\n```", events
+
+    monkeypatch.setattr(
+        "shellgenius.gpt_integration.create_openai_backend",
+        lambda: SimpleNamespace(create_text_response=create_text_response),
+    )
+
+    chatgpt_request(
+        format_prompt("list files", "Linux"),
+        model="gpt-5.4-nano",
+        stream=True,
+        chunk_callback=lambda _chunk: None,
+    )
+
+    stats = load_model_stats()["gpt-5.4-nano"]
+    assert stats["requests"] == 1
+    assert stats["kinds"]["explain"]["output_tokens"]["mean"] == 60
+    assert stats["kinds"]["explain"]["reasoning_tokens"]["mean"] == 30
+    assert stats["first_token"]["n"] == 1
+    assert stats["cost"]["mean"] == pytest.approx((120 * 0.20 + 90 * 1.25) / 10**6)
+
+
+def test_extract_usage_reads_responses_and_chat_completion_usage():
+    responses_usage = SimpleNamespace(
+        usage=SimpleNamespace(
+            input_tokens=100,
+            output_tokens=50,
+            input_tokens_details=SimpleNamespace(cached_tokens=64),
+            output_tokens_details=SimpleNamespace(reasoning_tokens=20),
+        )
+    )
+    chat_usage = SimpleNamespace(
+        usage=SimpleNamespace(
+            prompt_tokens=100,
+            completion_tokens=40,
+            prompt_tokens_details=None,
+            completion_tokens_details=None,
+        )
+    )
+
+    assert extract_usage(responses_usage) == ResponseUsage(100, 50, 20, 64)
+    assert extract_usage(responses_usage).visible_output_tokens == 30
+    assert extract_usage(chat_usage) == ResponseUsage(100, 40)
+    assert extract_usage([SimpleNamespace(type="delta"), chat_usage]) == ResponseUsage(100, 40)
+    assert extract_usage(SimpleNamespace(output_text="done")) is None
+    assert extract_usage([]) is None
+
+
 def test_openai_backend_collects_streaming_response_and_calls_chunk_callback():
     stream = [
         SimpleNamespace(type="response.output_text.delta", delta="```bash\n"),
@@ -219,6 +362,49 @@ def test_openai_backend_preserves_mixed_prompt_order_for_responses_api():
     assert "instructions" not in fake_client.responses.calls[0]
 
 
+def test_openai_backend_sends_reasoning_options_to_responses_api():
+    fake_client = FakeOpenAIClient(response=SimpleNamespace(output_text="done"))
+    backend = OpenAIResponsesBackend(client=fake_client)
+
+    backend.create_text_response(
+        prompt=format_prompt("list files", "Linux"),
+        model="gpt-5.4-mini",
+        n=1,
+        temperature=None,
+        stop=None,
+        stream=False,
+        chunk_callback=None,
+        reasoning_effort="low",
+        verbosity="low",
+        max_output_tokens=256,
+    )
+
+    call = fake_client.responses.calls[0]
+    assert call["reasoning"] == {"effort": "low"}
+    assert call["text"] == {"verbosity": "low"}
+    assert call["max_output_tokens"] == 256
+
+
+def test_openai_backend_omits_unset_reasoning_options():
+    fake_client = FakeOpenAIClient(response=SimpleNamespace(output_text="done"))
+    backend = OpenAIResponsesBackend(client=fake_client)
+
+    backend.create_text_response(
+        prompt=format_prompt("list files", "Linux"),
+        model="gpt-4.1",
+        n=1,
+        temperature=1,
+        stop=None,
+        stream=False,
+        chunk_callback=None,
+    )
+
+    call = fake_client.responses.calls[0]
+    assert "reasoning" not in call
+    assert "text" not in call
+    assert "max_output_tokens" not in call
+
+
 def test_openai_backend_falls_back_to_chat_completions_for_n_without_stop():
     chat_response = SimpleNamespace(
         choices=[
@@ -256,14 +442,245 @@ def test_openai_backend_falls_back_to_chat_completions_for_n_without_stop():
     ]
 
 
-@pytest.mark.parametrize("model", ["gpt-5.4-mini", "gpt-5.4", "GPT-5.4", " gpt-5.4-mini "])
+def test_openai_backend_maps_reasoning_options_for_chat_completions():
+    chat_response = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="done"))]
+    )
+    fake_client = FakeOpenAIClient(chat_response=chat_response)
+    backend = OpenAIResponsesBackend(client=fake_client)
+
+    backend.create_text_response(
+        prompt=format_prompt("list files", "Linux"),
+        model="gpt-5-mini",
+        n=2,
+        temperature=1,
+        stop=None,
+        stream=False,
+        chunk_callback=None,
+        reasoning_effort="minimal",
+        verbosity="low",
+        max_output_tokens=256,
+    )
+
+    call = fake_client.chat.completions.calls[0]
+    assert call["reasoning_effort"] == "minimal"
+    assert call["verbosity"] == "low"
+    assert call["max_completion_tokens"] == 256
+
+
+def test_openai_backend_sends_previous_response_id():
+    fake_client = FakeOpenAIClient(response=SimpleNamespace(output_text="* Lists files."))
+    backend = OpenAIResponsesBackend(client=fake_client)
+
+    backend.create_text_response(
+        prompt=[{"role": "user", "content": "Explain."}],
+        model="gpt-5.4-mini",
+        n=1,
+        temperature=1,
+        stop=None,
+        stream=False,
+        chunk_callback=None,
+        previous_response_id="resp_123",
+    )
+
+    assert fake_client.responses.calls[0]["previous_response_id"] == "resp_123"
+
+
+def test_chatgpt_request_sends_prompt_cache_key_and_notes_cache_hits(monkeypatch):
+    calls = []
+    usage = SimpleNamespace(
+        input_tokens=1200,
+        output_tokens=20,
+        input_tokens_details=SimpleNamespace(cached_tokens=900),
+        output_tokens_details=SimpleNamespace(reasoning_tokens=0),
+    )
+    monkeypatch.setattr(
+        "shellgenius.gpt_integration.create_openai_backend",
+        lambda: SimpleNamespace(
+            create_text_response=lambda **kwargs: (
+                calls.append(kwargs) or ("done", SimpleNamespace(usage=usage))
+            )
+        ),
+    )
+    prompt = format_prompt("list files", "Linux")
+
+    chatgpt_request(prompt, model="gpt-5.4-mini")
+
+    assert calls[0]["prompt_cache_key"] == prompt.cache_key
+    assert get_timings().notes["cached input"] == "900/1200 tokens (75%)"
+    assert load_model_stats()["gpt-5.4-mini"]["cache_hit_rate"] == {"n": 1, "mean": 0.75}
+
+
+def test_chatgpt_request_reports_no_cache_hits_for_short_prompts(monkeypatch):
+    usage = SimpleNamespace(
+        input_tokens=150,
+        output_tokens=20,
+        input_tokens_details=SimpleNamespace(cached_tokens=0),
+        output_tokens_details=SimpleNamespace(reasoning_tokens=0),
+    )
+    monkeypatch.setattr(
+        "shellgenius.gpt_integration.create_openai_backend",
+        lambda: SimpleNamespace(
+            create_text_response=lambda **kwargs: ("done", SimpleNamespace(usage=usage))
+        ),
+    )
+
+    chatgpt_request(format_prompt("list files", "Linux"), model="gpt-5.4-mini")
+
+    assert "cached input" not in get_timings().notes
+    assert "cache_hit_rate" not in load_model_stats()["gpt-5.4-mini"]
+
+
+def test_chatgpt_request_records_requested_and_served_service_tier(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        "shellgenius.gpt_integration.create_openai_backend",
+        lambda: SimpleNamespace(
+            create_text_response=lambda **kwargs: (
+                calls.append(kwargs) or ("done", SimpleNamespace(service_tier="default"))
+            )
+        ),
+    )
+
+    chatgpt_request(format_prompt("list files", "Linux"), model="gpt-5-mini", service_tier="flex")
+
+    assert calls[0]["service_tier"] == "flex"
+    assert get_timings().notes["service tier"] == "flex (served by default)"
+    assert load_model_stats()["gpt-5-mini"]["service_tiers"] == {"default": 1}
+
+
+def test_chatgpt_request_notes_service_tier_the_model_does_not_offer(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        "shellgenius.gpt_integration.create_openai_backend",
+        lambda: SimpleNamespace(
+            create_text_response=lambda **kwargs: (
+                calls.append(kwargs) or ("done", SimpleNamespace(service_tier="default"))
+            )
+        ),
+    )
+
+    chatgpt_request(format_prompt("list files", "Linux"), model="gpt-4.1", service_tier="flex")
+
+    assert calls[0]["service_tier"] is None
+    assert get_timings().notes["service tier"] == (
+        "flex not offered by gpt-4.1; auto (served by default)"
+    )
+
+
+def test_openai_backend_sends_service_tier_to_both_apis():
+    chat_response = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="done"))]
+    )
+    fake_client = FakeOpenAIClient(
+        response=SimpleNamespace(output_text="done"), chat_response=chat_response
+    )
+    backend = OpenAIResponsesBackend(client=fake_client)
+
+    for n in (1, 2):
+        backend.create_text_response(
+            prompt=format_prompt("list files", "Linux"),
+            model="gpt-5-mini",
+            n=n,
+            temperature=1,
+            stop=None,
+            stream=False,
+            chunk_callback=None,
+            service_tier="priority",
+        )
+
+    assert fake_client.responses.calls[0]["service_tier"] == "priority"
+    assert fake_client.chat.completions.calls[0]["service_tier"] == "priority"
+
+
+def test_openai_backend_sends_prompt_cache_key():
+    fake_client = FakeOpenAIClient(response=SimpleNamespace(output_text="done"))
+    backend = OpenAIResponsesBackend(client=fake_client)
+
+    backend.create_text_response(
+        prompt=format_prompt("list files", "Linux"),
+        model="gpt-5.4-mini",
+        n=1,
+        temperature=1,
+        stop=None,
+        stream=False,
+        chunk_callback=None,
+        prompt_cache_key="shellgenius-v2-explain-linux",
+    )
+
+    assert fake_client.responses.calls[0]["prompt_cache_key"] == "shellgenius-v2-explain-linux"
+
+
+def test_openai_backend_rejects_previous_response_id_for_chat_completions():
+    fake_client = FakeOpenAIClient()
+    backend = OpenAIResponsesBackend(client=fake_client)
+
+    with pytest.raises(ValueError, match="previous_response_id"):
+        backend.create_text_response(
+            prompt=[{"role": "user", "content": "Explain."}],
+            model="gpt-5-mini",
+            n=2,
+            temperature=1,
+            stop=None,
+            stream=False,
+            chunk_callback=None,
+            previous_response_id="resp_123",
+        )
+
+    assert fake_client.chat.completions.calls == []
+
+
+@pytest.mark.parametrize(
+    ("response", "expected"),
+    [
+        (SimpleNamespace(id="resp_1", output_text="ls"), "resp_1"),
+        (
+            [
+                SimpleNamespace(type="response.output_text.delta", delta="ls"),
+                SimpleNamespace(type="response.completed", response=SimpleNamespace(id="resp_2")),
+            ],
+            "resp_2",
+        ),
+        (SimpleNamespace(id="chatcmpl-1", choices=[]), None),
+        ([SimpleNamespace(id="chatcmpl-1", choices=[])], None),
+        (None, None),
+    ],
+)
+def test_extract_response_id(response, expected):
+    assert extract_response_id(response) == expected
+
+
+def test_format_explanation_prompt_continues_stored_response():
+    prompt = format_prompt("list files", "Linux", explain=False)
+
+    messages, previous_response_id = format_explanation_prompt(
+        prompt, "```bash\nls\n```", SimpleNamespace(id="resp_1", output_text="")
+    )
+
+    assert previous_response_id == "resp_1"
+    assert len(messages) == 1
+    assert messages[0]["role"] == "user"
+
+
+def test_format_explanation_prompt_resends_conversation_without_response_id():
+    prompt = format_prompt("list files", "Linux", explain=False)
+
+    messages, previous_response_id = format_explanation_prompt(prompt, "```bash\nls\n```")
+
+    assert previous_response_id is None
+    assert messages[:2] == list(prompt)
+    assert messages[2] == {"role": "assistant", "content": "```bash\nls\n```"}
+    assert messages[3]["role"] == "user"
+
+
+@pytest.mark.parametrize("model", ["gpt-5.4-mini", "gpt-5.4", "gpt-5.4-nano"])
 def test_openai_backend_rejects_stop_for_gpt_5_4_models_before_api_call(model):
     fake_client = FakeOpenAIClient(response=SimpleNamespace(output_text="unused"))
     backend = OpenAIResponsesBackend(client=fake_client)
 
     with pytest.raises(
         ValueError,
-        match=r"`stop` is not supported for GPT-5\.4 models",
+        match=r"`stop` is not supported for",
     ):
         backend.create_text_response(
             prompt=format_prompt("list files in the current directory", "Linux"),
@@ -309,6 +726,87 @@ def test_num_tokens_from_messages_counts_standard_prompt():
     assert count > 0
 
 
+TOKEN_CACHE_TASKS = [
+    "list files in the current directory",
+    "",
+    "\nstarts with a newline",
+    "/etc/hosts entries",
+    "  leading spaces",
+    "Task:\nnested template text",
+    "résumé 日本語 🚀",
+    "123456 files",
+]
+
+
+@pytest.mark.parametrize("model", ["gpt-4", "gpt-5.4-mini"])
+@pytest.mark.parametrize("os_name", ["Linux", "macOS", "Windows"])
+@pytest.mark.parametrize("explain", [True, False])
+def test_num_tokens_from_messages_template_cache_matches_full_encoding(model, os_name, explain):
+    for task in TOKEN_CACHE_TASKS:
+        prompt = format_prompt(task, os_name, explain=explain)
+
+        assert isinstance(prompt, FormattedPrompt)
+        assert num_tokens_from_messages(prompt, model) == num_tokens_from_messages(
+            list(prompt), model
+        )
+
+
+def test_num_tokens_from_messages_falls_back_when_prompt_is_modified():
+    prompt = format_prompt("list files", "Linux")
+    prompt[1]["content"] += "Use long options."
+
+    assert not prompt.is_unmodified()
+    assert num_tokens_from_messages(prompt, "gpt-4") == num_tokens_from_messages(
+        list(prompt), "gpt-4"
+    )
+
+
+def test_prompt_token_template_is_cached_per_os_and_encoding():
+    gpt_integration_module._prompt_token_template.cache_clear()
+
+    for task in ["list files", "show disk usage", "print ok"]:
+        num_tokens_from_messages(format_prompt(task, "Linux"), "gpt-4")
+
+    cache_info = gpt_integration_module._prompt_token_template.cache_info()
+    assert cache_info.misses == 1
+    assert cache_info.hits == 2
+
+
+@pytest.mark.parametrize("model", ["gpt-4", "gpt-5.4-mini"])
+def test_iter_prompt_token_counts_matches_single_prompt_counts(model):
+    counts = list(iter_prompt_token_counts(iter(TOKEN_CACHE_TASKS), "Linux", model, batch_size=3))
+
+    assert counts == [
+        num_tokens_from_messages(list(format_prompt(task, "Linux")), model)
+        for task in TOKEN_CACHE_TASKS
+    ]
+
+
+def test_iter_prompt_token_counts_supports_command_only_prompts():
+    counts = list(
+        iter_prompt_token_counts(iter(TOKEN_CACHE_TASKS), "Linux", "gpt-4", explain=False)
+    )
+
+    assert counts == [
+        num_tokens_from_messages(list(format_prompt(task, "Linux", explain=False)), "gpt-4")
+        for task in TOKEN_CACHE_TASKS
+    ]
+
+
+def test_iter_prompt_token_counts_consumes_input_one_batch_at_a_time():
+    consumed = []
+
+    def tasks():
+        for index in range(10):
+            consumed.append(index)
+            yield f"task {index}"
+
+    counts = iter_prompt_token_counts(tasks(), "Linux", "gpt-4", batch_size=4)
+
+    next(counts)
+    assert consumed == [0, 1, 2, 3]
+
+
 def test_estimate_prompt_cost_returns_string_for_known_model():
     messages = format_prompt("list files", "Linux")
     cost = estimate_prompt_cost(messages, "gpt-5.4-mini")
@@ -331,3 +829,152 @@ def test_openai_backend_exits_cleanly_when_key_file_has_invalid_utf8(monkeypatch
         OpenAIResponsesBackend()
 
     assert "No OpenAI API key found." in capsys.readouterr().err
+
+
+@pytest.fixture
+def local_models():
+    from shellgenius import config as config_module
+
+    models = {
+        "local-chat": {"api": "chat_completions"},
+        "local-batch": {"streaming": False},
+        "local-nostop": {"stop": False},
+    }
+    config_module.CONFIG_PATH.write_text(
+        json.dumps({"shellgenius": {"base_url": "http://127.0.0.1:8000/v1", "models": models}}),
+        encoding="utf-8",
+    )
+
+
+def test_openai_backend_sends_chat_models_to_chat_completions(local_models):
+    chat_response = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="```bash\nls\n```"))]
+    )
+    fake_client = FakeOpenAIClient(chat_response=chat_response)
+    backend = OpenAIResponsesBackend(client=fake_client)
+
+    generated_text, _ = backend.create_text_response(
+        prompt=format_prompt("list files", "Linux"),
+        model="local-chat",
+        n=1,
+        temperature=1,
+        stop=None,
+        stream=False,
+        chunk_callback=None,
+    )
+
+    assert generated_text == "```bash\nls\n```"
+    assert fake_client.responses.calls == []
+    assert fake_client.chat.completions.calls[0]["model"] == "local-chat"
+
+
+def test_chatgpt_request_sends_only_standard_fields_to_custom_chat_models(
+    local_models, monkeypatch
+):
+    chat_response = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="```bash\nls\n```"))]
+    )
+    fake_client = FakeOpenAIClient(chat_response=chat_response)
+    monkeypatch.setattr(
+        "shellgenius.gpt_integration.create_openai_backend",
+        lambda: OpenAIResponsesBackend(client=fake_client),
+    )
+
+    chatgpt_request(format_prompt("list files", "Linux"), model="local-chat", service_tier="flex")
+
+    assert sorted(fake_client.chat.completions.calls[0]) == ["messages", "model", "n", "stream"]
+
+
+def test_openai_backend_delivers_non_streaming_models_in_one_chunk(local_models):
+    fake_client = FakeOpenAIClient(response=SimpleNamespace(output_text="```bash\nls\n```"))
+    backend = OpenAIResponsesBackend(client=fake_client)
+    chunks = []
+
+    generated_text, _ = backend.create_text_response(
+        prompt=format_prompt("list files", "Linux"),
+        model="local-batch",
+        n=1,
+        temperature=1,
+        stop=None,
+        stream=True,
+        chunk_callback=chunks.append,
+    )
+
+    assert generated_text == "```bash\nls\n```"
+    assert chunks == ["```bash\nls\n```"]
+    assert fake_client.responses.calls[0]["stream"] is False
+
+
+def test_openai_backend_rejects_stop_for_models_without_it(local_models):
+    fake_client = FakeOpenAIClient(chat_response=SimpleNamespace(choices=[]))
+    backend = OpenAIResponsesBackend(client=fake_client)
+
+    with pytest.raises(ValueError, match="`stop` is not supported for local-nostop"):
+        backend.create_text_response(
+            prompt=format_prompt("list files", "Linux"),
+            model="local-nostop",
+            n=1,
+            temperature=1,
+            stop=["STOP"],
+            stream=False,
+            chunk_callback=None,
+        )
+
+    assert fake_client.chat.completions.calls == []
+
+
+def test_create_openai_backend_uses_configured_base_url(local_models, monkeypatch, tmp_path):
+    monkeypatch.setattr(api_key_module, "KEY_FILE_PATH", tmp_path / "missing.env")
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+    backend = gpt_integration_module.create_openai_backend()
+
+    assert str(backend._client.base_url) == "http://127.0.0.1:8000/v1/"
+    assert backend._client.api_key == PLACEHOLDER_API_KEY
+
+
+def test_chatgpt_request_paces_requests_within_learned_limits(monkeypatch, tokenizer_unavailable):
+    paced = []
+    fake_backend = SimpleNamespace(
+        create_text_response=lambda **kwargs: ("```bash\nls\n```", SimpleNamespace())
+    )
+    monkeypatch.setattr("shellgenius.gpt_integration.create_openai_backend", lambda: fake_backend)
+    monkeypatch.setattr(
+        "shellgenius.gpt_integration.pace",
+        lambda model, estimate, *, max_wait: paced.append((model, estimate(), max_wait)) or 1.5,
+    )
+    prompt = format_prompt("list files", "Linux")
+
+    chatgpt_request(prompt, model="gpt-5.4-mini", max_output_tokens=100, timeout=5)
+
+    assert paced == [
+        ("gpt-5.4-mini", gpt_integration_module._estimate_prompt_tokens(prompt) + 100, 5)
+    ]
+    assert get_timings().notes["rate limit"] == "waited 1.50s for gpt-5.4-mini"
+
+
+def test_chatgpt_request_raises_connection_errors_without_the_tokenizer(
+    monkeypatch, tokenizer_unavailable
+):
+    request = httpx.Request("POST", "https://api.openai.com/v1/responses")
+
+    def unreachable(**kwargs):
+        raise APIConnectionError(request=request)
+
+    monkeypatch.setattr(
+        "shellgenius.gpt_integration.create_openai_backend",
+        lambda: SimpleNamespace(create_text_response=unreachable),
+    )
+    learn_limits("gpt-5.4-mini", {"x-ratelimit-limit-tokens": "100000"})
+
+    # The CLI falls back to a local answer on connection errors.
+    with pytest.raises(APIConnectionError):
+        chatgpt_request(format_prompt("list files", "Linux"), model="gpt-5.4-mini")
+
+
+def test_openai_backend_learns_rate_limits_from_responses(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+    backend = OpenAIResponsesBackend()
+
+    assert learn_from_response in backend._client._client.event_hooks["response"]
@@ -0,0 +1,153 @@
+import threading
+
+import pytest
+
+from shellgenius.hedging import DEFAULT_HEDGE_AFTER, HedgedBackend, HedgePolicy
+from shellgenius.model_stats import load_model_stats, record_hedge, record_request
+
+
+class FakeStreamingBackend:
+    """Streams ``chunks[model]`` after waiting on ``gates[model]``, if any."""
+
+    def __init__(self, chunks, gates=None, errors=None):
+        self.chunks = chunks
+        self.gates = gates or {}
+        self.errors = errors or {}
+        self.calls = []
+        self.cancelled = threading.Event()
+
+    def create_text_response(self, *, model, chunk_callback, **kwargs):
+        self.calls.append({"model": model, **kwargs})
+        if model in self.gates:
+            self.gates[model].wait(5)
+        if model in self.errors:
+            raise self.errors[model]
+        try:
+            for chunk in self.chunks[model]:
+                chunk_callback(chunk)
+        except Exception:
+            self.cancelled.set()
+            raise
+        return "".join(self.chunks[model]), [model]
+
+
+def request(backend, chunks_seen, **kwargs):
+    return backend.create_text_response(
+        prompt=[{"role": "user", "content": "list files"}],
+        model="gpt-5.4-mini",
+        n=1,
+        temperature=1,
+        stop=None,
+        stream=True,
+        chunk_callback=chunks_seen.append,
+        **kwargs,
+    )
+
+
+def test_hedged_backend_does_not_hedge_fast_requests():
+    inner = FakeStreamingBackend({"gpt-5.4-mini": ["ls", " -la"]})
+    backend = HedgedBackend(inner, HedgePolicy(after=5))
+    chunks = []
+
+    text, response = request(backend, chunks)
+
+    assert (text, response) == ("ls -la", ["gpt-5.4-mini"])
+    assert chunks == ["ls", " -la"]
+    assert [call["model"] for call in inner.calls] == ["gpt-5.4-mini"]
+    assert not backend.last_outcome.fired
+    assert load_model_stats()["gpt-5.4-mini"]["hedge_rate"] == {"n": 1, "mean": 0.0}
+
+
+def test_hedged_backend_races_fallback_model_and_cancels_loser():
+    slow_primary = threading.Event()
+    inner = FakeStreamingBackend(
+        {"gpt-5.4-mini": ["slow"], "gpt-5.4-nano": ["fast"]},
+        gates={"gpt-5.4-mini": slow_primary},
+    )
+    backend = HedgedBackend(
+        inner,
+        HedgePolicy(after=0.01, model="gpt-5.4-nano"),
+        options_for=lambda model: {"reasoning_effort": f"effort-for-{model}"},
+    )
+    chunks = []
+
+    text, response = request(backend, chunks, reasoning_effort="effort-for-gpt-5.4-mini")
+    slow_primary.set()
+
+    assert text == "fast"
+    assert chunks == ["fast"]
+    assert backend.last_outcome.fired
+    assert backend.last_outcome.winner == "hedge"
+    assert backend.last_outcome.model == "gpt-5.4-nano"
+    assert inner.calls[1]["reasoning_effort"] == "effort-for-gpt-5.4-nano"
+    assert inner.cancelled.wait(5)
+    assert load_model_stats()["gpt-5.4-mini"]["hedge_wins"] == {"hedge": 1}
+
+
+def test_hedged_backend_respects_rate_cap():
+    record_hedge("gpt-5.4-mini", fired=True, winner="hedge")
+    slow_primary = threading.Event()
+    inner = FakeStreamingBackend({"gpt-5.4-mini": ["ls"]}, gates={"gpt-5.4-mini": slow_primary})
+    backend = HedgedBackend(inner, HedgePolicy(after=0.01, max_rate=0.5))
+    threading.Timer(0.05, slow_primary.set).start()
+
+    text, _ = request(backend, [])
+
+    assert text == "ls"
+    assert len(inner.calls) == 1
+    assert backend.last_outcome.skipped
+    assert not backend.last_outcome.fired
+
+
+def test_hedged_backend_raises_when_only_request_fails():
+    inner = FakeStreamingBackend({}, errors={"gpt-5.4-mini": RuntimeError("boom")})
+    backend = HedgedBackend(inner, HedgePolicy(after=5))
+
+    with pytest.raises(RuntimeError, match="boom"):
+        request(backend, [])
+
+
+def test_hedged_backend_ignores_primary_failure_when_hedge_succeeds():
+    slow_primary = threading.Event()
+    inner = FakeStreamingBackend(
+        {"gpt-5.4-nano": ["ls"]},
+        gates={"gpt-5.4-mini": slow_primary},
+        errors={"gpt-5.4-mini": RuntimeError("primary failed")},
+    )
+    backend = HedgedBackend(inner, HedgePolicy(after=0.01, model="gpt-5.4-nano"))
+    threading.Timer(0.05, slow_primary.set).start()
+
+    text, _ = request(backend, [])
+
+    assert text == "ls"
+    assert backend.last_outcome.winner == "hedge"
+
+
+def test_hedged_backend_hedges_once_when_primary_fails_after_the_hedge():
+    slow_primary = threading.Event()
+    slow_hedge = threading.Event()
+    inner = FakeStreamingBackend(
+        {"gpt-5.4-nano": ["ls"]},
+        gates={"gpt-5.4-mini": slow_primary, "gpt-5.4-nano": slow_hedge},
+        errors={"gpt-5.4-mini": RuntimeError("primary failed")},
+    )
+    backend = HedgedBackend(inner, HedgePolicy(after=0.05, model="gpt-5.4-nano"))
+    threading.Timer(0.15, slow_primary.set).start()
+    threading.Timer(0.3, slow_hedge.set).start()
+
+    text, _ = request(backend, [])
+
+    assert text == "ls"
+    assert len(inner.calls) == 2
+
+
+def test_hedge_policy_uses_learned_p90_threshold():
+    policy = HedgePolicy()
+    assert policy.threshold("gpt-5.4-mini") == DEFAULT_HEDGE_AFTER
+
+    for _ in range(18):
+        record_request("gpt-5.4-mini", latency=1.0, first_token=0.3)
+    for _ in range(2):
+        record_request("gpt-5.4-mini", latency=3.0, first_token=2.5)
+
+    assert 0.3 <= policy.threshold("gpt-5.4-mini") < 0.5
@@ -0,0 +1,156 @@
+import time
+
+import pytest
+
+from shellgenius import history as history_module
+from shellgenius.history import (
+    HistoryError,
+    connect_history,
+    find_generation,
+    get_history_path,
+    prune_history,
+    record_execution,
+    record_generation,
+    search_history,
+)
+from shellgenius.response_parser import ParsedShellResponse
+
+
+def parsed(command, explanation="", fence_language="bash"):
+    return ParsedShellResponse(
+        command=command,
+        explanation=explanation,
+        raw_text=command,
+        fence_language=fence_language,
+    )
+
+
+def store(task, command, explanation="", **kwargs):
+    return record_generation(
+        task, parsed(command, explanation), model="gpt-5.4-mini", os_name="Linux", **kwargs
+    )
+
+
+def test_record_generation_and_search():
+    entry_id = store("compress the logs folder", "tar czf logs.tgz logs", "* Creates an archive.")
+    store("list files", "ls -la")
+
+    entries = search_history("compress")
+
+    assert [entry.id for entry in entries] == [entry_id]
+    entry = entries[0]
+    assert entry.task == "compress the logs folder"
+    assert entry.command == "tar czf logs.tgz logs"
+    assert entry.explanation == "* Creates an archive."
+    assert entry.fence_language == "bash"
+    assert entry.model == "gpt-5.4-mini"
+    assert entry.os_name == "Linux"
+    assert not entry.executed
+
+
+@pytest.mark.parametrize("terms", ["tar", "arch", "LOGS FOLDER", "czf"])
+def test_search_history_matches_prefixes_in_every_column(terms):
+    store("compress the logs folder", "tar czf logs.tgz logs", "* Creates an archive.")
+
+    assert len(search_history(terms)) == 1
+
+
+@pytest.mark.parametrize("terms", ["", "   ", "logs OR", '"unbalanced', "NEAR(", "missing"])
+def test_search_history_treats_terms_literally(terms):
+    store("compress the logs folder", "tar czf logs.tgz logs")
+
+    assert search_history(terms) == []
+
+
+def test_search_history_requires_every_term():
+    store("compress the logs folder", "tar czf logs.tgz logs")
+    store("delete the logs folder", "rm -r logs")
+
+    assert [entry.command for entry in search_history("logs delete")] == ["rm -r logs"]
+
+
+def test_record_execution_stores_exit_status():
+    entry_id = store("list files", "ls -la")
+
+    record_execution(entry_id, 2)
+
+    entry = search_history("list")[0]
+    assert entry.executed
+    assert entry.exit_status == 2
+
+
+def test_find_generation_prefers_successful_command():
+    succeeded = store("Compress  the logs", "tar czf logs.tgz logs")
+    record_execution(succeeded, 0)
+    failed = store("compress the logs", "zip -r logs.zip logs")
+    record_execution(failed, 1)
+
+    assert find_generation("compress the LOGS", "linux").id == succeeded
+    assert find_generation("compress the logs", "Windows") is None
+
+
+def test_find_generation_without_history_does_not_create_it():
+    assert find_generation("compress the logs", "Linux") is None
+    assert not get_history_path().exists()
+
+
+def test_prune_history_by_count_and_age():
+    for index in range(5):
+        store(f"task {index}", f"echo {index}")
+    with connect_history() as connection:
+        connection.execute(
+            "UPDATE generations SET created = ? WHERE id = 1", (time.time() - 10 * 86400,)
+        )
+
+    assert prune_history(max_entries=None, max_age_days=5) == 1
+    assert prune_history(max_entries=2) == 2
+    assert sorted(entry.command for entry in search_history("task")) == ["echo 3", "echo 4"]
+
+
+def test_record_generation_applies_retention_periodically(monkeypatch):
+    monkeypatch.setattr(history_module, "PRUNE_INTERVAL", 4)
+
+    for index in range(4):
+        store(f"task {index}", f"echo {index}", max_entries=2)
+
+    assert len(search_history("task")) == 2
+
+
+def test_prune_history_vacuum():
+    store("list files", "ls -la")
+
+    assert prune_history(max_entries=0, vacuum=True) == 1
+    assert search_history("list") == []
+
+
+def test_search_history_without_fts5():
+    store("compress the logs folder", "tar czf logs.tgz logs")
+    with connect_history() as connection:
+        connection.executescript(
+            "DROP TRIGGER generations_ai; DROP TRIGGER generations_ad; DROP TABLE generations_fts;"
+        )
+
+    assert [entry.command for entry in search_history("logs tar")] == ["tar czf logs.tgz logs"]
+
+
+def test_search_history_without_fts5_treats_wildcards_literally():
+    store("show disk usage", "df -h")
+    store("show 100% full disks", "df -h | grep 100%")
+    with connect_history() as connection:
+        connection.executescript(
+            "DROP TRIGGER generations_ai; DROP TRIGGER generations_ad; DROP TABLE generations_fts;"
+        )
+
+    assert [entry.command for entry in search_history("100%")] == ["df -h | grep 100%"]
+    assert search_history("%") == search_history("100%")
+    assert search_history("show_disk") == []
+
+
+def test_search_and_prune_report_unreadable_history():
+    get_history_path().parent.mkdir(parents=True, exist_ok=True)
+    get_history_path().write_bytes(b"not a database" * 100)
+
+    with pytest.raises(HistoryError, match="Cannot read the history"):
+        search_history("logs")
+    with pytest.raises(HistoryError, match="Cannot prune the history"):
+        prune_history()
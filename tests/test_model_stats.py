@@ -0,0 +1,175 @@
+import pytest
+
+from shellgenius import model_stats
+from shellgenius.model_stats import (
+    COMMAND,
+    FOLLOW_UP,
+    HISTOGRAM_BOUNDS,
+    estimate_usage,
+    first_token_quantile,
+    histogram_quantile,
+    latency_quantile,
+    load_model_stats,
+    parse_success_rate,
+    record_hedge,
+    record_parse_result,
+    record_request,
+    summarize_models,
+)
+from shellgenius.openai_backend import ResponseUsage
+
+
+def test_estimate_usage_uses_defaults_without_history():
+    estimate = estimate_usage("gpt-5.4-mini")
+
+    assert estimate.is_default
+    assert estimate.output_tokens == 110
+    assert estimate.reasoning_tokens == 0
+    assert estimate.latency_seconds == pytest.approx(0.6 + 110 / 110)
+
+
+def test_estimate_usage_uses_recorded_history():
+    record_request(
+        "gpt-5.4-mini",
+        latency=2.0,
+        first_token=0.5,
+        usage=ResponseUsage(input_tokens=120, output_tokens=300, reasoning_tokens=200),
+    )
+    record_request(
+        "gpt-5.4-mini",
+        latency=4.0,
+        usage=ResponseUsage(input_tokens=120, output_tokens=500, reasoning_tokens=400),
+    )
+
+    estimate = estimate_usage("gpt-5.4-mini")
+
+    assert estimate.samples == 2
+    assert estimate.output_tokens == 100
+    assert estimate.reasoning_tokens == 300
+    assert estimate.latency_seconds == pytest.approx(3.0)
+    assert load_model_stats()["gpt-5.4-mini"]["first_token"] == {"n": 1, "mean": 0.5}
+
+
+def test_estimate_usage_keeps_each_request_kind_apart():
+    record_request(
+        "gpt-5.4-mini",
+        latency=6.0,
+        usage=ResponseUsage(input_tokens=120, output_tokens=600, reasoning_tokens=100),
+    )
+    record_request(
+        "gpt-5.4-mini",
+        kind=COMMAND,
+        latency=1.0,
+        usage=ResponseUsage(input_tokens=120, output_tokens=40, reasoning_tokens=10),
+    )
+
+    explain = estimate_usage("gpt-5.4-mini")
+    command = estimate_usage("gpt-5.4-mini", COMMAND)
+    follow_up = estimate_usage("gpt-5.4-mini", FOLLOW_UP)
+
+    assert (explain.output_tokens, explain.latency_seconds) == (500, pytest.approx(6.0))
+    assert (command.output_tokens, command.latency_seconds) == (30, pytest.approx(1.0))
+    assert follow_up.is_default
+    assert load_model_stats()["gpt-5.4-mini"]["requests"] == 2
+
+
+def test_record_request_without_usage_only_updates_latency():
+    record_request("gpt-4.1", latency=1.5)
+
+    estimate = estimate_usage("gpt-4.1")
+
+    assert estimate.is_default
+    assert estimate.output_tokens == 110
+    assert estimate.latency_seconds == pytest.approx(1.5)
+
+
+def test_rolling_mean_weights_recent_samples_after_warmup():
+    for _ in range(50):
+        record_request("gpt-4.1", latency=1.0)
+    record_request("gpt-4.1", latency=11.0)
+
+    assert load_model_stats()["gpt-4.1"]["latency"]["mean"] == pytest.approx(2.0)
+
+
+def test_record_request_ignores_unwritable_cache_dir(monkeypatch, tmp_path):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("", encoding="utf-8")
+    monkeypatch.setenv("SHELLGENIUS_CACHE_DIR", str(blocker / "nested"))
+
+    record_request("gpt-4.1", latency=1.0)
+
+    assert load_model_stats() == {}
+
+
+def test_load_model_stats_discards_unknown_versions():
+    model_stats.get_model_stats_path().parent.mkdir(parents=True)
+    model_stats.get_model_stats_path().write_text(
+        '{"version": 999, "models": {"gpt-4.1": {}}}', encoding="utf-8"
+    )
+
+    assert load_model_stats() == {}
+
+
+def test_histogram_quantile_returns_bucket_upper_bound():
+    counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+    counts[2] = 9
+    counts[5] = 1
+
+    assert histogram_quantile(counts, 0.5) == HISTOGRAM_BOUNDS[2]
+    assert histogram_quantile(counts, 0.95) == HISTOGRAM_BOUNDS[5]
+    assert histogram_quantile([], 0.5) is None
+
+
+def test_first_token_quantile_needs_enough_samples():
+    for _ in range(5):
+        record_request("gpt-5.4-mini", latency=1.0, first_token=0.4)
+
+    assert first_token_quantile("gpt-5.4-mini", 0.9) is None
+
+
+def test_record_hedge_tracks_rate_and_winners():
+    record_hedge("gpt-5.4-mini", fired=False)
+    record_hedge("gpt-5.4-mini", fired=True, winner="hedge")
+
+    stats = load_model_stats()["gpt-5.4-mini"]
+    assert stats["hedge_rate"] == {"n": 2, "mean": 0.5}
+    assert stats["hedge_wins"] == {"hedge": 1}
+
+
+def test_parse_success_rate_defaults_to_perfect_without_history():
+    assert parse_success_rate("gpt-5.4-mini") == (1.0, 0)
+
+    record_parse_result("gpt-5.4-mini", ok=True)
+    record_parse_result("gpt-5.4-mini", ok=False)
+
+    assert parse_success_rate("gpt-5.4-mini") == (0.5, 2)
+
+
+def test_latency_quantile_uses_total_latency_histogram():
+    for _ in range(20):
+        record_request("gpt-5.4-mini", latency=1.0)
+
+    assert latency_quantile("gpt-5.4-mini", 0.5) == HISTOGRAM_BOUNDS[8]
+
+
+def test_summarize_models_reports_quantiles_throughput_and_cost():
+    usage = ResponseUsage(input_tokens=100, output_tokens=50)
+    for latency in (1.0, 1.0, 1.0, 5.0):
+        record_request("gpt-5.4-mini", latency=latency, first_token=0.3, usage=usage, cost=0.001)
+    record_parse_result("gpt-5.4-mini", ok=True)
+
+    summary = summarize_models()["gpt-5.4-mini"]
+
+    assert summary.requests == 4
+    assert summary.first_token_p50 == summary.first_token_p95 == HISTOGRAM_BOUNDS[5]
+    assert summary.latency_p50 == HISTOGRAM_BOUNDS[8]
+    assert summary.latency_p95 == HISTOGRAM_BOUNDS[12]
+    assert summary.tokens_per_second == pytest.approx(40.0)
+    assert summary.parse_success == 1.0
+    assert summary.average_cost == pytest.approx(0.001)
+
+
+def test_summarize_models_skips_models_without_requests():
+    record_parse_result("gpt-5.4-nano", ok=True)
+
+    assert summarize_models() == {}
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from shellgenius import config as config_module
+from shellgenius.models import (
+    DEFAULT_MODEL,
+    MODEL_CAPABILITIES,
+    VALID_MODELS,
+    canonical_model_name,
+    get_model_capabilities,
+    resolve_request_options,
+)
+
+
+def test_valid_models_follow_capability_table():
+    assert list(VALID_MODELS) == list(MODEL_CAPABILITIES)
+    assert VALID_MODELS["gpt-5.4-mini"] == ("5.4-mini",)
+    assert DEFAULT_MODEL in VALID_MODELS
+
+
+def test_unknown_model_has_no_capabilities():
+    capabilities = get_model_capabilities("some-future-model")
+
+    assert not capabilities.reasoning
+    assert not capabilities.verbosity
+
+
+@pytest.mark.parametrize(
+    ("model", "requested", "expected"),
+    [
+        ("gpt-5-mini", None, "minimal"),
+        ("gpt-5-mini", "high", "high"),
+        ("gpt-5.4-mini", None, "none"),
+        ("gpt-5.4-mini", "minimal", "none"),
+        ("gpt-5.4", "medium", "medium"),
+        ("gpt-4.1", "high", None),
+    ],
+)
+def test_resolve_request_options_effort(model, requested, expected):
+    options = resolve_request_options(model, reasoning_effort=requested)
+
+    assert options.reasoning_effort == expected
+
+
+def test_resolve_request_options_drops_verbosity_for_models_without_it():
+    assert resolve_request_options("gpt-4o", verbosity="high").verbosity is None
+    assert resolve_request_options("gpt-5", verbosity="high").verbosity == "high"
+    assert resolve_request_options("gpt-5").verbosity == "low"
+
+
+def test_resolve_request_options_keeps_max_output_tokens():
+    assert resolve_request_options("gpt-4.1", max_output_tokens=64).max_output_tokens == 64
+
+
+def test_resolve_request_options_drops_unsupported_service_tier():
+    assert resolve_request_options("gpt-5-mini", service_tier="flex").service_tier == "flex"
+    assert resolve_request_options("gpt-4.1", service_tier="flex").service_tier is None
+    assert resolve_request_options("gpt-4.1", service_tier="priority").service_tier == "priority"
+
+
+def test_custom_models_resolve_from_config():
+    config_module.CONFIG_PATH.write_text(
+        json.dumps(
+            {"shellgenius": {"models": {"Local-Coder": {"aliases": ["lc"], "stop": False}}}}
+        ),
+        encoding="utf-8",
+    )
+
+    assert canonical_model_name("LC") == "Local-Coder"
+    assert canonical_model_name("local-coder") == "Local-Coder"
+    assert canonical_model_name("5.4-mini") == "gpt-5.4-mini"
+    assert canonical_model_name("other") is None
+    assert not get_model_capabilities("Local-Coder").stop
+    assert get_model_capabilities("Local-Coder").service_tiers == ()
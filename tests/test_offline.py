@@ -0,0 +1,73 @@
+import pytest
+
+from shellgenius import similarity
+from shellgenius.history import record_generation
+from shellgenius.offline import find_local_answer, format_answer
+from shellgenius.response_cache import response_cache_key, store_response
+from shellgenius.response_parser import parse_shellgenius_response
+
+
+def remember(task, command, *, model="gpt-5.4-mini"):
+    record_generation(
+        task,
+        parse_shellgenius_response(f"```bash\n{command}\n```\n\nExplanation:\n* Stored."),
+        model=model,
+        os_name="Linux",
+    )
+
+
+def test_format_answer_round_trips_through_parser():
+    parsed = parse_shellgenius_response(format_answer("ls -la", "* Lists files.", "bash"))
+
+    assert (parsed.command, parsed.explanation, parsed.fence_language) == (
+        "ls -la",
+        "* Lists files.",
+        "bash",
+    )
+
+
+def test_find_local_answer_prefers_response_cache():
+    task = "list open ports"
+    store_response(response_cache_key(task, "Linux"), "cached", model="gpt-5.4", explain=False)
+    remember(task, "netstat -tln")
+
+    answer = find_local_answer(task, "Linux")
+
+    assert (answer.text, answer.explain, answer.source) == ("cached", False, "response cache")
+    assert answer.describe() == "local answer from the response cache (gpt-5.4)"
+
+
+def test_find_local_answer_uses_history_before_patterns():
+    remember("list open ports", "netstat -tln")
+
+    answer = find_local_answer("List open ports", "Linux")
+
+    assert answer.source == "history"
+    assert parse_shellgenius_response(answer.text).command == "netstat -tln"
+    assert find_local_answer("list open ports", "Linux", history=False).source == "pattern library"
+
+
+@pytest.mark.skipif(not similarity.available(), reason="NumPy is not installed")
+def test_find_local_answer_uses_similar_task_index():
+    similarity.add_task(
+        "tar the logs folder", "Linux", "```bash\ntar cf l.tar logs\n```", model="m", explain=False
+    )
+
+    answer = find_local_answer("please tar the logs folder", "Linux")
+
+    assert answer.source == "similar-task index"
+    assert find_local_answer("please tar the logs folder", "Linux", similar_tasks=False) is None
+
+
+def test_find_local_answer_falls_back_to_pattern_library():
+    answer = find_local_answer("list open ports", "macOS")
+
+    assert answer.source == "pattern library"
+    assert answer.explain
+    parsed = parse_shellgenius_response(answer.text)
+    assert parsed.command == "lsof -nP -iTCP -sTCP:LISTEN"
+    assert parsed.explanation == "* Lists TCP ports with a listening process."
+
+
+def test_find_local_answer_without_any_source():
+    assert find_local_answer("write a haiku about rsync", "Linux") is None
@@ -0,0 +1,92 @@
+import re
+from string import Template
+
+import pytest
+
+from shellgenius.offline import format_answer
+from shellgenius.patterns import PATTERNS, match_pattern
+from shellgenius.response_parser import (
+    parse_shellgenius_response,
+    validate_executable_shell_response,
+)
+
+
+@pytest.mark.parametrize(
+    ("task", "os_name", "command"),
+    [
+        ("how do I check disk space left?", "Linux", "df -h"),
+        (
+            "find all files larger than 100MB in ~/Downloads",
+            "Linux",
+            "find ~/Downloads -type f -size +100M",
+        ),
+        (
+            "Show the 10 largest files in /var/log.",
+            "Linux",
+            "find /var/log -type f -exec du -h {} + | sort -rh | head -n 10",
+        ),
+        ("list open ports", "macOS", "lsof -nP -iTCP -sTCP:LISTEN"),
+        ("list open ports", "Linux", "ss -tlnp"),
+        (
+            "kill the process on port 8080",
+            "Windows",
+            "Stop-Process -Id (Get-NetTCPConnection -LocalPort 8080).OwningProcess",
+        ),
+        ("search for 'TODO fix' in all files under ./src", "macOS", "grep -rn -- 'TODO fix' ./src"),
+        ("extract Backup.tar.gz", "Linux", "tar -xf Backup.tar.gz"),
+        ("find files with extension .py", "Linux", "find . -type f -name '*.'py"),
+        (
+            "list empty folders in C:\\Temp",
+            "Windows",
+            "Get-ChildItem 'C:\\Temp' -Recurse -Directory"
+            " | Where-Object { -not (Get-ChildItem $_.FullName -Force) }",
+        ),
+        ("please undo the last commit but keep the changes", "Linux", "git reset --soft HEAD~1"),
+        ("list all docker containers", "Linux", "docker ps -a"),
+        ("list docker containers", "Linux", "docker ps"),
+    ],
+)
+def test_match_pattern(task, os_name, command):
+    match = match_pattern(task, os_name)
+
+    assert match is not None
+    assert match.command == command
+
+
+def test_match_pattern_quotes_captured_paths():
+    match = match_pattern("show disk usage of ~/my'dir", "Linux")
+
+    assert match.command == "du -sh ~/'my'\"'\"'dir'"
+    assert match.explanation == "Prints the total size of ~/my'dir in human-readable units."
+
+
+@pytest.mark.parametrize(
+    ("task", "os_name"),
+    [
+        ("find files larger than 10mb and delete them", "Linux"),
+        ("delete empty directories", "Windows"),
+        ("list open ports on the remote host", "Linux"),
+        ("find all log files", "Linux"),
+        ("count lines in My File.txt", "Linux"),
+        ("find all files larger than 100MB in ~/My Downloads", "Linux"),
+    ],
+)
+def test_match_pattern_requires_whole_task(task, os_name):
+    assert match_pattern(task, os_name) is None
+
+
+@pytest.mark.parametrize("pattern", PATTERNS, ids=lambda pattern: pattern.keywords[0])
+def test_patterns_are_consistent(pattern):
+    groups = set(re.compile(pattern.regex).groupindex)
+    fields = groups | set(pattern.defaults)
+    for os_name in ("Linux", "macOS", "Windows"):
+        template = pattern.template_for(os_name)
+        if template is None:
+            continue
+        command = Template(template).substitute({name: "x" for name in fields})
+        parsed = parse_shellgenius_response(
+            format_answer(command, "* Test.", "powershell" if os_name == "Windows" else "bash")
+        )
+        validate_executable_shell_response(parsed)
+    Template(pattern.explanation).substitute({name: "x" for name in fields})
+    assert all(re.search(keyword, pattern.regex) for keyword in pattern.keywords)
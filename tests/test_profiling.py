@@ -0,0 +1,126 @@
+import importlib
+import pstats
+import sys
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import shellgenius._entrypoint as entrypoint_module
+from shellgenius.profiling import ProfileRequest, extract_profile_request, run_profiled
+from shellgenius.timings import Timings, get_timings
+
+
+def test_extract_profile_request_consumes_profile_options():
+    request, remaining = extract_profile_request(
+        ["--profile", "out.prof", "--profile-memory", "list", "files"], {}
+    )
+
+    assert request == ProfileRequest(Path("out.prof"), trace_memory=True)
+    assert remaining == ["list", "files"]
+
+
+def test_extract_profile_request_accepts_equals_form_anywhere():
+    request, remaining = extract_profile_request(["--cmd", "list", "--profile=out.prof"], {})
+
+    assert request == ProfileRequest(Path("out.prof"))
+    assert remaining == ["--cmd", "list"]
+
+
+def test_extract_profile_request_reads_environment():
+    request, remaining = extract_profile_request(
+        ["list"],
+        {"SHELLGENIUS_PROFILE": "env.prof", "SHELLGENIUS_PROFILE_MEMORY": "1"},
+    )
+
+    assert request == ProfileRequest(Path("env.prof"), trace_memory=True)
+    assert remaining == ["list"]
+
+
+def test_extract_profile_request_leaves_task_after_double_dash():
+    request, remaining = extract_profile_request(["--", "--profile", "x"], {})
+
+    assert request is None
+    assert remaining == ["--", "--profile", "x"]
+
+
+def test_extract_profile_request_keeps_dangling_option_for_click():
+    request, remaining = extract_profile_request(["list", "--profile"], {})
+
+    assert request is None
+    assert remaining == ["list", "--profile"]
+
+
+def test_run_profiled_writes_stats_report_and_snapshot(tmp_path):
+    profile_path = tmp_path / "run.prof"
+    get_timings().record("request", 0.25)
+
+    result = run_profiled(lambda: sorted(range(1000)), ProfileRequest(profile_path, True))
+
+    assert result == list(range(1000))
+    assert not tracemalloc.is_tracing()
+    assert pstats.Stats(str(profile_path)).total_calls > 0
+    assert tracemalloc.Snapshot.load(str(tmp_path / "run.prof.tracemalloc")).traces
+    report = (tmp_path / "run.prof.txt").read_text(encoding="utf-8")
+    assert "# Timings" in report
+    assert "request" in report
+    assert "# Top functions by cumulative time" in report
+    assert "peak traced:" in report
+
+
+def test_run_profiled_writes_report_when_main_exits(tmp_path):
+    profile_path = tmp_path / "exit.prof"
+
+    def exit_main():
+        raise SystemExit(3)
+
+    with pytest.raises(SystemExit, match="3"):
+        run_profiled(exit_main, ProfileRequest(profile_path))
+
+    assert profile_path.exists()
+    assert "# Memory" not in (tmp_path / "exit.prof.txt").read_text(encoding="utf-8")
+    assert not (tmp_path / "exit.prof.tracemalloc").exists()
+
+
+def test_entrypoint_profiles_cli_run_and_strips_options(monkeypatch, tmp_path):
+    profile_path = tmp_path / "cli.prof"
+    seen_argv = []
+
+    monkeypatch.setattr(sys, "argv", ["shellgenius", "--profile", str(profile_path), "models"])
+    monkeypatch.setattr(
+        entrypoint_module.importlib,
+        "import_module",
+        _import_with_fake_cli(lambda: seen_argv.append(list(sys.argv)) or 0),
+    )
+
+    assert entrypoint_module.main() == 0
+    assert seen_argv == [["shellgenius", "models"]]
+    assert profile_path.exists()
+    assert "startup" in (tmp_path / "cli.prof.txt").read_text(encoding="utf-8")
+
+
+def _import_with_fake_cli(shellgenius):
+    real_import_module = importlib.import_module
+
+    def import_module(name):
+        if name == "shellgenius.cli":
+            return SimpleNamespace(shellgenius=shellgenius)
+        return real_import_module(name)
+
+    return import_module
+
+
+def test_timings_report_nests_detail_phases():
+    timings = Timings()
+    timings.record("request", 1.0)
+    timings.record("request.first_token", 0.4)
+    timings.note("model", "gpt-5.4-mini")
+
+    lines = timings.format_lines()
+
+    assert timings.total == 1.0
+    assert lines[0].startswith("request")
+    assert lines[1].startswith("  first_token")
+    assert lines[2].startswith("total")
+    assert lines[3] == "model: gpt-5.4-mini"
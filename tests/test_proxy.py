@@ -0,0 +1,380 @@
+import json
+import socket
+import threading
+
+import httpx
+import pytest
+from openai import OpenAI
+
+from shellgenius.gpt_integration import format_prompt
+from shellgenius.openai_backend import OpenAIResponsesBackend
+from shellgenius.proxy import (
+    REPLAY_HEADER,
+    CachedReply,
+    ProxyCache,
+    ProxyServer,
+    TokenBucket,
+    get_proxy_cache_path,
+)
+
+RESPONSE = {
+    "id": "resp_1",
+    "object": "response",
+    "created_at": 0,
+    "model": "gpt-5.4-mini",
+    "status": "completed",
+    "output": [
+        {
+            "type": "message",
+            "id": "msg_1",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": "```bash\nls\n```", "annotations": []}],
+        }
+    ],
+}
+
+STREAM = (
+    b"event: response.output_text.delta\n"
+    b'data: {"type":"response.output_text.delta","delta":"ls"}\n\n'
+    b"event: response.completed\n"
+    b'data: {"type":"response.completed"}\n\n'
+)
+
+
+class Upstream:
+    def __init__(self):
+        self.requests = []
+        self.status = 200
+
+    def __call__(self, request):
+        self.requests.append(request)
+        if json.loads(request.content or b"{}").get("stream"):
+            return httpx.Response(
+                self.status, content=STREAM, headers={"content-type": "text/event-stream"}
+            )
+        return httpx.Response(
+            self.status, json=RESPONSE, headers={"x-ratelimit-limit-requests": "500"}
+        )
+
+
+@pytest.fixture
+def upstream():
+    return Upstream()
+
+
+@pytest.fixture
+def start_proxy(upstream):
+    servers = []
+
+    def start(**options):
+        options.setdefault("cache", ProxyCache(get_proxy_cache_path()))
+        server = ProxyServer(
+            ("127.0.0.1", 0),
+            upstream="https://upstream.test/v1",
+            client=httpx.Client(transport=httpx.MockTransport(upstream)),
+            log=False,
+            **options,
+        )
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def post(server, path="/responses", body=None, **headers):
+    body = (
+        body
+        if body is not None
+        else {"model": "gpt-5.4-mini", "input": "list files", "temperature": 0}
+    )
+    return httpx.post(server.url + path, json=body, headers=headers)
+
+
+def test_key_ignores_field_order_and_irrelevant_fields():
+    key = ProxyCache.key_for("/responses", b'{"model": "m", "input": "x", "temperature": 0}')
+
+    assert key == ProxyCache.key_for(
+        "/responses", b'{"temperature": 0, "input": "x", "model": "m", "user": "u"}'
+    )
+    assert key != ProxyCache.key_for(
+        "/responses", b'{"input": "y", "model": "m", "temperature": 0}'
+    )
+    assert key != ProxyCache.key_for(
+        "/chat/completions", b'{"model": "m", "input": "x", "temperature": 0}'
+    )
+
+
+@pytest.mark.parametrize(
+    ("path", "body"),
+    [
+        ("/responses", b"not json"),
+        ("/responses", b'{"input": "x", "temperature": 0, "previous_response_id": "resp_1"}'),
+        ("/responses", b'{"input": "x"}'),
+        ("/responses", b'{"input": "x", "temperature": 0.7}'),
+        ("/embeddings", b'{"input": "x", "temperature": 0}'),
+    ],
+)
+def test_key_skips_uncacheable_requests(path, body):
+    assert ProxyCache.key_for(path, body) is None
+
+
+def test_key_depends_on_the_authorization_header():
+    body = b'{"input": "x", "temperature": 0}'
+
+    assert ProxyCache.key_for("/responses", body, authorization="Bearer a") != ProxyCache.key_for(
+        "/responses", body, authorization="Bearer b"
+    )
+
+
+def test_key_includes_sampled_requests_on_request():
+    assert ProxyCache.key_for("/responses", b'{"input": "x"}', sampled=True) is not None
+    assert ProxyCache.key_for("/responses", b'{"input": "x", "temperature": 1}', sampled=True)
+
+
+def test_cached_reply_round_trips():
+    reply = CachedReply(200, "text/event-stream", STREAM)
+
+    assert CachedReply.decode(reply.encode()) == reply
+    assert CachedReply.decode(b"garbage") is None
+
+
+def test_cache_expires_after_the_ttl(monkeypatch):
+    cache = ProxyCache(get_proxy_cache_path(), ttl=60)
+    key = ProxyCache.key_for("/responses", b'{"temperature": 0}')
+    cache.put(key, CachedReply(200, "application/json", b"{}"))
+
+    assert cache.get(key) is not None
+    monkeypatch.setattr("shellgenius.proxy.time.time", lambda: 1e12)
+    assert cache.get(key) is None
+
+
+def test_openai_client_through_proxy_is_cached(start_proxy, upstream):
+    server = start_proxy()
+    client = OpenAI(api_key="sk-test", base_url=server.url)
+
+    first = client.responses.create(model="gpt-5.4-mini", input="list files", temperature=0)
+    second = client.responses.create(model="gpt-5.4-mini", input="list files", temperature=0)
+
+    assert first.output_text == second.output_text == "```bash\nls\n```"
+    assert len(upstream.requests) == 1
+    assert str(upstream.requests[0].url) == "https://upstream.test/v1/responses"
+    assert upstream.requests[0].headers["authorization"] == "Bearer sk-test"
+    assert server.metrics.requests == {"hit": 1, "miss": 1, "bypass": 0}
+
+
+def test_proxy_passes_upstream_headers_and_marks_cache_result(start_proxy):
+    server = start_proxy()
+
+    first = post(server)
+    second = post(server)
+
+    assert first.headers["x-shellgenius-cache"] == "miss"
+    assert first.headers["x-ratelimit-limit-requests"] == "500"
+    assert second.headers["x-shellgenius-cache"] == "hit"
+    assert second.json() == first.json() == RESPONSE
+
+
+def test_proxy_replays_streams(start_proxy, upstream):
+    server = start_proxy()
+    body = {"model": "gpt-5.4-mini", "input": "list files", "temperature": 0, "stream": True}
+
+    first = post(server, body=body)
+    second = post(server, body=body)
+
+    assert first.content == second.content == STREAM
+    assert second.headers["content-type"] == "text/event-stream"
+    assert second.headers["x-shellgenius-cache"] == "hit"
+    assert len(upstream.requests) == 1
+
+
+def test_proxy_does_not_cache_errors(start_proxy, upstream):
+    server = start_proxy()
+    upstream.status = 500
+
+    assert post(server).status_code == 500
+    assert post(server).status_code == 500
+    assert len(upstream.requests) == 2
+
+
+def test_no_cache_header_bypasses_the_cache(start_proxy, upstream):
+    server = start_proxy()
+
+    post(server)
+    reply = post(server, **{"Cache-Control": "no-cache"})
+
+    assert reply.headers["x-shellgenius-cache"] == "bypass"
+    assert len(upstream.requests) == 2
+
+
+def test_proxy_forwards_sampled_requests_unless_told_to_cache_them(start_proxy, upstream):
+    body = {"model": "gpt-5.4-mini", "input": "list files"}
+    server = start_proxy()
+
+    post(server, body=body)
+    assert post(server, body=body).headers["x-shellgenius-cache"] == "bypass"
+
+    sampled = start_proxy(cache=ProxyCache(get_proxy_cache_path(), sampled=True))
+    post(sampled, body=body)
+    assert post(sampled, body=body).headers["x-shellgenius-cache"] == "hit"
+    assert len(upstream.requests) == 3
+
+
+def test_proxy_replays_cached_replies_only_for_the_same_api_key(start_proxy, upstream):
+    server = start_proxy()
+
+    post(server, Authorization="Bearer sk-a")
+    assert post(server, Authorization="Bearer sk-a").headers["x-shellgenius-cache"] == "hit"
+    assert post(server, Authorization="Bearer sk-b").headers["x-shellgenius-cache"] == "miss"
+    assert len(upstream.requests) == 2
+
+
+def test_shellgenius_requests_through_the_proxy_are_cached(start_proxy, upstream, monkeypatch):
+    monkeypatch.setattr("shellgenius.openai_backend.get_api_key", lambda: "sk-test")
+    server = start_proxy()
+    backend = OpenAIResponsesBackend(base_url=server.url)
+    request = {
+        "prompt": format_prompt("list files", "Linux"),
+        "model": "gpt-5.4-mini",
+        "n": 1,
+        "temperature": None,
+        "stop": None,
+        "stream": False,
+        "chunk_callback": None,
+    }
+
+    first, _ = backend.create_text_response(**request)
+    second, _ = backend.create_text_response(**request)
+
+    assert first == second == "```bash\nls\n```"
+    assert upstream.requests[0].headers[REPLAY_HEADER] == "1"
+    assert "temperature" not in json.loads(upstream.requests[0].content)
+    assert server.metrics.requests == {"hit": 1, "miss": 1, "bypass": 0}
+
+
+def test_proxy_survives_clients_that_hang_up(start_proxy, monkeypatch):
+    hung_up = threading.Event()
+    handled = threading.Event()
+    errors = []
+
+    def stream():
+        yield b"event: response.output_text.delta\n"
+        hung_up.wait(5)
+        for _ in range(100):
+            yield b"x" * 65536
+
+    server = start_proxy()
+    shutdown_request = server.shutdown_request
+    monkeypatch.setattr(server, "handle_error", lambda *args: errors.append(args))
+    monkeypatch.setattr(
+        server, "shutdown_request", lambda request: (shutdown_request(request), handled.set())
+    )
+    server.client = httpx.Client(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(
+                200, content=stream(), headers={"content-type": "text/event-stream"}
+            )
+        )
+    )
+
+    body = b'{"input": "list files", "temperature": 0, "stream": true}'
+    with socket.create_connection(server.server_address[:2]) as client:
+        client.sendall(
+            b"POST /v1/responses HTTP/1.1\r\nHost: proxy\r\n"
+            + f"Content-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        client.recv(1)
+    hung_up.set()
+
+    assert handled.wait(5)
+    assert errors == []
+
+
+def test_proxy_forwards_other_requests(start_proxy, upstream):
+    server = start_proxy()
+
+    reply = httpx.get(server.url + "/models")
+
+    assert reply.status_code == 200
+    assert str(upstream.requests[0].url) == "https://upstream.test/v1/models"
+    assert server.metrics.requests["bypass"] == 1
+
+
+def test_proxy_rejects_paths_outside_the_api(start_proxy):
+    server = start_proxy()
+
+    assert httpx.get(server.url.removesuffix("/v1") + "/other").status_code == 404
+
+
+def test_proxy_reports_upstream_failures(start_proxy, upstream):
+    def fail(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    server = start_proxy()
+    server.client = httpx.Client(transport=httpx.MockTransport(fail))
+
+    reply = post(server)
+
+    assert reply.status_code == 502
+    assert server.metrics.upstream_errors == 1
+
+
+def test_proxy_cuts_the_reply_short_when_upstream_fails_mid_stream(start_proxy):
+    def stream():
+        yield b"event: response.output_text.delta\n"
+        raise httpx.ReadError("connection reset")
+
+    server = start_proxy()
+    server.client = httpx.Client(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(
+                200, content=stream(), headers={"content-type": "text/event-stream"}
+            )
+        )
+    )
+
+    reply = post(server, body={"input": "list files", "temperature": 0, "stream": True})
+
+    assert reply.status_code == 200
+    assert reply.content == b"event: response.output_text.delta\n"
+    assert server.metrics.upstream_errors == 1
+
+
+def test_rate_limit_refuses_requests_beyond_the_wait(start_proxy, upstream, monkeypatch):
+    monkeypatch.setattr("shellgenius.proxy.MAX_RATE_LIMIT_WAIT", 0.0)
+    server = start_proxy(rate_limit=TokenBucket(1))
+    body = {"model": "gpt-5.4-mini", "input": "list ports", "temperature": 0}
+
+    assert post(server).status_code == 200
+    assert post(server).status_code == 200  # cache hits are not rate limited
+    reply = post(server, body=body)
+
+    assert reply.status_code == 429
+    assert "retry-after" in reply.headers
+    assert server.metrics.rate_limited == 1
+
+
+def test_token_bucket_paces_requests():
+    bucket = TokenBucket(60)
+    for _ in range(60):
+        assert bucket.reserve() == 0
+
+    wait = bucket.reserve()
+    assert 0.9 < wait <= 1.0
+    assert bucket.reserve(max_wait=0.5) is None
+
+
+def test_metrics_report_the_hit_rate(start_proxy):
+    server = start_proxy()
+    post(server)
+    post(server)
+
+    metrics = httpx.get(server.url.removesuffix("/v1") + "/metrics").text
+
+    assert 'shellgenius_proxy_requests_total{cache="hit"} 1' in metrics
+    assert "shellgenius_proxy_cache_hit_ratio 0.500000" in metrics
@@ -0,0 +1,147 @@
+import json
+
+import httpx
+import pytest
+
+from shellgenius import rate_limit
+from shellgenius.rate_limit import (
+    REQUESTS,
+    TOKENS,
+    Bucket,
+    get_rate_limit_path,
+    learn_from_response,
+    learn_limits,
+    load_rate_limits,
+    pace,
+    reserve,
+)
+
+HEADERS = {
+    "x-ratelimit-limit-requests": "60",
+    "x-ratelimit-remaining-requests": "59",
+    "x-ratelimit-limit-tokens": "6000",
+    "x-ratelimit-remaining-tokens": "6000",
+}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now[0])
+    return now
+
+
+def test_bucket_refills_per_minute():
+    bucket = Bucket(limit=60, level=0, updated=0)
+
+    assert bucket.level_at(30) == 30
+    assert bucket.level_at(600) == 60
+    assert bucket.wait_for(10, 0) == 10
+    assert bucket.wait_for(600, 0) == 60
+
+
+def test_no_limits_are_known_at_first():
+    assert load_rate_limits() == {}
+    assert reserve("gpt-5.4-mini", 100) == 0
+    assert not get_rate_limit_path().exists()
+
+
+def test_learn_limits_from_headers(clock):
+    learn_limits("gpt-5.4-mini", HEADERS)
+
+    assert load_rate_limits() == {
+        "gpt-5.4-mini": {
+            REQUESTS: Bucket(60, 59, clock[0]),
+            TOKENS: Bucket(6000, 6000, clock[0]),
+        }
+    }
+
+
+def test_learn_limits_keeps_the_lower_local_level(clock):
+    learn_limits("gpt-5.4-mini", HEADERS)
+    reserve("gpt-5.4-mini", 5000)
+
+    learn_limits("gpt-5.4-mini", HEADERS)
+
+    assert load_rate_limits()["gpt-5.4-mini"][TOKENS].level == 1000
+
+
+def test_learn_limits_ignores_responses_without_limits():
+    learn_limits("gpt-5.4-mini", {"x-ratelimit-limit-requests": "none"})
+
+    assert load_rate_limits() == {}
+
+
+def test_reserve_queues_requests_across_callers(clock):
+    learn_limits("gpt-5.4-mini", HEADERS)
+
+    assert reserve("gpt-5.4-mini", 3000) == 0
+    assert reserve("gpt-5.4-mini", 3000) == 0
+    assert reserve("gpt-5.4-mini", 3000) == pytest.approx(30)
+    assert reserve("gpt-5.4-mini", 3000) == pytest.approx(60)
+    assert reserve("gpt-5.4", 3000) == 0
+
+
+def test_reserve_paces_requests_per_minute(clock):
+    learn_limits("gpt-5.4-mini", {"x-ratelimit-limit-requests": "60"})
+    for _ in range(60):
+        assert reserve("gpt-5.4-mini", 0) == 0
+
+    assert reserve("gpt-5.4-mini", 0) == pytest.approx(1)
+    clock[0] += 2
+    assert reserve("gpt-5.4-mini", 0) == 0
+
+
+def test_learned_limits_expire(clock):
+    learn_limits("gpt-5.4-mini", HEADERS)
+    clock[0] += rate_limit.LIMIT_MAX_AGE + 1
+
+    assert load_rate_limits() == {}
+
+
+def test_pace_sleeps_at_most_max_wait(clock):
+    learn_limits("gpt-5.4-mini", {"x-ratelimit-limit-tokens": "600"})
+    slept = []
+
+    assert pace("gpt-5.4-mini", lambda: 600, sleep=slept.append) == 0
+    assert pace("gpt-5.4-mini", lambda: 300, max_wait=10, sleep=slept.append) == 10
+    assert slept == [10]
+
+
+def test_pace_estimates_tokens_only_with_known_limits():
+    def estimate():
+        raise AssertionError("no limits are known")
+
+    assert pace("gpt-5.4-mini", estimate) == 0
+
+
+def test_pace_counts_only_the_request_when_the_estimate_fails(clock):
+    learn_limits("gpt-5.4-mini", HEADERS)
+
+    def estimate():
+        raise OSError("tokenizer unavailable")
+
+    assert pace("gpt-5.4-mini", estimate) == 0
+    assert load_rate_limits()["gpt-5.4-mini"][REQUESTS].level == 58
+    assert load_rate_limits()["gpt-5.4-mini"][TOKENS].level == 6000
+
+
+def test_learn_from_response_reads_model_from_request():
+    request = httpx.Request(
+        "POST",
+        "https://api.openai.com/v1/responses",
+        content=json.dumps({"model": "gpt-5.4-nano", "input": "hi"}),
+    )
+
+    learn_from_response(httpx.Response(200, headers=HEADERS, request=request))
+    learn_from_response(httpx.Response(200, request=request))
+
+    assert list(load_rate_limits()) == ["gpt-5.4-nano"]
+
+
+def test_learn_from_response_ignores_requests_without_a_model():
+    request = httpx.Request("GET", "https://api.openai.com/v1/models")
+
+    learn_from_response(httpx.Response(200, headers=HEADERS, request=request))
+
+    assert load_rate_limits() == {}
@@ -0,0 +1,184 @@
+import gzip
+import json
+import time
+
+import pytest
+
+from shellgenius import response_cache
+from shellgenius.response_cache import (
+    EXPIRED,
+    FRESH,
+    STALE,
+    CacheTTL,
+    export_responses,
+    import_responses,
+    lookup_response,
+    prune_responses,
+    record_lookup,
+    response_cache_key,
+    response_cache_stats,
+    store_response,
+)
+
+
+def test_response_cache_key_ignores_case_and_whitespace():
+    assert response_cache_key("List  files ", "Linux") == response_cache_key("list files", "linux")
+    assert response_cache_key("list files", "Linux") != response_cache_key("list files", "Windows")
+
+
+def test_store_and_lookup_response():
+    key = response_cache_key("list files", "Linux")
+    assert lookup_response(key) is None
+
+    store_response(key, "```bash\nls\n```", model="gpt-5.4-mini", explain=False)
+
+    cached = lookup_response(key)
+    assert cached.text == "```bash\nls\n```"
+    assert cached.model == "gpt-5.4-mini"
+    assert not cached.explain
+    assert cached.age_seconds < 60
+
+
+def test_store_response_drops_oldest_entries(monkeypatch):
+    monkeypatch.setattr(response_cache, "MAX_CACHED_RESPONSES", 2)
+
+    for task in ("one", "two", "one", "three"):
+        store_response(response_cache_key(task, "Linux"), task, model="m", explain=True)
+
+    assert lookup_response(response_cache_key("two", "Linux")) is None
+    assert lookup_response(response_cache_key("one", "Linux")).text == "one"
+    assert lookup_response(response_cache_key("three", "Linux")).text == "three"
+
+
+def test_cache_ttl_freshness():
+    ttl = CacheTTL(soft=60, hard=3600)
+
+    assert ttl.freshness(0) == FRESH
+    assert ttl.freshness(60) == STALE
+    assert ttl.freshness(3599) == STALE
+    assert ttl.freshness(3600) == EXPIRED
+    assert CacheTTL(soft=60).freshness(10**9) == STALE
+
+
+def store_aged(task, age, *, model="gpt-5.4-mini"):
+    key = response_cache_key(task, "Linux")
+    store_response(
+        key, f"```bash\n{task}\n```", model=model, explain=True, created=time.time() - age
+    )
+    return key
+
+
+def test_response_cache_stats():
+    store_aged("one", 60)
+    store_aged("two", 7200, model="gpt-5.4-nano")
+    store_aged("three", 90 * 86400)
+    record_lookup(hit=True)
+    record_lookup(hit=True)
+    record_lookup(hit=False)
+
+    stats = response_cache_stats()
+
+    assert stats.entries == 3
+    assert stats.size_bytes > response_cache.get_response_cache_path().stat().st_size
+    assert stats.models == {"gpt-5.4-mini": 2, "gpt-5.4-nano": 1}
+    assert stats.ages == (1, 1, 0, 0, 1)
+    assert (stats.hits, stats.misses) == (2, 1)
+    assert stats.hit_rate == pytest.approx(2 / 3)
+
+
+def test_response_cache_stats_without_cache():
+    stats = response_cache_stats()
+
+    assert (stats.entries, stats.size_bytes, stats.hit_rate) == (0, 0, None)
+
+
+def test_prune_responses_by_age_model_and_count():
+    store_aged("old", 10 * 86400)
+    store_aged("nano", 60, model="gpt-5.4-nano")
+    store_aged("first", 60)
+    store_aged("second", 30)
+    store_aged("third", 10)
+
+    deleted = prune_responses(max_age=86400, max_entries=2, models=("gpt-5.4-nano",))
+
+    assert deleted == 3
+    assert [
+        lookup_response(response_cache_key(task, "Linux")) is not None
+        for task in ("old", "nano", "first", "second", "third")
+    ] == [False, False, False, True, True]
+
+
+def test_export_and_import_responses(tmp_path):
+    bundle = tmp_path / "runbooks.json.gz"
+    key = store_aged("list files", 7200)
+    store_aged("nano", 60, model="gpt-5.4-nano")
+
+    assert export_responses(bundle, models=("gpt-5.4-mini",)) == 1
+    response_cache.get_response_cache_path().unlink()
+
+    assert import_responses(bundle) == 1
+    assert lookup_response(key).text == "```bash\nlist files\n```"
+    assert lookup_response(key).age_seconds > 3600
+    assert import_responses(bundle) == 0
+
+    assert import_responses(bundle, as_new=True) == 1
+    assert lookup_response(key).age_seconds < 60
+
+
+def test_import_responses_keeps_newer_cached_answers(tmp_path):
+    bundle = tmp_path / "bundle.json.gz"
+    key = store_aged("list files", 7200)
+    export_responses(bundle)
+    store_response(key, "newer", model="gpt-5.4-mini", explain=True)
+
+    assert import_responses(bundle) == 0
+    assert lookup_response(key).text == "newer"
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        b"not gzip",
+        gzip.compress(b"[]"),
+        gzip.compress(json.dumps({"format": "other", "entries": {}}).encode()),
+        gzip.compress(
+            json.dumps(
+                {"format": "shellgenius-response-cache", "version": 99, "entries": {}}
+            ).encode()
+        ),
+    ],
+)
+def test_import_responses_rejects_invalid_bundles(tmp_path, content):
+    bundle = tmp_path / "bundle.json.gz"
+    bundle.write_bytes(content)
+
+    with pytest.raises(ValueError):
+        import_responses(bundle)
+
+
+def test_lookup_response_migrates_json_cache():
+    key = response_cache_key("list files", "Linux")
+    legacy_path = response_cache.get_cache_dir() / "responses.json"
+    legacy_path.parent.mkdir(parents=True)
+    legacy_path.write_text(
+        json.dumps(
+            {
+                "version": 1,
+                "entries": {
+                    key: {"text": "ls", "model": "gpt-5.4-mini", "explain": False, "created": 5.0},
+                    "not-a-key": {"text": "ignored"},
+                },
+            }
+        )
+    )
+
+    cached = lookup_response(key)
+
+    assert (cached.text, cached.model, cached.explain, cached.created) == (
+        "ls",
+        "gpt-5.4-mini",
+        False,
+        5.0,
+    )
+    assert not legacy_path.exists()
+    assert response_cache_stats().entries == 1
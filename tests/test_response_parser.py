@@ -85,3 +85,27 @@ def test_validate_executable_shell_response_rejects_non_shell_fence():
 def test_parse_shellgenius_response_rejects_malformed_output(response_text):
     with pytest.raises(ShellGeniusResponseError):
         parse_shellgenius_response(response_text)
+
+
+def test_parse_shellgenius_response_command_only_keeps_blank_lines_in_command():
+    text = "```bash\ncat <<'EOF' > notes.md\n```\nfirst\n\nsecond\n```\nEOF\n```"
+
+    response = parse_shellgenius_response(text, command_only=True)
+
+    assert response.command == "cat <<'EOF' > notes.md\n```\nfirst\n\nsecond\n```\nEOF"
+    assert response.explanation == ""
+
+
+def test_parse_shellgenius_response_command_only_splits_unrequested_explanation():
+    response = parse_shellgenius_response(
+        "```bash\nls -la\n```\n\nExplanation:\n* Lists files.\n```text\nout\n```",
+        command_only=True,
+    )
+
+    assert response.command == "ls -la"
+    assert response.explanation == "* Lists files.\n```text\nout\n```"
+
+
+def test_parse_shellgenius_response_command_only_rejects_unfenced_text():
+    with pytest.raises(ShellGeniusResponseError):
+        parse_shellgenius_response("Here is your command: ls", command_only=True)
@@ -0,0 +1,128 @@
+import json
+import os
+import time
+
+import pytest
+
+from shellgenius import config as config_module
+from shellgenius import gpt_integration, revalidate
+from shellgenius.response_cache import lookup_response, response_cache_key, store_response
+from shellgenius.revalidate import revalidate as revalidate_task
+from shellgenius.revalidate import spawn_revalidation
+from shellgenius.single_flight import SingleFlight, get_inflight_dir
+from shellgenius.storage import FileLock
+
+KEY = response_cache_key("list files", "Linux")
+ANSWER = "```bash\nls -la\n```\n\nExplanation:\n* Lists all files."
+
+
+@pytest.fixture
+def requests(monkeypatch):
+    sent = []
+
+    def chatgpt_request(prompt, **kwargs):
+        sent.append((prompt, kwargs))
+        return ANSWER, 0.1, object()
+
+    monkeypatch.setattr(gpt_integration, "chatgpt_request", chatgpt_request)
+    return sent
+
+
+def store_old_answer(age):
+    store_response(
+        KEY, "```bash\nls\n```", model="gpt-5.4-mini", explain=True, created=time.time() - age
+    )
+
+
+def test_revalidate_stores_a_new_answer(requests):
+    store_old_answer(7200)
+
+    assert revalidate_task("list files", "Linux", model="gpt-5.4-mini", explain=True)
+
+    assert lookup_response(KEY).text == ANSWER
+    assert lookup_response(KEY).age_seconds < 60
+    assert requests[0][1]["model"] == "gpt-5.4-mini"
+    assert SingleFlight(KEY).try_lead()
+
+
+def test_revalidate_uses_batch_tier_and_fallback(requests):
+    config_module.CONFIG_PATH.write_text(
+        json.dumps(
+            {"shellgenius": {"service_tier": {"batch": "flex"}, "fallback_model": "5.4-nano"}}
+        )
+    )
+
+    revalidate_task("list files", "Linux", model="gpt-5.4-mini", explain=True)
+
+    assert requests[0][1]["service_tier"] == "flex"
+    assert requests[0][1]["fallback_model"] == "gpt-5.4-nano"
+
+
+def test_revalidate_skips_answer_refreshed_meanwhile(requests):
+    config_module.CONFIG_PATH.write_text(json.dumps({"shellgenius": {"cache_ttl": {"soft": "1h"}}}))
+    store_old_answer(60)
+
+    assert not revalidate_task("list files", "Linux", model="gpt-5.4-mini", explain=True)
+    assert requests == []
+
+
+def test_revalidate_skips_task_being_generated(requests):
+    leader = SingleFlight(KEY)
+    assert leader.try_lead()
+
+    assert not revalidate_task("list files", "Linux", model="gpt-5.4-mini", explain=True)
+    assert requests == []
+
+
+def test_revalidate_skips_when_all_slots_are_taken(requests, monkeypatch):
+    monkeypatch.setattr(revalidate, "MAX_REFRESHES", 1)
+    slot = FileLock(get_inflight_dir() / "refresh-0.lock")
+    assert slot.acquire(timeout=0)
+
+    assert not revalidate_task("list files", "Linux", model="gpt-5.4-mini", explain=True)
+    assert requests == []
+
+
+def test_revalidate_keeps_old_answer_when_new_one_does_not_parse(monkeypatch):
+    store_old_answer(7200)
+    monkeypatch.setattr(
+        gpt_integration, "chatgpt_request", lambda *args, **kwargs: ("no code", 0.1, object())
+    )
+
+    assert not revalidate_task("list files", "Linux", model="gpt-5.4-mini", explain=True)
+    assert lookup_response(KEY).text == "```bash\nls\n```"
+
+
+def test_spawn_revalidation_starts_detached_process(monkeypatch):
+    started = []
+    monkeypatch.setattr(
+        revalidate.subprocess, "Popen", lambda args, **kwargs: started.append((args, kwargs))
+    )
+
+    assert spawn_revalidation("list files", "Linux", model="gpt-5.4-mini", explain=False)
+
+    ((args, kwargs),) = started
+    assert args[1:3] == ["-m", "shellgenius.revalidate"]
+    assert json.loads(args[3]) == {
+        "task": "list files",
+        "os_name": "Linux",
+        "model": "gpt-5.4-mini",
+        "explain": False,
+    }
+    if os.name != "nt":
+        assert kwargs["start_new_session"]
+
+
+def test_spawn_revalidation_skips_task_in_flight(monkeypatch):
+    monkeypatch.setattr(
+        revalidate.subprocess, "Popen", lambda *args, **kwargs: pytest.fail("process started")
+    )
+    leader = SingleFlight(KEY)
+    assert leader.try_lead()
+
+    assert not spawn_revalidation("list files", "Linux", model="gpt-5.4-mini", explain=False)
+
+
+def test_main_ignores_malformed_arguments():
+    assert revalidate.main([]) == 1
+    assert revalidate.main(["{}"]) == 1
@@ -0,0 +1,72 @@
+import pytest
+
+from shellgenius.model_stats import record_parse_result, record_request
+from shellgenius.routing import (
+    COMPLEX,
+    MODERATE,
+    SIMPLE,
+    choose_model,
+    classify_task,
+    estimate_task_tokens,
+)
+
+
+@pytest.mark.parametrize(
+    ("task", "tokens", "expected"),
+    [
+        ("list files", 2, SIMPLE),
+        ("show disk usage of the home directory", 7, SIMPLE),
+        ("parse the json output of docker ps", 8, MODERATE),
+        ("find logs, compress them, then upload with rsync over ssh", 14, COMPLEX),
+        ("word " * 60, 60, MODERATE),
+    ],
+)
+def test_classify_task(task, tokens, expected):
+    assert classify_task(task, tokens).complexity == expected
+
+
+def test_estimate_task_tokens_from_length():
+    assert estimate_task_tokens("list files") == 3
+    assert estimate_task_tokens("  ") == 0
+    assert estimate_task_tokens("word " * 60) == 75
+
+
+def test_classify_task_explains_reasons():
+    profile = classify_task("parse json with sed", 5)
+
+    assert profile.reasons == ("keywords: json, parse, sed",)
+
+
+def test_choose_model_prefers_smallest_model_for_simple_tasks():
+    choice = choose_model("list files", 2)
+
+    assert choice.model == "gpt-5.4-nano"
+    assert not choice.observed
+    assert "gpt-5.4-nano for a simple task (~2 tokens)" in choice.describe()
+
+
+def test_choose_model_needs_larger_model_for_complex_tasks():
+    choice = choose_model("find logs, compress them, then upload with rsync over ssh", 14)
+
+    assert choice.model == "gpt-5.4"
+
+
+def test_choose_model_uses_observed_p50_latency():
+    for _ in range(20):
+        record_request("gpt-5.4-nano", latency=4.0)
+        record_request("gpt-5.4-mini", latency=0.5)
+
+    choice = choose_model("list files", 2)
+
+    assert choice.model == "gpt-5.4-mini"
+    assert choice.observed
+    assert choice.p50_latency <= 0.6
+
+
+def test_choose_model_skips_models_that_often_fail_to_parse():
+    for ok in (False, False, True, True, True):
+        record_parse_result("gpt-5.4-nano", ok=ok)
+
+    choice = choose_model("list files", 2)
+
+    assert choice.model == "gpt-5.4-mini"
@@ -0,0 +1,159 @@
+import hashlib
+import os
+
+import pytest
+
+from shellgenius import segment_store
+from shellgenius.segment_store import SegmentStore
+
+
+def key(name):
+    return hashlib.sha256(name.encode()).digest()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SegmentStore(tmp_path / "store.seg")
+
+
+def put(store, *names, created=1.0):
+    with store.writer() as writer:
+        for name in names:
+            writer.put(key(name), created, f"value of {name}".encode())
+
+
+def test_get_from_missing_store(store):
+    assert store.get(key("a")) is None
+    assert list(store.items()) == []
+    assert store.size_bytes() == 0
+
+
+def test_put_and_get(store):
+    put(store, "a", "b")
+
+    assert store.get(key("a")) == (1.0, b"value of a")
+    assert store.get(key("b")) == (1.0, b"value of b")
+    assert store.get(key("c")) is None
+
+
+def test_put_supersedes_earlier_record(store):
+    put(store, "a", "b")
+    with store.writer() as writer:
+        writer.put(key("a"), 2.0, b"new")
+        assert writer.count == 2
+
+    assert store.get(key("a")) == (2.0, b"new")
+    assert [name for name, _, _ in store.items()] == [key("b"), key("a")]
+
+
+def test_put_rejects_malformed_keys(store):
+    with store.writer() as writer, pytest.raises(ValueError):
+        writer.put(b"short", 1.0, b"value")
+
+
+def test_index_grows_past_its_initial_size(store):
+    names = [str(number) for number in range(3 * segment_store.MIN_INDEX_SLOTS)]
+    put(store, *names)
+
+    assert all(store.get(key(name)) == (1.0, f"value of {name}".encode()) for name in names)
+    with store.writer() as writer:
+        assert writer.count == len(names)
+
+
+def test_writer_truncates_torn_last_record(store):
+    put(store, "a")
+    size = store.path.stat().st_size
+    with open(store.path, "ab") as segment:
+        segment.write(b"RC partial record")
+
+    put(store, "b")
+
+    assert store.get(key("a")) == (1.0, b"value of a")
+    assert store.get(key("b")) == (1.0, b"value of b")
+    assert len(list(store.items())) == 2
+    assert store.path.stat().st_size > size
+
+
+def test_writer_rebuilds_missing_index(store):
+    put(store, "a", "b")
+    store.index_path.unlink()
+
+    assert store.get(key("a")) is None
+    with store.writer() as writer:
+        assert writer.count == 2
+
+    assert store.get(key("a")) == (1.0, b"value of a")
+
+
+def test_writer_indexes_records_appended_after_a_crash(store, monkeypatch):
+    put(store, "a")
+    # Simulate a crash between appending a record and indexing it.
+    monkeypatch.setattr(segment_store.SegmentWriter, "_set", lambda *args: None)
+    monkeypatch.setattr(segment_store.SegmentWriter, "_set_indexed_size", lambda *args: None)
+    put(store, "b")
+    monkeypatch.undo()
+    assert store.get(key("b")) is None
+
+    with store.writer() as writer:
+        assert writer.count == 2
+
+    assert store.get(key("b")) == (1.0, b"value of b")
+
+
+def test_get_rejects_corrupt_record(store):
+    put(store, "a")
+    with open(store.path, "r+b") as segment:
+        segment.seek(-1, os.SEEK_END)
+        last = segment.read(1)
+        segment.seek(-1, os.SEEK_END)
+        segment.write(bytes([last[0] ^ 0xFF]))
+
+    assert store.get(key("a")) is None
+
+
+def test_writer_starts_over_from_unreadable_segment(store):
+    store.path.write_bytes(b"not a segment")
+
+    put(store, "a")
+
+    assert store.get(key("a")) == (1.0, b"value of a")
+
+
+def test_compact_keeps_live_records(store):
+    put(store, "a", "b", "c")
+    put(store, "a", "b", created=2.0)
+    size = store.path.stat().st_size
+
+    with store.writer() as writer:
+        assert writer.compact() == 0
+
+    assert store.path.stat().st_size < size
+    assert [(name, created) for name, created, _ in store.items()] == [
+        (key("c"), 1.0),
+        (key("a"), 2.0),
+        (key("b"), 2.0),
+    ]
+
+
+def test_compact_filters_and_keeps_newest_records(store):
+    put(store, "a", "b", "c", "d")
+
+    with store.writer() as writer:
+        dropped = writer.compact(lambda name, created, value: value != b"value of d", max_records=2)
+
+    assert dropped == 2
+    assert [name for name, _, _ in store.items()] == [key("b"), key("c")]
+    assert store.get(key("a")) is None
+    assert store.get(key("d")) is None
+
+
+def test_needs_compaction_once_mostly_superseded(store, monkeypatch):
+    monkeypatch.setattr(segment_store, "COMPACT_MIN_BYTES", 0)
+    put(store, "a", "b")
+
+    with store.writer() as writer:
+        assert not writer.needs_compaction()
+        writer.put(key("a"), 2.0, b"value of a")
+        writer.put(key("b"), 2.0, b"value of b")
+        writer.put(key("a"), 3.0, b"value of a")
+        assert writer.needs_compaction()
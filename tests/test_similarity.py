@@ -0,0 +1,139 @@
+import json
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from shellgenius import similarity  # noqa: E402
+from shellgenius.similarity import (  # noqa: E402
+    DIMENSIONS,
+    add_task,
+    find_similar_task,
+    get_index_path,
+    task_anchors,
+)
+
+ANSWER = "```bash\nfind . -name '*.log' -mtime +7 -delete\n```"
+
+
+def vector_rows():
+    return (get_index_path().parent / similarity.VECTORS_FILE).stat().st_size // (DIMENSIONS * 4)
+
+
+def test_task_anchors_keep_leading_verb_numbers_paths_and_globs():
+    assert task_anchors("Please delete all *.log files in /var/log older than 7 days.") == {
+        "delete",
+        "*.log",
+        "/var/log",
+        "7",
+    }
+    assert task_anchors("how do I show human-readable disk usage?") == {"show"}
+
+
+def test_find_similar_task_without_index():
+    assert find_similar_task("delete old logs", "Linux") is None
+
+
+def test_find_similar_task_matches_rewording():
+    add_task("delete log files older than 7 days", "Linux", ANSWER, model="gpt-5.4", explain=False)
+
+    match = find_similar_task("Please delete all the log files older than 7 days?", "linux")
+
+    assert match is not None
+    assert match.task == "delete log files older than 7 days"
+    assert match.text == ANSWER
+    assert match.model == "gpt-5.4"
+    assert not match.explain
+    assert match.similarity == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize(
+    ("task", "os_name"),
+    [
+        ("delete log files older than 70 days", "Linux"),
+        ("list log files older than 7 days", "Linux"),
+        ("delete log files older than 7 days", "Darwin"),
+        ("show the ten largest docker images", "Linux"),
+    ],
+)
+def test_find_similar_task_rejects_other_tasks(task, os_name):
+    add_task("delete log files older than 7 days", "Linux", ANSWER, model="gpt-5.4", explain=False)
+    add_task("show the five largest docker images", "Linux", ANSWER, model="gpt-5.4", explain=False)
+
+    assert find_similar_task(task, os_name) is None
+
+
+def test_find_similar_task_honors_threshold():
+    add_task("compress the logs folder into a tarball", "Linux", ANSWER, model="m", explain=True)
+
+    assert find_similar_task("compress logs folder to tar", "Linux") is None
+    match = find_similar_task("compress logs folder to tar", "Linux", threshold=0.5)
+    assert match is not None
+    assert 0.5 <= match.similarity < similarity.DEFAULT_THRESHOLD
+
+
+def test_add_task_refreshes_duplicate_without_new_vector():
+    add_task("list open ports", "Linux", "old", model="gpt-5.4-mini", explain=False)
+    add_task("List  open ports", "Linux", "new", model="gpt-5.4", explain=True)
+
+    assert vector_rows() == 1
+    match = find_similar_task("list open ports", "Linux")
+    assert (match.text, match.model, match.explain) == ("new", "gpt-5.4", True)
+
+
+def test_add_task_truncates_vector_left_by_interrupted_write():
+    add_task("list open ports", "Linux", ANSWER, model="m", explain=False)
+    with open(get_index_path().parent / similarity.VECTORS_FILE, "ab") as vectors_file:
+        vectors_file.write(b"\0" * DIMENSIONS * 4)
+
+    add_task("count zombie processes", "Linux", ANSWER, model="m", explain=False)
+
+    assert vector_rows() == 2
+    assert find_similar_task("count zombie processes", "Linux").task == "count zombie processes"
+
+
+def test_add_task_compacts_oldest_entries(monkeypatch):
+    monkeypatch.setattr(similarity, "MAX_INDEXED_TASKS", 10)
+
+    for index in range(12):
+        add_task(f"task number {index}", "Linux", ANSWER, model="m", explain=False)
+
+    entries = [json.loads(line) for line in get_index_path().read_text("utf-8").splitlines()[1:]]
+    assert [entry["task"] for entry in entries][:2] == ["task number 2", "task number 3"]
+    assert vector_rows() == 10
+    assert find_similar_task("task number 11", "Linux").task == "task number 11"
+
+
+def test_add_task_appends_to_the_index():
+    add_task("list open ports", "Linux", ANSWER, model="m", explain=False)
+    index = get_index_path().read_bytes()
+    answers = (get_index_path().parent / similarity.ANSWERS_FILE).read_bytes()
+
+    add_task("count zombie processes", "Linux", ANSWER, model="m", explain=False)
+
+    assert get_index_path().read_bytes().startswith(index)
+    assert (get_index_path().parent / similarity.ANSWERS_FILE).read_bytes().startswith(answers)
+    assert len(get_index_path().read_bytes().splitlines()) == 3
+
+
+def test_add_task_drops_line_torn_by_interrupted_write():
+    add_task("list open ports", "Linux", ANSWER, model="m", explain=False)
+    with open(get_index_path(), "ab") as index_file:
+        index_file.write(b'{"key": "ab')
+
+    assert find_similar_task("list open ports", "Linux").task == "list open ports"
+    add_task("count zombie processes", "Linux", ANSWER, model="m", explain=False)
+
+    assert vector_rows() == 2
+    assert find_similar_task("count zombie processes", "Linux").task == "count zombie processes"
+
+
+def test_add_task_starts_over_when_vectors_are_missing():
+    add_task("list open ports", "Linux", ANSWER, model="m", explain=False)
+    (get_index_path().parent / similarity.VECTORS_FILE).write_bytes(b"")
+
+    assert find_similar_task("list open ports", "Linux") is None
+    add_task("list open ports", "Linux", ANSWER, model="m", explain=False)
+
+    assert vector_rows() == 1
+    assert find_similar_task("list open ports", "Linux").task == "list open ports"
@@ -0,0 +1,111 @@
+import threading
+
+from shellgenius.response_cache import lookup_response, response_cache_key, store_response
+from shellgenius.single_flight import SingleFlight, get_inflight_dir, prune_lock_files
+
+KEY = response_cache_key("list files", "Linux")
+
+
+def finish_later(leader, text="```bash\nls\n```", *, explain=False, delay=0.05):
+    def finish():
+        if text is not None:
+            store_response(KEY, text, model="gpt-5.4-mini", explain=explain)
+        leader.release()
+
+    timer = threading.Timer(delay, finish)
+    timer.start()
+    return timer
+
+
+def test_first_process_leads():
+    leader = SingleFlight(KEY)
+
+    assert leader.try_lead()
+    assert leader.leading
+    assert not SingleFlight(KEY).try_lead()
+    assert (get_inflight_dir() / f"{KEY}.lock").exists()
+
+    leader.release()
+    assert not leader.leading
+    assert SingleFlight(KEY).try_lead()
+
+
+def test_follower_reads_the_leaders_answer():
+    leader = SingleFlight(KEY)
+    assert leader.try_lead()
+    follower = SingleFlight(KEY)
+    assert not follower.try_lead()
+
+    finish_later(leader)
+    shared = follower.wait(5, explain=False, model="gpt-5.4-mini")
+
+    assert shared.text == "```bash\nls\n```"
+    assert shared.model == "gpt-5.4-mini"
+    assert not follower.leading
+
+
+def test_follower_leads_when_the_leader_fails():
+    leader = SingleFlight(KEY)
+    assert leader.try_lead()
+
+    finish_later(leader, text=None)
+    follower = SingleFlight(KEY)
+
+    assert follower.wait(5, explain=False, model="gpt-5.4-mini") is None
+    assert follower.leading
+
+
+def test_follower_ignores_the_answer_cached_before_it_waited():
+    store_response(KEY, "```bash\nls -a\n```", model="gpt-5.4-mini", explain=False)
+    leader = SingleFlight(KEY)
+    assert leader.try_lead()
+
+    finish_later(leader, text=None)
+    follower = SingleFlight(KEY)
+
+    assert follower.wait(5, explain=False, model="gpt-5.4-mini") is None
+    assert follower.leading
+
+
+def test_follower_needing_an_explanation_leads_instead():
+    leader = SingleFlight(KEY)
+    assert leader.try_lead()
+
+    finish_later(leader, explain=False)
+    follower = SingleFlight(KEY)
+
+    assert follower.wait(5, explain=True, model="gpt-5.4-mini") is None
+    assert follower.leading
+    assert lookup_response(KEY) is not None
+
+
+def test_follower_asking_another_model_leads_instead():
+    leader = SingleFlight(KEY)
+    assert leader.try_lead()
+
+    finish_later(leader)
+    follower = SingleFlight(KEY)
+
+    assert follower.wait(5, explain=False, model="gpt-5.4") is None
+    assert follower.leading
+
+
+def test_follower_gives_up_after_the_timeout():
+    leader = SingleFlight(KEY)
+    assert leader.try_lead()
+    follower = SingleFlight(KEY)
+
+    assert follower.wait(0.05, explain=False, model="gpt-5.4-mini") is None
+    assert not follower.leading
+    assert leader.leading
+
+
+def test_prune_lock_files_keeps_held_locks():
+    held = SingleFlight(KEY)
+    assert held.try_lead()
+    idle = SingleFlight(response_cache_key("list ports", "Linux"))
+    assert idle.try_lead()
+    idle.release()
+
+    assert prune_lock_files() == 1
+    assert [path.name for path in get_inflight_dir().iterdir()] == [f"{KEY}.lock"]
@@ -0,0 +1,70 @@
+import json
+import threading
+
+import pytest
+
+from shellgenius import storage
+from shellgenius.storage import FileLock, format_size, get_cache_dir, read_json, update_json
+
+
+def test_get_cache_dir_honors_override(monkeypatch, tmp_path):
+    monkeypatch.setenv("SHELLGENIUS_CACHE_DIR", str(tmp_path / "state"))
+
+    assert get_cache_dir() == tmp_path / "state"
+
+
+@pytest.mark.skipif(storage.os.name == "nt", reason="XDG layout is POSIX-only")
+def test_get_cache_dir_defaults_to_xdg_cache_home(monkeypatch, tmp_path):
+    monkeypatch.delenv("SHELLGENIUS_CACHE_DIR", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+
+    assert get_cache_dir() == tmp_path / "shellgenius"
+
+
+def test_file_lock_times_out_while_another_holder_has_it(tmp_path):
+    lock_path = tmp_path / "busy.lock"
+    holder = FileLock(lock_path)
+    assert holder.acquire()
+
+    try:
+        assert FileLock(lock_path).acquire(timeout=0.05) is False
+    finally:
+        holder.release()
+
+    second = FileLock(lock_path)
+    assert second.acquire(timeout=0)
+    second.release()
+
+
+def test_update_json_serializes_concurrent_updates(tmp_path):
+    path = tmp_path / "counter.json"
+
+    def increment():
+        for _ in range(20):
+            update_json(path, lambda data: {"count": (data or {}).get("count", 0) + 1})
+
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert read_json(path) == {"count": 80}
+    assert [entry.name for entry in tmp_path.iterdir() if entry.suffix == ".tmp"] == []
+
+
+def test_read_json_returns_none_for_corrupt_file(tmp_path):
+    path = tmp_path / "broken.json"
+    path.write_text("{not json", encoding="utf-8")
+
+    assert read_json(path) is None
+    update_json(path, lambda data: {"recovered": data is None})
+    assert json.loads(path.read_text(encoding="utf-8")) == {"recovered": True}
+
+
+@pytest.mark.parametrize(
+    ("size", "expected"),
+    [(0, "0.0 B"), (1536, "1.5 KiB"), (5 * 1024**2, "5.0 MiB"), (3 * 1024**3, "3.0 GiB")],
+)
+def test_format_size(size, expected):
+    assert format_size(size) == expected